@@ -0,0 +1,141 @@
+"""Deterministic grading of short answers before they are sent to the LLM.
+
+Most submitted answers are easy to decide: an exact match once case, accents
+and punctuation are ignored, the same words in a different order, the same
+number written differently, or no answer at all. local_verdict() decides those
+cases. It returns None for everything else, and only those answers are graded
+by the LLM. The rules only ever say "correct" or "incorrect"; "partial" is
+left to the LLM.
+"""
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter, namedtuple
+
+LocalVerdict = namedtuple('LocalVerdict', ['verdict', 'rule'])
+ExpectedAnswer = namedtuple('ExpectedAnswer', ['normalized', 'quantity', 'tokens'])
+
+# Extra words allowed on top of the expected ones before the answer counts as ambiguous
+CORRECT_TOKEN_PRECISION = 0.75
+NUMERIC_REL_TOLERANCE = 1e-9
+
+STOPWORDS = frozenset(['a', 'an', 'the', 'of', 'to', 'in', 'on', 'and', 'is', 'are', 'it', 'its', 'by', 'for'])
+NEGATIONS = frozenset(['not', 'no', 'never', 'none', 'neither', 'nor', 'without', 'cannot', 'isnt', 'arent',
+                       'doesnt', 'dont', 'wasnt', 'werent'])
+NO_ANSWER = frozenset([
+    '', 'idk', 'i dont know', 'dont know', 'i do not know', 'do not know', 'no idea', 'i have no idea',
+    'not sure', 'i am not sure', 'im not sure', 'no clue', 'unknown', 'pass', 'skip', 'na', 'n/a', 'none'
+])
+
+NUMBER_RE = re.compile(r'^([-+]?(?:\d[\d,]*(?:\.\d+)?|\.\d+))(?:\s*/\s*(\d+(?:\.\d+)?))?\s*(%?)\s*(.*)$')
+
+
+def normalize_answer(text):
+    """Lowercase, strip accents and apostrophes, turn punctuation into spaces and collapse whitespace"""
+    text = unicodedata.normalize('NFKD', str(text))
+    text = ''.join(char for char in text if not unicodedata.combining(char)).lower()
+    text = re.sub(r"['’`]", '', text)
+    text = re.sub(r'[^\w\s.,%/+-]|_', ' ', text)
+    return ' '.join(text.split()).strip(' .,')
+
+
+def content_tokens(normalized):
+    return set(re.findall(r'[a-z0-9]+', normalized)) - STOPWORDS
+
+
+def parse_quantity(normalized):
+    """(value, tolerance, unit) for answers like '1,000', '-2.5 kg', '3/4' or '50%', else None.
+
+    The tolerance is half a unit of the last written digit, so '3.14' accepts 3.1416
+    but '1000' does not accept 1001.
+    """
+    match = NUMBER_RE.match(normalized)
+    if not match:
+        return None
+    number, denominator, percent, unit = match.groups()
+    if unit and not re.fullmatch(r'[a-z][a-z .]*', unit):
+        return None
+    value = float(number.replace(',', ''))
+    decimals = len(number.split('.', 1)[1]) if '.' in number else 0
+    tolerance = 0.5 * 10 ** -decimals
+    if denominator:
+        if float(denominator) == 0:
+            return None
+        value /= float(denominator)
+        tolerance /= float(denominator)
+    if percent:
+        value /= 100.0
+        tolerance /= 100.0
+    return value, tolerance, unit.strip(' .')
+
+
+def compile_expected(correct_answer):
+    """Pre-parse a correct answer so it can be checked against many user answers"""
+    normalized = normalize_answer(correct_answer)
+    return ExpectedAnswer(normalized, parse_quantity(normalized), content_tokens(normalized))
+
+
+def local_verdict(correct_answer, user_answer):
+    """LocalVerdict for answers that can be decided without the LLM, or None to escalate.
+
+    correct_answer may be a plain string or the result of compile_expected().
+    """
+    expected = correct_answer if isinstance(correct_answer, ExpectedAnswer) else compile_expected(correct_answer)
+    given = normalize_answer(user_answer)
+
+    if expected.normalized and given == expected.normalized:
+        return LocalVerdict('correct', 'exact')
+    if given in NO_ANSWER:
+        return LocalVerdict('incorrect', 'no_answer')
+    if not expected.normalized:
+        return None
+
+    expected_quantity, given_quantity = expected.quantity, parse_quantity(given)
+    # Only the same unit on both sides: "5" for "5 million" or "1990" for "1990s" goes to the LLM
+    if expected_quantity and given_quantity and given_quantity[2] == expected_quantity[2]:
+        same = math.isclose(expected_quantity[0], given_quantity[0],
+                            rel_tol=NUMERIC_REL_TOLERANCE, abs_tol=expected_quantity[1])
+        return LocalVerdict('correct' if same else 'incorrect', 'numeric')
+
+    expected_tokens, given_tokens = expected.tokens, content_tokens(given)
+    if not expected_tokens or not given_tokens:
+        return None
+    # A negation the expected answer doesn't have can flip the meaning; let the LLM judge it
+    if (given_tokens - expected_tokens) & NEGATIONS:
+        return None
+    if expected_tokens <= given_tokens:
+        precision = len(expected_tokens) / len(given_tokens)
+        if precision >= CORRECT_TOKEN_PRECISION:
+            return LocalVerdict('correct', 'token_overlap')
+    return None
+
+
+class GradingStats:
+    """Per-process counters of how short answers were graded"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = Counter()
+
+    def record(self, graded_by, rule=None):
+        with self._lock:
+            self._counts[graded_by] += 1
+            if rule:
+                self._counts[f"rule:{rule}"] += 1
+
+    def snapshot(self):
+        with self._lock:
+            counts = dict(self._counts)
+        local, llm = counts.get('local', 0), counts.get('llm', 0)
+        total = local + llm
+        return {
+            'answers': total,
+            'local': local,
+            'llm': llm,
+            'local_share': round(local / total, 4) if total else 0.0,
+            'rules': {key.split(':', 1)[1]: value for key, value in counts.items() if key.startswith('rule:')}
+        }
+
+
+grading_stats = GradingStats()
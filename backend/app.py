@@ -1,42 +1,53 @@
-from flask import Flask, request, jsonify, current_app
+from flask import Flask, Blueprint, Response, request, jsonify, current_app, stream_with_context
 from flask_cors import CORS
 import os
 import uuid
 from datetime import datetime, timedelta
-from openai import OpenAI
+from types import SimpleNamespace
 from dotenv import load_dotenv
 from flask_sqlalchemy import SQLAlchemy
 from werkzeug.security import generate_password_hash, check_password_hash
 import jwt
 from functools import wraps
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import json
+import base64
+import gzip
+import hashlib
+import math
+import random
+import time
+import threading
+import click
 from flask_migrate import Migrate
-from sqlalchemy import func, desc, distinct
-import httpx
+from sqlalchemy import func, desc, bindparam, select, case, and_, union, union_all
+from sqlalchemy.orm import selectinload, joinedload, raiseload, load_only
+from llm_scheduler import (LLMScheduler, RateLimitStore, DEFAULT_STORE_PATH,
+                           PRIORITY_INTERACTIVE, PRIORITY_GENERATION, PRIORITY_BULK)
+from llm_backends import create_llm_backend
+from answer_grading import compile_expected, local_verdict, normalize_answer, grading_stats
+from token_budget import TokenUsage, estimate_messages_tokens, fit_passage
+from spaced_repetition import REVIEW_FIELDS, next_review
+from quiz_schema import InvalidPackageError, generation_stats, merge_package, parse_package, validate_package
+from compression import compress, is_compressible, negotiate_encoding
+from json_provider import OrjsonProvider
 
 
 load_dotenv(dotenv_path="./.env")
 
-# Initialize Flask app
-app = Flask(__name__)
-
-# Configuration
-app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key')
-app.config['OPENAI_API_KEY'] = os.getenv('OPENAI_API_KEY')
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///quizzes.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-
-CORS(app, resources={r"/*": {"origins": [
+CORS_ORIGINS = [
     "http://localhost:3000",
     "http://192.168.0.174:3000",
     "https://quizgenie-8be1.onrender.com",
     "https://quizgenie-eta.vercel.app"
-]}}, supports_credentials=True)
+]
+
+# Routes and CLI commands live on this blueprint; create_app() builds the application
+bp = Blueprint('quizgenie', __name__, cli_group=None)
 
-# Initialize database
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)
+# Initialize database (bound to the app in create_app)
+db = SQLAlchemy()
+migrate = Migrate()
 
 # Add this to your models section
 tags = db.Table('quiz_tags',
@@ -56,6 +67,9 @@ class Tag(db.Model):
 
 class Quiz(db.Model):
     __tablename__ = 'quizzes'
+    __table_args__ = (
+        db.Index('ix_quizzes_user_id_created_at', 'user_id', 'created_at'),
+    )
     
     id = db.Column(db.String(36), primary_key=True)
     original_text = db.Column(db.Text, nullable=False)
@@ -68,6 +82,9 @@ class Quiz(db.Model):
     difficulty = db.Column(db.String(20))
     plays = db.Column(db.Integer, default=0)  # Add this line
     rating = db.Column(db.Float, default=0.0)  # Also add rating if not present
+    trending_score = db.Column(db.Float, index=True)  # Log-space time-decayed plays, see trending_increment()
+    prompt_tokens = db.Column(db.Integer)  # Provider-reported usage of the generation call
+    completion_tokens = db.Column(db.Integer)
     
     # Relationships
     tags = db.relationship('Tag', secondary=tags, lazy='subquery',
@@ -106,6 +123,12 @@ class User(db.Model):
 # Add these models to track quiz attempts
 class QuizAttempt(db.Model):
     __tablename__ = 'quiz_attempts'
+    __table_args__ = (
+        db.Index('ix_quiz_attempts_quiz_id_id', 'quiz_id', 'id'),
+        db.Index('ix_quiz_attempts_quiz_id_completed_at', 'quiz_id', 'completed_at'),
+        db.Index('ix_quiz_attempts_user_id_completed_at', 'user_id', 'completed_at'),
+        db.Index('ix_quiz_attempts_user_id_quiz_id_completed_at', 'user_id', 'quiz_id', 'completed_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -115,6 +138,9 @@ class QuizAttempt(db.Model):
     total_questions = db.Column(db.Integer, nullable=False)
     completed_at = db.Column(db.DateTime, default=datetime.utcnow)
     time_spent = db.Column(db.String(20))  # Format: "MM:SS"
+    time_spent_seconds = db.Column(db.Integer)  # time_spent parsed once at write time, for SQL aggregates
+    prompt_tokens = db.Column(db.Integer)  # Provider-reported usage of the LLM grading calls, if any
+    completion_tokens = db.Column(db.Integer)
     user_answers = db.Column(db.Text)  # JSON string of all user answers
     details = db.Column(db.Text)  # JSON string of evaluation details
     
@@ -125,39 +151,728 @@ class QuizAttempt(db.Model):
     def __repr__(self):
         return f'<QuizAttempt {self.id} - User {self.user_id} - Quiz {self.quiz_id}>'
 
+# Score buckets shared by analytics and the daily rollups: (label, upper bound, rollup column)
+SCORE_BUCKETS = [
+    ('0-20', 20, 'bucket_0_20'),
+    ('21-40', 40, 'bucket_21_40'),
+    ('41-60', 60, 'bucket_41_60'),
+    ('61-80', 80, 'bucket_61_80'),
+    ('81-100', None, 'bucket_81_100'),
+]
+
+class QuizDailyRollup(db.Model):
+    """Per-quiz daily aggregate of attempts that were moved out of quiz_attempts"""
+    __tablename__ = 'quiz_daily_rollups'
+
+    quiz_id = db.Column(db.String(36), db.ForeignKey('quizzes.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    score_sum = db.Column(db.Float, nullable=False, default=0.0)
+    score_max = db.Column(db.Float)
+    bucket_0_20 = db.Column(db.Integer, nullable=False, default=0)
+    bucket_21_40 = db.Column(db.Integer, nullable=False, default=0)
+    bucket_41_60 = db.Column(db.Integer, nullable=False, default=0)
+    bucket_61_80 = db.Column(db.Integer, nullable=False, default=0)
+    bucket_81_100 = db.Column(db.Integer, nullable=False, default=0)
+    time_count = db.Column(db.Integer, nullable=False, default=0)  # Attempts with a parseable time_spent
+    time_sum_seconds = db.Column(db.Integer, nullable=False, default=0)
+    time_min_seconds = db.Column(db.Integer)
+    time_max_seconds = db.Column(db.Integer)
+
+class UserDailyRollup(db.Model):
+    """Per-user, per-quiz daily aggregate of archived attempts (feeds the history endpoints)"""
+    __tablename__ = 'user_daily_rollups'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    quiz_id = db.Column(db.String(36), db.ForeignKey('quizzes.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    score_sum = db.Column(db.Float, nullable=False, default=0.0)
+    score_max = db.Column(db.Float)
+    correct_sum = db.Column(db.Integer, nullable=False, default=0)
+    questions_sum = db.Column(db.Integer, nullable=False, default=0)
+    time_sum_seconds = db.Column(db.Integer, nullable=False, default=0)
+    last_completed_at = db.Column(db.DateTime)
+    last_score = db.Column(db.Float)
+
+    __table_args__ = (
+        db.Index('ix_user_daily_rollups_quiz_id', 'quiz_id'),
+    )
+
+class UserQuizSummary(db.Model):
+    """One row per quiz a user took (live and archived attempts), so the taken-quiz history never groups attempts"""
+    __tablename__ = 'user_quiz_summaries'
+    __table_args__ = (
+        db.Index('ix_user_quiz_summaries_user_id_last_completed_at', 'user_id', 'last_completed_at', 'quiz_id'),
+    )
+
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    quiz_id = db.Column(db.String(36), db.ForeignKey('quizzes.id'), primary_key=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    score_sum = db.Column(db.Float, nullable=False, default=0.0)
+    best_score = db.Column(db.Float)
+    # The latest attempt; only its completed_at and score survive once it is rolled up
+    last_attempt_id = db.Column(db.Integer)
+    last_completed_at = db.Column(db.DateTime, nullable=False)
+    last_score = db.Column(db.Float)
+    last_correct_answers = db.Column(db.Integer)
+    last_total_questions = db.Column(db.Integer)
+    last_time_spent = db.Column(db.String(20))
+
+class ArchivedQuizAttempt(db.Model):
+    """Raw attempts moved out of the hot quiz_attempts table by the rollup job"""
+    __tablename__ = 'quiz_attempts_archive'
+
+    id = db.Column(db.Integer, primary_key=True)  # Same id as the original quiz_attempts row
+    user_id = db.Column(db.Integer, nullable=False, index=True)
+    quiz_id = db.Column(db.String(36), nullable=False, index=True)
+    score = db.Column(db.Float, nullable=False)
+    correct_answers = db.Column(db.Integer, nullable=False)
+    total_questions = db.Column(db.Integer, nullable=False)
+    completed_at = db.Column(db.DateTime)
+    time_spent = db.Column(db.String(20))
+    user_answers = db.Column(db.Text)
+    details = db.Column(db.Text)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class QuestionStat(db.Model):
+    """Per-question outcome counters, incremented by every submit"""
+    __tablename__ = 'question_stats'
+
+    quiz_id = db.Column(db.String(36), db.ForeignKey('quizzes.id'), primary_key=True)
+    question_index = db.Column(db.Integer, primary_key=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    correct = db.Column(db.Integer, nullable=False, default=0)
+    partial = db.Column(db.Integer, nullable=False, default=0)
+    incorrect = db.Column(db.Integer, nullable=False, default=0)
+
+class QuestionOptionStat(db.Model):
+    """How often each MCQ option was picked; option_index -1 counts answers matching no option"""
+    __tablename__ = 'question_option_stats'
+
+    quiz_id = db.Column(db.String(36), db.ForeignKey('quizzes.id'), primary_key=True)
+    question_index = db.Column(db.Integer, primary_key=True)
+    option_index = db.Column(db.Integer, primary_key=True)
+    selections = db.Column(db.Integer, nullable=False, default=0)
+
+class ReviewItem(db.Model):
+    """Spaced-repetition state of one question for one user, advanced by every graded attempt"""
+    __tablename__ = 'review_items'
+    __table_args__ = (
+        db.Index('ix_review_items_user_id_due_at', 'user_id', 'due_at'),
+    )
+
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    quiz_id = db.Column(db.String(36), db.ForeignKey('quizzes.id'), primary_key=True)
+    question_index = db.Column(db.Integer, primary_key=True)
+    ease = db.Column(db.Float, nullable=False)
+    interval_days = db.Column(db.Float, nullable=False)
+    repetitions = db.Column(db.Integer, nullable=False)  # Successful reviews since the last lapse
+    lapses = db.Column(db.Integer, nullable=False)
+    due_at = db.Column(db.DateTime, nullable=False)
+    last_reviewed_at = db.Column(db.DateTime, nullable=False)
+    last_outcome = db.Column(db.String(10), nullable=False)  # correct / partial / incorrect
+
+class QuizSignature(db.Model):
+    """MinHash signatures of a quiz's passage and question text, and its near-duplicate cluster"""
+    __tablename__ = 'quiz_signatures'
+
+    quiz_id = db.Column(db.String(36), db.ForeignKey('quizzes.id'), primary_key=True)
+    passage = db.Column(db.LargeBinary)
+    questions = db.Column(db.LargeBinary)
+    cluster_id = db.Column(db.String(36), nullable=False, index=True)  # Quiz the cluster formed around
+
+class QuizLshBand(db.Model):
+    """LSH band keys of the signatures; quizzes sharing a key are near-duplicate candidates"""
+    __tablename__ = 'quiz_lsh_bands'
+
+    band_key = db.Column(db.BigInteger, primary_key=True)
+    quiz_id = db.Column(db.String(36), db.ForeignKey('quizzes.id'), primary_key=True, index=True)
+
+class TrendingQuiz(db.Model):
+    """Materialized top TRENDING_TOP_N public quizzes by trending score, overall and per tag"""
+    __tablename__ = 'trending_quizzes'
+    __table_args__ = (
+        db.Index('ix_trending_quizzes_scope_score', 'scope', 'score'),
+    )
+
+    scope = db.Column(db.String(60), primary_key=True)  # 'all' or 'tag:<name>', see trending_scope()
+    quiz_id = db.Column(db.String(36), db.ForeignKey('quizzes.id'), primary_key=True)
+    score = db.Column(db.Float, nullable=False)
+
+class TagFacetCount(db.Model):
+    """Public quizzes per (tag, difficulty), kept current on every write so Discover facets never scan quizzes"""
+    __tablename__ = 'tag_facet_counts'
+
+    tag_id = db.Column(db.Integer, primary_key=True)  # ALL_QUIZZES_FACET for every public quiz
+    difficulty = db.Column(db.String(20), primary_key=True)  # '' when the quiz has none
+    quizzes = db.Column(db.Integer, nullable=False, default=0)
+
+class BankQuestion(db.Model):
+    """One question of a saved quiz, copied out of quiz_content so quizzes can be assembled without the LLM"""
+    __tablename__ = 'bank_questions'
+    __table_args__ = (
+        db.UniqueConstraint('quiz_id', 'question_index', name='uq_bank_questions_quiz_id_question_index'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    quiz_id = db.Column(db.String(36), db.ForeignKey('quizzes.id'), nullable=False)
+    question_index = db.Column(db.Integer, nullable=False)
+    quiz_type = db.Column(db.String(20), nullable=False)
+    difficulty = db.Column(db.String(20), nullable=False)  # The quiz's; '' when it has none
+    question_hash = db.Column(db.String(32), nullable=False, index=True)  # See bank_question_hash()
+    content = db.Column(db.Text, nullable=False)  # The question's JSON, as in quiz_content
+    # Set on the questions of assembled quizzes: where the question was drawn from. Such rows
+    # record what a quiz asked but have no keys, so they are never drawn again.
+    source_quiz_id = db.Column(db.String(36), index=True)
+    source_index = db.Column(db.Integer)
+
+class BankQuestionKey(db.Model):
+    """Drawing index of the bank: a question under each of its tags and ALL_QUIZZES_FACET, in random order"""
+    __tablename__ = 'bank_question_keys'
+    __table_args__ = (
+        db.Index('ix_bank_question_keys_draw', 'tag_id', 'quiz_type', 'difficulty', 'sample_key'),
+        db.Index('ix_bank_question_keys_draw_any', 'tag_id', 'quiz_type', 'sample_key'),
+    )
+
+    question_id = db.Column(db.Integer, db.ForeignKey('bank_questions.id'), primary_key=True)
+    tag_id = db.Column(db.Integer, primary_key=True)
+    quiz_type = db.Column(db.String(20), nullable=False)
+    difficulty = db.Column(db.String(20), nullable=False)
+    is_public = db.Column(db.Boolean, nullable=False)
+    user_id = db.Column(db.Integer, nullable=False)  # Owner of the quiz; private questions are drawn for them only
+    question_hash = db.Column(db.String(32), nullable=False)
+    sample_key = db.Column(db.Float, nullable=False)  # Uniform in [0, 1), redrawn whenever the question is drawn
+
+class LlmUsageDaily(db.Model):
+    """Provider-reported tokens per user, day (UTC) and purpose: generation, grading or regrade"""
+    __tablename__ = 'llm_usage_daily'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    purpose = db.Column(db.String(20), primary_key=True)
+    requests = db.Column(db.Integer, nullable=False, default=0)
+    prompt_tokens = db.Column(db.Integer, nullable=False, default=0)
+    completion_tokens = db.Column(db.Integer, nullable=False, default=0)
+
+class BulkGenerationJob(db.Model):
+    __tablename__ = 'bulk_generation_jobs'
+
+    id = db.Column(db.String(36), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending/running/completed/failed
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+    items = db.relationship('BulkGenerationItem', backref='job', lazy=True,
+                            order_by='BulkGenerationItem.position')
+
+class BulkGenerationItem(db.Model):
+    __tablename__ = 'bulk_generation_items'
+
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.String(36), db.ForeignKey('bulk_generation_jobs.id'), nullable=False, index=True)
+    position = db.Column(db.Integer, nullable=False)
+    text = db.Column(db.Text, nullable=False)
+    quiz_type = db.Column(db.String(20), nullable=False, default='mcq')
+    num_questions = db.Column(db.Integer, nullable=False, default=5)
+    is_public = db.Column(db.Boolean, default=True)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending/running/done/failed
+    quiz_id = db.Column(db.String(36), db.ForeignKey('quizzes.id'))
+    error = db.Column(db.Text)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'position': self.position,
+            'status': self.status,
+            'quiz_type': self.quiz_type,
+            'num_questions': self.num_questions,
+            'is_public': self.is_public,
+            'quiz_id': self.quiz_id,
+            'error': self.error
+        }
+
+class RegradeJob(db.Model):
+    __tablename__ = 'regrade_jobs'
+
+    id = db.Column(db.String(36), primary_key=True)
+    quiz_id = db.Column(db.String(36), db.ForeignKey('quizzes.id'), nullable=False, index=True)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending/running/completed/failed/superseded
+    answer_key_hash = db.Column(db.String(64), nullable=False)
+    last_attempt_id = db.Column(db.Integer, nullable=False, default=0)  # Checkpoint: attempts up to here are done
+    attempts_done = db.Column(db.Integer, nullable=False, default=0)
+    attempts_changed = db.Column(db.Integer, nullable=False, default=0)
+    llm_calls = db.Column(db.Integer, nullable=False, default=0)
+    rating = db.Column(db.Float)  # Quiz rating replayed over the regraded attempts, set when the job completes
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'quiz_id': self.quiz_id,
+            'status': self.status,
+            'attempts_done': self.attempts_done,
+            'attempts_changed': self.attempts_changed,
+            'llm_calls': self.llm_calls,
+            'error': self.error,
+            'created_at': self.created_at.isoformat(),
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+class TransferCheckpoint(db.Model):
+    __tablename__ = 'transfer_checkpoints'
+
+    name = db.Column(db.String(64), primary_key=True)  # sha256 of the export's header line
+    position = db.Column(db.Integer, nullable=False, default=0)  # Lines of the file already imported
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    completed_at = db.Column(db.DateTime)
+
+
+class OutboxEvent(db.Model):
+    """Work derived from a committed write, delivered after the response by the outbox worker"""
+    __tablename__ = 'outbox_events'
+    # Ids are never reused: a delivery deletes its events by id, and a reused id would let a stale batch
+    # delete someone else's event instead of coming up short
+    __table_args__ = {'sqlite_autoincrement': True}
+
+    id = db.Column(db.Integer, primary_key=True)
+    topic = db.Column(db.String(40), nullable=False)
+    payload = db.Column(db.Text, nullable=False)  # JSON
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    available_at = db.Column(db.DateTime, index=True)  # Next delivery; NULL once parked after OUTBOX_MAX_ATTEMPTS
+    attempts = db.Column(db.Integer, nullable=False, default=0)  # Failed deliveries so far
+    last_error = db.Column(db.Text)
 
 # ---------------------------------------------------------------------------
 # Database Initialization
 # ---------------------------------------------------------------------------
 def initialize_database():
-    """Create tables & seed initial data when app starts"""
-    with app.app_context():
-        db.create_all()
-        # Only seed if database is empty
-        if not User.query.first():
-            admin = User(
-                username="admin", 
-                email="admin@example.com",
-                password=generate_password_hash("adminpassword")
-            )
-            db.session.add(admin)
-            db.session.commit()
-
-# Initialize immediately (for production)
-initialize_database()
+    """Create tables & seed initial data (run once per deploy via `flask init-db`)"""
+    db.create_all()
+    # Only seed if database is empty
+    if not User.query.first():
+        admin = User(
+            username="admin", 
+            email="admin@example.com",
+            password=generate_password_hash("adminpassword")
+        )
+        db.session.add(admin)
+        db.session.commit()
 
-# OR use before_first_request for lazy initialization (development)
-# @app.before_first_request
-# def on_first_request():
-#     initialize_database()
+@bp.cli.command('init-db')
+def init_db_command():
+    """Create the database tables and seed the admin user"""
+    initialize_database()
+    click.echo('Database initialized')
 
-@app.teardown_appcontext
 def shutdown_session(exception=None):
     """Cleanup database session at app context teardown"""
     db.session.remove()
 
 
-@app.route('/verify-token', methods=['GET'])
+# ---------------------------------------------------------------------------
+# Attempt Retention (daily rollups + archive)
+# ---------------------------------------------------------------------------
+def parse_time_spent(time_spent):
+    """Convert a "MM:SS" string into seconds, or None if it can't be parsed"""
+    if not time_spent or ':' not in time_spent:
+        return None
+    try:
+        minutes, seconds = map(int, time_spent.split(':'))
+    except ValueError:
+        return None
+    return minutes * 60 + seconds
+
+def score_bucket(score):
+    """Return the SCORE_BUCKETS entry a score falls into"""
+    for bucket in SCORE_BUCKETS:
+        if bucket[1] is None or score <= bucket[1]:
+            return bucket
+    return SCORE_BUCKETS[-1]
+
+def serialize_attempt_row(attempt):
+    """Column values of a QuizAttempt, as stored in the archive table / NDJSON files"""
+    return {
+        'id': attempt.id,
+        'user_id': attempt.user_id,
+        'quiz_id': attempt.quiz_id,
+        'score': attempt.score,
+        'correct_answers': attempt.correct_answers,
+        'total_questions': attempt.total_questions,
+        'completed_at': attempt.completed_at.isoformat() if attempt.completed_at else None,
+        'time_spent': attempt.time_spent,
+        'user_answers': attempt.user_answers,
+        'details': attempt.details
+    }
+
+def _merge_attempt_into_rollups(attempt, quiz_rollups, user_rollups):
+    """Fold one raw attempt into the (not yet flushed) rollup rows for its day"""
+    day = attempt.completed_at.date()
+    seconds = attempt.time_spent_seconds if attempt.time_spent_seconds is not None \
+        else parse_time_spent(attempt.time_spent)
+
+    quiz_key = (attempt.quiz_id, day)
+    quiz_rollup = quiz_rollups.get(quiz_key)
+    if quiz_rollup is None:
+        quiz_rollup = db.session.get(QuizDailyRollup, quiz_key) or \
+                      QuizDailyRollup(quiz_id=attempt.quiz_id, day=day, attempts=0, score_sum=0.0,
+                                      bucket_0_20=0, bucket_21_40=0, bucket_41_60=0,
+                                      bucket_61_80=0, bucket_81_100=0,
+                                      time_count=0, time_sum_seconds=0)
+        quiz_rollups[quiz_key] = quiz_rollup
+        db.session.add(quiz_rollup)
+
+    quiz_rollup.attempts += 1
+    quiz_rollup.score_sum += attempt.score
+    quiz_rollup.score_max = max(quiz_rollup.score_max or 0, attempt.score)
+    column = score_bucket(attempt.score)[2]
+    setattr(quiz_rollup, column, getattr(quiz_rollup, column) + 1)
+    if seconds is not None:
+        quiz_rollup.time_count += 1
+        quiz_rollup.time_sum_seconds += seconds
+        quiz_rollup.time_min_seconds = seconds if quiz_rollup.time_min_seconds is None \
+            else min(quiz_rollup.time_min_seconds, seconds)
+        quiz_rollup.time_max_seconds = seconds if quiz_rollup.time_max_seconds is None \
+            else max(quiz_rollup.time_max_seconds, seconds)
+
+    user_key = (attempt.user_id, attempt.quiz_id, day)
+    user_rollup = user_rollups.get(user_key)
+    if user_rollup is None:
+        user_rollup = db.session.get(UserDailyRollup, user_key) or \
+                      UserDailyRollup(user_id=attempt.user_id, quiz_id=attempt.quiz_id, day=day,
+                                      attempts=0, score_sum=0.0, correct_sum=0,
+                                      questions_sum=0, time_sum_seconds=0)
+        user_rollups[user_key] = user_rollup
+        db.session.add(user_rollup)
+
+    user_rollup.attempts += 1
+    user_rollup.score_sum += attempt.score
+    user_rollup.score_max = max(user_rollup.score_max or 0, attempt.score)
+    user_rollup.correct_sum += attempt.correct_answers or 0
+    user_rollup.questions_sum += attempt.total_questions or 0
+    user_rollup.time_sum_seconds += seconds or 0
+    if not user_rollup.last_completed_at or attempt.completed_at >= user_rollup.last_completed_at:
+        user_rollup.last_completed_at = attempt.completed_at
+        user_rollup.last_score = attempt.score
+
+def rollup_attempts(older_than_days=None, archive_mode=None, batch_size=1000):
+    """Roll raw attempts older than N days into the daily rollups and archive them.
+
+    Attempts are processed in id order, one batch per transaction, so an
+    interrupted run simply resumes with the rows that are still in quiz_attempts.
+    The cutoff is aligned to midnight (UTC) so a rolled-up day is always complete.
+    Attempts whose outbox event has not been delivered are kept for a later run.
+    Returns the number of attempts archived.
+    """
+    older_than_days = older_than_days if older_than_days is not None else current_app.config['ATTEMPT_RETENTION_DAYS']
+    archive_mode = archive_mode or current_app.config['ATTEMPT_ARCHIVE_MODE']
+    if archive_mode not in ('table', 'ndjson'):
+        raise ValueError(f"Unknown archive mode: {archive_mode}")
+
+    cutoff = datetime.combine((datetime.utcnow() - timedelta(days=older_than_days)).date(), datetime.min.time())
+    archive_path = None
+    if archive_mode == 'ndjson':
+        archive_dir = current_app.config['ATTEMPT_ARCHIVE_DIR']
+        os.makedirs(archive_dir, exist_ok=True)
+        archive_path = os.path.join(
+            archive_dir, f"quiz_attempts-{cutoff.date().isoformat()}-{uuid.uuid4().hex[:8]}.ndjson.gz"
+        )
+
+    # Archiving an attempt before its event is delivered would lose its counters, stats and summaries.
+    # New events are only ever for new attempts, newer than the cutoff, so one snapshot covers the run.
+    undelivered = undelivered_attempt_ids()
+    archived = 0
+    while True:
+        batch = QuizAttempt.query.filter(QuizAttempt.completed_at < cutoff, QuizAttempt.id.notin_(undelivered))\
+                .order_by(QuizAttempt.id)\
+                .limit(batch_size).all()
+        if not batch:
+            break
+
+        quiz_rollups, user_rollups = {}, {}
+        for attempt in batch:
+            _merge_attempt_into_rollups(attempt, quiz_rollups, user_rollups)
+
+        rows = [serialize_attempt_row(attempt) for attempt in batch]
+        if archive_mode == 'table':
+            for row in rows:
+                row['completed_at'] = datetime.fromisoformat(row['completed_at']) if row['completed_at'] else None
+            db.session.bulk_insert_mappings(ArchivedQuizAttempt, rows)
+        else:
+            # Appending gzip members keeps earlier batches readable if the job dies mid-run;
+            # a crash before commit can leave a batch in the file twice, never lose one.
+            with gzip.open(archive_path, 'at', encoding='utf-8') as archive_file:
+                for row in rows:
+                    archive_file.write(json.dumps(row) + '\n')
+
+        batch_ids = [attempt.id for attempt in batch]
+        QuizAttempt.query.filter(QuizAttempt.id.in_(batch_ids)).delete(synchronize_session=False)
+        # Summaries keep the values of their latest attempt, but its id no longer resolves
+        UserQuizSummary.query.filter(UserQuizSummary.last_attempt_id.in_(batch_ids))\
+            .update({'last_attempt_id': None}, synchronize_session=False)
+        db.session.commit()
+        db.session.expunge_all()
+        archived += len(batch)
+
+    return archived
+
+def quiz_rollup_totals(quiz_id):
+    """Aggregates for a quiz's archived attempts, shaped like the raw-row analytics"""
+    row = db.session.query(
+        func.coalesce(func.sum(QuizDailyRollup.attempts), 0),
+        func.coalesce(func.sum(QuizDailyRollup.score_sum), 0.0),
+        *[func.coalesce(func.sum(getattr(QuizDailyRollup, bucket[2])), 0) for bucket in SCORE_BUCKETS],
+        func.coalesce(func.sum(QuizDailyRollup.time_count), 0),
+        func.coalesce(func.sum(QuizDailyRollup.time_sum_seconds), 0),
+        func.min(QuizDailyRollup.time_min_seconds),
+        func.max(QuizDailyRollup.time_max_seconds)
+    ).filter(QuizDailyRollup.quiz_id == quiz_id).one()
+
+    bucket_counts = row[2:2 + len(SCORE_BUCKETS)]
+    time_count, time_sum, time_min, time_max = row[2 + len(SCORE_BUCKETS):]
+    return {
+        'attempts': int(row[0]),
+        'score_sum': float(row[1]),
+        'score_distribution': {bucket[0]: int(count) for bucket, count in zip(SCORE_BUCKETS, bucket_counts)},
+        'time_count': int(time_count),
+        'time_sum_seconds': int(time_sum),
+        'time_min_seconds': time_min,
+        'time_max_seconds': time_max
+    }
+
+def quiz_attempt_aggregates(quiz_id):
+    """Totals over a quiz's live attempts plus unique users (live and archived), in one SQL query"""
+    score, seconds = QuizAttempt.score, QuizAttempt.time_spent_seconds
+    bucket_columns, lower = [], None
+    for _, upper, _ in SCORE_BUCKETS:
+        # Same boundaries as score_bucket(): (previous upper, upper]
+        conditions = []
+        if lower is not None:
+            conditions.append(score > lower)
+        if upper is not None:
+            conditions.append(score <= upper)
+        bucket_columns.append(func.coalesce(func.sum(case((and_(*conditions), 1), else_=0)), 0))
+        lower = upper
+
+    user_ids = union(
+        select(QuizAttempt.user_id).where(QuizAttempt.quiz_id == quiz_id),
+        select(UserDailyRollup.user_id).where(UserDailyRollup.quiz_id == quiz_id)
+    ).subquery()
+    unique_users = select(func.count()).select_from(user_ids).scalar_subquery()
+
+    row = db.session.query(
+        func.count(QuizAttempt.id),
+        func.coalesce(func.sum(score), 0.0),
+        *bucket_columns,
+        func.count(seconds),
+        func.coalesce(func.sum(seconds), 0),
+        func.min(seconds),
+        func.max(seconds),
+        unique_users
+    ).filter(QuizAttempt.quiz_id == quiz_id).one()
+
+    bucket_counts = row[2:2 + len(SCORE_BUCKETS)]
+    time_count, time_sum, time_min, time_max, users = row[2 + len(SCORE_BUCKETS):]
+    return {
+        'attempts': int(row[0]),
+        'score_sum': float(row[1]),
+        'score_distribution': {bucket[0]: int(count) for bucket, count in zip(SCORE_BUCKETS, bucket_counts)},
+        'time_count': int(time_count),
+        'time_sum_seconds': int(time_sum),
+        'time_min_seconds': time_min,
+        'time_max_seconds': time_max,
+        'unique_users': int(users or 0)
+    }
+
+def user_rollup_totals(user_id, quiz_id=None):
+    """Attempt count, score sum and best score of a user's archived attempts"""
+    query = db.session.query(
+        func.coalesce(func.sum(UserDailyRollup.attempts), 0),
+        func.coalesce(func.sum(UserDailyRollup.score_sum), 0.0),
+        func.max(UserDailyRollup.score_max)
+    ).filter(UserDailyRollup.user_id == user_id)
+    if quiz_id is not None:
+        query = query.filter(UserDailyRollup.quiz_id == quiz_id)
+    attempts, score_sum, best_score = query.one()
+    return {'attempts': int(attempts), 'score_sum': float(score_sum), 'best_score': best_score}
+
+@bp.cli.command('rollup-attempts')
+@click.option('--days', type=int, default=None, help='Archive attempts older than this many days')
+@click.option('--archive', 'archive_mode', type=click.Choice(['table', 'ndjson']), default=None,
+              help='Move raw rows to the archive table or to compressed NDJSON files')
+@click.option('--batch-size', type=int, default=1000)
+def rollup_attempts_command(days, archive_mode, batch_size):
+    """Roll old quiz attempts into daily aggregates (run periodically, e.g. from cron)"""
+    archived = rollup_attempts(days, archive_mode, batch_size)
+    click.echo(f"Rolled up and archived {archived} attempts")
+
+
+# ---------------------------------------------------------------------------
+# Item Analysis (per-question stats)
+# ---------------------------------------------------------------------------
+def conflict_insert(table):
+    """INSERT supporting on_conflict_do_*() on SQLite and PostgreSQL, or None on other databases"""
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        return None
+    return dialect_insert(table)
+
+def upsert_increments(table, key_columns, rows, counter_columns):
+    """Add each row's counters onto the row with the same key, inserting it when missing"""
+    if not rows:
+        return
+    stmt = conflict_insert(table)
+    if stmt is not None:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=key_columns,
+            set_={column: table.c[column] + stmt.excluded[column] for column in counter_columns}
+        )
+        db.session.execute(stmt, rows)
+        return
+
+    # Portable fallback: update, then insert the keys that didn't exist yet
+    for row in rows:
+        condition = [table.c[column] == row[column] for column in key_columns]
+        result = db.session.execute(table.update().where(*condition).values(
+            {column: table.c[column] + row[column] for column in counter_columns}))
+        if result.rowcount == 0:
+            db.session.execute(table.insert(), [row])
+
+def upsert_values(table, key_columns, rows, value_columns):
+    """Insert rows, overwriting value_columns of the rows whose key already exists"""
+    if not rows:
+        return
+    stmt = conflict_insert(table)
+    if stmt is not None:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=key_columns,
+            set_={column: stmt.excluded[column] for column in value_columns}
+        )
+        db.session.execute(stmt, rows)
+        return
+
+    for row in rows:
+        condition = [table.c[column] == row[column] for column in key_columns]
+        result = db.session.execute(table.update().where(*condition).values(
+            {column: row[column] for column in value_columns}))
+        if result.rowcount == 0:
+            db.session.execute(table.insert(), [row])
+
+def option_index(question, user_answer):
+    """Index of the MCQ option the user picked, or -1 when it matches none of them"""
+    answer = str(user_answer or '').strip().lower()
+    for index, option in enumerate(question.get('options') or []):
+        if str(option).strip().lower() == answer:
+            return index
+    return -1
+
+def item_outcome(quiz_type, item):
+    """'correct', 'partial' or 'incorrect' for one entry of an attempt's evaluation"""
+    verdict = str(item.get('verdict', '')).lower()
+    if quiz_type == 'mcq' or verdict not in ('correct', 'partial'):
+        return 'correct' if item.get('is_correct') else 'incorrect'
+    return verdict
+
+def item_stat_rows(quiz_id, quiz_type, quiz_content, evaluation, answers):
+    """question_stats / question_option_stats increments for one graded attempt"""
+    question_rows, option_rows = [], []
+    for index, (question, item) in enumerate(zip(quiz_content, evaluation)):
+        outcome = item_outcome(quiz_type, item)
+        question_rows.append({'quiz_id': quiz_id, 'question_index': index, 'attempts': 1,
+                              'correct': int(outcome == 'correct'), 'partial': int(outcome == 'partial'),
+                              'incorrect': int(outcome == 'incorrect')})
+        if quiz_type == 'mcq':
+            option_rows.append({'quiz_id': quiz_id, 'question_index': index,
+                                'option_index': option_index(question, answers.get(str(index))), 'selections': 1})
+    return question_rows, option_rows
+
+def record_item_stats(question_rows, option_rows):
+    upsert_increments(QuestionStat.__table__, ['quiz_id', 'question_index'], question_rows,
+                      ['attempts', 'correct', 'partial', 'incorrect'])
+    upsert_increments(QuestionOptionStat.__table__, ['quiz_id', 'question_index', 'option_index'], option_rows,
+                      ['selections'])
+
+def _merge_item_rows(totals, rows, key_columns, counter_columns):
+    for row in rows:
+        key = tuple(row[column] for column in key_columns)
+        merged = totals.setdefault(key, dict(row, **{column: 0 for column in counter_columns}))
+        for column in counter_columns:
+            merged[column] += row[column]
+
+def rebuild_question_stats(quiz_id=None, batch_size=2000, echo=None, skip_attempt_ids=()):
+    """Recompute item analysis from the details of stored attempts (live and table-archived).
+
+    Attempts are streamed grouped by quiz; each quiz's totals are written once
+    its rows are done. skip_attempt_ids are left out (their outbox event adds
+    them when it is delivered). Returns the number of attempts read.
+    """
+    question_table, option_table = QuestionStat.__table__, QuestionOptionStat.__table__
+    for table in (question_table, option_table):
+        delete = table.delete()
+        if quiz_id is not None:
+            delete = delete.where(table.c.quiz_id == quiz_id)
+        db.session.execute(delete)
+
+    processed = 0
+    for source in (QuizAttempt.__table__, ArchivedQuizAttempt.__table__):
+        stmt = select(source.c.id, source.c.quiz_id, source.c.user_answers, source.c.details)\
+            .order_by(source.c.quiz_id, source.c.id)
+        if quiz_id is not None:
+            stmt = stmt.where(source.c.quiz_id == quiz_id)
+
+        current, quiz_type, quiz_content = None, None, None
+        question_totals, option_totals = {}, {}
+
+        def flush():
+            record_item_stats(list(question_totals.values()), list(option_totals.values()))
+            question_totals.clear()
+            option_totals.clear()
+
+        for row in db.session.execute(stmt.execution_options(yield_per=batch_size)):
+            if row.quiz_id != current:
+                flush()
+                current = row.quiz_id
+                quiz = db.session.get(Quiz, current)
+                quiz_type = quiz.quiz_type if quiz else None
+                quiz_content = json.loads(quiz.quiz_content) if quiz else None
+                db.session.expunge_all()
+            processed += 1
+            if quiz_content is None or not row.details or row.id in skip_attempt_ids:
+                continue
+            evaluation = json.loads(row.details)
+            answers = json.loads(row.user_answers) if row.user_answers else {}
+            question_rows, option_rows = item_stat_rows(current, quiz_type, quiz_content, evaluation, answers)
+            _merge_item_rows(question_totals, question_rows, ('quiz_id', 'question_index'),
+                             ('attempts', 'correct', 'partial', 'incorrect'))
+            _merge_item_rows(option_totals, option_rows, ('quiz_id', 'question_index', 'option_index'),
+                             ('selections',))
+            if echo and processed % (batch_size * 10) == 0:
+                echo(f"  {processed} attempts")
+        flush()
+    # Deletes and inserts commit together, so readers never see a half-built table
+    db.session.commit()
+    return processed
+
+@bp.cli.command('rebuild-question-stats')
+@click.option('--quiz', 'quiz_id', default=None, help='Only rebuild this quiz')
+@click.option('--batch-size', type=int, default=2000)
+def rebuild_question_stats_command(quiz_id, batch_size):
+    """Backfill the per-question item analysis from existing attempts"""
+    started = time.perf_counter()
+    processed = rebuild_question_stats(quiz_id, batch_size, echo=click.echo)
+    click.echo(f"Rebuilt question stats from {processed} attempts in {time.perf_counter() - started:.1f}s")
+
+
+@bp.route('/verify-token', methods=['GET'])
 def verify_token():
     auth_header = request.headers.get('Authorization')
     
@@ -169,7 +884,7 @@ def verify_token():
     try:
         decoded = jwt.decode(
             token,
-            app.config['SECRET_KEY'],  # Use same key as login
+            current_app.config['SECRET_KEY'],  # Use same key as login
             algorithms=["HS256"]
         )
         print("Decoded token:", decoded)  # Debug
@@ -195,48 +910,110 @@ def verify_token():
         return jsonify({"error": "Invalid token"}), 401
 
 # JWT Required decorator (optional, for protecting other endpoints)
+def decode_auth_header(auth_header, secret_key):
+    """(user id, None) for a valid bearer token, otherwise (None, (error body, status))"""
+    if not auth_header or not auth_header.startswith('Bearer '):
+        return None, ({'error': 'Authorization header missing or invalid'}, 401)
+        
+    token = auth_header.split(' ')[1]
+    
+    try:
+        decoded = jwt.decode(token, secret_key, algorithms=['HS256'])
+    except jwt.ExpiredSignatureError:
+        return None, ({'error': 'Token expired'}, 401)
+    except jwt.InvalidTokenError:
+        return None, ({'error': 'Invalid token'}, 401)
+    return decoded['id'], None
+
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
-        auth_header = request.headers.get('Authorization')
-        
-        if not auth_header or not auth_header.startswith('Bearer '):
-            return jsonify({'error': 'Authorization header missing or invalid'}), 401
+        user_id, error = decode_auth_header(request.headers.get('Authorization'),
+                                            current_app.config['SECRET_KEY'])
+        if error:
+            return jsonify(error[0]), error[1]
             
-        token = auth_header.split(' ')[1]
-        
-        try:
-            decoded = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
-            current_user = User.query.get(decoded['id'])
-            if not current_user:
-                return jsonify({'error': 'User not found'}), 404
-        except jwt.ExpiredSignatureError:
-            return jsonify({'error': 'Token expired'}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({'error': 'Invalid token'}), 401
+        current_user = User.query.get(user_id)
+        if not current_user:
+            return jsonify({'error': 'User not found'}), 404
             
         return f(current_user, *args, **kwargs)
     return decorated
-# Initialize OpenAI
-client = OpenAI()
+# Heavy clients and worker pools are created per app on first use, so importing the
+# module (and forking preloaded gunicorn workers) stays cheap.
+_extension_lock = threading.Lock()
 
-@app.route('/generate-quiz', methods=['POST'])
-@token_required
-def generate_quiz(current_user):
-    """Generate quiz from user input text with all metadata (title, description, difficulty)"""
-    data = request.json
-    text = data.get('text')
-    
-    quiz_type = data.get('type', 'mcq')
-    num_questions = data.get('num_questions', 5)
-    is_public = data.get('is_public', True)  # Default to True if not provided
+def lazy_extension(name, factory):
+    """current_app.extensions[name], built by factory(app) the first time it's needed"""
+    extensions = current_app.extensions
+    if name not in extensions:
+        with _extension_lock:
+            if name not in extensions:
+                extensions[name] = factory(current_app._get_current_object())
+    return extensions[name]
 
-    if not text:
-        return jsonify({'error': 'Text input is required'}), 400
+def in_app_context(app, fn, *args):
+    """Run fn(*args) inside an app context (for work handed to a thread pool)"""
+    with app.app_context():
+        return fn(*args)
 
-    try:
-        # Comprehensive prompt for full quiz generation
-        combined_prompt = f"""
+def async_openai_client():
+    from openai import AsyncOpenAI
+    return AsyncOpenAI(max_retries=0)
+
+def openai_client():
+    # Imported here: the SDK is slow to import and only needed by the openai/record backends.
+    # Its own retries are disabled because the scheduler handles them with knowledge of the
+    # shared rate limits.
+    from openai import OpenAI
+    return OpenAI(max_retries=0)
+
+def get_llm_backend():
+    return lazy_extension('quizgenie.llm_backend',
+                          lambda app: create_llm_backend(app.config, openai_client, async_openai_client))
+
+def get_llm_scheduler():
+    return lazy_extension('quizgenie.llm_scheduler', lambda app: LLMScheduler(RateLimitStore(
+        app.config['LLM_RATE_LIMIT_DB'],
+        requests_per_minute=app.config['LLM_REQUESTS_PER_MINUTE'],
+        tokens_per_minute=app.config['LLM_TOKENS_PER_MINUTE']
+    )))
+
+def estimate_request_tokens(messages, completion_tokens=500):
+    """Budget for a chat request: the estimated prompt plus the expected reply"""
+    return estimate_messages_tokens(messages) + completion_tokens
+
+def llm_chat_completion(priority=PRIORITY_GENERATION, completion_tokens=500, usage=None, **kwargs):
+    """Chat completion on the configured backend, scheduled under the shared rate limits.
+
+    The response's reported token usage is added to `usage` (a TokenUsage) when given.
+    """
+    backend = get_llm_backend()
+    response = get_llm_scheduler().call(
+        lambda: backend.chat_completion(**kwargs),
+        priority=priority,
+        estimated_tokens=estimate_request_tokens(kwargs['messages'], completion_tokens)
+    )
+    if usage is not None:
+        usage.add(response)
+    return response
+
+async def allm_chat_completion(app, priority=PRIORITY_GENERATION, completion_tokens=500, usage=None, **kwargs):
+    """Async chat completion for the ASGI endpoints (see asgi.py); waits don't block a thread"""
+    with app.app_context():
+        backend, scheduler = get_llm_backend(), get_llm_scheduler()
+    response = await scheduler.acall(
+        lambda: backend.achat_completion(**kwargs),
+        priority=priority,
+        estimated_tokens=estimate_request_tokens(kwargs['messages'], completion_tokens)
+    )
+    if usage is not None:
+        usage.add(response)
+    return response
+
+def build_quiz_prompt(text, quiz_type, num_questions):
+    """Comprehensive prompt for full quiz generation"""
+    return f"""
         Generate a complete quiz package from the following passage:
 
         Passage:
@@ -261,8 +1038,7 @@ def generate_quiz(current_user):
                     "question": "...",
                     "options": ["...", "...", "...", "..."],
                     "answer": "...",
-                    "explanation": "...",
-                    "difficulty": "Easy/Medium/Hard"  # Per-question difficulty
+                    "explanation": "One sentence, at most 25 words"
                 }}
             ],
             "tags": ["tag1", "tag2"],
@@ -274,245 +1050,1643 @@ def generate_quiz(current_user):
           * Easy: Basic recall, straightforward questions
           * Medium: Requires some analysis/application
           * Hard: Complex reasoning or specialized knowledge
-        - Be consistent between per-question and overall difficulty
         - For mixed difficulty quizzes, weight toward most common level
         """
 
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": combined_prompt}],
-            temperature=0.7
-        )
+# Fixed part of a generated package (title, description, tags, JSON framing)
+GENERATION_BASE_COMPLETION_TOKENS = 200
 
-        result = json.loads(response.choices[0].message.content.strip())
-        
-        # Extract all generated components
-        quiz_data = result['quiz']
-        suggested_tags = result['tags']
-        title = result['title']
-        description = result['description']
-        difficulty = result['overall_difficulty']  # Using comprehensive difficulty
-
-        # Calculate average difficulty if you want to be precise
-        if all('difficulty' in q for q in quiz_data):
-            difficulty_levels = {'Easy': 1, 'Medium': 2, 'Hard': 3}
-            avg_score = sum(difficulty_levels[q.get('difficulty', 'Medium')] for q in quiz_data)/len(quiz_data)
-            difficulty = ('Easy' if avg_score < 1.5 else 
-                         'Medium' if avg_score < 2.5 else 'Hard')
-
-        # Save to database
-        quiz_id = str(uuid.uuid4())
-        new_quiz = Quiz(
-            id=quiz_id,
-            original_text=text,
-            quiz_content=json.dumps(quiz_data),
-            quiz_type=quiz_type,
-            created_at=datetime.utcnow(),
-            is_public=is_public,  # Use the is_public from request
-            title=title,
-            description=description,
-            difficulty=difficulty,
-            user_id=current_user.id
-        )
+# What a follow-up request asks for, per missing metadata field
+FOLLOWUP_FIELDS = {
+    'title': '"title": "Unique, descriptive title (5-8 words)"',
+    'description': '"description": "1-2 sentences, max 30 words"',
+    'tags': '"tags": ["3-5 relevant tags"]',
+    'overall_difficulty': '"overall_difficulty": "Easy/Medium/Hard"'
+}
 
-        # Process tags
-        for tag_name in suggested_tags:
-            tag = Tag.query.filter_by(name=tag_name.lower().strip()).first() or \
-                  Tag(name=tag_name.lower().strip())
-            new_quiz.tags.append(tag)
+def build_followup_prompt(passage, quiz_type, missing_questions, missing_metadata, existing_questions):
+    """Prompt for only the parts of a package that were missing or invalid"""
+    keys = [FOLLOWUP_FIELDS[field] for field in missing_metadata]
+    instructions = []
+    if missing_questions:
+        options = '"options": ["...", "...", "...", "..."], ' if quiz_type == 'mcq' else ''
+        keys.insert(0, f'"quiz": [{{"question": "...", {options}"answer": "...", '
+                       f'"explanation": "One sentence, at most 25 words"}}]')
+        instructions.append(f"Create {missing_questions} {quiz_type.upper()} questions about the passage.")
+        if existing_questions:
+            instructions.append("Do not repeat these questions:\n" +
+                                "\n".join(f"- {question['question']}" for question in existing_questions))
+    if missing_metadata:
+        instructions.append("Also provide: " + ", ".join(field.replace('_', ' ') for field in missing_metadata) + ".")
+    newline = '\n'
+    return f"""
+        Complete a quiz package for the following passage.
 
-        db.session.add(new_quiz)
-        db.session.commit()
+        Passage:
+        \"\"\"{passage}\"\"\"
 
-        return jsonify({
-            'quiz_id': quiz_id,
-            'content': quiz_data,
-            'metadata': {
-                'title': title,
-                'description': description,
-                'difficulty': difficulty,
-                'tags': suggested_tags,
-                'is_public': is_public,  # Include in response
-                'creator_id': current_user.id
-            },
-            'shareable_url': f'/quiz/{quiz_id}'
-        })
+        {newline.join(instructions)}
 
-    except Exception as e:
-        current_app.logger.error(f"Quiz generation failed: {str(e)}")
-        return jsonify({'error': f"Quiz generation failed: {str(e)}"}), 500  
-    
+        Output format (a JSON object with exactly these keys):
+        {{{', '.join(keys)}}}
+        """
 
-@app.route('/quiz/<quiz_id>', methods=['GET'])
-def get_quiz(quiz_id):
-    """Retrieve a quiz by its ID"""
-    quiz = Quiz.query.get_or_404(quiz_id)
-    
-    return jsonify({
-        'id': quiz.id,
-        'title': quiz.title,
-        'description': quiz.description,
-        'content': json.loads(quiz.quiz_content),
-        'type': quiz.quiz_type,
-        'created_at': quiz.created_at.isoformat()
-    })
+def generation_request(config, prompt, num_questions, priority):
+    """Chat completion kwargs for a generation prompt: JSON output mode, and the reply capped at
+    GENERATION_TOKENS_PER_QUESTION per question"""
+    max_tokens = GENERATION_BASE_COMPLETION_TOKENS + config['GENERATION_TOKENS_PER_QUESTION'] * num_questions
+    return {
+        'priority': priority,
+        'completion_tokens': max_tokens,
+        'model': "gpt-3.5-turbo",
+        'messages': [{"role": "user", "content": prompt}],
+        'temperature': 0.7,
+        'max_tokens': max_tokens,
+        'response_format': {"type": "json_object"}
+    }
 
-@app.route('/submit-quiz', methods=['POST'])
-@token_required
-def submit_quiz(current_user):
-    data = request.json
-    quiz_id = data.get('quiz_id')
-    answers = data.get('answers')
-    time_spent = data.get('time_spent', '00:00')  # Default if not provided
-    
-    if not quiz_id or not answers:
-        return jsonify({'error': 'Missing quiz ID or answers'}), 400
-    
-    quiz = Quiz.query.get_or_404(quiz_id)
-    quiz_content = json.loads(quiz.quiz_content)
-    
-    evaluation = []
-    correct_count = 0
-    
-    # Increment play count for the quiz
-    quiz.plays = (quiz.plays or 0) + 1
-    
-    for i, question in enumerate(quiz_content):
-        user_answer_raw = answers.get(str(i), '')
-        user_answer = str(user_answer_raw).strip()
-        correct_answer = str(question['answer']).strip()
-        
-        is_correct = False
-        explanation = question.get('explanation', '')
-        verdict = "exact match"  # Default for MCQ
-        
-        if quiz.quiz_type == 'mcq':
-            is_correct = user_answer.lower() == correct_answer.lower()
-        else:
-            # Use ChatGPT to evaluate short answers
-            prompt = (
-                f"Question: {question['question']}\n"
-                f"Correct Answer: {correct_answer}\n"
-                f"User's Answer: {user_answer}\n\n"
-                "Determine if the user's answer is correct, partially correct, or incorrect. "
-                "Reply with JSON format like: {\"verdict\": \"correct\" | \"partial\" | \"incorrect\", \"reason\": \"...\"}"
-            )
-            
+def default_metadata(passage):
+    """Metadata used when the LLM didn't provide a field even when asked again"""
+    words = passage.split()[:6]
+    return {
+        'title': 'Quiz: ' + ' '.join(words) if words else 'Untitled Quiz',
+        'description': 'A quiz generated from your text.',
+        'tags': [],
+        'overall_difficulty': 'Medium'
+    }
+
+def generation_pipeline(config, text, quiz_type, num_questions, priority):
+    """Generate a quiz package, repairing rather than discarding imperfect replies.
+
+    A generator: it yields chat completion kwargs, is sent each response and
+    returns the package (drive it with run_generation / arun_generation).
+    Passages over GENERATION_PASSAGE_TOKENS are fitted first (token_budget.fit_passage).
+    The reply is parsed leniently and validated against the schema (quiz_schema);
+    invalid or missing questions and metadata are requested again, up to
+    GENERATION_REPAIR_ROUNDS times, and merged in. The package is kept while at
+    least one question is valid; metadata still missing falls back to defaults.
+    """
+    num_questions = int(num_questions)
+    passage, report = fit_passage(text, config['GENERATION_PASSAGE_TOKENS'])
+    usage = TokenUsage()
+    prompt = build_quiz_prompt(passage, quiz_type, num_questions)
+    response = yield dict(generation_request(config, prompt, num_questions, priority), usage=usage)
+    try:
+        result, repairs = parse_package(response.choices[0].message.content)
+    except InvalidPackageError:
+        result, repairs = {}, ['unparseable']
+    questions, metadata, problems = validate_package(result, quiz_type, num_questions)
+    invalid_questions = problems['invalid_questions']
+
+    followups, followup_error = 0, None
+    while (problems['missing_questions'] or problems['missing_metadata']) \
+            and followups < config['GENERATION_REPAIR_ROUNDS']:
+        followups += 1
+        prompt = build_followup_prompt(passage, quiz_type, problems['missing_questions'],
+                                       problems['missing_metadata'], questions)
+        try:
+            response = yield dict(generation_request(config, prompt, max(problems['missing_questions'], 1), priority),
+                                  usage=usage)
+            result, more_repairs = parse_package(response.choices[0].message.content)
+        except Exception as e:
+            # Keep what the first reply produced; the follow-up is best effort
+            followup_error = str(e)
+            break
+        repairs += more_repairs
+        questions, metadata, problems = merge_package(questions, metadata, result, quiz_type, num_questions)
+
+    defaulted = problems['missing_metadata']
+    if not questions:
+        generation_stats.record('failed', repairs, followups > 0)
+        raise InvalidPackageError('The generated quiz has no valid questions')
+    if problems['missing_questions'] or defaulted:
+        outcome = 'partial'
+    else:
+        outcome = 'repaired' if repairs or followups else 'valid'
+    generation_stats.record(outcome, repairs, followups > 0)
+
+    metadata = dict(default_metadata(passage), **metadata)
+    return {
+        'quiz': questions,
+        'tags': metadata['tags'],
+        'title': metadata['title'],
+        'description': metadata['description'],
+        'difficulty': metadata['overall_difficulty'],
+        'usage': usage.as_dict(),
+        'passage': report,
+        'generation': {
+            'outcome': outcome,
+            'repairs': repairs,
+            'invalid_questions': invalid_questions,
+            'followup_requests': followups,
+            'followup_error': followup_error,
+            'missing_questions': problems['missing_questions'],
+            'defaulted_metadata': defaulted
+        }
+    }
+
+def run_generation(steps, call):
+    """Drive a generation_pipeline() with a blocking chat completion call; returns its package"""
+    request_kwargs = next(steps)
+    while True:
+        try:
             try:
-                chat_response = client.chat.completions.create(
-                    model="gpt-3.5-turbo",
-                    messages=[{"role": "user", "content": prompt}],
-                    temperature=0,
-                    response_format={"type": "json_object"}  # Ensure JSON response
-                )
-                
-                if chat_response.choices:
-                    reply_content = chat_response.choices[0].message.content.strip()
-                    try:
-                        result_json = json.loads(reply_content)
-                        verdict = result_json.get("verdict", "incorrect").lower()
-                        is_correct = verdict in ["correct", "partial"]
-                        explanation = result_json.get("reason", explanation)
-                    except json.JSONDecodeError:
-                        current_app.logger.error(f"Failed to parse GPT response: {reply_content}")
+                response = call(**request_kwargs)
             except Exception as e:
-                current_app.logger.error(f"GPT evaluation failed: {str(e)}")
-
-        if is_correct:
-            correct_count += 1
+                request_kwargs = steps.throw(e)  # Re-raised here unless the pipeline handles it
+            else:
+                request_kwargs = steps.send(response)
+        except StopIteration as finished:
+            return finished.value
 
-        evaluation.append({
+async def arun_generation(steps, call):
+    """run_generation() with an awaitable chat completion call"""
+    request_kwargs = next(steps)
+    while True:
+        try:
+            try:
+                response = await call(**request_kwargs)
+            except Exception as e:
+                request_kwargs = steps.throw(e)  # Re-raised here unless the pipeline handles it
+            else:
+                request_kwargs = steps.send(response)
+        except StopIteration as finished:
+            return finished.value
+
+def generate_quiz_package(text, quiz_type, num_questions, priority=PRIORITY_GENERATION):
+    """Ask the LLM for a quiz and return its content plus title/description/tags/difficulty,
+    the token usage of its calls, how the passage was fitted to the budget and what had to be repaired.
+
+    Needs an app context for the config but does not touch the database, so it can run on any thread.
+    """
+    return run_generation(generation_pipeline(current_app.config, text, quiz_type, num_questions, priority),
+                          llm_chat_completion)
+
+async def agenerate_quiz_package(app, text, quiz_type, num_questions, priority=PRIORITY_GENERATION):
+    """Awaitable generate_quiz_package() for the async endpoints"""
+    return await arun_generation(generation_pipeline(app.config, text, quiz_type, num_questions, priority),
+                                 lambda **request_kwargs: allm_chat_completion(app, **request_kwargs))
+
+def normalize_tag_name(tag_name):
+    return str(tag_name).lower().strip()
+
+def resolve_tags(tag_names):
+    """Create the missing tags in one INSERT .. ON CONFLICT DO NOTHING, then load them all: {name: Tag}.
+
+    Concurrent requests adding the same new tag no longer race on the unique name.
+    """
+    names = {normalize_tag_name(name) for name in tag_names} - {''}
+    if not names:
+        return {}
+    stmt = conflict_insert(Tag.__table__)
+    if stmt is not None:
+        db.session.execute(stmt.on_conflict_do_nothing(index_elements=['name']), [{'name': name} for name in names])
+        return {tag.name: tag for tag in Tag.query.filter(Tag.name.in_(names)).all()}
+
+    resolved = {tag.name: tag for tag in Tag.query.filter(Tag.name.in_(names)).all()}
+    for name in names - resolved.keys():
+        resolved[name] = Tag(name=name)
+        db.session.add(resolved[name])
+    db.session.flush()
+    return resolved
+
+def quiz_tag_list(tag_names, tag_map):
+    """Tags for tag_names from a resolve_tags() map, in order and without duplicates"""
+    ordered = dict.fromkeys(normalize_tag_name(name) for name in tag_names)
+    return [tag_map[name] for name in ordered if name in tag_map]
+
+def build_quiz(user_id, text, quiz_type, is_public, package, tag_map):
+    """Quiz row for a generated package; tags come from a resolve_tags() map"""
+    new_quiz = Quiz(
+        id=str(uuid.uuid4()),
+        original_text=text,
+        quiz_content=json.dumps(package['quiz']),
+        quiz_type=quiz_type,
+        created_at=datetime.utcnow(),
+        is_public=is_public,
+        title=package['title'],
+        description=package['description'],
+        difficulty=package['difficulty'],
+        user_id=user_id,
+        prompt_tokens=package.get('usage', {}).get('prompt_tokens'),
+        completion_tokens=package.get('usage', {}).get('completion_tokens')
+    )
+    new_quiz.tags = quiz_tag_list(package['tags'], tag_map)
+    return new_quiz
+
+def save_generated_quiz(current_user, text, quiz_type, is_public, package):
+    """Persist a generated package; returns the generate-quiz response body"""
+    new_quiz = build_quiz(current_user.id, text, quiz_type, is_public, package,
+                          resolve_tags(package['tags']))
+    db.session.add(new_quiz)
+    adjust_facet_counts(added=quiz_facet_keys(new_quiz))
+    db.session.flush()
+    index_bank_questions([new_quiz])
+    record_llm_usage(current_user.id, 'generation', [package.get('usage')])
+    db.session.commit()
+    refresh_similar_index([new_quiz])
+    quiz_id = new_quiz.id
+    near_duplicates = register_quiz_signatures([new_quiz]).get(quiz_id, [])
+
+    return {
+        'quiz_id': quiz_id,
+        'content': package['quiz'],
+        'metadata': {
+            'title': package['title'],
+            'description': package['description'],
+            'difficulty': package['difficulty'],
+            'tags': package['tags'],
+            'is_public': is_public,  # Include in response
+            'creator_id': current_user.id
+        },
+        'shareable_url': f'/quiz/{quiz_id}',
+        'usage': dict(package.get('usage') or {}, passage=package.get('passage')),
+        'generation': package.get('generation'),
+        'near_duplicates': [duplicate_summary(match) for match in near_duplicates
+                            if match[2]['is_public'] or match[2]['user_id'] == current_user.id]
+    }
+
+@bp.route('/generate-quiz', methods=['POST'])
+@token_required
+def generate_quiz(current_user):
+    """Generate quiz from user input text with all metadata (title, description, difficulty)"""
+    data = request.json
+    text = data.get('text')
+    
+    quiz_type = data.get('type', 'mcq')
+    num_questions = data.get('num_questions', 5)
+    is_public = data.get('is_public', True)  # Default to True if not provided
+
+    if not text:
+        return jsonify({'error': 'Text input is required'}), 400
+
+    # Opt-in: point the user at an existing quiz on the same passage instead of paying for a new one
+    if data.get('offer_existing'):
+        existing = existing_quiz_offer(text, current_user.id)
+        if existing:
+            return jsonify({'error': 'A near-identical quiz already exists', 'duplicates': existing}), 409
+
+    try:
+        package = generate_quiz_package(text, quiz_type, num_questions)
+        return jsonify(save_generated_quiz(current_user, text, quiz_type, is_public, package))
+
+    except Exception as e:
+        current_app.logger.error(f"Quiz generation failed: {str(e)}")
+        return jsonify({'error': f"Quiz generation failed: {str(e)}"}), 500  
+    
+
+# ---------------------------------------------------------------------------
+# Bulk Quiz Generation
+# ---------------------------------------------------------------------------
+# LLM calls from every bulk job share one pool, so LLM_MAX_CONCURRENCY bounds the
+# generation requests in flight per process regardless of how many jobs are running.
+# Job coordinators only wait on futures and write to the database.
+def get_generation_executor():
+    return lazy_extension('quizgenie.generation_executor', lambda app: ThreadPoolExecutor(
+        max_workers=app.config['LLM_MAX_CONCURRENCY'], thread_name_prefix='quiz-generation'))
+
+def get_bulk_job_executor():
+    return lazy_extension('quizgenie.bulk_job_executor',
+                          lambda app: ThreadPoolExecutor(max_workers=2, thread_name_prefix='bulk-job'))
+
+def persist_bulk_results(job, results):
+    """Save a batch of finished items in one transaction, with all their tags resolved at once"""
+    packages = [package for _, package, _ in results if package]
+    tag_map = resolve_tags(tag for package in packages for tag in package['tags'])
+    new_quizzes = []
+    for item, package, error in results:
+        if package:
+            new_quiz = build_quiz(job.user_id, item.text, item.quiz_type, item.is_public, package, tag_map)
+            db.session.add(new_quiz)
+            new_quizzes.append(new_quiz)
+            item.quiz_id = new_quiz.id
+            item.status = 'done'
+        else:
+            item.status = 'failed'
+            item.error = error
+    adjust_facet_counts(added=[key for new_quiz in new_quizzes for key in quiz_facet_keys(new_quiz)])
+    db.session.flush()
+    index_bank_questions(new_quizzes)
+    record_llm_usage(job.user_id, 'generation', [package.get('usage') for package in packages])
+    db.session.commit()
+    refresh_similar_index(new_quizzes)
+    register_quiz_signatures(new_quizzes)
+
+def run_bulk_generation_job(app, job_id):
+    """Generate every unfinished item of a job concurrently, persisting results in batches"""
+    with app.app_context():
+        job = db.session.get(BulkGenerationJob, job_id)
+        if not job:
+            return
+        items = [item for item in job.items if item.status in ('pending', 'running')]
+        for item in items:
+            item.status = 'running'
+        job.status = 'running'
+        job.error = None
+        db.session.commit()
+
+        futures = {
+            get_generation_executor().submit(in_app_context, app, generate_quiz_package,
+                                             item.text, item.quiz_type, item.num_questions, PRIORITY_BULK): item
+            for item in items
+        }
+        batch_size = current_app.config['BULK_GENERATION_PERSIST_BATCH']
+        results = []
+        try:
+            for future in as_completed(futures):
+                item = futures[future]
+                try:
+                    results.append((item, future.result(), None))
+                except Exception as e:
+                    current_app.logger.error(f"Bulk generation item {item.id} failed: {str(e)}")
+                    results.append((item, None, str(e)))
+                if len(results) >= batch_size:
+                    persist_bulk_results(job, results)
+                    results = []
+            if results:
+                persist_bulk_results(job, results)
+
+            job.status = 'completed'
+            job.finished_at = datetime.utcnow()
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Bulk generation job {job.id} failed: {str(e)}")
+            for future in futures:
+                future.cancel()
+            # Items whose results were not saved go back to pending for resume-bulk-generation
+            for item in job.items:
+                if item.status == 'running':
+                    item.status = 'pending'
+            job.status = 'failed'
+            job.error = str(e)
+            db.session.commit()
+
+def bulk_job_progress(job):
+    counts = {'pending': 0, 'running': 0, 'done': 0, 'failed': 0}
+    for item in job.items:
+        counts[item.status] = counts.get(item.status, 0) + 1
+    return {
+        'job_id': job.id,
+        'status': job.status,
+        'error': job.error,
+        'created_at': job.created_at.isoformat(),
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        'total': len(job.items),
+        'counts': counts,
+        'items': [item.to_dict() for item in job.items]
+    }
+
+@bp.route('/api/bulk-generate', methods=['POST'])
+@token_required
+def bulk_generate(current_user):
+    """Queue generation of many passages; poll the returned status URL for progress"""
+    data = request.json or {}
+    items = data.get('items') or []
+
+    if not items:
+        return jsonify({'success': False, 'error': 'At least one item is required'}), 400
+    if len(items) > current_app.config['BULK_GENERATION_MAX_ITEMS']:
+        return jsonify({
+            'success': False,
+            'error': f"At most {current_app.config['BULK_GENERATION_MAX_ITEMS']} items per request"
+        }), 400
+    question_counts = []
+    for position, item in enumerate(items):
+        if not isinstance(item, dict) or not item.get('text'):
+            return jsonify({'success': False, 'error': f'Item {position} is missing text'}), 400
+        try:
+            num_questions = int(item.get('num_questions', 5))
+        except (TypeError, ValueError):
+            num_questions = 0
+        if num_questions < 1:
+            return jsonify({
+                'success': False,
+                'error': f'Item {position} num_questions must be a positive integer'
+            }), 400
+        question_counts.append(num_questions)
+
+    job = BulkGenerationJob(id=str(uuid.uuid4()), user_id=current_user.id)
+    db.session.add(job)
+    for position, (item, num_questions) in enumerate(zip(items, question_counts)):
+        db.session.add(BulkGenerationItem(
+            job_id=job.id,
+            position=position,
+            text=item['text'],
+            quiz_type=item.get('type', 'mcq'),
+            num_questions=num_questions,
+            is_public=item.get('is_public', True)
+        ))
+    db.session.commit()
+
+    get_bulk_job_executor().submit(run_bulk_generation_job, current_app._get_current_object(), job.id)
+
+    return jsonify({
+        'success': True,
+        'job_id': job.id,
+        'total': len(items),
+        'status_url': f'/api/bulk-generate/{job.id}'
+    }), 202
+
+@bp.route('/api/bulk-generate/<job_id>', methods=['GET'])
+@token_required
+def bulk_generate_status(current_user, job_id):
+    """Per-item progress of a bulk generation job"""
+    job = BulkGenerationJob.query.filter_by(id=job_id, user_id=current_user.id).first()
+    if not job:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    return jsonify({'success': True, **bulk_job_progress(job)})
+
+@bp.cli.command('resume-bulk-generation')
+def resume_bulk_generation_command():
+    """Finish bulk generation jobs that were interrupted by a restart"""
+    job_ids = [job.id for job in BulkGenerationJob.query.filter(BulkGenerationJob.status != 'completed').all()]
+    for job_id in job_ids:
+        run_bulk_generation_job(current_app._get_current_object(), job_id)
+    click.echo(f"Resumed {len(job_ids)} bulk generation jobs")
+
+@bp.route('/quiz/<quiz_id>', methods=['GET'])
+def get_quiz(quiz_id):
+    """Retrieve a quiz by its ID"""
+    quiz = Quiz.query.get_or_404(quiz_id)
+    
+    return jsonify({
+        'id': quiz.id,
+        'title': quiz.title,
+        'description': quiz.description,
+        'content': json.loads(quiz.quiz_content),
+        'type': quiz.quiz_type,
+        'created_at': quiz.created_at.isoformat()
+    })
+
+def short_answer_prompt(question, correct_answer, user_answer):
+    return (
+        f"Question: {question}\n"
+        f"Correct Answer: {correct_answer}\n"
+        f"User's Answer: {user_answer}\n\n"
+        "Determine if the user's answer is correct, partially correct, or incorrect. "
+        "Reply with JSON format like: {\"verdict\": \"correct\" | \"partial\" | \"incorrect\", \"reason\": \"...\"}"
+    )
+
+def compile_answer_key(quiz_type, quiz_content):
+    """Per-question grading data, parsed once per quiz version"""
+    key = []
+    for question in quiz_content:
+        correct_answer = str(question['answer']).strip()
+        key.append({
             'question': question['question'],
+            'correct_answer': correct_answer,
+            'explanation': question.get('explanation', ''),
+            'expected': correct_answer.lower() if quiz_type == 'mcq' else compile_expected(correct_answer)
+        })
+    return key
+
+def answer_key_signature(quiz_type, quiz_content):
+    """Changes whenever an edit can change how existing attempts are graded"""
+    answers = [str(question.get('answer', '')).strip() for question in quiz_content]
+    return hashlib.sha256(json.dumps([quiz_type, answers]).encode('utf-8')).hexdigest()
+
+def grading_messages(entry, user_answer):
+    return [{"role": "user", "content": short_answer_prompt(entry['question'], entry['correct_answer'], user_answer)}]
+
+def short_answer_grading_messages(quiz_type, quiz_content, answers):
+    """{question index: chat messages} for every answer that has to be graded by the LLM.
+
+    Answers the local grader can decide (see answer_grading) are left out.
+    """
+    if quiz_type == 'mcq':
+        return {}
+    messages = {}
+    for i, entry in enumerate(compile_answer_key(quiz_type, quiz_content)):
+        user_answer = str(answers.get(str(i), '')).strip()
+        if local_verdict(entry['expected'], user_answer) is None:
+            messages[i] = grading_messages(entry, user_answer)
+    return messages
+
+# Arguments shared by the sync and async grading calls
+GRADING_REQUEST = {
+    'priority': PRIORITY_INTERACTIVE,
+    'completion_tokens': 100,
+    'model': "gpt-3.5-turbo",
+    'temperature': 0,
+    'max_tokens': 100,
+    'response_format': {"type": "json_object"}  # Ensure JSON response
+}
+
+def grade_short_answer(messages, usage=None):
+    """The grader's raw JSON reply, or None if the call failed"""
+    try:
+        chat_response = llm_chat_completion(messages=messages, usage=usage, **GRADING_REQUEST)
+        if chat_response.choices:
+            return chat_response.choices[0].message.content.strip()
+    except Exception as e:
+        current_app.logger.error(f"GPT evaluation failed: {str(e)}")
+    return None
+
+async def agrade_short_answer(app, messages, usage=None):
+    """Awaitable grade_short_answer() for the async endpoints"""
+    try:
+        chat_response = await allm_chat_completion(app, messages=messages, usage=usage, **GRADING_REQUEST)
+        if chat_response.choices:
+            return chat_response.choices[0].message.content.strip()
+    except Exception as e:
+        app.logger.error(f"GPT evaluation failed: {str(e)}")
+    return None
+
+def build_evaluation(quiz_type, quiz_content, answers, llm_replies):
+    """Per-question evaluation; short answers use the grader replies in llm_replies[index]"""
+    return evaluate_answers(quiz_type, compile_answer_key(quiz_type, quiz_content), answers, llm_replies)
+
+def evaluate_answers(quiz_type, answer_key, answers, llm_replies, stats=grading_stats):
+    """build_evaluation() against a compiled answer key; stats=None keeps the live grading metric untouched"""
+    evaluation = []
+    correct_count = 0
+    
+    for i, entry in enumerate(answer_key):
+        user_answer_raw = answers.get(str(i), '')
+        user_answer = str(user_answer_raw).strip()
+        correct_answer = entry['correct_answer']
+        
+        is_correct = False
+        explanation = entry['explanation']
+        verdict = "exact match"  # Default for MCQ
+        graded_by = 'local'
+        
+        local = local_verdict(entry['expected'], user_answer) if quiz_type != 'mcq' else None
+        if quiz_type == 'mcq':
+            is_correct = user_answer.lower() == entry['expected']
+        elif local is not None:
+            verdict = local.verdict
+            is_correct = verdict == "correct"
+            if stats:
+                stats.record('local', local.rule)
+        else:
+            graded_by = 'llm'
+            if stats:
+                stats.record('llm')
+            reply_content = llm_replies.get(i)
+            if reply_content:
+                try:
+                    result_json = json.loads(reply_content)
+                    verdict = result_json.get("verdict", "incorrect").lower()
+                    is_correct = verdict in ["correct", "partial"]
+                    explanation = result_json.get("reason", explanation)
+                except json.JSONDecodeError:
+                    current_app.logger.error(f"Failed to parse GPT response: {reply_content}")
+
+        if is_correct:
+            correct_count += 1
+
+        evaluation.append({
+            'question': entry['question'],
             'user_answer': user_answer_raw,
             'correct_answer': correct_answer,
             'is_correct': is_correct,
             'verdict': verdict,
+            'graded_by': graded_by,
             'explanation': explanation
         })
     
+    return evaluation, correct_count
+
+def record_attempt(current_user, quiz, quiz_content, answers, time_spent, llm_replies, usage=None):
+    """Score a submission and save the attempt; returns the response body.
+
+    Only the attempt and its outbox event are written here. Plays, rating,
+    trending, the user's total, item stats, review schedules and LLM usage
+    follow from the event (see apply_recorded_attempts()), so the values in
+    the response are projected from the quiz as loaded. usage is the
+    TokenUsage of the grading calls that produced llm_replies.
+    """
+    usage = usage.as_dict() if usage is not None else None
+    evaluation, correct_count = build_evaluation(quiz.quiz_type, quiz_content, answers, llm_replies)
     score = (correct_count / len(quiz_content)) * 100
-    
-    # Create and save the quiz attempt
+
     attempt = QuizAttempt(
         user_id=current_user.id,
-        quiz_id=quiz_id,
+        quiz_id=quiz.id,
         score=score,
         correct_answers=correct_count,
         total_questions=len(quiz_content),
+        completed_at=datetime.utcnow(),
         time_spent=time_spent,
+        time_spent_seconds=parse_time_spent(time_spent),
+        prompt_tokens=usage['prompt_tokens'] if usage else None,
+        completion_tokens=usage['completion_tokens'] if usage else None,
         user_answers=json.dumps(answers),
         details=json.dumps(evaluation)
     )
-    
-    # Update user's total score (simple implementation)
-    current_user.total_score = (current_user.total_score or 0) + score
-    
-    # Update quiz rating (simple average)
-    if quiz.rating:
-        quiz.rating = (quiz.rating + score) / 2
-    else:
-        quiz.rating = score
-    
     db.session.add(attempt)
+    db.session.flush()
+    enqueue_outbox_event(ATTEMPT_RECORDED, {'attempt_id': attempt.id, 'usage': usage})
     db.session.commit()
-    
-    return jsonify({
+    notify_outbox()
+
+    return {
         'evaluation': evaluation,
         'score': score,
         'correct_count': correct_count,
         'total_questions': len(quiz_content),
         'quiz_type': quiz.quiz_type,
         'attempt_id': attempt.id,
-        'new_plays_count': quiz.plays,
-        'new_rating': quiz.rating
+        'new_plays_count': (quiz.plays or 0) + 1,
+        'new_rating': (quiz.rating + score) / 2 if quiz.rating else score
+    }
+
+@bp.route('/submit-quiz', methods=['POST'])
+@token_required
+def submit_quiz(current_user):
+    data = request.json
+    quiz_id = data.get('quiz_id')
+    answers = data.get('answers')
+    time_spent = data.get('time_spent', '00:00')  # Default if not provided
+    
+    if not quiz_id or not answers:
+        return jsonify({'error': 'Missing quiz ID or answers'}), 400
+    
+    quiz = Quiz.query.get_or_404(quiz_id)
+    quiz_content = json.loads(quiz.quiz_content)
+    
+    # Use ChatGPT to evaluate short answers
+    usage = TokenUsage()
+    llm_replies = {
+        i: grade_short_answer(messages, usage)
+        for i, messages in short_answer_grading_messages(quiz.quiz_type, quiz_content, answers).items()
+    }
+    
+    return jsonify(record_attempt(current_user, quiz, quiz_content, answers, time_spent, llm_replies, usage))
+
+
+# ---------------------------------------------------------------------------
+# Post-Submit Pipeline (outbox)
+# ---------------------------------------------------------------------------
+# A write that has follow-up work (derived counters, stats, ...) adds an
+# outbox_events row in its own transaction and returns. One worker thread per
+# process delivers due events in id order: each batch runs the topic's handlers
+# and deletes the events in one transaction, so a handler's writes land exactly
+# once even though delivery is at-least-once (a crash or error before the
+# commit leaves the event for the next round). If another process delivered
+# some of the events first, the delete comes up short and the batch is rolled
+# back. Failing events are retried one by one with backoff and parked (no
+# available_at) after OUTBOX_MAX_ATTEMPTS; `flask outbox` lists and requeues them.
+# Within a process one drain runs at a time. Handlers should keep their writes
+# short and do anything slow before the first one: on SQLite the batch holds the
+# database's only write lock until it commits, and submits wait for it.
+#
+# OUTBOX_WORKER picks who delivers: 'thread' (default), 'inline' (right after
+# the commit, in the request) or 'off' (a separate `flask drain-outbox --follow`).
+ATTEMPT_RECORDED = 'attempt_recorded'
+OUTBOX_HANDLERS = {}
+OUTBOX_MAX_BACKOFF_SECONDS = 3600
+_drain_lock = threading.Lock()
+
+def outbox_handler(topic):
+    """Register a function(payloads) to run for the events of `topic` in a batch, oldest first; it must not commit"""
+    def register(fn):
+        OUTBOX_HANDLERS.setdefault(topic, []).append(fn)
+        return fn
+    return register
+
+def enqueue_outbox_event(topic, payload):
+    """Add an event to the current transaction (caller commits, then calls notify_outbox())"""
+    now = datetime.utcnow()
+    db.session.add(OutboxEvent(topic=topic, payload=json.dumps(payload), created_at=now, available_at=now))
+
+def dispatch_outbox_events(events):
+    payloads = {}
+    for event in events:
+        payloads.setdefault(event.topic, []).append(json.loads(event.payload))
+    for topic, topic_payloads in payloads.items():
+        for handler in OUTBOX_HANDLERS.get(topic, ()):
+            handler(topic_payloads)
+
+def _deliver(events):
+    """Run the handlers of `events` and delete them in one transaction; False (rolled back) if any was taken"""
+    dispatch_outbox_events(events)
+    ids = [event.id for event in events]
+    deleted = OutboxEvent.query.filter(OutboxEvent.id.in_(ids)).delete(synchronize_session=False)
+    if deleted != len(ids):
+        db.session.rollback()
+        return False
+    db.session.commit()
+    return True
+
+def _record_delivery_failure(event_id, error):
+    event = db.session.get(OutboxEvent, event_id)
+    if event is None:
+        return
+    event.attempts += 1
+    event.last_error = str(error)[:2000]
+    if event.attempts >= current_app.config['OUTBOX_MAX_ATTEMPTS']:
+        event.available_at = None
+        current_app.logger.error(f"Outbox event {event.id} ({event.topic}) parked after {event.attempts} attempts: {error}")
+    else:
+        delay = min(OUTBOX_MAX_BACKOFF_SECONDS, 2 ** event.attempts)
+        event.available_at = datetime.utcnow() + timedelta(seconds=delay)
+    db.session.commit()
+
+def drain_outbox(batch_size=None):
+    """Deliver one batch of due events; returns how many were delivered"""
+    batch_size = batch_size or current_app.config['OUTBOX_BATCH_SIZE']
+    with _drain_lock:
+        return _drain_outbox(batch_size)
+
+def _drain_outbox(batch_size):
+    events = OutboxEvent.query.filter(OutboxEvent.available_at <= datetime.utcnow())\
+                              .order_by(OutboxEvent.id).limit(batch_size).all()
+    if not events:
+        return 0
+    ids = [event.id for event in events]
+    try:
+        if _deliver(events):
+            return len(ids)
+    except Exception:
+        db.session.rollback()
+
+    # One at a time, so a failing event doesn't hold back the rest of the batch
+    delivered = 0
+    for event_id in ids:
+        event = db.session.get(OutboxEvent, event_id)
+        if event is None or event.available_at is None:
+            continue
+        try:
+            delivered += _deliver([event])
+        except Exception as e:
+            db.session.rollback()
+            _record_delivery_failure(event_id, e)
+    return delivered
+
+class OutboxWorker:
+    """Background thread draining the outbox; woken after each enqueue and every OUTBOX_POLL_SECONDS"""
+
+    def __init__(self, app):
+        self.app = app
+        self._wake = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='outbox-worker', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def notify(self):
+        self._wake.set()
+
+    def _run(self):
+        batch_size = self.app.config['OUTBOX_BATCH_SIZE']
+        while True:
+            self._wake.wait(self.app.config['OUTBOX_POLL_SECONDS'])
+            self._wake.clear()
+            try:
+                with self.app.app_context():
+                    while drain_outbox(batch_size) == batch_size:
+                        pass
+            except Exception as e:
+                # The events stay in the table; the next round retries them
+                self.app.logger.error(f"Outbox worker round failed: {str(e)}")
+
+def notify_outbox():
+    """Have the new events of the last commit delivered, as OUTBOX_WORKER says"""
+    mode = current_app.config['OUTBOX_WORKER']
+    if mode == 'inline':
+        while drain_outbox():
+            pass
+    elif mode == 'thread':
+        lazy_extension('quizgenie.outbox_worker', lambda app: OutboxWorker(app).start()).notify()
+
+def outbox_status():
+    pending = db.session.query(func.count(), func.min(OutboxEvent.created_at))\
+                        .filter(OutboxEvent.available_at.isnot(None)).one()
+    parked = OutboxEvent.query.filter(OutboxEvent.available_at.is_(None)).count()
+    return {
+        'pending': pending[0],
+        'oldest_pending_seconds': round((datetime.utcnow() - pending[1]).total_seconds(), 1) if pending[1] else None,
+        'parked': parked
+    }
+
+@bp.route('/api/outbox/stats', methods=['GET'])
+@token_required
+def get_outbox_stats(current_user):
+    return jsonify(outbox_status())
+
+@bp.cli.command('drain-outbox')
+@click.option('--follow', is_flag=True, help='Keep delivering new events (for OUTBOX_WORKER=off)')
+def drain_outbox_command(follow):
+    """Deliver the due outbox events"""
+    delivered = 0
+    while True:
+        count = drain_outbox()
+        delivered += count
+        if not count:
+            if not follow:
+                break
+            time.sleep(current_app.config['OUTBOX_POLL_SECONDS'])
+    click.echo(f"Delivered {delivered} events; {outbox_status()}")
+
+@bp.cli.command('outbox')
+@click.option('--requeue', is_flag=True, help='Retry the parked events')
+def outbox_command(requeue):
+    """Show the outbox backlog and its parked events"""
+    if requeue:
+        count = OutboxEvent.query.filter(OutboxEvent.available_at.is_(None))\
+                                 .update({'available_at': datetime.utcnow(), 'attempts': 0}, synchronize_session=False)
+        db.session.commit()
+        click.echo(f"Requeued {count} events")
+    click.echo(json.dumps(outbox_status()))
+    for event in OutboxEvent.query.filter(OutboxEvent.available_at.is_(None)).order_by(OutboxEvent.id).limit(20):
+        click.echo(f"  {event.id} {event.topic} {event.created_at.isoformat()} attempts={event.attempts}: {event.last_error}")
+
+# What record_attempt() leaves to the outbox. A batch is applied like the attempts
+# of a live session (record_live_results()): counters merged, one write per row.
+@outbox_handler(ATTEMPT_RECORDED)
+def apply_recorded_attempts(payloads):
+    attempt_ids = [payload['attempt_id'] for payload in payloads]
+    # Locked before the attempts are read, so that deliveries in other processes and regrades
+    # (lock_quiz_deliveries()) apply their changes before or after ours, not over them
+    quiz_ids = select(QuizAttempt.quiz_id).where(QuizAttempt.id.in_(attempt_ids)).distinct()
+    quizzes = {quiz.id: quiz for quiz in Quiz.query.filter(Quiz.id.in_(quiz_ids)).with_for_update()}
+    # rollup_attempts() only archives an attempt once its event is gone, so the batch's attempts are all here
+    attempts = QuizAttempt.query.options(raiseload(QuizAttempt.user), raiseload(QuizAttempt.quiz))\
+                                .filter(QuizAttempt.id.in_(attempt_ids)).order_by(QuizAttempt.id).all()
+    contents = {quiz_id: json.loads(quiz.quiz_content) for quiz_id, quiz in quizzes.items()}
+    half_life = current_app.config['TRENDING_HALF_LIFE_HOURS']
+
+    question_totals, option_totals, user_gains = {}, {}, {}
+    for attempt in attempts:
+        quiz = quizzes[attempt.quiz_id]
+        evaluation = json.loads(attempt.details)
+        question_rows, option_rows = item_stat_rows(quiz.id, quiz.quiz_type, contents[quiz.id], evaluation,
+                                                    json.loads(attempt.user_answers))
+        _merge_item_rows(question_totals, question_rows, ['quiz_id', 'question_index'],
+                         ['attempts', 'correct', 'partial', 'incorrect'])
+        _merge_item_rows(option_totals, option_rows, ['quiz_id', 'question_index', 'option_index'], ['selections'])
+        # Review states advance per attempt, so a user answering the same quiz twice in a batch is applied in order
+        record_reviews(quiz.id, quiz.quiz_type, {attempt.user_id: evaluation}, attempt.completed_at)
+        user_gains[attempt.user_id] = user_gains.get(attempt.user_id, 0) + attempt.score
+        # Same running average and trending increments as one submit at a time, in attempt order
+        quiz.plays = (quiz.plays or 0) + 1
+        quiz.rating = (quiz.rating + attempt.score) / 2 if quiz.rating else attempt.score
+        quiz.trending_score = trending_increment(quiz.trending_score, attempt.completed_at, half_life)
+
+    record_item_stats(list(question_totals.values()), list(option_totals.values()))
+    record_quiz_summaries(attempts)
+    users = User.__table__
+    if user_gains:
+        db.session.execute(users.update().where(users.c.id == bindparam('user_key'))
+                           .values(total_score=func.coalesce(users.c.total_score, 0) + bindparam('gain')),
+                           [{'user_key': user_id, 'gain': gain} for user_id, gain in user_gains.items()])
+    for quiz in quizzes.values():
+        offer_trending(quiz)
+
+    usages = {}
+    usage_by_attempt = {payload['attempt_id']: payload.get('usage') for payload in payloads}
+    for attempt in attempts:
+        usages.setdefault((attempt.user_id, attempt.completed_at.date()), []).append(usage_by_attempt[attempt.id])
+    for (user_id, day), user_usages in usages.items():
+        record_llm_usage(user_id, 'grading', user_usages, day=day)
+
+def undelivered_attempt_ids():
+    """Ids of the attempts whose derived updates are still in the outbox (due, backing off or parked)"""
+    payloads = db.session.query(OutboxEvent.payload).filter(OutboxEvent.topic == ATTEMPT_RECORDED)
+    return {json.loads(payload)['attempt_id'] for payload, in payloads}
+
+
+# ---------------------------------------------------------------------------
+# Spaced Repetition (question reviews)
+# ---------------------------------------------------------------------------
+# Every graded answer is a review of that question for that user (scheduling in
+# spaced_repetition.py). A submit reads and writes the review_items rows of the
+# quiz's questions by primary key, and /api/review/next is a range scan of
+# (user_id, due_at), so neither depends on how many items a user tracks.
+def record_reviews(quiz_id, quiz_type, evaluations, reviewed_at):
+    """Advance the review state of every question answered in `evaluations` ({user id: evaluation}).
+    The caller commits.
+    """
+    if not evaluations:
+        return
+    items = ReviewItem.__table__
+    current = {(row.user_id, row.question_index): row._asdict() for row in db.session.execute(
+        select(items).where(items.c.quiz_id == quiz_id, items.c.user_id.in_(list(evaluations))))}
+    rows = []
+    for user_id, evaluation in evaluations.items():
+        for index, item in enumerate(evaluation):
+            state = next_review(current.get((user_id, index)), item_outcome(quiz_type, item), reviewed_at)
+            rows.append(dict(state, user_id=user_id, quiz_id=quiz_id, question_index=index))
+    upsert_values(items, ['user_id', 'quiz_id', 'question_index'], rows, list(REVIEW_FIELDS))
+
+def review_item_summary(item, quiz, question):
+    return {
+        'quiz_id': item.quiz_id,
+        'quiz_title': quiz.title,
+        'quiz_type': quiz.quiz_type,
+        'question_index': item.question_index,
+        'question': question,
+        'due_at': item.due_at.isoformat(),
+        'last_reviewed_at': item.last_reviewed_at.isoformat(),
+        'last_outcome': item.last_outcome,
+        'interval_days': item.interval_days,
+        'repetitions': item.repetitions,
+        'lapses': item.lapses,
+        'ease': item.ease
+    }
+
+@bp.route('/api/review/next', methods=['GET'])
+@token_required
+def get_next_reviews(current_user):
+    """Questions due for review, most overdue first (optionally within one quiz)"""
+    limit = max(1, min(request.args.get('limit', 20, type=int), 100))
+    quiz_id = request.args.get('quiz_id')
+    now = datetime.utcnow()
+    query = ReviewItem.query.filter(ReviewItem.user_id == current_user.id)
+    if quiz_id:
+        query = query.filter(ReviewItem.quiz_id == quiz_id)
+    due = query.filter(ReviewItem.due_at <= now).order_by(ReviewItem.due_at).limit(limit + 1).all()
+
+    quizzes = {quiz.id: quiz for quiz in Quiz.query.options(
+        load_only(Quiz.id, Quiz.title, Quiz.quiz_type, Quiz.quiz_content), raiseload(Quiz.tags)
+    ).filter(Quiz.id.in_({item.quiz_id for item in due[:limit]}))}
+    contents = {quiz.id: json.loads(quiz.quiz_content) for quiz in quizzes.values()}
+    items = []
+    for item in due[:limit]:
+        questions = contents.get(item.quiz_id, [])
+        # Questions removed by an edit since they were answered are skipped
+        if item.question_index < len(questions):
+            items.append(review_item_summary(item, quizzes[item.quiz_id], questions[item.question_index]))
+
+    next_due = None if due else query.with_entities(ReviewItem.due_at).filter(ReviewItem.due_at > now)\
+                                      .order_by(ReviewItem.due_at).limit(1).scalar()
+    return jsonify({
+        'success': True,
+        'items': items,
+        'has_more': len(due) > limit,
+        'next_due_at': next_due.isoformat() if next_due else None
     })
 
-@app.route('/api/attempts/<quiz_id>', methods=['GET'])
+@bp.cli.command('rebuild-review-schedule')
+@click.option('--users-per-batch', type=int, default=200)
+def rebuild_review_schedule_command(users_per_batch):
+    """Recompute every user's review schedule by replaying their attempts (live and archived) in order"""
+    started = time.perf_counter()
+    ReviewItem.query.delete()
+    db.session.commit()
+
+    user_ids = sorted(set(db.session.scalars(select(QuizAttempt.user_id).distinct())) |
+                      set(db.session.scalars(select(ArchivedQuizAttempt.user_id).distinct())))
+    replayed = tracked = 0
+    for start in range(0, len(user_ids), users_per_batch):
+        batch = user_ids[start:start + users_per_batch]
+        history = union_all(
+            select(QuizAttempt.user_id, QuizAttempt.quiz_id, QuizAttempt.completed_at, QuizAttempt.id,
+                   QuizAttempt.details).where(QuizAttempt.user_id.in_(batch)),
+            select(ArchivedQuizAttempt.user_id, ArchivedQuizAttempt.quiz_id, ArchivedQuizAttempt.completed_at,
+                   ArchivedQuizAttempt.id, ArchivedQuizAttempt.details).where(ArchivedQuizAttempt.user_id.in_(batch))
+        ).subquery()
+        states = {}
+        for row in db.session.execute(
+                select(history, Quiz.quiz_type).join(Quiz, Quiz.id == history.c.quiz_id)
+                .where(history.c.completed_at.isnot(None))
+                .order_by(history.c.user_id, history.c.completed_at, history.c.id)):
+            try:
+                evaluation = json.loads(row.details) if row.details else []
+            except ValueError:
+                continue
+            for index, item in enumerate(evaluation):
+                if isinstance(item, dict):
+                    key = (row.user_id, row.quiz_id, index)
+                    states[key] = next_review(states.get(key), item_outcome(row.quiz_type, item), row.completed_at)
+            replayed += 1
+        if states:
+            db.session.execute(ReviewItem.__table__.insert(), [
+                dict(state, user_id=user_id, quiz_id=quiz_id, question_index=index)
+                for (user_id, quiz_id, index), state in states.items()])
+        db.session.commit()
+        tracked += len(states)
+        click.echo(f"  {min(start + users_per_batch, len(user_ids))}/{len(user_ids)} users")
+    click.echo(f"Replayed {replayed} attempts into {tracked} review items in {time.perf_counter() - started:.1f}s")
+
+
+# ---------------------------------------------------------------------------
+# Live Sessions (persistence)
+# ---------------------------------------------------------------------------
+# Live sessions run in memory (live_sessions.py, served by asgi.py); these are
+# their only database steps: loading the quiz once and storing every
+# signed-in participant's attempt in one transaction when the session ends.
+LIVE_QUIZ_TYPES = ('mcq',)  # Scored locally; answers that need the LLM grader can't be scored live
+
+def load_live_quiz(quiz_id, user_id):
+    """The quiz as a live session needs it, or None if `user_id` may not host it"""
+    quiz = db.session.get(Quiz, quiz_id)
+    if quiz is None or not (quiz.is_public or quiz.user_id == user_id):
+        return None
+    quiz_content = json.loads(quiz.quiz_content)
+    return {
+        'quiz_id': quiz.id,
+        'title': quiz.title,
+        'quiz_type': quiz.quiz_type,
+        'questions': [{'question': question['question'], 'options': question.get('options', [])}
+                      for question in quiz_content],
+        'answer_key': compile_answer_key(quiz.quiz_type, quiz_content)
+    }
+
+def record_live_results(quiz_id, results):
+    """Save the attempts of a finished live session: one bulk insert and one commit.
+
+    results come from LiveSession.finish(); guests (no user_id) are not stored.
+    Quiz plays, rating and trending, user totals, item stats and review schedules
+    move exactly as if each attempt had been submitted through /submit-quiz.
+    """
+    results = [result for result in results if result['user_id'] is not None]
+    quiz = db.session.get(Quiz, quiz_id)
+    if quiz is None or not results:
+        return 0
+    quiz_content = json.loads(quiz.quiz_content)
+    answer_key = compile_answer_key(quiz.quiz_type, quiz_content)
+    completed_at = datetime.utcnow()
+
+    attempts, user_gains, evaluations = [], [], {}
+    question_totals, option_totals = {}, {}
+    for result in results:
+        evaluation, correct_count = evaluate_answers(quiz.quiz_type, answer_key, result['answers'], {}, stats=None)
+        evaluations[result['user_id']] = evaluation
+        score = (correct_count / len(quiz_content)) * 100
+        question_rows, option_rows = item_stat_rows(quiz.id, quiz.quiz_type, quiz_content, evaluation,
+                                                    result['answers'])
+        _merge_item_rows(question_totals, question_rows, ['quiz_id', 'question_index'],
+                         ['attempts', 'correct', 'partial', 'incorrect'])
+        _merge_item_rows(option_totals, option_rows, ['quiz_id', 'question_index', 'option_index'], ['selections'])
+        time_spent = f"{result['seconds'] // 60:02d}:{result['seconds'] % 60:02d}"
+        attempts.append({
+            'user_id': result['user_id'],
+            'quiz_id': quiz.id,
+            'score': score,
+            'correct_answers': correct_count,
+            'total_questions': len(quiz_content),
+            'completed_at': completed_at,
+            'time_spent': time_spent,
+            'time_spent_seconds': result['seconds'],
+            'user_answers': json.dumps(result['answers']),
+            'details': json.dumps(evaluation)
+        })
+        user_gains.append({'user_key': result['user_id'], 'gain': score})
+        # Same running average as record_attempt()
+        quiz.rating = (quiz.rating + score) / 2 if quiz.rating else score
+
+    attempt_ids = db.session.execute(db.insert(QuizAttempt).returning(QuizAttempt.id, sort_by_parameter_order=True),
+                                     attempts).scalars().all()
+    record_quiz_summaries(SimpleNamespace(id=attempt_id, **attempt)
+                          for attempt_id, attempt in zip(attempt_ids, attempts))
+    users = User.__table__
+    db.session.execute(users.update().where(users.c.id == bindparam('user_key'))
+                       .values(total_score=func.coalesce(users.c.total_score, 0) + bindparam('gain')), user_gains)
+    record_item_stats(list(question_totals.values()), list(option_totals.values()))
+    record_reviews(quiz.id, quiz.quiz_type, evaluations, completed_at)
+    quiz.plays = (quiz.plays or 0) + len(attempts)
+    quiz.trending_score = trending_increment(quiz.trending_score, completed_at,
+                                             current_app.config['TRENDING_HALF_LIFE_HOURS'], plays=len(attempts))
+    offer_trending(quiz)
+    db.session.commit()
+    return len(attempts)
+
+
+# ---------------------------------------------------------------------------
+# Re-grading After Quiz Edits
+# ---------------------------------------------------------------------------
+# Attempts are streamed in id order and each batch is rewritten in one
+# transaction together with the job checkpoint, so an interrupted job resumes
+# from the last committed batch without double-counting user totals.
+#
+# Attempts whose attempt_recorded event is still in the outbox haven't reached
+# the user totals, item stats or rating yet, and their handler will apply the
+# regraded score and details when it runs. The regrade leaves their derived
+# values to it: their rows are rewritten without a total delta, and they are
+# skipped when the rating, item stats and history summaries are recomputed at
+# the end. Both steps
+# hold the outbox drain lock and the quiz row, so no delivery runs in between.
+_regrade_locks = {}
+_regrade_locks_guard = threading.Lock()
+
+def _regrade_lock(quiz_id):
+    with _regrade_locks_guard:
+        return _regrade_locks.setdefault(quiz_id, threading.Lock())
+
+def start_regrade(quiz):
+    """Queue a regrade of every attempt of `quiz`, superseding older jobs for it"""
+    RegradeJob.query.filter(RegradeJob.quiz_id == quiz.id,
+                            RegradeJob.status.in_(['pending', 'running', 'failed']))\
+        .update({'status': 'superseded'}, synchronize_session=False)
+    job = RegradeJob(id=str(uuid.uuid4()), quiz_id=quiz.id,
+                     answer_key_hash=answer_key_signature(quiz.quiz_type, json.loads(quiz.quiz_content)))
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+def regrade_llm_reply(messages, usage=None):
+    """The grader's reply for one answer; unlike grade_short_answer(), failures propagate"""
+    response = llm_chat_completion(messages=messages, usage=usage, **{**GRADING_REQUEST, 'priority': PRIORITY_BULK})
+    return response.choices[0].message.content.strip()
+
+def fill_regrade_replies(app, quiz_type, answer_key, answer_sets, reply_cache, usage=None):
+    """Grade every distinct, locally undecidable answer of a batch with the LLM (concurrently)"""
+    if quiz_type == 'mcq':
+        return 0
+    pending = {}
+    for answers in answer_sets:
+        for i, entry in enumerate(answer_key):
+            user_answer = str(answers.get(str(i), '')).strip()
+            cache_key = (i, normalize_answer(user_answer))
+            if cache_key in reply_cache or cache_key in pending:
+                continue
+            if local_verdict(entry['expected'], user_answer) is None:
+                pending[cache_key] = grading_messages(entry, user_answer)
+
+    futures = {get_generation_executor().submit(in_app_context, app, regrade_llm_reply, messages, usage): cache_key
+               for cache_key, messages in pending.items()}
+    for future in as_completed(futures):
+        reply_cache[futures[future]] = future.result()
+    return len(pending)
+
+def lock_quiz_deliveries(quiz_id):
+    """Lock the quiz row against attempt_recorded deliveries (other processes wait in apply_recorded_attempts())"""
+    return Quiz.query.filter(Quiz.id == quiz_id).with_for_update().one()
+
+def regrade_batch(app, job, quiz_type, answer_key, rows, reply_cache):
+    """Regrade one batch of (id, user_id, score, correct_answers, user_answers, details) rows and commit it"""
+    answer_sets = [json.loads(row.user_answers) if row.user_answers else {} for row in rows]
+    usage = TokenUsage()
+    llm_calls = fill_regrade_replies(app, quiz_type, answer_key, answer_sets, reply_cache, usage)
+    with _drain_lock:
+        _write_regrade_batch(job, quiz_type, answer_key, rows, answer_sets, reply_cache, usage, llm_calls)
+
+def _write_regrade_batch(job, quiz_type, answer_key, rows, answer_sets, reply_cache, usage, llm_calls):
+    quiz = lock_quiz_deliveries(job.quiz_id)
+    undelivered = undelivered_attempt_ids()
+    attempt_updates, user_deltas = [], {}
+    for row, answers in zip(rows, answer_sets):
+        llm_replies = {}
+        if quiz_type != 'mcq':
+            for i in range(len(answer_key)):
+                cache_key = (i, normalize_answer(str(answers.get(str(i), '')).strip()))
+                if cache_key in reply_cache:
+                    llm_replies[i] = reply_cache[cache_key]
+        evaluation, correct_count = evaluate_answers(quiz_type, answer_key, answers, llm_replies, stats=None)
+        score = (correct_count / len(answer_key)) * 100 if answer_key else 0
+        details = json.dumps(evaluation)
+
+        if score != row.score or correct_count != row.correct_answers or details != row.details:
+            attempt_updates.append({'attempt_id': row.id, 'new_score': score, 'new_correct': correct_count,
+                                    'new_total': len(answer_key), 'new_details': details})
+            if row.id not in undelivered:
+                user_deltas[row.user_id] = user_deltas.get(row.user_id, 0) + score - (row.score or 0)
+
+    attempts = QuizAttempt.__table__
+    users = User.__table__
+    if attempt_updates:
+        db.session.execute(
+            attempts.update().where(attempts.c.id == bindparam('attempt_id')).values(
+                score=bindparam('new_score'), correct_answers=bindparam('new_correct'),
+                total_questions=bindparam('new_total'), details=bindparam('new_details')),
+            attempt_updates
+        )
+    if user_deltas:
+        db.session.execute(
+            users.update().where(users.c.id == bindparam('user_id')).values(
+                total_score=func.coalesce(users.c.total_score, 0) + bindparam('delta')),
+            [{'user_id': user_id, 'delta': delta} for user_id, delta in user_deltas.items()]
+        )
+
+    job.last_attempt_id = rows[-1].id
+    job.attempts_done += len(rows)
+    job.attempts_changed += len(attempt_updates)
+    job.llm_calls += llm_calls
+    # Regrading is billed to the quiz's owner, whose edit triggered it
+    record_llm_usage(quiz.user_id, 'regrade', [usage.as_dict()])
+    db.session.commit()
+
+def replay_rating(quiz_id, skip_attempt_ids=(), batch_size=10000):
+    """The running average record_attempt() keeps, replayed over the quiz's stored scores in attempt order.
+
+    Attempts archived by the daily rollups are older than every live one and
+    only their totals are left, so their average seeds the replay.
+    """
+    archived = db.session.query(func.sum(QuizDailyRollup.attempts), func.sum(QuizDailyRollup.score_sum))\
+                         .filter(QuizDailyRollup.quiz_id == quiz_id).one()
+    rating = archived[1] / archived[0] if archived[0] else None
+    scores = db.session.execute(select(QuizAttempt.id, QuizAttempt.score).where(QuizAttempt.quiz_id == quiz_id)
+                                .order_by(QuizAttempt.id).execution_options(yield_per=batch_size))
+    for attempt_id, score in scores:
+        if attempt_id not in skip_attempt_ids:
+            rating = (rating + score) / 2 if rating else score
+    return rating
+
+def finish_regrade(job):
+    """Recompute the quiz's rating, history summaries and item stats from the regraded attempts; completes the job"""
+    with _drain_lock:
+        quiz = lock_quiz_deliveries(job.quiz_id)
+        undelivered = undelivered_attempt_ids()
+        job.rating = replay_rating(quiz.id, undelivered)
+        if job.rating is not None:
+            quiz.rating = job.rating
+        job.status = 'completed'
+        job.finished_at = datetime.utcnow()
+        refresh_quiz_summaries(quiz_id=quiz.id, skip_attempt_ids=undelivered)
+        db.session.flush()
+        # Commits the job, the rating and the stats together
+        rebuild_question_stats(quiz.id, skip_attempt_ids=undelivered)
+
+def run_regrade_job(app, job_id):
+    """Regrade the job's quiz from its checkpoint onwards; safe to call again after a crash"""
+    with app.app_context():
+        job = db.session.get(RegradeJob, job_id)
+        if not job or job.status in ('completed', 'superseded'):
+            return
+        with _regrade_lock(job.quiz_id):
+            quiz = db.session.get(Quiz, job.quiz_id)
+            quiz_content = json.loads(quiz.quiz_content) if quiz else None
+            if quiz is None or answer_key_signature(quiz.quiz_type, quiz_content) != job.answer_key_hash:
+                job.status = 'superseded'
+                db.session.commit()
+                return
+
+            quiz_type = quiz.quiz_type
+            answer_key = compile_answer_key(quiz_type, quiz_content)
+            batch_size = current_app.config['REGRADE_BATCH_SIZE']
+            reply_cache = {}
+            job.status = 'running'
+            job.error = None
+            db.session.commit()
+
+            try:
+                while True:
+                    db.session.refresh(job, ['status'])
+                    if job.status == 'superseded':
+                        return
+                    rows = db.session.query(QuizAttempt.id, QuizAttempt.user_id, QuizAttempt.score,
+                                            QuizAttempt.correct_answers, QuizAttempt.user_answers,
+                                            QuizAttempt.details)\
+                        .filter(QuizAttempt.quiz_id == quiz.id, QuizAttempt.id > job.last_attempt_id)\
+                        .order_by(QuizAttempt.id).limit(batch_size).all()
+                    if not rows:
+                        break
+                    regrade_batch(app, job, quiz_type, answer_key, rows, reply_cache)
+                finish_regrade(job)
+            except Exception as e:
+                db.session.rollback()
+                current_app.logger.error(f"Regrade job {job.id} failed: {str(e)}")
+                job.status = 'failed'
+                job.error = str(e)
+                db.session.commit()
+
+@bp.route('/api/quizzes/<quiz_id>/regrade', methods=['GET', 'POST'])
+@token_required
+def quiz_regrade(current_user, quiz_id):
+    """Latest regrade job of a quiz (GET), or start / resume one (POST)"""
+    quiz = Quiz.query.filter_by(id=quiz_id, user_id=current_user.id).first()
+    if not quiz:
+        return jsonify({'success': False, 'error': 'Quiz not found'}), 404
+
+    job = RegradeJob.query.filter_by(quiz_id=quiz.id).order_by(RegradeJob.created_at.desc()).first()
+    if request.method == 'GET':
+        if not job:
+            return jsonify({'success': False, 'error': 'No regrade job for this quiz'}), 404
+        return jsonify({'success': True, **job.to_dict()})
+
+    current_hash = answer_key_signature(quiz.quiz_type, json.loads(quiz.quiz_content))
+    if not job or job.status in ('completed', 'superseded') or job.answer_key_hash != current_hash:
+        job = start_regrade(quiz)
+    get_bulk_job_executor().submit(run_regrade_job, current_app._get_current_object(), job.id)
+    return jsonify({'success': True, **job.to_dict()}), 202
+
+@bp.cli.command('regrade-quiz')
+@click.argument('quiz_id')
+def regrade_quiz_command(quiz_id):
+    """Regrade every attempt of a quiz now (resumes its unfinished job if there is one)"""
+    quiz = db.session.get(Quiz, quiz_id)
+    if not quiz:
+        raise click.BadParameter(f"Quiz {quiz_id} not found")
+    job = RegradeJob.query.filter(RegradeJob.quiz_id == quiz.id, RegradeJob.status.in_(['pending', 'running', 'failed']))\
+        .order_by(RegradeJob.created_at.desc()).first()
+    if not job or job.answer_key_hash != answer_key_signature(quiz.quiz_type, json.loads(quiz.quiz_content)):
+        job = start_regrade(quiz)
+
+    started = time.perf_counter()
+    run_regrade_job(current_app._get_current_object(), job.id)
+    db.session.refresh(job)
+    click.echo(f"Regrade {job.status}: {job.attempts_done} attempts, {job.attempts_changed} changed, "
+               f"{job.llm_calls} LLM calls in {time.perf_counter() - started:.1f}s")
+    if job.error:
+        click.echo(f"Error: {job.error}")
+
+@bp.cli.command('resume-regrades')
+def resume_regrades_command():
+    """Finish regrade jobs that were interrupted by a restart or failed"""
+    job_ids = [job.id for job in RegradeJob.query.filter(RegradeJob.status.in_(['pending', 'running', 'failed'])).all()]
+    for job_id in job_ids:
+        run_regrade_job(current_app._get_current_object(), job_id)
+    click.echo(f"Resumed {len(job_ids)} regrade jobs")
+
+
+# ---------------------------------------------------------------------------
+# Attempt History (keyset pagination)
+# ---------------------------------------------------------------------------
+# History lists are read newest first, one page at a time. ?cursor= is the
+# opaque position of the last row already returned ((completed_at, id) for
+# attempts), so each page is one index range read of ?limit= rows however
+# deep the client has scrolled. List rows are summaries; the graded details
+# of one attempt come from /api/attempt/<id>.
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+def encode_cursor(moment, key):
+    payload = json.dumps([moment.isoformat(), key], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii').rstrip('=')
+
+def decode_cursor(token):
+    """(datetime, key) from encode_cursor(); ValueError if the token is malformed"""
+    try:
+        moment, key = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        return datetime.fromisoformat(moment), key
+    except (TypeError, ValueError) as e:
+        raise ValueError('Invalid cursor') from e
+
+def page_request(default_limit=DEFAULT_PAGE_SIZE):
+    """(limit, cursor, error) from ?limit= and ?cursor=; error is a ready response or None"""
+    limit = max(1, min(request.args.get('limit', default_limit, type=int), MAX_PAGE_SIZE))
+    token = request.args.get('cursor')
+    if not token:
+        return limit, None, None
+    try:
+        return limit, decode_cursor(token), None
+    except ValueError:
+        return limit, None, (jsonify({'success': False, 'error': 'Invalid cursor'}), 400)
+
+def keyset_page(query, moment_column, key_column, position, limit, cursor, having=False):
+    """One page of `query` ordered by (moment_column, key_column) descending, after `cursor`.
+
+    position(row) gives a row's (moment, key) for the next cursor. Pass having=True
+    when the ordering columns are aggregates of a grouped query. Returns (rows, next_cursor).
+    """
+    if cursor is not None:
+        moment, key = cursor
+        after = db.or_(moment_column < moment, db.and_(moment_column == moment, key_column < key))
+        query = query.having(after) if having else query.filter(after)
+    rows = query.order_by(moment_column.desc(), key_column.desc()).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    return rows[:limit], encode_cursor(*position(rows[limit - 1]))
+
+# Columns of the list rows; details and user_answers are only read for a single attempt
+ATTEMPT_SUMMARY_COLUMNS = (QuizAttempt.id, QuizAttempt.quiz_id, QuizAttempt.score, QuizAttempt.correct_answers,
+                           QuizAttempt.total_questions, QuizAttempt.completed_at, QuizAttempt.time_spent)
+
+def attempts_page(query, limit, cursor):
+    """A page of QuizAttempt rows (summary columns only), newest first: (attempts, next_cursor)"""
+    return keyset_page(query.options(load_only(*ATTEMPT_SUMMARY_COLUMNS)), QuizAttempt.completed_at, QuizAttempt.id,
+                       lambda attempt: (attempt.completed_at, attempt.id), limit, cursor)
+
+def attempt_summary(attempt):
+    return {
+        'id': attempt.id,
+        'quiz_id': attempt.quiz_id,
+        'score': attempt.score,
+        'correct_answers': attempt.correct_answers,
+        'total_questions': attempt.total_questions,
+        'completed_at': attempt.completed_at.isoformat(),
+        'time_spent': attempt.time_spent
+    }
+
+# The taken-quiz list reads user_quiz_summaries, one row per (user, quiz) ordered
+# by (user_id, last_completed_at), so a page never groups the user's attempts.
+# Rows take in attempts where their other derived values are applied (the
+# outbox, live results, imports); regrades and `flask rebuild-quiz-history`
+# recompute them from the attempts and the user rollups.
+SUMMARY_VALUE_COLUMNS = ['attempts', 'score_sum', 'best_score', 'last_attempt_id', 'last_completed_at', 'last_score',
+                         'last_correct_answers', 'last_total_questions', 'last_time_spent']
+
+def _new_summary(user_id, quiz_id):
+    return {'user_id': user_id, 'quiz_id': quiz_id, 'attempts': 0, 'score_sum': 0.0, 'best_score': None,
+            'last_attempt_id': None, 'last_completed_at': None, 'last_score': None, 'last_correct_answers': None,
+            'last_total_questions': None, 'last_time_spent': None}
+
+def _fold_latest(summary, attempt_id, completed_at, score, correct_answers=None, total_questions=None,
+                 time_spent=None):
+    completed_at = completed_at or datetime.min  # Imported attempts may have no time
+    if summary['last_completed_at'] is None or \
+            (completed_at, attempt_id or 0) >= (summary['last_completed_at'], summary['last_attempt_id'] or 0):
+        summary.update(last_attempt_id=attempt_id, last_completed_at=completed_at, last_score=score,
+                       last_correct_answers=correct_answers, last_total_questions=total_questions,
+                       last_time_spent=time_spent)
+
+def record_quiz_summaries(attempts):
+    """Fold newly stored attempts (QuizAttempt-like objects with their ids) into the summaries; the caller commits"""
+    attempts = list(attempts)
+    if not attempts:
+        return
+    keys = {(attempt.user_id, attempt.quiz_id) for attempt in attempts}
+    table = UserQuizSummary.__table__
+    stored = db.session.execute(select(table).where(table.c.user_id.in_({user_id for user_id, _ in keys}),
+                                                    table.c.quiz_id.in_({quiz_id for _, quiz_id in keys})))
+    summaries = {(row.user_id, row.quiz_id): dict(row._mapping) for row in stored}
+    for attempt in attempts:
+        summary = summaries.setdefault((attempt.user_id, attempt.quiz_id),
+                                       _new_summary(attempt.user_id, attempt.quiz_id))
+        summary['attempts'] += 1
+        summary['score_sum'] += attempt.score
+        summary['best_score'] = attempt.score if summary['best_score'] is None else max(summary['best_score'],
+                                                                                       attempt.score)
+        _fold_latest(summary, attempt.id, attempt.completed_at, attempt.score, attempt.correct_answers,
+                     attempt.total_questions, attempt.time_spent)
+    upsert_values(table, ['user_id', 'quiz_id'], [summaries[key] for key in keys], SUMMARY_VALUE_COLUMNS)
+
+def refresh_quiz_summaries(user_ids=None, quiz_id=None, skip_attempt_ids=()):
+    """Recompute the summaries of some users or of one quiz; the caller commits.
+
+    skip_attempt_ids are left out (their outbox event adds them when it is delivered).
+    """
+    def scoped(query, model):
+        if user_ids is not None:
+            query = query.where(model.user_id.in_(user_ids))
+        if quiz_id is not None:
+            query = query.where(model.quiz_id == quiz_id)
+        return query
+
+    summaries = {}
+    # Archived attempts first: they are older than the live ones of the same (user, quiz)
+    rollups = scoped(select(UserDailyRollup.user_id, UserDailyRollup.quiz_id, UserDailyRollup.attempts,
+                            UserDailyRollup.score_sum, UserDailyRollup.score_max, UserDailyRollup.last_completed_at,
+                            UserDailyRollup.last_score), UserDailyRollup)
+    for user_id, rollup_quiz_id, attempts, score_sum, score_max, last_completed_at, last_score in \
+            db.session.execute(rollups):
+        summary = summaries.setdefault((user_id, rollup_quiz_id), _new_summary(user_id, rollup_quiz_id))
+        summary['attempts'] += attempts
+        summary['score_sum'] += score_sum
+        if score_max is not None:
+            summary['best_score'] = max(summary['best_score'] or 0, score_max)
+        _fold_latest(summary, None, last_completed_at, last_score)
+
+    live = scoped(select(QuizAttempt.id, QuizAttempt.user_id, QuizAttempt.quiz_id, QuizAttempt.score,
+                         QuizAttempt.correct_answers, QuizAttempt.total_questions, QuizAttempt.completed_at,
+                         QuizAttempt.time_spent), QuizAttempt)
+    for attempt in db.session.execute(live.execution_options(yield_per=10000)):
+        if attempt.id in skip_attempt_ids:
+            continue
+        summary = summaries.setdefault((attempt.user_id, attempt.quiz_id),
+                                       _new_summary(attempt.user_id, attempt.quiz_id))
+        summary['attempts'] += 1
+        summary['score_sum'] += attempt.score
+        summary['best_score'] = max(summary['best_score'] or 0, attempt.score)
+        _fold_latest(summary, attempt.id, attempt.completed_at, attempt.score, attempt.correct_answers,
+                     attempt.total_questions, attempt.time_spent)
+
+    db.session.execute(scoped(UserQuizSummary.__table__.delete(), UserQuizSummary))
+    if summaries:
+        db.session.execute(UserQuizSummary.__table__.insert(), list(summaries.values()))
+    return len(summaries)
+
+@bp.cli.command('rebuild-quiz-history')
+@click.option('--users-per-batch', type=int, default=500)
+def rebuild_quiz_history_command(users_per_batch):
+    """Recompute the per-quiz summaries of the taken-quiz history from attempts and rollups"""
+    started = time.perf_counter()
+    user_ids = [user_id for user_id, in db.session.query(User.id).order_by(User.id)]
+    summaries = 0
+    for start in range(0, len(user_ids), users_per_batch):
+        summaries += refresh_quiz_summaries(user_ids=user_ids[start:start + users_per_batch])
+        db.session.commit()
+    click.echo(f"Rebuilt {summaries} quiz summaries for {len(user_ids)} users in "
+               f"{time.perf_counter() - started:.1f}s")
+
+@bp.route('/api/attempts/<quiz_id>', methods=['GET'])
 @token_required
 def get_quiz_attempts(current_user, quiz_id):
-    """Get all attempts for a specific quiz by the current user"""
-    attempts = QuizAttempt.query.filter_by(
-        user_id=current_user.id,
-        quiz_id=quiz_id
-    ).order_by(QuizAttempt.completed_at.desc()).all()
-    
-    attempts_data = []
-    for attempt in attempts:
-        attempts_data.append({
-            'id': attempt.id,
-            'score': attempt.score,
-            'correct_answers': attempt.correct_answers,
-            'total_questions': attempt.total_questions,
-            'completed_at': attempt.completed_at.isoformat(),
-            'time_spent': attempt.time_spent,
-            'details': json.loads(attempt.details) if attempt.details else None
-        })
-    
-    return jsonify(attempts_data)
+    """A page of the current user's attempts on a quiz, newest first, with totals over all of them"""
+    limit, cursor, error = page_request()
+    if error:
+        return error
+    query = QuizAttempt.query.filter_by(user_id=current_user.id, quiz_id=quiz_id)
+    attempts, next_cursor = attempts_page(query, limit, cursor)
+    # Totals include archived attempts; the best attempt's details only exist while it is live
+    summary = db.session.get(UserQuizSummary, (current_user.id, quiz_id))
+    best = query.order_by(QuizAttempt.score.desc(), QuizAttempt.completed_at.desc()).first()
+    return jsonify({
+        'success': True,
+        'attempts': [attempt_summary(attempt) for attempt in attempts],
+        'next_cursor': next_cursor,
+        'summary': {
+            'total_attempts': summary.attempts if summary else 0,
+            'best_score': summary.best_score if summary else None,
+            'average_score': round(summary.score_sum / summary.attempts, 1) if summary and summary.attempts else None,
+            'best_attempt': attempt_summary(best) if best else None
+        }
+    })
 
-@app.route('/api/attempts/user/recent', methods=['GET'])
+@bp.route('/api/attempts/user/recent', methods=['GET'])
 @token_required
 def get_recent_attempts(current_user):
-    """Get recent attempts across all quizzes"""
-    attempts = QuizAttempt.query.filter_by(
-        user_id=current_user.id
-    ).order_by(QuizAttempt.completed_at.desc()).limit(10).all()
-    
-    attempts_data = []
-    for attempt in attempts:
-        attempts_data.append({
-            'id': attempt.id,
-            'quiz_id': attempt.quiz_id,
+    """A page of recent attempts across all quizzes (10 by default)"""
+    limit, cursor, error = page_request(default_limit=10)
+    if error:
+        return error
+    query = QuizAttempt.query.filter_by(user_id=current_user.id)\
+              .options(joinedload(QuizAttempt.quiz).load_only(Quiz.id, Quiz.title).raiseload(Quiz.tags))
+    attempts, next_cursor = attempts_page(query, limit, cursor)
+    return jsonify({
+        'success': True,
+        'attempts': [{
+            **attempt_summary(attempt),
+            'quiz_title': attempt.quiz.title if attempt.quiz else 'Deleted Quiz'
+        } for attempt in attempts],
+        'next_cursor': next_cursor
+    })
+
+@bp.route('/api/attempt/<int:attempt_id>', methods=['GET'])
+@token_required
+def get_attempt(current_user, attempt_id):
+    """One of the current user's attempts with its graded details and answers"""
+    attempt = QuizAttempt.query.filter_by(id=attempt_id, user_id=current_user.id)\
+                .options(joinedload(QuizAttempt.quiz).load_only(Quiz.id, Quiz.title, Quiz.quiz_type).raiseload(Quiz.tags))\
+                .first()
+    if not attempt:
+        return jsonify({'success': False, 'error': 'Attempt not found'}), 404
+    return jsonify({
+        'success': True,
+        'attempt': {
+            **attempt_summary(attempt),
             'quiz_title': attempt.quiz.title if attempt.quiz else 'Deleted Quiz',
-            'score': attempt.score,
-            'completed_at': attempt.completed_at.isoformat(),
-            'time_spent': attempt.time_spent
-        })
-    
-    return jsonify(attempts_data)
+            'quiz_type': attempt.quiz.quiz_type if attempt.quiz else None,
+            'details': json.loads(attempt.details) if attempt.details else None,
+            'user_answers': json.loads(attempt.user_answers) if attempt.user_answers else None
+        }
+    })
+
+
+# ---------------------------------------------------------------------------
+# LLM Usage
+# ---------------------------------------------------------------------------
+# Token counts come from each response's `usage` field, never from the local
+# estimate. Quizzes and attempts keep the tokens spent on them; llm_usage_daily
+# totals them per user, UTC day and purpose for reporting.
+def record_llm_usage(user_id, purpose, usages, day=None):
+    """Add TokenUsage.as_dict() totals onto the user's row for the day (caller commits)"""
+    usages = [usage for usage in usages if usage and usage['requests']]
+    if not usages:
+        return
+    upsert_increments(LlmUsageDaily.__table__, ['user_id', 'day', 'purpose'], [{
+        'user_id': user_id,
+        'day': day or datetime.utcnow().date(),
+        'purpose': purpose,
+        'requests': sum(usage['requests'] for usage in usages),
+        'prompt_tokens': sum(usage['prompt_tokens'] for usage in usages),
+        'completion_tokens': sum(usage['completion_tokens'] for usage in usages)
+    }], ['requests', 'prompt_tokens', 'completion_tokens'])
+
+def usage_rows(days, user_id=None):
+    """llm_usage_daily rows of the last `days` days, newest first"""
+    since = datetime.utcnow().date() - timedelta(days=days - 1)
+    query = LlmUsageDaily.query.filter(LlmUsageDaily.day >= since)
+    if user_id is not None:
+        query = query.filter(LlmUsageDaily.user_id == user_id)
+    return query.order_by(LlmUsageDaily.day.desc(), LlmUsageDaily.user_id, LlmUsageDaily.purpose).all()
+
+@bp.route('/api/usage', methods=['GET'])
+@token_required
+def get_usage(current_user):
+    """The current user's LLM token usage per day and purpose"""
+    days = max(1, min(request.args.get('days', 30, type=int), 366))
+    rows = usage_rows(days, current_user.id)
+    totals = {'requests': 0, 'prompt_tokens': 0, 'completion_tokens': 0}
+    for row in rows:
+        for key in totals:
+            totals[key] += getattr(row, key)
+    return jsonify({
+        'days': days,
+        'usage': [{
+            'day': row.day.isoformat(),
+            'purpose': row.purpose,
+            'requests': row.requests,
+            'prompt_tokens': row.prompt_tokens,
+            'completion_tokens': row.completion_tokens
+        } for row in rows],
+        'totals': dict(totals, total_tokens=totals['prompt_tokens'] + totals['completion_tokens'])
+    })
+
+@bp.cli.command('usage-report')
+@click.option('--days', default=7, show_default=True, help='Number of days to report, including today.')
+def usage_report_command(days):
+    """Print LLM token usage per user and day"""
+    totals = {}
+    for row in usage_rows(days):
+        entry = totals.setdefault((row.day, row.user_id), [0, 0, 0])
+        entry[0] += row.requests
+        entry[1] += row.prompt_tokens
+        entry[2] += row.completion_tokens
+    usernames = dict(db.session.query(User.id, User.username)
+                     .filter(User.id.in_({user_id for day, user_id in totals})).all()) if totals else {}
+    click.echo(f"{'day':<12}{'user':<24}{'requests':>10}{'prompt':>12}{'completion':>12}")
+    for (day, user_id), (requests, prompt_tokens, completion_tokens) in totals.items():
+        click.echo(f"{day.isoformat():<12}{usernames.get(user_id, user_id)!s:<24}"
+                   f"{requests:>10}{prompt_tokens:>12}{completion_tokens:>12}")
 
 # Auth routes
-@app.route('/register', methods=['POST'])
+@bp.route('/register', methods=['POST'])
 def register():
     data = request.json
     
@@ -531,7 +2705,7 @@ def register():
     except:
         return jsonify({'message': 'Username or email already exists!'}), 400
 
-@app.route('/login', methods=['POST'])
+@bp.route('/login', methods=['POST'])
 def login():
     auth = request.json
     
@@ -549,7 +2723,7 @@ def login():
         token = jwt.encode({
             'id': user.id,
             'exp': datetime.utcnow() + timedelta(hours=24)
-        }, app.config['SECRET_KEY'])
+        }, current_app.config['SECRET_KEY'])
         
         return jsonify({
             'token': token,
@@ -563,108 +2737,1004 @@ def login():
     
     return jsonify({'message': 'Wrong password!'}), 401
 
-@app.route('/api/quizzes', methods=['GET'])
+@bp.route('/api/quizzes', methods=['GET'])
 def get_quizzes():
-    print("\n=== New Request ===")
-    
     # Get filter parameters
     search = request.args.get('search', '')
-    category = request.args.get('category', 'all')
-    difficulty = request.args.get('difficulty', 'all')
+    difficulty = request.args.get('difficulty', '').lower()
     sort = request.args.get('sort', 'trending')
     tags = request.args.get('tags', '')
+    tag_list = [tag.strip().lower() for tag in tags.split(',') if tag.strip()]
+    collapse = request.args.get('collapse', 'true').lower() != 'false'  # One card per near-duplicate cluster
+
+    # Filters
+    filters = []
+    if search:
+        filters.append(db.or_(
+            Quiz.title.ilike(f'%{search}%'),
+            Quiz.description.ilike(f'%{search}%')
+        ))
+    if difficulty not in ('', 'all'):
+        filters.append(func.lower(Quiz.difficulty) == difficulty)
+
+    # Trending reads the materialized top lists; the other sorts scan the public quizzes
+    if sort == 'trending':
+        quizzes = trending_quizzes_query(tag_list, filters)
+    else:
+        quizzes = Quiz.query.filter(Quiz.is_public.is_(True), *filters)
+        if tag_list:
+            quizzes = quizzes.filter(Quiz.id.in_(tagged_quiz_ids(tag_list)))
+        if sort == 'newest':
+            quizzes = quizzes.order_by(Quiz.created_at.desc())
+        elif sort == 'top-rated':
+            quizzes = quizzes.order_by(Quiz.rating.desc())
+    if collapse:
+        quizzes = collapse_near_duplicates(quizzes)
+    
+    # Serialize
+    quizzes_data = []
+    for quiz in quizzes:
+        try:
+            quiz_data = {
+                'id': quiz.id,
+                'title': quiz.title,
+                'description': quiz.description,
+                'difficulty': quiz.difficulty,
+                'plays': quiz.plays,
+                'createdAt': quiz.created_at.isoformat(),
+                'isPublic': quiz.is_public,
+                'tags': [tag.name for tag in quiz.tags],
+                'questionCount': len(json.loads(quiz.quiz_content)) if quiz.quiz_content else 0
+            }
+            quizzes_data.append(quiz_data)
+        except Exception as e:
+            current_app.logger.error(f"Failed to serialize quiz {quiz.id}: {str(e)}")
+            continue
     
-    print(f"Filters - search: '{search}', category: '{category}', difficulty: '{difficulty}', sort: '{sort}', tags: '{tags}'")
+    return jsonify(quizzes_data)
+
+
+# ---------------------------------------------------------------------------
+# Trending (time-decayed plays)
+# ---------------------------------------------------------------------------
+# A play at time t is worth 2 ** ((t - TRENDING_EPOCH) / half-life) and
+# Quiz.trending_score is the log of the sum. Every score decays at the same
+# rate, so comparing stored scores ranks quizzes exactly like comparing their
+# decayed play counts at any moment, and nothing is rewritten as time passes.
+# Scores are in units of TRENDING_HALF_LIFE_HOURS: run `flask rebuild-trending`
+# after changing it. The top TRENDING_TOP_N public quizzes, overall and per
+# tag, are kept in trending_quizzes for Discover.
+TRENDING_EPOCH = datetime(2024, 1, 1)
+
+def trending_weight(played_at, half_life_hours):
+    return math.log(2) * (played_at - TRENDING_EPOCH).total_seconds() / (half_life_hours * 3600.0)
+
+def trending_increment(score, played_at, half_life_hours, plays=1):
+    """Log-space trending score after adding `plays` plays at played_at"""
+    weight = trending_weight(played_at, half_life_hours) + math.log(plays)
+    if score is None:
+        return weight
+    high, low = max(score, weight), min(score, weight)
+    return high + math.log1p(math.exp(low - high))
+
+def trending_scope(tag_name=None):
+    return f"tag:{tag_name}" if tag_name else 'all'
+
+def trending_scopes(quiz):
+    return [trending_scope()] + [trending_scope(tag.name) for tag in quiz.tags]
+
+def trim_trending_scope(scope, top_n):
+    overflow = select(TrendingQuiz.quiz_id).where(TrendingQuiz.scope == scope)\
+        .order_by(TrendingQuiz.score.desc(), TrendingQuiz.quiz_id).offset(top_n)
+    TrendingQuiz.query.filter(TrendingQuiz.scope == scope, TrendingQuiz.quiz_id.in_(overflow))\
+        .delete(synchronize_session=False)
+
+def offer_trending(quiz):
+    """Update the materialized top lists after quiz.trending_score went up (caller commits).
+
+    Scores only grow, so a quiz outside a full list can only enter it by beating its lowest entry.
+    """
+    if not quiz.is_public or quiz.trending_score is None:
+        return
+    top_n = current_app.config['TRENDING_TOP_N']
+    scopes = trending_scopes(quiz)
+    lists = db.session.query(TrendingQuiz.scope, func.count(), func.min(TrendingQuiz.score),
+                             func.max(case((TrendingQuiz.quiz_id == quiz.id, 1), else_=0)))\
+                      .filter(TrendingQuiz.scope.in_(scopes))\
+                      .group_by(TrendingQuiz.scope).all()
+    lists = {scope: (count, lowest, member) for scope, count, lowest, member in lists}
+
+    listed, entering = [], []
+    for scope in scopes:
+        count, lowest, member = lists.get(scope, (0, None, 0))
+        if member:
+            listed.append(scope)
+        elif count < top_n or quiz.trending_score > lowest:
+            entering.append(scope)
+    if listed:
+        TrendingQuiz.query.filter(TrendingQuiz.quiz_id == quiz.id, TrendingQuiz.scope.in_(listed))\
+            .update({'score': quiz.trending_score}, synchronize_session=False)
+    if entering:
+        db.session.execute(TrendingQuiz.__table__.insert(),
+                           [{'scope': scope, 'quiz_id': quiz.id, 'score': quiz.trending_score} for scope in entering])
+        for scope in entering:
+            if lists.get(scope, (0,))[0] >= top_n:
+                trim_trending_scope(scope, top_n)
+
+def fill_trending_scope(scope):
+    """Recompute one materialized list from Quiz.trending_score (caller commits)"""
+    TrendingQuiz.query.filter_by(scope=scope).delete(synchronize_session=False)
+    query = db.session.query(Quiz.id, Quiz.trending_score)\
+              .filter(Quiz.is_public.is_(True), Quiz.trending_score.isnot(None))
+    if scope != trending_scope():
+        query = query.join(tags, tags.c.quiz_id == Quiz.id).join(Tag, Tag.id == tags.c.tag_id)\
+                     .filter(Tag.name == scope.split(':', 1)[1])
+    rows = query.order_by(Quiz.trending_score.desc(), Quiz.id).limit(current_app.config['TRENDING_TOP_N']).all()
+    if rows:
+        db.session.execute(TrendingQuiz.__table__.insert(),
+                           [{'scope': scope, 'quiz_id': quiz_id, 'score': score} for quiz_id, score in rows])
+
+def refresh_trending(quiz, previous_scopes):
+    """Re-list an edited quiz: lists it left (made private, tag removed) are refilled from the quizzes table"""
+    try:
+        current = trending_scopes(quiz) if quiz.is_public else []
+        for scope in previous_scopes:
+            if scope not in current and TrendingQuiz.query.filter_by(scope=scope, quiz_id=quiz.id).first():
+                fill_trending_scope(scope)
+        offer_trending(quiz)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Trending refresh failed for quiz {quiz.id}: {str(e)}")
+
+def tagged_quiz_ids(tag_names):
+    """Subquery of the ids of quizzes with any of the tags"""
+    return select(tags.c.quiz_id).join(Tag, Tag.id == tags.c.tag_id).where(Tag.name.in_(tag_names))
+
+def trending_quizzes_query(tag_names=(), filters=()):
+    """Public quizzes of the materialized top list(s), hottest first, then the newest of the rest.
+
+    One tag (or none) is a single range read of ix_trending_quizzes_scope_score;
+    several tags merge their lists. Quizzes that aren't listed (never played, or
+    below a full list) follow newest first, up to TRENDING_TOP_N of them, so new
+    quizzes can be found before anyone plays them. `filters` (Quiz criteria such
+    as a search) apply to both, so the backfill is drawn from matching quizzes.
+    """
+    top_n = current_app.config['TRENDING_TOP_N']
+    scopes = [trending_scope(name) for name in tag_names] or [trending_scope()]
+    if len(scopes) == 1:
+        ranked = select(TrendingQuiz.quiz_id, TrendingQuiz.score).where(TrendingQuiz.scope == scopes[0])
+    else:
+        ranked = select(TrendingQuiz.quiz_id, func.max(TrendingQuiz.score).label('score'))\
+            .where(TrendingQuiz.scope.in_(scopes)).group_by(TrendingQuiz.quiz_id)
+    ranked = ranked.order_by(desc('score')).limit(top_n).subquery()
+
+    unlisted = select(Quiz.id.label('quiz_id')).where(Quiz.is_public.is_(True),
+                                                       Quiz.id.notin_(select(ranked.c.quiz_id)), *filters)
+    if tag_names:
+        unlisted = unlisted.where(Quiz.id.in_(tagged_quiz_ids(tag_names)))
+    unlisted = unlisted.order_by(Quiz.created_at.desc(), Quiz.id).limit(top_n).subquery()
+
+    return Quiz.query.outerjoin(ranked, ranked.c.quiz_id == Quiz.id)\
+               .outerjoin(unlisted, unlisted.c.quiz_id == Quiz.id)\
+               .filter(Quiz.is_public.is_(True), *filters,
+                       db.or_(ranked.c.quiz_id.isnot(None), unlisted.c.quiz_id.isnot(None)))\
+               .order_by(ranked.c.score.is_(None), ranked.c.score.desc(), Quiz.created_at.desc(), Quiz.id)
+
+def rebuild_trending(batch_size=10000, echo=None):
+    """Recompute every quiz's trending score from its attempts and daily rollups, then every top list"""
+    half_life = current_app.config['TRENDING_HALF_LIFE_HOURS']
+    scores = {}
+    attempts = db.session.execute(
+        select(QuizAttempt.quiz_id, QuizAttempt.completed_at).where(QuizAttempt.completed_at.isnot(None))
+        .execution_options(yield_per=batch_size))
+    for quiz_id, completed_at in attempts:
+        scores[quiz_id] = trending_increment(scores.get(quiz_id), completed_at, half_life)
+    # Archived attempts only survive as daily counts; they are placed at midday
+    rollups = db.session.execute(
+        select(QuizDailyRollup.quiz_id, QuizDailyRollup.day, QuizDailyRollup.attempts)
+        .where(QuizDailyRollup.attempts > 0).execution_options(yield_per=batch_size))
+    for quiz_id, day, count in rollups:
+        played_at = datetime.combine(day, datetime.min.time()) + timedelta(hours=12)
+        scores[quiz_id] = trending_increment(scores.get(quiz_id), played_at, half_life, count)
+    if echo:
+        echo(f"  scored {len(scores)} quizzes")
+
+    quizzes = Quiz.__table__
+    db.session.execute(quizzes.update().values(trending_score=None))
+    items = list(scores.items())
+    for start in range(0, len(items), batch_size):
+        db.session.execute(
+            quizzes.update().where(quizzes.c.id == bindparam('quiz_id')).values(trending_score=bindparam('score')),
+            [{'quiz_id': quiz_id, 'score': score} for quiz_id, score in items[start:start + batch_size]])
+
+    TrendingQuiz.query.delete(synchronize_session=False)
+    fill_trending_scope(trending_scope())
+    ranked = select(Tag.name, Quiz.id, Quiz.trending_score,
+                    func.row_number().over(partition_by=Tag.id,
+                                           order_by=(Quiz.trending_score.desc(), Quiz.id)).label('position'))\
+        .join(tags, tags.c.tag_id == Tag.id).join(Quiz, Quiz.id == tags.c.quiz_id)\
+        .where(Quiz.is_public.is_(True), Quiz.trending_score.isnot(None)).subquery()
+    rows = db.session.execute(select(ranked.c.name, ranked.c.id, ranked.c.trending_score)
+                              .where(ranked.c.position <= current_app.config['TRENDING_TOP_N'])).all()
+    for start in range(0, len(rows), batch_size):
+        db.session.execute(TrendingQuiz.__table__.insert(),
+                           [{'scope': trending_scope(name), 'quiz_id': quiz_id, 'score': score}
+                            for name, quiz_id, score in rows[start:start + batch_size]])
+    db.session.commit()
+    return len(scores)
+
+@bp.cli.command('rebuild-trending')
+@click.option('--batch-size', type=int, default=10000)
+def rebuild_trending_command(batch_size):
+    """Recompute trending scores and the materialized top lists (after imports or a half-life change)"""
+    started = time.perf_counter()
+    scored = rebuild_trending(batch_size, echo=click.echo)
+    click.echo(f"Rebuilt trending for {scored} quizzes in {time.perf_counter() - started:.1f}s")
+
+# ---------------------------------------------------------------------------
+# Tag Facets
+# ---------------------------------------------------------------------------
+# tag_facet_counts holds the number of public quizzes per (tag, difficulty),
+# plus one row per difficulty under ALL_QUIZZES_FACET. Every write that adds a
+# quiz or changes its visibility, difficulty or tags adjusts the counts in the
+# same transaction, so /api/tags only reads this table and tags.
+ALL_QUIZZES_FACET = 0
+
+def facet_keys(is_public, difficulty, tag_ids):
+    if not is_public:
+        return []
+    difficulty = difficulty or ''
+    return [(ALL_QUIZZES_FACET, difficulty)] + [(tag_id, difficulty) for tag_id in set(tag_ids)]
+
+def quiz_facet_keys(quiz):
+    return facet_keys(quiz.is_public, quiz.difficulty, [tag.id for tag in quiz.tags])
+
+def adjust_facet_counts(removed=(), added=()):
+    """Apply facet_keys() before / after a change to tag_facet_counts (caller commits)"""
+    deltas = {}
+    for key in removed:
+        deltas[key] = deltas.get(key, 0) - 1
+    for key in added:
+        deltas[key] = deltas.get(key, 0) + 1
+    upsert_increments(TagFacetCount.__table__, ['tag_id', 'difficulty'],
+                      [{'tag_id': tag_id, 'difficulty': difficulty, 'quizzes': delta}
+                       for (tag_id, difficulty), delta in deltas.items() if delta], ['quizzes'])
+
+def rebuild_tag_facets():
+    """Recount tag_facet_counts from the quizzes table"""
+    difficulty = func.coalesce(Quiz.difficulty, '')
+    TagFacetCount.query.delete(synchronize_session=False)
+    counts = TagFacetCount.__table__
+    db.session.execute(counts.insert().from_select(
+        ['tag_id', 'difficulty', 'quizzes'],
+        select(tags.c.tag_id, difficulty, func.count()).join(Quiz, Quiz.id == tags.c.quiz_id)
+        .where(Quiz.is_public.is_(True)).group_by(tags.c.tag_id, difficulty)))
+    db.session.execute(counts.insert().from_select(
+        ['tag_id', 'difficulty', 'quizzes'],
+        select(db.literal(ALL_QUIZZES_FACET), difficulty, func.count())
+        .where(Quiz.is_public.is_(True)).group_by(difficulty)))
+    db.session.commit()
+
+def tag_facets(difficulty=None, limit=100):
+    """Tag and difficulty facet counts, read from tag_facet_counts only"""
+    count = func.sum(TagFacetCount.quizzes)
+    tag_query = db.session.query(Tag.name, count.label('count'))\
+                  .join(TagFacetCount, TagFacetCount.tag_id == Tag.id)
+    if difficulty:
+        tag_query = tag_query.filter(TagFacetCount.difficulty == difficulty)
+    tag_rows = tag_query.group_by(Tag.id, Tag.name).having(count > 0)\
+                        .order_by(count.desc(), Tag.name).limit(limit).all()
+    difficulty_rows = db.session.query(TagFacetCount.difficulty, TagFacetCount.quizzes)\
+                        .filter(TagFacetCount.tag_id == ALL_QUIZZES_FACET, TagFacetCount.quizzes > 0).all()
+    return {
+        'tags': [{'name': name, 'count': int(total)} for name, total in tag_rows],
+        'difficulties': {name or 'Unrated': total for name, total in difficulty_rows},
+        'total': sum(total for name, total in difficulty_rows if not difficulty or name == difficulty)
+    }
+
+def cached_tag_facets(difficulty, limit):
+    """tag_facets() memoized per process for TAG_FACETS_CACHE_SECONDS"""
+    cache = lazy_extension('quizgenie.tag_facets_cache', lambda app: {})
+    key = (difficulty, limit)
+    hit = cache.get(key)
+    if hit and hit[0] > time.monotonic():
+        return hit[1]
+    facets = tag_facets(difficulty, limit)
+    cache[key] = (time.monotonic() + current_app.config['TAG_FACETS_CACHE_SECONDS'], facets)
+    return facets
+
+@bp.route('/api/tags', methods=['GET'])
+def get_tags():
+    """Discover facets: public quiz counts per tag (optionally within one difficulty) and per difficulty"""
+    difficulty = request.args.get('difficulty', '')
+    difficulty = '' if difficulty.lower() == 'all' else difficulty
+    limit = max(1, min(request.args.get('limit', 100, type=int), 500))
+    response = jsonify(cached_tag_facets(difficulty, limit))
+    response.cache_control.public = True
+    response.cache_control.max_age = current_app.config['TAG_FACETS_CACHE_SECONDS']
+    return response
+
+@bp.cli.command('rebuild-tag-facets')
+def rebuild_tag_facets_command():
+    """Recount the Discover tag / difficulty facets from the quizzes table"""
+    rebuild_tag_facets()
+    click.echo(f"Rebuilt {TagFacetCount.query.count()} facet counts")
+
 
-    # Base query
-    query = Quiz.query.filter_by(is_public=False)
-    print(f"\nInitial query count: {query.count()}")
+# ---------------------------------------------------------------------------
+# Question Bank (quizzes assembled without the LLM)
+# ---------------------------------------------------------------------------
+# Every saved quiz's questions are copied into bank_questions, and each one gets
+# a bank_question_keys row per tag plus one under ALL_QUIZZES_FACET holding what
+# a draw filters on and a random sample_key. Drawing N questions for a tag, type
+# and difficulty is an index range scan from a random sample_key (wrapping
+# around), so it reads about N rows however big the bank is. Drawn questions get
+# a new sample_key, so the next draw doesn't return the same neighbours.
+#
+# Questions are identified by bank_question_hash(): a question saved in several
+# quizzes is drawn once, and the questions a user has answered are the hashes of
+# the quizzes they attempted. Assembled quizzes keep copies of their questions
+# (with source_quiz_id set) for that lookup only; copies have no keys.
+BANK_DRAW_BATCH = 200
+
+def bank_question_hash(question):
+    """Identity of a question across quizzes: its normalized text and answer"""
+    identity = f"{normalize_answer(question.get('question', ''))}\x1f{normalize_answer(question.get('answer', ''))}"
+    return hashlib.sha256(identity.encode()).hexdigest()[:32]
+
+def bank_question_rows(quiz_id, quiz_content, quiz_type, difficulty):
+    try:
+        questions = json.loads(quiz_content) if isinstance(quiz_content, str) else quiz_content
+    except (TypeError, ValueError):
+        return []
+    return [{'quiz_id': quiz_id, 'question_index': index, 'quiz_type': quiz_type, 'difficulty': difficulty or '',
+             'question_hash': bank_question_hash(question), 'content': json.dumps(question)}
+            for index, question in enumerate(questions or []) if isinstance(question, dict)]
+
+def index_bank_questions(quizzes, tag_ids=None):
+    """Replace the bank entries of saved quizzes (anything with id, quiz_content, quiz_type, difficulty,
+    is_public and user_id). tag_ids maps quiz id -> tag ids and defaults to quiz.tags. The caller commits.
+    """
+    quizzes = {quiz.id: quiz for quiz in quizzes}
+    if not quizzes:
+        return
+    stale = select(BankQuestion.id).where(BankQuestion.quiz_id.in_(list(quizzes)))
+    BankQuestionKey.query.filter(BankQuestionKey.question_id.in_(stale)).delete(synchronize_session=False)
+    BankQuestion.query.filter(BankQuestion.quiz_id.in_(list(quizzes))).delete(synchronize_session=False)
+
+    rows = [row for quiz in quizzes.values()
+            for row in bank_question_rows(quiz.id, quiz.quiz_content, quiz.quiz_type, quiz.difficulty)]
+    if not rows:
+        return
+    if tag_ids is None:
+        tag_ids = {quiz.id: [tag.id for tag in quiz.tags] for quiz in quizzes.values()}
+    by_position = {(row['quiz_id'], row['question_index']): row for row in rows}
+    inserted = db.session.execute(BankQuestion.__table__.insert().returning(
+        BankQuestion.id, BankQuestion.quiz_id, BankQuestion.question_index), rows)
+    keys = []
+    for question_id, quiz_id, question_index in inserted:
+        quiz, row = quizzes[quiz_id], by_position[(quiz_id, question_index)]
+        for tag_id in {ALL_QUIZZES_FACET, *tag_ids.get(quiz_id, ())}:
+            keys.append({'question_id': question_id, 'tag_id': tag_id, 'quiz_type': quiz.quiz_type,
+                         'difficulty': row['difficulty'], 'is_public': bool(quiz.is_public), 'user_id': quiz.user_id,
+                         'question_hash': row['question_hash'], 'sample_key': random.random()})
+    db.session.execute(BankQuestionKey.__table__.insert(), keys)
+
+def answered_question_hashes(user_id):
+    """Hashes of every question in the quizzes the user attempted, including rolled-up attempts"""
+    attempted = union(select(QuizAttempt.quiz_id).where(QuizAttempt.user_id == user_id),
+                      select(UserDailyRollup.quiz_id).where(UserDailyRollup.user_id == user_id)).subquery()
+    return set(db.session.scalars(select(BankQuestion.question_hash)
+                                  .where(BankQuestion.quiz_id.in_(select(attempted.c.quiz_id)))))
+
+def draw_bank_questions(user_id, tag_id, quiz_type, difficulty, count, excluded=()):
+    """Ids of up to `count` random bank questions visible to the user, with distinct hashes not in `excluded`"""
+    keys = BankQuestionKey
+    query = db.session.query(keys.question_id, keys.question_hash, keys.sample_key)\
+                      .filter(keys.tag_id == tag_id, keys.quiz_type == quiz_type,
+                              db.or_(keys.is_public.is_(True), keys.user_id == user_id))
+    if difficulty:
+        query = query.filter(keys.difficulty == difficulty)
+
+    seen, drawn = set(excluded), []
+    start = random.random()
+    # From a random point to the end of the key range, then from its beginning up to that point
+    for lower, upper in ((start, None), (0.0, start)):
+        after = None
+        while len(drawn) < count:
+            page = query.filter(keys.sample_key > after if after is not None else keys.sample_key >= lower)
+            if upper is not None:
+                page = page.filter(keys.sample_key < upper)
+            rows = page.order_by(keys.sample_key).limit(BANK_DRAW_BATCH).all()
+            for question_id, question_hash, _ in rows:
+                if question_hash not in seen and len(drawn) < count:
+                    seen.add(question_hash)
+                    drawn.append(question_id)
+            if len(rows) < BANK_DRAW_BATCH:
+                break
+            after = rows[-1].sample_key
+    return drawn
+
+def assemble_quiz(current_user, tag, quiz_type, difficulty, count, exclude_answered=True, is_public=False,
+                  title=None):
+    """Save a quiz of up to `count` bank questions; returns the generate-quiz response body, or None
+    when no question matches. No LLM call is made.
+    """
+    excluded = answered_question_hashes(current_user.id) if exclude_answered else set()
+    drawn = draw_bank_questions(current_user.id, tag.id if tag else ALL_QUIZZES_FACET, quiz_type, difficulty,
+                                count, excluded)
+    if not drawn:
+        return None
+    by_id = {question.id: question for question in db.session.query(
+        BankQuestion.id, BankQuestion.quiz_id, BankQuestion.question_index, BankQuestion.difficulty,
+        BankQuestion.question_hash, BankQuestion.content).filter(BankQuestion.id.in_(drawn))}
+    questions = [by_id[question_id] for question_id in drawn]
+    content = [json.loads(question.content) for question in questions]
+    if not difficulty:
+        levels = [question.difficulty for question in questions if question.difficulty]
+        difficulty = max(set(levels), key=levels.count) if levels else None
+
+    # Drawn questions move to a new random position in the key range
+    db.session.execute(
+        BankQuestionKey.__table__.update().where(BankQuestionKey.question_id == bindparam('drawn_id'))
+        .values(sample_key=bindparam('new_key')),
+        [{'drawn_id': question_id, 'new_key': random.random()} for question_id in drawn])
+
+    topic = tag.name.title() if tag else 'Mixed topics'
+    quiz = Quiz(
+        id=str(uuid.uuid4()),
+        original_text='\n\n'.join(question.get('question', '') for question in content),
+        quiz_content=json.dumps(content),
+        quiz_type=quiz_type,
+        created_at=datetime.utcnow(),
+        is_public=is_public,
+        title=(title or f"{topic} practice")[:200],
+        description=f"{len(content)} {(difficulty or 'mixed').lower()} questions from the question bank",
+        difficulty=difficulty,
+        user_id=current_user.id
+    )
+    quiz.tags = [tag] if tag else []
+    db.session.add(quiz)
+    db.session.flush()
+    db.session.execute(BankQuestion.__table__.insert(), [{
+        'quiz_id': quiz.id, 'question_index': index, 'quiz_type': quiz_type, 'difficulty': question.difficulty,
+        'question_hash': question.question_hash, 'content': question.content,
+        'source_quiz_id': question.quiz_id, 'source_index': question.question_index
+    } for index, question in enumerate(questions)])
+    adjust_facet_counts(added=quiz_facet_keys(quiz))
+    db.session.commit()
+    refresh_similar_index([quiz])
+    register_quiz_signatures([quiz])
+
+    return {
+        'quiz_id': quiz.id,
+        'content': content,
+        'metadata': {
+            'title': quiz.title,
+            'description': quiz.description,
+            'difficulty': quiz.difficulty,
+            'tags': [tag.name] if tag else [],
+            'is_public': is_public,
+            'creator_id': current_user.id
+        },
+        'shareable_url': f'/quiz/{quiz.id}',
+        'bank': {
+            'requested': count,
+            'drawn': len(content),
+            'excluded_answered': len(excluded),
+            'sources': [{'quiz_id': question.quiz_id, 'question_index': question.question_index}
+                        for question in questions]
+        }
+    }
+
+@bp.route('/api/quizzes/assemble', methods=['POST'])
+@token_required
+def assemble_quiz_from_bank(current_user):
+    """Assemble a quiz from the question bank: e.g. 20 Medium questions on a tag, skipping ones already answered"""
+    data = request.get_json(silent=True) or {}
+    quiz_type = data.get('type', 'mcq')
+    difficulty = data.get('difficulty') or None
+    count = data.get('num_questions', 10)
+    max_questions = current_app.config['QUESTION_BANK_MAX_QUESTIONS']
+    if quiz_type not in ('mcq', 'short_answer'):
+        return jsonify({'success': False, 'error': 'type must be mcq or short_answer'}), 400
+    if difficulty not in (None, 'Easy', 'Medium', 'Hard'):
+        return jsonify({'success': False, 'error': 'difficulty must be Easy, Medium or Hard'}), 400
+    if not isinstance(count, int) or isinstance(count, bool) or not 1 <= count <= max_questions:
+        return jsonify({'success': False, 'error': f"num_questions must be between 1 and {max_questions}"}), 400
+
+    tag = None
+    if data.get('tag'):
+        tag = Tag.query.filter_by(name=normalize_tag_name(data['tag'])).first()
+        if tag is None:
+            return jsonify({'success': False, 'error': 'Unknown tag'}), 404
+
+    result = assemble_quiz(current_user, tag, quiz_type, difficulty, count,
+                           exclude_answered=bool(data.get('exclude_answered', True)),
+                           is_public=bool(data.get('is_public', False)), title=data.get('title'))
+    if result is None:
+        return jsonify({'success': False, 'error': 'No matching questions in the bank'}), 404
+    return jsonify(result)
+
+@bp.cli.command('rebuild-question-bank')
+@click.option('--batch-size', type=int, default=1000)
+def rebuild_question_bank_command(batch_size):
+    """Re-index the questions of every quiz into the question bank, oldest first"""
+    started = time.perf_counter()
+    BankQuestionKey.query.delete()
+    # Assembled quizzes keep their copies; only their keys-less rows point at a source
+    assembled = select(BankQuestion.quiz_id).where(BankQuestion.source_quiz_id.isnot(None))
+    BankQuestion.query.filter(BankQuestion.quiz_id.notin_(assembled)).delete(synchronize_session=False)
+    db.session.commit()
+
+    indexed, after = 0, None
+    while True:
+        page = db.session.query(Quiz.id, Quiz.quiz_content, Quiz.quiz_type, Quiz.difficulty, Quiz.is_public,
+                                Quiz.user_id, Quiz.created_at)\
+                 .filter(Quiz.id.notin_(assembled))\
+                 .order_by(Quiz.created_at, Quiz.id)
+        if after:
+            page = page.filter(db.or_(Quiz.created_at > after[0],
+                                      and_(Quiz.created_at == after[0], Quiz.id > after[1])))
+        rows = page.limit(batch_size).all()
+        if not rows:
+            break
+        tag_ids = {}
+        for quiz_id, tag_id in db.session.query(tags.c.quiz_id, tags.c.tag_id)\
+                                         .filter(tags.c.quiz_id.in_([row.id for row in rows])):
+            tag_ids.setdefault(quiz_id, []).append(tag_id)
+        index_bank_questions(rows, tag_ids)
+        db.session.commit()
+        indexed += len(rows)
+        after = (rows[-1].created_at, rows[-1].id)
+        click.echo(f"  indexed {indexed} quizzes")
+    click.echo(f"Indexed {BankQuestion.query.filter(BankQuestion.source_quiz_id.is_(None)).count()} questions "
+               f"of {indexed} quizzes in {time.perf_counter() - started:.1f}s")
+
+# ---------------------------------------------------------------------------
+# Similar Quizzes ("more like this" on Discover)
+# ---------------------------------------------------------------------------
+# Each process keeps the index in memory. It is loaded from SIMILAR_INDEX_PATH
+# (written by `flask build-similar-index`) or built from the database on first
+# use, and quizzes created or edited in this process are folded in as they are
+# saved. recommendations pulls in NumPy/SciPy, so it is imported on first use.
+def question_texts(quiz_content):
+    try:
+        questions = json.loads(quiz_content) if isinstance(quiz_content, str) else quiz_content
+    except (TypeError, ValueError):
+        return []
+    return [str(question.get('question', '')) for question in questions or [] if isinstance(question, dict)]
+
+def quiz_document(quiz):
+    from recommendations import QuizDocument
+    return QuizDocument(quiz.id, quiz.title, quiz.description, [tag.name for tag in quiz.tags],
+                        question_texts(quiz.quiz_content), quiz.difficulty)
+
+def public_quiz_documents(batch_size=2000):
+    """QuizDocuments for every public quiz, streamed in id order"""
+    from recommendations import QuizDocument
+    quiz_tag_names = {}
+    for quiz_id, name in db.session.execute(select(tags.c.quiz_id, Tag.name).join(Tag, Tag.id == tags.c.tag_id)):
+        quiz_tag_names.setdefault(quiz_id, []).append(name)
+    rows = db.session.execute(
+        select(Quiz.id, Quiz.title, Quiz.description, Quiz.difficulty, Quiz.quiz_content)
+        .where(Quiz.is_public.is_(True))
+        .order_by(Quiz.id)
+        .execution_options(yield_per=batch_size)
+    )
+    for quiz_id, title, description, difficulty, quiz_content in rows:
+        yield QuizDocument(quiz_id, title, description, quiz_tag_names.get(quiz_id, []),
+                           question_texts(quiz_content), difficulty)
+
+def build_similar_index(echo=None):
+    from recommendations import build_index
+    return build_index(public_quiz_documents(), k=current_app.config['SIMILAR_INDEX_K'], echo=echo)
+
+def load_similar_index(app):
+    from recommendations import SimilarityIndex
+    path = app.config['SIMILAR_INDEX_PATH']
+    if os.path.exists(path):
+        return SimilarityIndex.load(path)
+    return build_similar_index()
+
+def get_similar_index():
+    return lazy_extension('quizgenie.similar_index', load_similar_index)
+
+def refresh_similar_index(quizzes):
+    """Fold saved quizzes into this process's index, if it has loaded one"""
+    index = current_app.extensions.get('quizgenie.similar_index')
+    if index is None:
+        return
+    try:
+        for quiz in quizzes:
+            if quiz.is_public:
+                index.upsert(quiz_document(quiz))
+            else:
+                index.remove(quiz.id)
+    except Exception as e:
+        # The next build catches up; saving the quiz must not fail because of the index
+        current_app.logger.error(f"Similar-quiz index update failed: {str(e)}")
+
+@bp.route('/api/quiz/<quiz_id>/similar', methods=['GET'])
+def get_similar_quizzes(quiz_id):
+    """Public quizzes most similar to this one, from the in-memory index"""
+    limit = request.args.get('limit', type=int)
+    index = get_similar_index()
+    similar = index.similar(quiz_id, limit)
+    if similar is None:
+        # Not indexed here yet, e.g. created through another worker since the last build
+        quiz = db.session.get(Quiz, quiz_id)
+        if not quiz or not quiz.is_public:
+            return jsonify({'success': False, 'error': 'Quiz not found'}), 404
+        refresh_similar_index([quiz])
+        similar = index.similar(quiz_id, limit) or []
+    return jsonify({'success': True, 'quiz_id': quiz_id, 'similar': similar})
+
+@bp.cli.command('build-similar-index')
+@click.option('--output', type=click.Path(dir_okay=False), default=None,
+              help='Where to write the index (defaults to SIMILAR_INDEX_PATH)')
+def build_similar_index_command(output):
+    """Rebuild the similar-quiz index from every public quiz; workers load it on start"""
+    started = time.perf_counter()
+    index = build_similar_index(echo=click.echo)
+    path = output or current_app.config['SIMILAR_INDEX_PATH']
+    index.save(path)
+    click.echo(f"Indexed {len(index)} quizzes into {path} in {time.perf_counter() - started:.1f}s")
+
+
+# ---------------------------------------------------------------------------
+# Near-Duplicate Detection (MinHash / LSH)
+# ---------------------------------------------------------------------------
+# Signatures and band keys live in the database, so every worker sees a quiz
+# as soon as it is saved. A lookup reads the rows sharing one of the probe's
+# band keys through the primary key index and verifies at most
+# MAX_DUPLICATE_CANDIDATES of them, whatever the size of the corpus.
+MAX_DUPLICATE_CANDIDATES = 500
+
+def find_near_duplicates(signatures, visible_to=None, exclude_id=None, limit=5):
+    """[(similarity, cluster id, quiz columns)] for indexed quizzes above the duplicate threshold, best first.
+
+    visible_to restricts matches to public quizzes and that user's own.
+    """
+    from near_duplicates import DUPLICATE_THRESHOLD, from_bytes, probe_keys, similarity
+    keys = probe_keys(signatures)
+    if not keys:
+        return []
+
+    candidates = select(QuizLshBand.quiz_id).where(QuizLshBand.band_key.in_(keys))
+    query = db.session.query(QuizSignature.quiz_id, QuizSignature.passage, QuizSignature.questions,
+                             QuizSignature.cluster_id, Quiz.title, Quiz.created_at, Quiz.is_public, Quiz.user_id)\
+              .join(Quiz, Quiz.id == QuizSignature.quiz_id)\
+              .filter(QuizSignature.quiz_id.in_(candidates))
+    if exclude_id:
+        query = query.filter(QuizSignature.quiz_id != exclude_id)
+    if visible_to is not None:
+        query = query.filter(db.or_(Quiz.is_public.is_(True), Quiz.user_id == visible_to))
+
+    matches = []
+    for row in query.limit(MAX_DUPLICATE_CANDIDATES):
+        score = similarity(signatures, {'passage': from_bytes(row.passage), 'questions': from_bytes(row.questions)})
+        if score >= DUPLICATE_THRESHOLD:
+            matches.append((score, row.cluster_id, {'id': row.quiz_id, 'title': row.title, 'created_at': row.created_at,
+                                                    'is_public': row.is_public, 'user_id': row.user_id}))
+    matches.sort(key=lambda match: (-match[0], match[2]['created_at']))
+    return matches[:limit] if limit else matches
+
+def duplicate_summary(match):
+    score, _, quiz = match
+    return {'id': quiz['id'], 'title': quiz['title'], 'similarity': round(score, 3)}
+
+def register_quiz_signatures(quizzes):
+    """Index saved quizzes (anything with id, title, original_text, quiz_content, created_at, is_public,
+    user_id) in one commit, merging each with its matches into one cluster.
+
+    Returns {quiz_id: matches}; a failure is logged and leaves the quizzes unindexed.
+    """
+    from near_duplicates import DUPLICATE_THRESHOLD, index_keys, probe_keys, similarity, text_signatures, to_bytes
+    found = {}
+    try:
+        ids = [quiz.id for quiz in quizzes]
+        # Re-indexed (edited) quizzes keep their cluster
+        clusters = dict(db.session.query(QuizSignature.quiz_id, QuizSignature.cluster_id)
+                                  .filter(QuizSignature.quiz_id.in_(ids)))
+        if clusters:
+            QuizLshBand.query.filter(QuizLshBand.quiz_id.in_(ids)).delete(synchronize_session=False)
+            QuizSignature.query.filter(QuizSignature.quiz_id.in_(ids)).delete(synchronize_session=False)
+
+        indexed, holders = [], {}
+        for quiz in quizzes:
+            signatures = text_signatures(quiz.original_text, question_texts(quiz.quiz_content))
+            keys = set(index_keys(signatures))
+            matches = find_near_duplicates(signatures, exclude_id=quiz.id, limit=None)
+            # Quizzes earlier in this batch are not in the tables yet
+            for position in sorted({position for key in probe_keys(signatures) for position in holders.get(key, ())}):
+                other, other_signatures, _ = indexed[position]
+                score = similarity(signatures, other_signatures)
+                if other.id != quiz.id and score >= DUPLICATE_THRESHOLD:
+                    matches.append((score, clusters[other.id],
+                                    {'id': other.id, 'title': other.title, 'created_at': other.created_at,
+                                     'is_public': other.is_public, 'user_id': other.user_id}))
+            matches.sort(key=lambda match: (-match[0], match[2]['created_at']))
+
+            cluster_ids = list(dict.fromkeys(match[1] for match in matches))
+            cluster_id = clusters.get(quiz.id) or (cluster_ids[0] if cluster_ids else quiz.id)
+            merged = [other for other in cluster_ids if other != cluster_id]
+            if merged:
+                QuizSignature.query.filter(QuizSignature.cluster_id.in_(merged))\
+                    .update({'cluster_id': cluster_id}, synchronize_session=False)
+                for other_id, other_cluster in clusters.items():
+                    if other_cluster in merged:
+                        clusters[other_id] = cluster_id
+            clusters[quiz.id] = cluster_id
+            for key in keys:
+                holders.setdefault(key, []).append(len(indexed))
+            indexed.append((quiz, signatures, keys))
+            found[quiz.id] = matches
+
+        if indexed:
+            db.session.execute(QuizSignature.__table__.insert(), [
+                {'quiz_id': quiz.id, 'passage': to_bytes(signatures['passage']),
+                 'questions': to_bytes(signatures['questions']), 'cluster_id': clusters[quiz.id]}
+                for quiz, signatures, _ in indexed
+            ])
+            bands = [{'band_key': key, 'quiz_id': quiz.id} for quiz, _, keys in indexed for key in keys]
+            if bands:
+                db.session.execute(QuizLshBand.__table__.insert(), bands)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Near-duplicate indexing failed: {str(e)}")
+        return {}
+    return found
+
+def existing_quiz_offer(text, user_id):
+    """Quizzes the user can open instead of generating one from a near-identical passage"""
+    from near_duplicates import text_signatures
+    return [duplicate_summary(match) for match in
+            find_near_duplicates(text_signatures(text, []), visible_to=user_id)]
+
+def collapse_near_duplicates(query):
+    """Restrict a Quiz query to one quiz per near-duplicate cluster: the most played, then the oldest"""
+    cluster = func.coalesce(QuizSignature.cluster_id, Quiz.id)
+    ranked = query.outerjoin(QuizSignature, QuizSignature.quiz_id == Quiz.id)\
+                  .with_entities(Quiz.id.label('quiz_id'),
+                                 func.row_number().over(partition_by=cluster,
+                                                        order_by=(Quiz.plays.desc(), Quiz.created_at, Quiz.id))
+                                 .label('position'))\
+                  .subquery()
+    return query.join(ranked, ranked.c.quiz_id == Quiz.id).filter(ranked.c.position == 1)
+
+@bp.cli.command('rebuild-duplicate-index')
+@click.option('--batch-size', type=int, default=1000)
+def rebuild_duplicate_index_command(batch_size):
+    """Recompute near-duplicate signatures and clusters for every quiz, oldest first"""
+    started = time.perf_counter()
+    QuizLshBand.query.delete()
+    QuizSignature.query.delete()
+    db.session.commit()
+
+    indexed, clustered, after = 0, 0, None
+    while True:
+        page = db.session.query(Quiz.id, Quiz.title, Quiz.original_text, Quiz.quiz_content, Quiz.created_at,
+                                Quiz.is_public, Quiz.user_id)\
+                 .order_by(Quiz.created_at, Quiz.id)
+        if after:
+            page = page.filter(db.or_(Quiz.created_at > after[0],
+                                      and_(Quiz.created_at == after[0], Quiz.id > after[1])))
+        rows = page.limit(batch_size).all()
+        if not rows:
+            break
+        found = register_quiz_signatures(rows)
+        if len(found) != len(rows):
+            raise click.ClickException(f"Indexing failed after {indexed} quizzes; see the log")
+        indexed += len(rows)
+        clustered += sum(1 for matches in found.values() if matches)
+        after = (rows[-1].created_at, rows[-1].id)
+        click.echo(f"  indexed {indexed} quizzes")
+    click.echo(f"Indexed {indexed} quizzes ({clustered} near-duplicates) in {time.perf_counter() - started:.1f}s")
+
+# Protected route example
+@bp.route('/protected', methods=['GET'])
+@token_required
+def protected(current_user):  # Note the current_user parameter
+    return jsonify({'message': f'Hello {current_user.username}! This is a protected route.'})
+
+@bp.route('/routes')
+def list_routes():
+    return jsonify({
+        'routes': [str(rule) for rule in current_app.url_map.iter_rules()] 
+    })
+
+
+# ---------------------------------------------------------------------------
+# User Dashboard (/get-user-data)
+# ---------------------------------------------------------------------------
+# The dashboard is four sections: stats, created (quizzes with their
+# participants), taken (attempts with quiz details) and rank. Only the
+# sections named in ?include= are queried, so the MyQuizzes header
+# (include=stats,rank) costs a few aggregates however many quizzes the user
+# has. ?fields= keeps only the named keys of the created / taken items, and
+# per-quiz lookups backing dropped keys (participants, archived totals, tags,
+# creator, question counts) are skipped too. /get-user-data/<section> serves
+# one section on its own, for lists loaded lazily.
+def wanted(fields, *names):
+    """Whether any of the item keys `names` survives the ?fields= selection"""
+    return fields is None or any(name in fields for name in names)
+
+def select_fields(item, fields):
+    return item if fields is None else {key: value for key, value in item.items() if key in fields}
+
+def dashboard_stats(current_user, fields=None):
+    """Header counts from SQL aggregates, without loading any quiz or attempt rows"""
+    created, plays = db.session.query(func.count(Quiz.id), func.coalesce(func.sum(func.coalesce(Quiz.plays, 0)), 0))\
+                       .filter(Quiz.user_id == current_user.id).one()
+    taken = db.session.query(func.count(QuizAttempt.id)).join(Quiz, Quiz.id == QuizAttempt.quiz_id)\
+              .filter(QuizAttempt.user_id == current_user.id).scalar()
+    attempts, score_sum = db.session.query(func.count(QuizAttempt.id), func.coalesce(func.sum(QuizAttempt.score), 0.0))\
+                            .filter(QuizAttempt.user_id == current_user.id).one()
+
+    # Average score across all attempts (not just unique quizzes), archived ones included
+    archived = user_rollup_totals(current_user.id)
+    total_attempts = attempts + archived['attempts']
+    average_score = (score_sum + archived['score_sum']) / total_attempts if total_attempts else 0
+    return {
+        'quizzesCreated': created,
+        'quizzesTaken': taken,  # Attempts on quizzes that still exist
+        'totalPlays': int(plays),  # Total plays on quizzes they created
+        'totalAttempts': total_attempts,  # Total attempts by user
+        'averageScore': round(average_score, 1)
+    }
+
+def dashboard_created_quizzes(current_user, fields=None):
+    """The user's quizzes, newest first, with their participants and score averages"""
+    query = Quiz.query.filter_by(user_id=current_user.id).order_by(Quiz.created_at.desc())
+    if not wanted(fields, 'tags'):
+        query = query.options(raiseload(Quiz.tags))
+    user_quizzes = query.all()
+
+    # Attempts on all of the user's quizzes in one query instead of one per quiz
+    participants, score_sums = {}, {}
+    if wanted(fields, 'recent_attempts'):
+        attempts = QuizAttempt.query.options(joinedload(QuizAttempt.user))\
+                     .join(Quiz, Quiz.id == QuizAttempt.quiz_id).filter(Quiz.user_id == current_user.id)\
+                     .order_by(QuizAttempt.completed_at.desc()).all()
+        for attempt in attempts:
+            participants.setdefault(attempt.quiz_id, []).append({
+                'username': attempt.user.username if attempt.user else 'Anonymous',
+                'score': attempt.score,
+                'completed_at': attempt.completed_at.isoformat() if attempt.completed_at else None,
+                'timeSpent': attempt.time_spent,
+                'correct_answers': attempt.correct_answers,
+                'total_questions': attempt.total_questions
+            })
+            totals = score_sums.setdefault(attempt.quiz_id, [0, 0.0])
+            totals[0] += 1
+            totals[1] += attempt.score
+    elif wanted(fields, 'averageScore', 'totalAttempts'):
+        rows = db.session.query(QuizAttempt.quiz_id, func.count(QuizAttempt.id), func.sum(QuizAttempt.score))\
+                 .join(Quiz, Quiz.id == QuizAttempt.quiz_id).filter(Quiz.user_id == current_user.id)\
+                 .group_by(QuizAttempt.quiz_id)
+        score_sums = {quiz_id: [count, score_sum] for quiz_id, count, score_sum in rows}
+
+    archived = {}
+    if wanted(fields, 'averageScore', 'totalAttempts'):
+        rows = db.session.query(QuizDailyRollup.quiz_id, func.sum(QuizDailyRollup.attempts),
+                                func.sum(QuizDailyRollup.score_sum))\
+                 .join(Quiz, Quiz.id == QuizDailyRollup.quiz_id).filter(Quiz.user_id == current_user.id)\
+                 .group_by(QuizDailyRollup.quiz_id)
+        archived = {quiz_id: (int(count), float(score_sum)) for quiz_id, count, score_sum in rows}
+
+    created_quizzes = []
+    for quiz in user_quizzes:
+        # Average score for this quiz, including rolled-up attempts
+        live_count, live_sum = score_sums.get(quiz.id, (0, 0.0))
+        archived_count, archived_sum = archived.get(quiz.id, (0, 0.0))
+        attempt_count = live_count + archived_count
+        average_score = (live_sum + archived_sum) / attempt_count if attempt_count else 0
+
+        question_count = 0
+        if wanted(fields, 'questions'):
+            try:
+                question_count = len(json.loads(quiz.quiz_content)) if quiz.quiz_content else 0
+            except json.JSONDecodeError:
+                print(f"Error parsing quiz content for quiz {quiz.id}")
+
+        created_quizzes.append(select_fields({
+            'id': quiz.id,
+            'title': quiz.title or 'Untitled Quiz',
+            'description': quiz.description or 'No description available',
+            'difficulty': quiz.difficulty or 'Medium',
+            'category': getattr(quiz, 'category', None) or 'General',
+            'plays': quiz.plays or 0,
+            'rating': quiz.rating or 0,
+            'created_at': quiz.created_at.isoformat(),
+            'questions': question_count,
+            'recent_attempts': participants.get(quiz.id, []),
+            'averageScore': round(average_score, 1),
+            'totalAttempts': attempt_count,
+            'tags': [tag.name for tag in quiz.tags] if wanted(fields, 'tags') else [],
+            'is_public': quiz.is_public,
+            'quiz_type': quiz.quiz_type
+        }, fields))
+    return created_quizzes
+
+def dashboard_taken_quizzes(current_user, fields=None):
+    """The user's attempts on existing quizzes, most recent first, with the quiz details"""
+    quiz_loader = joinedload(QuizAttempt.quiz)
+    options = [quiz_loader]
+    if wanted(fields, 'creator'):
+        options.append(quiz_loader.joinedload(Quiz.user))
+    if not wanted(fields, 'tags'):
+        options.append(quiz_loader.raiseload(Quiz.tags))
+    attempts = QuizAttempt.query.options(*options).join(Quiz, Quiz.id == QuizAttempt.quiz_id)\
+                 .filter(QuizAttempt.user_id == current_user.id)\
+                 .order_by(QuizAttempt.completed_at.desc()).all()
+
+    taken_quizzes = []
+    for attempt in attempts:
+        quiz = attempt.quiz
+        question_count = 0
+        if wanted(fields, 'question_count'):
+            try:
+                question_count = len(json.loads(quiz.quiz_content)) if quiz.quiz_content else 0
+            except json.JSONDecodeError:
+                question_count = attempt.total_questions or 0
+
+        taken_quizzes.append(select_fields({
+            'id': attempt.id,
+            'quiz_id': quiz.id,
+            'title': quiz.title,
+            'description': quiz.description,
+            'creator': (quiz.user.username if quiz.user else 'System') if wanted(fields, 'creator') else None,
+            'category': getattr(quiz, 'category', 'General'),
+            'difficulty': quiz.difficulty,
+            'question_count': question_count,
+            'score': attempt.score,
+            'correct_answers': attempt.correct_answers,
+            'questions': attempt.total_questions,
+            'completed_at': attempt.completed_at.isoformat(),
+            'time_spent': attempt.time_spent,
+            'rating': quiz.rating,
+            'plays': quiz.plays,
+            'created_at': quiz.created_at.isoformat(),
+            'quiz_type': quiz.quiz_type,
+            'tags': [tag.name for tag in quiz.tags] if wanted(fields, 'tags') else [],
+        }, fields))
+    return taken_quizzes
 
-    for q in query:
-        print(q.is_public)
-    
-    # Apply filters
-    if search:
-        query = query.filter(db.or_(
-            Quiz.title.ilike(f'%{search}%'),
-            Quiz.description.ilike(f'%{search}%')
-        ))
-    
-    if difficulty != 'all':
-        query = query.filter_by(difficulty=difficulty)
-    
-    # Tag filtering - only if tags are specified
-    if tags:
-        tag_list = [tag.strip().lower() for tag in tags.split(',') if tag.strip()]
-        if tag_list:
-            query = query.join(Quiz.tags).filter(Tag.name.in_(tag_list))
-    
-    # Apply sorting
-    if sort == 'trending':
-        query = query.order_by(Quiz.plays.desc())
-    elif sort == 'newest':
-        query = query.order_by(Quiz.created_at.desc())
-    elif sort == 'top-rated':
-        query = query.order_by(Quiz.rating.desc())
-    
-    print(f"\nQuery after filters: {query}")
-    
-    # Execute query
-    quizzes = Quiz.query.filter_by(is_public=True)  # Remove distinct() temporarily for debugging
-    
-    # Debug: print raw quiz data
-    for i, quiz in enumerate(quizzes):
-        print(f"\nQuiz {i+1}:")
-        print(f"ID: {quiz.id}")
-        print(f"Title: {quiz.title}")
-        print(f"Content length: {len(quiz.quiz_content)}")
-        print(f"Tags: {[tag.name for tag in quiz.tags]}")
-        
-    
-    # Serialize
-    quizzes_data = []
-    for quiz in quizzes:
-        try:
-            quiz_data = {
-                'id': quiz.id,
-                'title': quiz.title,
-                'description': quiz.description,
-                'difficulty': quiz.difficulty,
-                'plays': quiz.plays,
-                'createdAt': quiz.created_at.isoformat(),
-                'isPublic': quiz.is_public,
-                'tags': [tag.name for tag in quiz.tags],
-                'questionCount': len(json.loads(quiz.quiz_content)) if quiz.quiz_content else 0
-            }
-            quizzes_data.append(quiz_data)
-        except Exception as e:
-            print(f"Failed to serialize quiz {quiz.id}: {str(e)}")
-            continue
-    
-    print(f"\nSuccessfully serialized {len(quizzes_data)} quizzes")
-    return jsonify(quizzes_data)
+def dashboard_rank(current_user, fields=None):
+    return db.session.query(func.count(User.id)).filter(User.total_score > current_user.total_score).scalar() + 1
 
-# Protected route example
-@app.route('/protected', methods=['GET'])
-@token_required
-def protected(current_user):  # Note the current_user parameter
-    return jsonify({'message': f'Hello {current_user.username}! This is a protected route.'})
+# ?include= name -> (key under 'user', builder)
+DASHBOARD_SECTIONS = {
+    'stats': ('stats', dashboard_stats),
+    'created': ('createdQuizzes', dashboard_created_quizzes),
+    'taken': ('takenQuizzes', dashboard_taken_quizzes),
+    'rank': ('rank', dashboard_rank)
+}
 
-@app.route('/routes')
-def list_routes():
-    return jsonify({
-        'routes': [str(rule) for rule in app.url_map.iter_rules()] 
-    })
+def csv_arg(name):
+    """Comma-separated query argument as a set, or None when absent or empty"""
+    values = {value.strip() for value in request.args.get(name, '').split(',') if value.strip()}
+    return values or None
 
-@app.route('/get-user-data', methods=['GET'])
+@bp.route('/get-user-data', methods=['GET'])
 @token_required
 def get_user_data(current_user):
-    """Get comprehensive user data including full quiz details for created and taken quizzes"""
+    """Get comprehensive user data including full quiz details for created and taken quizzes.
+
+    ?include=stats,created,taken,rank picks the sections (default: all of them) and
+    ?fields= the keys kept in each created / taken quiz.
+    """
+    sections = csv_arg('include') or set(DASHBOARD_SECTIONS)
+    unknown = sections - set(DASHBOARD_SECTIONS)
+    if unknown:
+        return jsonify({'success': False, 'error': f"Unknown section(s): {', '.join(sorted(unknown))}"}), 400
+    fields = csv_arg('fields')
+
     try:
-        print(f"Getting data for user ID: {current_user.id}")
-        
-        # 1. Basic user info
-        user_info = {
+        user_data = {
             'id': current_user.id,
             'username': current_user.username,
             'email': current_user.email,
@@ -672,171 +3742,14 @@ def get_user_data(current_user):
             'total_score': getattr(current_user, 'total_score', 0),
             'badge': getattr(current_user, 'badge', 'Member')
         }
-        
-        # 2. Get created quizzes with full details and participants
-        created_quizzes = []
-        try:
-            user_quizzes = Quiz.query.filter_by(user_id=current_user.id)\
-                         .order_by(Quiz.created_at.desc())\
-                         .all()
-            
-            for quiz in user_quizzes:
-                # Get quiz attempts/participants with detailed info
-                attempts = QuizAttempt.query.filter_by(quiz_id=quiz.id)\
-                          .order_by(QuizAttempt.completed_at.desc())\
-                          .all()
-                
-                participants = []
-                total_score_sum = 0
-                for attempt in attempts:
-                    participant_data = {
-                        'username': attempt.user.username if attempt.user else 'Anonymous',
-                        'score': attempt.score,
-                        'completed_at': attempt.completed_at.isoformat() if attempt.completed_at else None,
-                        'completedAt': attempt.completed_at.isoformat() if attempt.completed_at else None,
-                        'timeSpent': attempt.time_spent,
-                        'correct_answers': attempt.correct_answers,
-                        'total_questions': attempt.total_questions
-                        
-                    }
-                    participants.append(participant_data)
-                    total_score_sum += attempt.score
-                
-                # Calculate average score for this quiz
-                average_score = total_score_sum / len(participants) if participants else 0
-                
-                # Parse questions count safely
-                question_count = 0
-                quiz_content = []
-                try:
-                    quiz_content = json.loads(quiz.quiz_content) if quiz.quiz_content else []
-                    question_count = len(quiz_content)
-                except json.JSONDecodeError:
-                    print(f"Error parsing quiz content for quiz {quiz.id}")
-                    question_count = 0
-                
-                # Extract category from quiz content or use default
-                category = getattr(quiz, 'category', None)
-                if not category and quiz_content:
-                    # Try to infer category from tags or use default
-                    category = 'General'
-                
-                created_quiz_data = {
-                    'id': quiz.id,
-                    'title': quiz.title or 'Untitled Quiz',
-                    'description': quiz.description or 'No description available',
-                    'difficulty': quiz.difficulty or 'Medium',
-                    'category': category or 'General',
-                    'plays': quiz.plays or 0,
-                    'rating': quiz.rating or 0,
-                    'created_at': quiz.created_at.isoformat(),
-                    'createdAt': quiz.created_at.isoformat(),
-                    'questions': question_count,
-                    'recent_attempts': participants,  # <-- UPDATE THIS LINE
-                    'averageScore': round(average_score, 1),
-                    'totalAttempts': len(participants),
-                    'tags': [tag.name for tag in quiz.tags] if quiz.tags else [],
-                    'is_public': quiz.is_public,
-                    'quiz_type': quiz.quiz_type
-                }
+        for name in DASHBOARD_SECTIONS:
+            if name in sections:
+                key, build = DASHBOARD_SECTIONS[name]
+                user_data[key] = build(current_user, fields)
+        return jsonify({'user': user_data, 'success': True})
 
-                created_quizzes.append(created_quiz_data)
-                
-        except Exception as e:
-            print(f"Error getting created quizzes: {str(e)}")
-            created_quizzes = []
-        
-        # 3. Get taken quizzes with FULL quiz details extracted from quiz_id
-        taken_quizzes = []
-        try:
-            # Get all attempts by the user, ordered by most recent
-            attempts = QuizAttempt.query.filter_by(user_id=current_user.id)\
-                      .order_by(QuizAttempt.completed_at.desc())\
-                      .all()
-            
-            for attempt in attempts:
-                quiz = attempt.quiz
-                if quiz:  # Only include if quiz exists
-                    # Parse quiz content to get question count and other details
-                    question_count = 0
-                    try:
-                        quiz_content = json.loads(quiz.quiz_content) if quiz.quiz_content else []
-                        question_count = len(quiz_content)
-                    except json.JSONDecodeError:
-                        question_count = attempt.total_questions or 0
-                    
-                    taken_quiz_data = {
-                        'id': attempt.id,
-                        'quiz_id': quiz.id,
-                        'title': quiz.title,
-                        'description': quiz.description,
-                        'creator': quiz.user.username if quiz.user else 'System',
-                        'category': getattr(quiz, 'category', 'General'),
-                        'difficulty': quiz.difficulty,
-                        'question_count': question_count,
-                        'score': attempt.score,
-                        'correct_answers': attempt.correct_answers,
-                        'questions': attempt.total_questions,
-                        'completed_at': attempt.completed_at.isoformat(),
-                        'time_spent': attempt.time_spent,
-                        'rating': quiz.rating,
-                        'plays': quiz.plays,
-                        'created_at': quiz.created_at.isoformat(),
-                        'quiz_type': quiz.quiz_type,
-                        'tags': [tag.name for tag in quiz.tags] if quiz.tags else [],
-                    }
-                    taken_quizzes.append(taken_quiz_data)
-                    
-        except Exception as e:
-            print(f"Error getting taken quizzes: {str(e)}")
-            taken_quizzes = []
-        
-        # 4. Calculate comprehensive statistics
-        total_created_plays = sum(quiz['plays'] for quiz in created_quizzes)
-        total_user_attempts = len(QuizAttempt.query.filter_by(user_id=current_user.id).all())
-        
-        # Calculate average score across all attempts (not just unique quizzes)
-        all_attempts = QuizAttempt.query.filter_by(user_id=current_user.id).all()
-        average_score = sum(attempt.score for attempt in all_attempts) / len(all_attempts) if all_attempts else 0
-        
-        stats = {
-            'quizzesCreated': len(created_quizzes),
-            'quizzesTaken': len(taken_quizzes),  # Unique quizzes taken
-            'totalPlays': total_created_plays,  # Total plays on quizzes they created
-            'totalAttempts': total_user_attempts,  # Total attempts by user
-            'averageScore': round(average_score, 1)
-        }
-        
-        # 5. Calculate rank
-        try:
-            user_count = User.query.count()
-            rank = db.session.query(
-                func.count(User.id)
-            ).filter(
-                User.total_score > current_user.total_score
-            ).scalar() + 1
-        except Exception as e:
-            print(f"Error calculating rank: {str(e)}")
-            rank = user_count if 'user_count' in locals() else 1
-        
-        response_data = {
-            'user': {
-                **user_info,
-                'stats': stats,
-                'createdQuizzes': created_quizzes,
-                'takenQuizzes': taken_quizzes,
-                'rank': rank,
-            },
-            
-            'success': True
-        }
-        
-        print(f"Returning enhanced data: Created={len(created_quizzes)}, Taken={len(taken_quizzes)}")
-        return jsonify(response_data)
-        
     except Exception as e:
         current_app.logger.error(f"Error in get_user_data: {str(e)}", exc_info=True)
-        print(f"Full error: {str(e)}")
         return jsonify({
             'error': 'Internal server error',
             'details': str(e),
@@ -854,36 +3767,44 @@ def get_user_data(current_user):
             }
         }), 500
 
+@bp.route('/get-user-data/<section>', methods=['GET'])
+@token_required
+def get_user_data_section(current_user, section):
+    """One dashboard section on its own: {'success': True, <key>: ...}; ?fields= as for /get-user-data"""
+    if section not in DASHBOARD_SECTIONS:
+        return jsonify({'success': False, 'error': f"Unknown section: {section}"}), 404
+    key, build = DASHBOARD_SECTIONS[section]
+    try:
+        return jsonify({'success': True, key: build(current_user, csv_arg('fields'))})
+    except Exception as e:
+        current_app.logger.error(f"Error in get_user_data_section({section}): {str(e)}", exc_info=True)
+        return jsonify({'success': False, 'error': 'Internal server error', 'details': str(e)}), 500
+
 # Additional endpoint to get detailed quiz attempt history for a specific quiz
-@app.route('/api/quiz/<quiz_id>/attempts', methods=['GET'])
+@bp.route('/api/quiz/<quiz_id>/attempts', methods=['GET'])
 @token_required
 def get_quiz_attempt_history(current_user, quiz_id):
-    """Get all attempts by current user for a specific quiz"""
+    """A page of the current user's attempts on a quiz plus their totals"""
+    limit, cursor, error = page_request()
+    if error:
+        return error
     try:
-        attempts = QuizAttempt.query.filter_by(
-            user_id=current_user.id,
-            quiz_id=quiz_id
-        ).order_by(QuizAttempt.completed_at.desc()).all()
-        
-        attempts_data = []
-        for attempt in attempts:
-            attempt_data = {
-                'id': attempt.id,
-                'score': attempt.score,
-                'correct_answers': attempt.correct_answers,
-                'total_questions': attempt.total_questions,
-                'completed_at': attempt.completed_at.isoformat(),
-                'time_spent': attempt.time_spent,
-                'details': json.loads(attempt.details) if attempt.details else None,
-                'user_answers': json.loads(attempt.user_answers) if attempt.user_answers else None
-            }
-            attempts_data.append(attempt_data)
-        
+        query = QuizAttempt.query.filter_by(user_id=current_user.id, quiz_id=quiz_id)
+        attempts, next_cursor = attempts_page(query, limit, cursor)
+        live_attempts, live_best = db.session.query(func.count(QuizAttempt.id), func.max(QuizAttempt.score))\
+                                     .filter_by(user_id=current_user.id, quiz_id=quiz_id).one()
+
+        # Attempts already rolled up only contribute to the totals
+        archived = user_rollup_totals(current_user.id, quiz_id)
+        best_scores = [score for score in (live_best, archived['best_score']) if score is not None]
+
         return jsonify({
             'success': True,
-            'attempts': attempts_data,
-            'total_attempts': len(attempts_data),
-            'best_score': max(attempt['score'] for attempt in attempts_data) if attempts_data else 0
+            'attempts': [attempt_summary(attempt) for attempt in attempts],
+            'next_cursor': next_cursor,
+            'total_attempts': live_attempts + archived['attempts'],
+            'archived_attempts': archived['attempts'],
+            'best_score': max(best_scores) if best_scores else 0
         })
         
     except Exception as e:
@@ -893,7 +3814,7 @@ def get_quiz_attempt_history(current_user, quiz_id):
         }), 500
 
 # Endpoint to get detailed quiz information by ID
-@app.route('/api/quiz/<quiz_id>/details', methods=['GET'])
+@bp.route('/api/quiz/<quiz_id>/details', methods=['GET'])
 def get_quiz_details(quiz_id):
     """Get comprehensive quiz details including content and statistics"""
     try:
@@ -907,12 +3828,16 @@ def get_quiz_details(quiz_id):
             quiz_content = []
         
         # Get attempt statistics
-        attempts = QuizAttempt.query.filter_by(quiz_id=quiz_id).all()
-        total_attempts = len(attempts)
-        average_score = sum(attempt.score for attempt in attempts) / total_attempts if attempts else 0
+        live_attempts, live_score_sum = db.session.query(
+            func.count(QuizAttempt.id), func.coalesce(func.sum(QuizAttempt.score), 0.0)
+        ).filter(QuizAttempt.quiz_id == quiz_id).one()
+        archived = quiz_rollup_totals(quiz_id)
+        total_attempts = live_attempts + archived['attempts']
+        average_score = (live_score_sum + archived['score_sum']) / total_attempts if total_attempts else 0
         
         # Get recent attempts (last 10)
-        recent_attempts = QuizAttempt.query.filter_by(quiz_id=quiz_id)\
+        recent_attempts = QuizAttempt.query.options(joinedload(QuizAttempt.user))\
+                         .filter_by(quiz_id=quiz_id)\
                          .order_by(QuizAttempt.completed_at.desc())\
                          .limit(10).all()
         
@@ -997,127 +3922,123 @@ def extract_quiz_metadata(quiz):
         'created_at': quiz.created_at.isoformat() if quiz.created_at else None
     }
 
+def created_history_page(current_user, limit, cursor):
+    """A page of the user's quizzes, newest first, with attempt statistics and the last 5 participants"""
+    quizzes, next_cursor = keyset_page(
+        Quiz.query.filter_by(user_id=current_user.id).options(joinedload(Quiz.user)),
+        Quiz.created_at, Quiz.id, lambda quiz: (quiz.created_at, quiz.id), limit, cursor)
+    quiz_ids = [quiz.id for quiz in quizzes]
+    if not quiz_ids:
+        return [], next_cursor
+    live = {quiz_id: (count, score_sum) for quiz_id, count, score_sum in db.session.query(
+        QuizAttempt.quiz_id, func.count(QuizAttempt.id), func.sum(QuizAttempt.score)
+    ).filter(QuizAttempt.quiz_id.in_(quiz_ids)).group_by(QuizAttempt.quiz_id)}
+    archived = {quiz_id: (count, score_sum) for quiz_id, count, score_sum in db.session.query(
+        QuizDailyRollup.quiz_id, func.sum(QuizDailyRollup.attempts), func.sum(QuizDailyRollup.score_sum)
+    ).filter(QuizDailyRollup.quiz_id.in_(quiz_ids)).group_by(QuizDailyRollup.quiz_id)}
+    # One statement, each branch a 5-row range read of ix_quiz_attempts_quiz_id_completed_at
+    recent_rows = db.session.execute(union_all(*[select(branch) for branch in (
+        select(QuizAttempt.id, QuizAttempt.quiz_id, User.username, QuizAttempt.score, QuizAttempt.completed_at,
+               QuizAttempt.time_spent)
+        .outerjoin(User, User.id == QuizAttempt.user_id).where(QuizAttempt.quiz_id == quiz_id)
+        .order_by(QuizAttempt.completed_at.desc(), QuizAttempt.id.desc()).limit(5).subquery()
+        for quiz_id in quiz_ids)])).all()
+    recent = {}
+    for row in sorted(recent_rows, key=lambda row: (row.completed_at, row.id), reverse=True):
+        recent.setdefault(row.quiz_id, []).append(row)
+
+    created = []
+    for quiz in quizzes:
+        count, score_sum = live.get(quiz.id, (0, 0.0))
+        archived_count, archived_sum = archived.get(quiz.id, (0, 0.0))
+        total_attempts = count + archived_count
+        avg_score = (score_sum + archived_sum) / total_attempts if total_attempts else 0
+        created.append({
+            'id': quiz.id,
+            **extract_quiz_metadata(quiz),
+            'statistics': {
+                'total_attempts': total_attempts,
+                'average_score': round(avg_score, 1),
+                'plays': quiz.plays or 0
+            },
+            'recent_participants': [{
+                'username': row.username or 'Anonymous',
+                'score': row.score,
+                'completed_at': row.completed_at.isoformat(),
+                'time_spent': row.time_spent
+            } for row in recent.get(quiz.id, [])],
+            'created_at': quiz.created_at.isoformat()
+        })
+    return created, next_cursor
+
+def taken_history_page(current_user, limit, cursor):
+    """A page of the quizzes the user took, most recently played first: one range read of user_quiz_summaries"""
+    summaries, next_cursor = keyset_page(
+        UserQuizSummary.query.filter_by(user_id=current_user.id),
+        UserQuizSummary.last_completed_at, UserQuizSummary.quiz_id,
+        lambda summary: (summary.last_completed_at, summary.quiz_id), limit, cursor)
+    quizzes = {quiz.id: quiz for quiz in Quiz.query.filter(Quiz.id.in_([summary.quiz_id for summary in summaries]))
+                                                    .options(joinedload(Quiz.user))} if summaries else {}
+    return [{
+        'id': summary.quiz_id,
+        **extract_quiz_metadata(quizzes.get(summary.quiz_id)),
+        'attempt_data': {
+            'latest_attempt_id': summary.last_attempt_id,
+            'latest_score': summary.last_score,
+            'best_score': summary.best_score,
+            'total_attempts': summary.attempts,
+            'latest_completed_at': summary.last_completed_at.isoformat(),
+            'latest_time_spent': summary.last_time_spent,
+            'correct_answers': summary.last_correct_answers,
+            'total_questions': summary.last_total_questions
+        }
+    } for summary in summaries], next_cursor
+
 # Enhanced endpoint for user's quiz history with full details
-@app.route('/api/user/quiz-history', methods=['GET'])
+@bp.route('/api/user/quiz-history', methods=['GET'])
 @token_required  
 def get_user_quiz_history(current_user):
-    """Get user's complete quiz history with full quiz details"""
+    """Get user's quiz history: a page of created quizzes and of taken quizzes (one row per quiz).
+
+    ?type=created|taken|all, ?limit= rows per list; ?cursor= (from next_cursor) needs type=created or taken.
+    Each quiz's individual attempts are paged by /api/quiz/<quiz_id>/attempts.
+    """
+    filter_type = request.args.get('type', 'all')  # 'created', 'taken', or 'all'
+    if filter_type not in ('created', 'taken', 'all'):
+        return jsonify({'success': False, 'error': 'type must be created, taken or all'}), 400
+    limit, cursor, error = page_request(default_limit=50)
+    if error:
+        return error
+    if cursor is not None and filter_type == 'all':
+        return jsonify({'success': False, 'error': 'cursor requires type=created or type=taken'}), 400
+
     try:
-        # Get filter parameters
-        filter_type = request.args.get('type', 'all')  # 'created', 'taken', or 'all'
-        limit = int(request.args.get('limit', 50))
-        
         result = {
             'success': True,
             'created_quizzes': [],
             'taken_quizzes': [],
+            'next_cursor': {},
             'summary': {}
         }
         
         if filter_type in ['created', 'all']:
-            # Get created quizzes with participant data
-            created_quizzes = Quiz.query.filter_by(user_id=current_user.id)\
-                            .order_by(Quiz.created_at.desc())\
-                            .limit(limit).all()
-            
-            for quiz in created_quizzes:
-                # Get all attempts for this quiz
-                attempts = QuizAttempt.query.filter_by(quiz_id=quiz.id)\
-                          .order_by(QuizAttempt.completed_at.desc()).all()
-                
-                # Calculate statistics
-                total_attempts = len(attempts)
-                avg_score = sum(attempt.score for attempt in attempts) / total_attempts if attempts else 0
-                
-                # Get recent participants (last 5)
-                recent_participants = []
-                for attempt in attempts[:5]:
-                    recent_participants.append({
-                        'username': attempt.user.username if attempt.user else 'Anonymous',
-                        'score': attempt.score,
-                        'completed_at': attempt.completed_at.isoformat(),
-                        'time_spent': attempt.time_spent
-                    })
-                
-                quiz_metadata = extract_quiz_metadata(quiz)
-                quiz_data = {
-                    'id': quiz.id,
-                    **quiz_metadata,
-                    'statistics': {
-                        'total_attempts': total_attempts,
-                        'average_score': round(avg_score, 1),
-                        'plays': quiz.plays or 0
-                    },
-                    'recent_participants': recent_participants,
-                    'created_at': quiz.created_at.isoformat()
-                }
-                result['created_quizzes'].append(quiz_data)
+            result['created_quizzes'], result['next_cursor']['created'] = \
+                created_history_page(current_user, limit, cursor)
         
         if filter_type in ['taken', 'all']:
-            # Get taken quizzes with attempt details
-            attempts = QuizAttempt.query.filter_by(user_id=current_user.id)\
-                      .order_by(QuizAttempt.completed_at.desc())\
-                      .limit(limit).all()
-            
-            # Group by quiz to get unique quizzes with best scores
-            quiz_attempts = {}
-            for attempt in attempts:
-                quiz_id = attempt.quiz_id
-                if quiz_id not in quiz_attempts:
-                    quiz_attempts[quiz_id] = {
-                        'attempts': [],
-                        'best_score': attempt.score,
-                        'latest_attempt': attempt,
-                        'quiz': attempt.quiz
-                    }
-                
-                quiz_attempts[quiz_id]['attempts'].append(attempt)
-                if attempt.score > quiz_attempts[quiz_id]['best_score']:
-                    quiz_attempts[quiz_id]['best_score'] = attempt.score
-            
-            # Format taken quizzes data
-            for quiz_id, data in quiz_attempts.items():
-                quiz = data['quiz']
-                latest_attempt = data['latest_attempt']
-                all_attempts = data['attempts']
-                
-                quiz_metadata = extract_quiz_metadata(quiz)
-                taken_quiz_data = {
-                    'id': quiz_id,
-                    **quiz_metadata,
-                    'attempt_data': {
-                        'latest_score': latest_attempt.score,
-                        'best_score': data['best_score'],
-                        'total_attempts': len(all_attempts),
-                        'latest_completed_at': latest_attempt.completed_at.isoformat(),
-                        'latest_time_spent': latest_attempt.time_spent,
-                        'correct_answers': latest_attempt.correct_answers,
-                        'total_questions': latest_attempt.total_questions
-                    },
-                    'all_attempts': [
-                        {
-                            'id': att.id,
-                            'score': att.score,
-                            'completed_at': att.completed_at.isoformat(),
-                            'time_spent': att.time_spent,
-                            'correct_answers': att.correct_answers,
-                            'total_questions': att.total_questions
-                        }
-                        for att in all_attempts
-                    ]
-                }
-                result['taken_quizzes'].append(taken_quiz_data)
+            result['taken_quizzes'], result['next_cursor']['taken'] = \
+                taken_history_page(current_user, limit, cursor)
         
-        # Add summary statistics
+        # Add summary statistics (one row per quiz taken, live and archived attempts together)
+        total_taken, total_attempts, score_sum = db.session.query(
+            func.count(), func.coalesce(func.sum(UserQuizSummary.attempts), 0),
+            func.coalesce(func.sum(UserQuizSummary.score_sum), 0.0)
+        ).filter(UserQuizSummary.user_id == current_user.id).one()
         result['summary'] = {
-            'total_created': len(result['created_quizzes']),
-            'total_taken': len(result['taken_quizzes']),
-            'total_attempts': QuizAttempt.query.filter_by(user_id=current_user.id).count(),
-            'average_score': round(
-                db.session.query(func.avg(QuizAttempt.score))
-                .filter_by(user_id=current_user.id)
-                .scalar() or 0, 1
-            )
+            'total_created': Quiz.query.filter_by(user_id=current_user.id).count(),
+            'total_taken': total_taken,
+            'total_attempts': total_attempts,
+            'average_score': round(score_sum / total_attempts if total_attempts else 0, 1)
         }
         
         return jsonify(result)
@@ -1132,8 +4053,63 @@ def get_user_quiz_history(current_user):
             'summary': {}
         }), 500
 
+@bp.route('/api/quiz/<quiz_id>/item-analysis', methods=['GET'])
+@token_required
+def get_item_analysis(current_user, quiz_id):
+    """Per-question difficulty and MCQ distractor usage (only for the quiz owner)"""
+    quiz = Quiz.query.filter_by(id=quiz_id, user_id=current_user.id).first()
+    if not quiz:
+        return jsonify({'success': False, 'error': 'Quiz not found or access denied'}), 404
+
+    quiz_content = json.loads(quiz.quiz_content)
+    stats = {stat.question_index: stat for stat in QuestionStat.query.filter_by(quiz_id=quiz_id)}
+    selections = {}
+    for option_stat in QuestionOptionStat.query.filter_by(quiz_id=quiz_id):
+        selections.setdefault(option_stat.question_index, {})[option_stat.option_index] = option_stat.selections
+
+    questions = []
+    for index, question in enumerate(quiz_content):
+        stat = stats.get(index)
+        attempts = stat.attempts if stat else 0
+        accuracy = round((stat.correct + 0.5 * stat.partial) / attempts * 100, 1) if attempts else None
+        item = {
+            'index': index,
+            'question': question.get('question'),
+            'attempts': attempts,
+            'correct': stat.correct if stat else 0,
+            'partial': stat.partial if stat else 0,
+            'incorrect': stat.incorrect if stat else 0,
+            'accuracy': accuracy,
+            'flag': None if accuracy is None else 'too_hard' if accuracy < 30 else 'too_easy' if accuracy > 90 else None
+        }
+        if quiz.quiz_type == 'mcq':
+            picked = selections.get(index, {})
+            answer = str(question.get('answer', '')).strip().lower()
+            item['options'] = [{
+                'option': option,
+                'is_answer': str(option).strip().lower() == answer,
+                'selections': picked.get(option_position, 0),
+                'share': round(picked.get(option_position, 0) / attempts * 100, 1) if attempts else 0
+            } for option_position, option in enumerate(question.get('options') or [])]
+            item['other_answers'] = picked.get(-1, 0)
+            item['unused_distractors'] = [option['option'] for option in item['options']
+                                          if not option['is_answer'] and attempts and not option['selections']]
+        questions.append(item)
+
+    answered = [item for item in questions if item['accuracy'] is not None]
+    return jsonify({
+        'success': True,
+        'quiz_id': quiz_id,
+        'quiz_type': quiz.quiz_type,
+        'questions': questions,
+        # Accuracy by position shows fatigue / ordering effects at a glance
+        'position_accuracy': [item['accuracy'] for item in questions],
+        'average_accuracy': round(sum(item['accuracy'] for item in answered) / len(answered), 1) if answered else None,
+        'hardest_questions': [item['index'] for item in sorted(answered, key=lambda item: item['accuracy'])[:3]]
+    })
+
 # Endpoint to get quiz performance analytics
-@app.route('/api/quiz/<quiz_id>/analytics', methods=['GET'])
+@bp.route('/api/quiz/<quiz_id>/analytics', methods=['GET'])
 @token_required
 def get_quiz_analytics(current_user, quiz_id):
     """Get detailed analytics for a quiz (only for quiz owner)"""
@@ -1142,11 +4118,11 @@ def get_quiz_analytics(current_user, quiz_id):
         if not quiz:
             return jsonify({'success': False, 'error': 'Quiz not found or access denied'}), 404
         
-        # Get all attempts
-        attempts = QuizAttempt.query.filter_by(quiz_id=quiz_id)\
-                  .order_by(QuizAttempt.completed_at.desc()).all()
+        # Live attempts are aggregated in SQL; archived ones come from the rollups
+        live = quiz_attempt_aggregates(quiz_id)
+        archived = quiz_rollup_totals(quiz_id)
         
-        if not attempts:
+        if not live['attempts'] and not archived['attempts']:
             return jsonify({
                 'success': True,
                 'analytics': {
@@ -1160,48 +4136,34 @@ def get_quiz_analytics(current_user, quiz_id):
                 }
             })
         
-        # Calculate analytics
-        total_attempts = len(attempts)
-        unique_users = len(set(attempt.user_id for attempt in attempts))
-        average_score = sum(attempt.score for attempt in attempts) / total_attempts
+        # Calculate analytics (archived rollups + live aggregates)
+        total_attempts = live['attempts'] + archived['attempts']
+        unique_users = live['unique_users']
+        average_score = (live['score_sum'] + archived['score_sum']) / total_attempts
         
         # Score distribution
-        score_ranges = {'0-20': 0, '21-40': 0, '41-60': 0, '61-80': 0, '81-100': 0}
-        for attempt in attempts:
-            score = attempt.score
-            if score <= 20:
-                score_ranges['0-20'] += 1
-            elif score <= 40:
-                score_ranges['21-40'] += 1
-            elif score <= 60:
-                score_ranges['41-60'] += 1
-            elif score <= 80:
-                score_ranges['61-80'] += 1
-            else:
-                score_ranges['81-100'] += 1
+        score_ranges = {label: live['score_distribution'][label] + archived['score_distribution'][label]
+                        for label, _, _ in SCORE_BUCKETS}
         
         # Time analysis
-        time_data = []
-        for attempt in attempts:
-            if attempt.time_spent and ':' in attempt.time_spent:
-                try:
-                    minutes, seconds = map(int, attempt.time_spent.split(':'))
-                    total_seconds = minutes * 60 + seconds
-                    time_data.append(total_seconds)
-                except ValueError:
-                    continue
-        
         time_analysis = {}
-        if time_data:
+        time_count = live['time_count'] + archived['time_count']
+        if time_count:
+            time_mins = [t for t in (live['time_min_seconds'], archived['time_min_seconds']) if t is not None]
+            time_maxs = [t for t in (live['time_max_seconds'], archived['time_max_seconds']) if t is not None]
             time_analysis = {
-                'average_time_seconds': sum(time_data) / len(time_data),
-                'min_time_seconds': min(time_data),
-                'max_time_seconds': max(time_data)
+                'average_time_seconds': (live['time_sum_seconds'] + archived['time_sum_seconds']) / time_count,
+                'min_time_seconds': min(time_mins),
+                'max_time_seconds': max(time_maxs)
             }
         
-        # Recent attempts with user details
+        # Recent attempts with user details (the only rows fetched)
+        attempts = QuizAttempt.query.options(joinedload(QuizAttempt.user))\
+                  .filter_by(quiz_id=quiz_id)\
+                  .order_by(QuizAttempt.completed_at.desc())\
+                  .limit(10).all()
         recent_attempts = []
-        for attempt in attempts[:10]:
+        for attempt in attempts:
             recent_attempts.append({
                 'username': attempt.user.username if attempt.user else 'Anonymous',
                 'score': attempt.score,
@@ -1232,7 +4194,7 @@ def get_quiz_analytics(current_user, quiz_id):
             'error': str(e)
         }), 500
 
-@app.route('/api/quizzes/created', methods=['GET'])
+@bp.route('/api/quizzes/created', methods=['GET'])
 @token_required
 def get_created_quizzes(current_user):
     """Get quizzes created by current user with detailed stats"""
@@ -1291,7 +4253,7 @@ def get_created_quizzes(current_user):
             'error': str(e)
         }), 500
 
-@app.route('/api/quizzes/<quiz_id>', methods=['PUT', 'GET'])
+@bp.route('/api/quizzes/<quiz_id>', methods=['PUT', 'GET'])
 @token_required
 def edit_quiz(current_user, quiz_id):
     quiz = Quiz.query.filter_by(id=quiz_id, user_id=current_user.id).first()
@@ -1309,7 +4271,9 @@ def edit_quiz(current_user, quiz_id):
     if request.method == 'PUT':
         try:
             data = request.get_json()
-            print(f"Updating quiz {quiz_id}: {data}")
+            previous_key = answer_key_signature(quiz.quiz_type, json.loads(quiz.quiz_content))
+            previous_scopes = trending_scopes(quiz) if quiz.is_public else []
+            previous_facets = quiz_facet_keys(quiz)
 
             quiz.title = data.get('title', quiz.title)
             quiz.description = data.get('description', quiz.description)
@@ -1319,23 +4283,42 @@ def edit_quiz(current_user, quiz_id):
 
             # Handle tags
             if 'tags' in data:
-                quiz.tags.clear()
-                for tag_name in data['tags']:
-                    tag = Tag.query.filter_by(name=tag_name).first()
-                    if not tag:
-                        tag = Tag(name=tag_name)
-                        db.session.add(tag)
-                    quiz.tags.append(tag)
+                quiz.tags = quiz_tag_list(data['tags'], resolve_tags(data['tags']))
+            adjust_facet_counts(removed=previous_facets, added=quiz_facet_keys(quiz))
+            index_bank_questions([quiz])
 
             db.session.commit()  # 👈🏽 This is what actually saves it
-            print("PUT received for quiz:", quiz_id)
-            return jsonify({'success': True, 'quiz': quiz.to_dict()})
         except Exception as e:
-            print("Save failed:", str(e))
+            db.session.rollback()
+            current_app.logger.error(f"Saving quiz {quiz_id} failed: {str(e)}")
             return jsonify({'success': False, 'error': 'Save failed', 'details': str(e)}), 500
 
+        # The quiz is saved from here on; nothing below may report the save as failed
+        try:
+            refresh_similar_index([quiz])
+            register_quiz_signatures([quiz])
+            refresh_trending(quiz, previous_scopes)
+        except Exception as e:
+            # `flask rebuild-duplicate-index` / `flask rebuild-trending` catch up
+            db.session.rollback()
+            current_app.logger.error(f"Updating the indexes of quiz {quiz.id} failed: {str(e)}")
+
+        # Changed answers make stored attempt scores stale
+        response = {'success': True, 'quiz': quiz.to_dict()}
+        new_key = answer_key_signature(quiz.quiz_type, json.loads(quiz.quiz_content))
+        if new_key != previous_key and QuizAttempt.query.filter_by(quiz_id=quiz.id).first():
+            try:
+                job = start_regrade(quiz)
+                response['regrade_job_id'] = job.id
+                get_bulk_job_executor().submit(run_regrade_job, current_app._get_current_object(), job.id)
+            except Exception as e:
+                db.session.rollback()
+                current_app.logger.error(f"Starting the regrade of quiz {quiz.id} failed: {str(e)}")
+                response['regrade_error'] = f"Regrade not started, POST /api/quizzes/{quiz.id}/regrade to retry: {str(e)}"
+        return jsonify(response)
+
 
-@app.route('/quizzes/all', methods=['GET'])
+@bp.route('/quizzes/all', methods=['GET'])
 @token_required
 def get_user_quizzes(current_user):
     """Get all quizzes created by the current user"""
@@ -1402,13 +4385,29 @@ def get_user_quizzes(current_user):
             'details': str(e)
         }), 500
     
-@app.route('/show-all-quizzes')
+@bp.route('/show-all-quizzes')
 def show_quizzes():
-    quizzes = Quiz.query.all()
-    quizzes_data = [quiz.to_dict() for quiz in quizzes]
-    return jsonify(quizzes_data)
+    """Every quiz as one JSON array, streamed page by page so memory stays flat"""
+    def generate():
+        yield '['
+        last_id, first = None, True
+        while True:
+            query = Quiz.query.options(selectinload(Quiz.tags)).order_by(Quiz.id)
+            if last_id is not None:
+                query = query.filter(Quiz.id > last_id)
+            page = query.limit(500).all()
+            if not page:
+                break
+            for quiz in page:
+                yield ('' if first else ',') + json.dumps(quiz.to_dict())
+                first = False
+            last_id = page[-1].id
+            db.session.expunge_all()
+        yield ']'
 
-@app.route('/api/quizzes/taken', methods=['GET'])
+    return Response(stream_with_context(generate()), mimetype='application/json')
+
+@bp.route('/api/quizzes/taken', methods=['GET'])
 @token_required
 def get_taken_quizzes(current_user):
     """Get all quizzes taken by the current user"""
@@ -1439,7 +4438,7 @@ def get_taken_quizzes(current_user):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
     
-@app.route('/api/quiz-analytics/<quiz_id>', methods=['GET'])
+@bp.route('/api/quiz-analytics/<quiz_id>', methods=['GET'])
 @token_required
 def quiz_analytics(current_user, quiz_id):
 
@@ -1447,18 +4446,22 @@ def quiz_analytics(current_user, quiz_id):
     if not quiz:
         return jsonify({'success': False, 'error': 'Quiz not found'}), 404
 
-    attempts = QuizAttempt.query.filter_by(quiz_id=quiz.id).order_by(desc(QuizAttempt.completed_at)).all()
-    total_attempts = len(attempts)
-    avg_score = round(sum(a.score for a in attempts) / total_attempts, 1) if attempts else 0
+    live_attempts, live_score_sum = db.session.query(
+        func.count(QuizAttempt.id), func.coalesce(func.sum(QuizAttempt.score), 0.0)
+    ).filter(QuizAttempt.quiz_id == quiz.id).one()
+    archived = quiz_rollup_totals(quiz.id)
+    total_attempts = live_attempts + archived['attempts']
+    avg_score = round((live_score_sum + archived['score_sum']) / total_attempts, 1) if total_attempts else 0
 
+    attempts = QuizAttempt.query.options(joinedload(QuizAttempt.user)).filter_by(quiz_id=quiz.id)
     recent_attempts = [{
         'username': a.user.username if a.user else 'Anonymous',
         'score': a.score,
         'timeSpent': a.time_spent,
         'completedAt': a.completed_at.isoformat() if a.completed_at else None
-    } for a in attempts[:10]]
+    } for a in attempts.order_by(desc(QuizAttempt.completed_at)).limit(10)]
 
-    top_performers = sorted(attempts, key=lambda x: x.score, reverse=True)[:5]
+    top_performers = attempts.order_by(desc(QuizAttempt.score), desc(QuizAttempt.completed_at)).limit(5).all()
     leaderboard = [{
         'username': a.user.username if a.user else 'Anonymous',
         'score': a.score,
@@ -1483,27 +4486,32 @@ def quiz_analytics(current_user, quiz_id):
         'leaderboard': leaderboard
     })
 
-@app.route('/api/stats', methods=['GET'])
+@bp.route('/api/stats', methods=['GET'])
 def get_global_stats():
     """Get global statistics for the platform"""
     try:
-        # 1. Get total active learners (unique users who have taken quizzes)
-        active_learners = db.session.query(
-            func.count(distinct(QuizAttempt.user_id))
-        ).scalar() or 0
+        # 1. Get total active learners (unique users who have taken quizzes, live or archived)
+        learner_ids = union(select(QuizAttempt.user_id), select(UserDailyRollup.user_id)).subquery()
+        active_learners = db.session.query(func.count()).select_from(learner_ids).scalar() or 0
         
         # 2. Get total quizzes created
         quizzes_created = Quiz.query.count()
         
         # 3. Get total questions answered (sum of all questions in all attempts)
-        total_questions_answered = db.session.query(
-            func.sum(QuizAttempt.total_questions)
-        ).scalar() or 0
+        live_attempts, live_questions, live_score_sum = db.session.query(
+            func.count(QuizAttempt.id), func.coalesce(func.sum(QuizAttempt.total_questions), 0),
+            func.coalesce(func.sum(QuizAttempt.score), 0.0)
+        ).one()
+        archived_questions = db.session.query(func.coalesce(func.sum(UserDailyRollup.questions_sum), 0)).scalar()
+        total_questions_answered = live_questions + archived_questions
         
         # 4. Calculate average success rate across all attempts
-        avg_success_rate = db.session.query(
-            func.avg(QuizAttempt.score)
-        ).scalar() or 0
+        archived_attempts, archived_score_sum = db.session.query(
+            func.coalesce(func.sum(QuizDailyRollup.attempts), 0),
+            func.coalesce(func.sum(QuizDailyRollup.score_sum), 0.0)
+        ).one()
+        total_attempts = live_attempts + archived_attempts
+        avg_success_rate = (live_score_sum + archived_score_sum) / total_attempts if total_attempts else 0
         
         return jsonify({
             'success': True,
@@ -1527,11 +4535,676 @@ def get_global_stats():
             ]
         }), 500
     
-@app.route('/health', methods=['GET'])
+@bp.route('/api/grading/stats', methods=['GET'])
+@token_required
+def get_grading_stats(current_user):
+    """How many short answers this worker graded locally vs with the LLM since it started"""
+    return jsonify({'success': True, 'pid': os.getpid(), 'stats': grading_stats.snapshot()})
+
+@bp.route('/api/generation/stats', methods=['GET'])
+@token_required
+def get_generation_stats(current_user):
+    """How often this worker's generation replies were valid, repaired, partial or unusable since it started"""
+    return jsonify({'success': True, 'pid': os.getpid(), 'stats': generation_stats.snapshot()})
+
+@bp.route('/health', methods=['GET'])
 def health_check():
     return jsonify({'status': 'ok'}), 200
 
 
+# ---------------------------------------------------------------------------
+# Export & Import
+# ---------------------------------------------------------------------------
+# Exports are NDJSON: a header line, then for each page of quizzes (in id
+# order) the quiz records, optionally their attempts, and a checkpoint line
+# carrying the last quiz id. An interrupted export restarts with after=<that
+# id>; an "end" line marks a complete file. Users are referenced by username so
+# a file can be imported into another environment.
+EXPORT_FORMAT = 'quizgenie-export'
+EXPORT_VERSION = 1
+
+def _export_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+def export_records(user_id=None, include_attempts=False, after=None, page_size=500):
+    """Yield the export as dicts, reading quizzes and attempts through server-side cursors"""
+    yield {'type': 'header', 'format': EXPORT_FORMAT, 'version': EXPORT_VERSION,
+           'exported_at': datetime.utcnow().isoformat(), 'attempts': include_attempts, 'after': after}
+
+    quizzes_table, attempts_table = Quiz.__table__, QuizAttempt.__table__
+    users_table = User.__table__
+    stmt = select(quizzes_table, users_table.c.username.label('owner'))\
+        .join(users_table, users_table.c.id == quizzes_table.c.user_id)\
+        .order_by(quizzes_table.c.id)
+    if user_id is not None:
+        stmt = stmt.where(quizzes_table.c.user_id == user_id)
+    if after:
+        stmt = stmt.where(quizzes_table.c.id > after)
+
+    quiz_count = attempt_count = 0
+    for page in db.session.execute(stmt.execution_options(yield_per=page_size)).partitions():
+        quiz_ids = [row.id for row in page]
+        tag_names = {}
+        for quiz_id, name in db.session.execute(
+                select(tags.c.quiz_id, Tag.name).join(Tag, Tag.id == tags.c.tag_id)
+                .where(tags.c.quiz_id.in_(quiz_ids))):
+            tag_names.setdefault(quiz_id, []).append(name)
+
+        for row in page:
+            record = {'type': 'quiz', **{key: _export_value(value) for key, value in row._mapping.items()}}
+            record['tags'] = sorted(tag_names.get(row.id, []))
+            quiz_count += 1
+            yield record
+
+        if include_attempts:
+            attempt_stmt = select(attempts_table, users_table.c.username)\
+                .join(users_table, users_table.c.id == attempts_table.c.user_id)\
+                .where(attempts_table.c.quiz_id.in_(quiz_ids))\
+                .order_by(attempts_table.c.id)
+            for row in db.session.execute(attempt_stmt.execution_options(yield_per=page_size * 4)):
+                attempt_count += 1
+                yield {'type': 'attempt', **{key: _export_value(value) for key, value in row._mapping.items()}}
+
+        yield {'type': 'checkpoint', 'after': quiz_ids[-1], 'quizzes': quiz_count, 'attempts': attempt_count}
+
+    yield {'type': 'end', 'quizzes': quiz_count, 'attempts': attempt_count}
+
+def export_lines(**kwargs):
+    for record in export_records(**kwargs):
+        yield json.dumps(record) + '\n'
+
+@bp.route('/api/export', methods=['GET'])
+@token_required
+def export_user_data(current_user):
+    """Stream the current user's quizzes (and with ?attempts=1 their attempts) as NDJSON; resume with ?after="""
+    include_attempts = request.args.get('attempts', '').lower() in ('1', 'true', 'yes')
+    lines = export_lines(user_id=current_user.id, include_attempts=include_attempts,
+                         after=request.args.get('after') or None)
+    return Response(stream_with_context(lines), mimetype='application/x-ndjson',
+                    headers={'Content-Disposition': 'attachment; filename=quizgenie-export.ndjson'})
+
+@bp.cli.command('export-data')
+@click.argument('output', type=click.Path(dir_okay=False))
+@click.option('--attempts', 'include_attempts', is_flag=True, help='Include quiz attempts')
+@click.option('--user', 'username', help='Only export quizzes created by this user')
+@click.option('--page-size', type=int, default=500)
+def export_data_command(output, include_attempts, username, page_size):
+    """Export quizzes (and attempts) to OUTPUT as NDJSON, gzipped if it ends in .gz.
+
+    The file is written to OUTPUT.partial with a OUTPUT.checkpoint sidecar; run
+    the same command again after an interruption to continue where it stopped.
+    """
+    user_id = None
+    if username:
+        user = User.query.filter_by(username=username).first()
+        if not user:
+            raise click.BadParameter(f"Unknown user {username}")
+        user_id = user.id
+
+    partial_path, checkpoint_path = f"{output}.partial", f"{output}.checkpoint"
+    after, size, done = None, 0, {'quizzes': 0, 'attempts': 0}
+    if os.path.exists(checkpoint_path) and os.path.exists(partial_path):
+        with open(checkpoint_path, encoding='utf-8') as checkpoint_file:
+            checkpoint = json.load(checkpoint_file)
+        after, size = checkpoint['after'], checkpoint['bytes']
+        done = {'quizzes': checkpoint['quizzes'], 'attempts': checkpoint['attempts']}
+        click.echo(f"Resuming after quiz {after}")
+    with open(partial_path, 'ab') as partial_file:
+        partial_file.truncate(size)
+
+    compress = output.endswith('.gz')
+    records = export_records(user_id=user_id, include_attempts=include_attempts, after=after, page_size=page_size)
+    chunk = []
+    for record in records:
+        if record['type'] == 'header' and after:
+            continue  # The partial file already starts with a header
+        if record['type'] in ('checkpoint', 'end'):
+            record['quizzes'] += done['quizzes']
+            record['attempts'] += done['attempts']
+        chunk.append(json.dumps(record) + '\n')
+        if record['type'] not in ('checkpoint', 'end'):
+            continue
+        # One gzip member per page, so the file can be cut back to any checkpoint
+        data = ''.join(chunk).encode('utf-8')
+        with open(partial_path, 'ab') as partial_file:
+            partial_file.write(gzip.compress(data) if compress else data)
+            partial_file.flush()
+            os.fsync(partial_file.fileno())
+            size = partial_file.tell()
+        chunk = []
+        if record['type'] == 'checkpoint':
+            with open(checkpoint_path, 'w', encoding='utf-8') as checkpoint_file:
+                json.dump({'after': record['after'], 'bytes': size,
+                           'quizzes': record['quizzes'], 'attempts': record['attempts']}, checkpoint_file)
+
+    os.replace(partial_path, output)
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    click.echo(f"Exported {record['quizzes']} quizzes and {record['attempts']} attempts to {output}")
+
+def _import_datetime(value):
+    return datetime.fromisoformat(value) if value else None
+
+def import_batch(records, default_user_id=None):
+    """Insert one batch of quiz / attempt records; returns per-kind counts. The caller commits."""
+    counts = {'quizzes': 0, 'attempts': 0, 'existing_quizzes': 0, 'skipped': 0}
+    quiz_records = [record for record in records if record['type'] == 'quiz']
+    attempt_records = [record for record in records if record['type'] == 'attempt']
+
+    usernames = {record.get('owner') for record in quiz_records} | \
+                {record.get('username') for record in attempt_records}
+    user_ids = dict(db.session.query(User.username, User.id).filter(User.username.in_(usernames - {None})).all())
+
+    def local_user(username):
+        return user_ids.get(username, default_user_id)
+
+    existing = {row[0] for row in db.session.query(Quiz.id).filter(
+        Quiz.id.in_([record['id'] for record in quiz_records]))}
+    quiz_rows, tag_links = [], []
+    for record in quiz_records:
+        if record['id'] in existing:
+            counts['existing_quizzes'] += 1
+            continue
+        owner_id = local_user(record.get('owner'))
+        if owner_id is None:
+            counts['skipped'] += 1
+            continue
+        quiz_rows.append({
+            'id': record['id'], 'original_text': record['original_text'], 'quiz_content': record['quiz_content'],
+            'quiz_type': record['quiz_type'], 'created_at': _import_datetime(record.get('created_at')),
+            'is_public': record.get('is_public', True), 'title': record.get('title'),
+            'description': record.get('description'), 'difficulty': record.get('difficulty'),
+            'plays': record.get('plays') or 0, 'rating': record.get('rating') or 0.0, 'user_id': owner_id
+        })
+        tag_links.extend((record['id'], name) for name in record.get('tags') or [])
+
+    links = set()
+    if quiz_rows:
+        db.session.execute(Quiz.__table__.insert(), quiz_rows)
+        counts['quizzes'] = len(quiz_rows)
+    if tag_links:
+        tag_map = resolve_tags(name for _, name in tag_links)
+        db.session.flush()
+        links = {(quiz_id, tag_map[normalize_tag_name(name)].id) for quiz_id, name in tag_links
+                 if normalize_tag_name(name) in tag_map}
+        db.session.execute(tags.insert(), [{'quiz_id': quiz_id, 'tag_id': tag_id} for quiz_id, tag_id in links])
+    quiz_tag_ids = {}
+    for quiz_id, tag_id in links:
+        quiz_tag_ids.setdefault(quiz_id, []).append(tag_id)
+    adjust_facet_counts(added=[key for row in quiz_rows for key in
+                               facet_keys(row['is_public'], row['difficulty'], quiz_tag_ids.get(row['id'], []))])
+    index_bank_questions([SimpleNamespace(**row) for row in quiz_rows], quiz_tag_ids)
+
+    known_quizzes = {row[0] for row in db.session.query(Quiz.id).filter(
+        Quiz.id.in_({record['quiz_id'] for record in attempt_records}))}
+    attempt_rows, score_totals = [], {}
+    for record in attempt_records:
+        user_id = local_user(record.get('username'))
+        if user_id is None or record['quiz_id'] not in known_quizzes:
+            counts['skipped'] += 1
+            continue
+        attempt_rows.append({
+            'user_id': user_id, 'quiz_id': record['quiz_id'], 'score': record['score'],
+            'correct_answers': record['correct_answers'], 'total_questions': record['total_questions'],
+            'completed_at': _import_datetime(record.get('completed_at')), 'time_spent': record.get('time_spent'),
+            'time_spent_seconds': parse_time_spent(record.get('time_spent')),
+            'user_answers': record.get('user_answers'), 'details': record.get('details')
+        })
+        score_totals[user_id] = score_totals.get(user_id, 0) + record['score']
+
+    if attempt_rows:
+        attempt_table = QuizAttempt.__table__
+        attempt_ids = db.session.execute(attempt_table.insert().returning(attempt_table.c.id,
+                                                                         sort_by_parameter_order=True),
+                                         attempt_rows).scalars().all()
+        record_quiz_summaries(SimpleNamespace(id=attempt_id, **row)
+                              for attempt_id, row in zip(attempt_ids, attempt_rows))
+        users = User.__table__
+        db.session.execute(
+            users.update().where(users.c.id == bindparam('user_id')).values(
+                total_score=func.coalesce(users.c.total_score, 0) + bindparam('delta')),
+            [{'user_id': user_id, 'delta': delta} for user_id, delta in score_totals.items()]
+        )
+        counts['attempts'] = len(attempt_rows)
+    return counts
+
+def import_lines(lines, batch_size=1000, default_user_id=None, echo=print):
+    """Import an export from an iterable of lines, committing a checkpoint with every batch.
+
+    Running it again on the same file continues after the last committed batch.
+    """
+    lines = iter(lines)
+    header_line = next(lines, '').strip()
+    header = json.loads(header_line) if header_line else {}
+    if header.get('type') != 'header' or header.get('format') != EXPORT_FORMAT:
+        raise ValueError('Not a QuizGenie export file')
+    if header.get('version') != EXPORT_VERSION:
+        raise ValueError(f"Unsupported export version {header.get('version')}")
+
+    name = hashlib.sha256(header_line.encode('utf-8')).hexdigest()
+    checkpoint = db.session.get(TransferCheckpoint, name)
+    if checkpoint is None:
+        checkpoint = TransferCheckpoint(name=name, position=1)
+        db.session.add(checkpoint)
+        db.session.commit()
+    elif checkpoint.completed_at:
+        echo('This export was already imported')
+        return {}
+    elif checkpoint.position > 1:
+        echo(f"Resuming at line {checkpoint.position + 1}")
+
+    totals = {'quizzes': 0, 'attempts': 0, 'existing_quizzes': 0, 'skipped': 0}
+    position, complete, batch = 1, False, []
+
+    def flush(batch, position):
+        for key, value in import_batch(batch, default_user_id).items():
+            totals[key] += value
+        checkpoint.position = position
+        db.session.commit()
+        db.session.expunge_all()
+        db.session.add(checkpoint)
+        echo(f"  line {position}: {totals['quizzes']} quizzes, {totals['attempts']} attempts")
+
+    for line in lines:
+        position += 1
+        if position <= checkpoint.position or not line.strip():
+            continue
+        record = json.loads(line)
+        if record['type'] == 'end':
+            complete = True
+        elif record['type'] in ('quiz', 'attempt'):
+            batch.append(record)
+        if len(batch) >= batch_size:
+            flush(batch, position)
+            batch = []
+
+    if batch or position > checkpoint.position:
+        flush(batch, position)
+    if complete:
+        checkpoint.completed_at = datetime.utcnow()
+        db.session.commit()
+    else:
+        echo('Warning: the file has no end marker; it may be a truncated export')
+    return totals
+
+@bp.cli.command('import-data')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', type=int, default=1000)
+@click.option('--default-user', 'default_username',
+              help='Assign quizzes and attempts of users missing here to this user instead of skipping them')
+def import_data_command(path, batch_size, default_username):
+    """Import an NDJSON export (plain or .gz); safe to re-run after an interruption"""
+    default_user_id = None
+    if default_username:
+        user = User.query.filter_by(username=default_username).first()
+        if not user:
+            raise click.BadParameter(f"Unknown user {default_username}")
+        default_user_id = user.id
+
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as lines:
+        totals = import_lines(lines, batch_size, default_user_id, echo=click.echo)
+    if totals:
+        click.echo(f"Imported {totals['quizzes']} quizzes and {totals['attempts']} attempts "
+                   f"({totals['existing_quizzes']} quizzes already present, {totals['skipped']} records skipped)")
+        if totals['attempts']:
+            click.echo("Run `flask rebuild-question-stats` to include the imported attempts in item analysis")
+            click.echo("Run `flask rebuild-trending` to include them in trending")
+
+
+# ---------------------------------------------------------------------------
+# Response Compression
+# ---------------------------------------------------------------------------
+# JSON bodies of COMPRESS_MIN_BYTES or more are sent brotli- or gzip-encoded
+# when the client's Accept-Encoding allows it (browsers always do). Smaller
+# bodies aren't worth the CPU, and streamed responses (exports,
+# /show-all-quizzes) are passed through untouched.
+@bp.after_app_request
+def compress_response(response):
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers or not is_compressible(response.mimetype)):
+        return response
+    min_bytes = current_app.config['COMPRESS_MIN_BYTES']
+    if min_bytes < 0 or (response.content_length or 0) < min_bytes:
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+    if encoding:
+        response.set_data(compress(response.get_data(), encoding))
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+
+# ---------------------------------------------------------------------------
+# Synthetic Data & Benchmarks
+# ---------------------------------------------------------------------------
+def _synthetic_question_pool(rng, quiz_type, size=200):
+    """Pre-serialized quiz_content blobs reused across synthetic quizzes"""
+    words = ['energy', 'cell', 'planet', 'empire', 'market', 'atom', 'river', 'theory',
+             'protein', 'climate', 'algorithm', 'novel', 'treaty', 'circuit', 'galaxy']
+    pool = []
+    for _ in range(size):
+        questions = []
+        for index in range(rng.randint(3, 10)):
+            answer = rng.choice(words)
+            question = {
+                'question': f"Question {index + 1} about {rng.choice(words)} and {rng.choice(words)}?",
+                'answer': answer if quiz_type == 'short_answer' else 'a',
+                'explanation': f"The passage describes the {answer}.",
+                'difficulty': rng.choice(['Easy', 'Medium', 'Hard'])
+            }
+            if quiz_type == 'mcq':
+                question['options'] = ['a', 'b', 'c', 'd']
+            questions.append(question)
+        pool.append((json.dumps(questions), len(questions)))
+    return pool
+
+def seed_synthetic_data(users, quizzes, attempts, tag_count, batch_size=10000, seed=42, echo=print):
+    """Bulk-insert a synthetic dataset (users, tags, quizzes with tags, attempts)"""
+    rng = random.Random(seed)
+    run = uuid.UUID(int=rng.getrandbits(128)).hex[:6]
+    now = datetime.utcnow()
+    password = generate_password_hash('benchmark')
+
+    def insert_batches(table, rows_iter, label):
+        batch, total = [], 0
+        for row in rows_iter:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                db.session.execute(table.insert(), batch)
+                db.session.commit()
+                total += len(batch)
+                batch = []
+                echo(f"  {label}: {total}")
+        if batch:
+            db.session.execute(table.insert(), batch)
+            db.session.commit()
+            total += len(batch)
+        echo(f"  {label}: {total} done")
+
+    insert_batches(User.__table__, ({
+        'username': f"bench{run}_{i}",
+        'email': f"bench{run}_{i}@example.com",
+        'password': password,
+        'created_at': now - timedelta(days=rng.randint(0, 730)),
+        'total_score': 0,
+        'badge': 'Member'
+    } for i in range(users)), 'users')
+    user_ids = [row[0] for row in db.session.query(User.id).filter(User.username.like(f"bench{run}_%"))]
+
+    insert_batches(Tag.__table__, ({'name': f"topic-{run}-{i}"} for i in range(tag_count)), 'tags')
+    tag_ids = [row[0] for row in db.session.query(Tag.id).filter(Tag.name.like(f"topic-{run}-%"))]
+
+    pools = {'mcq': _synthetic_question_pool(rng, 'mcq'),
+             'short_answer': _synthetic_question_pool(rng, 'short_answer')}
+    quiz_refs = []  # (quiz_id, quiz_type, question_count)
+
+    def quiz_rows():
+        for i in range(quizzes):
+            quiz_type = 'mcq' if rng.random() < 0.8 else 'short_answer'
+            content, question_count = rng.choice(pools[quiz_type])
+            quiz_id = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+            quiz_refs.append((quiz_id, quiz_type, question_count))
+            yield {
+                'id': quiz_id,
+                'original_text': f"Synthetic passage {i} " * 20,
+                'quiz_content': content,
+                'quiz_type': quiz_type,
+                'created_at': now - timedelta(minutes=rng.randint(0, 525600)),
+                'is_public': rng.random() < 0.9,
+                'title': f"Synthetic Quiz {i}",
+                'description': 'Generated for benchmarking',
+                'difficulty': rng.choice(['Easy', 'Medium', 'Hard']),
+                'plays': 0,
+                'rating': 0.0,
+                'user_id': rng.choice(user_ids)
+            }
+
+    insert_batches(Quiz.__table__, quiz_rows(), 'quizzes')
+
+    if tag_ids:
+        insert_batches(tags, ({'quiz_id': quiz_id, 'tag_id': tag_id}
+                              for quiz_id, _, _ in quiz_refs
+                              for tag_id in rng.sample(tag_ids, min(len(tag_ids), rng.randint(1, 4)))),
+                       'quiz tags')
+
+    def attempt_rows():
+        for _ in range(attempts):
+            # Skew toward a popular head of quizzes, like real traffic
+            quiz_id, _, question_count = quiz_refs[int(len(quiz_refs) * rng.random() ** 3)]
+            correct = rng.randint(0, question_count)
+            minutes, seconds = rng.randint(0, 14), rng.randint(0, 59)
+            yield {
+                'user_id': rng.choice(user_ids),
+                'quiz_id': quiz_id,
+                'score': correct / question_count * 100,
+                'correct_answers': correct,
+                'total_questions': question_count,
+                'completed_at': now - timedelta(minutes=rng.randint(0, 525600)),
+                'time_spent': f"{minutes:02d}:{seconds:02d}",
+                'time_spent_seconds': minutes * 60 + seconds,
+                'user_answers': json.dumps({str(i): 'a' for i in range(question_count)}),
+                'details': json.dumps([{'is_correct': i < correct, 'verdict': 'exact match'}
+                                       for i in range(question_count)])
+            }
+
+    if quiz_refs and user_ids:
+        insert_batches(QuizAttempt.__table__, attempt_rows(), 'attempts')
+
+@bp.cli.command('seed-synthetic')
+@click.option('--users', type=int, default=1000)
+@click.option('--quizzes', type=int, default=5000)
+@click.option('--attempts', type=int, default=50000)
+@click.option('--tags', 'tag_count', type=int, default=200)
+@click.option('--batch-size', type=int, default=10000)
+@click.option('--seed', type=int, default=42)
+def seed_synthetic_command(users, quizzes, attempts, tag_count, batch_size, seed):
+    """Seed a synthetic dataset for benchmarks, e.g. --users 100000 --quizzes 500000 --attempts 5000000"""
+    db.create_all()
+    started = time.perf_counter()
+    seed_synthetic_data(users, quizzes, attempts, tag_count, batch_size, seed, echo=click.echo)
+    rebuild_trending(batch_size, echo=click.echo)
+    rebuild_tag_facets()
+    click.echo(f"Seeded in {time.perf_counter() - started:.1f}s")
+
+def benchmark_fixtures(sample_size=200):
+    """IDs and auth headers the benchmark scenarios pick from"""
+    def sample(quiz_type):
+        rows = db.session.query(Quiz.id, Quiz.user_id, Quiz.quiz_content)\
+                 .filter(Quiz.quiz_type == quiz_type, Quiz.is_public.is_(True))\
+                 .limit(sample_size).all()
+        return [{'id': quiz_id, 'user_id': user_id, 'question_count': len(json.loads(content))}
+                for quiz_id, user_id, content in rows]
+
+    # Scenarios run on worker threads without an app context
+    secret_key = current_app.config['SECRET_KEY']
+    headers_cache = {}
+    def auth(user_id):
+        if user_id not in headers_cache:
+            token = jwt.encode({'id': user_id, 'exp': datetime.utcnow() + timedelta(hours=24)}, secret_key)
+            headers_cache[user_id] = {'Authorization': f'Bearer {token}'}
+        return headers_cache[user_id]
+
+    # Users with attempts exercise the heavy paths of /get-user-data
+    user_ids = [row[0] for row in db.session.query(QuizAttempt.user_id).distinct().limit(sample_size)]
+    return {
+        'mcq_quizzes': sample('mcq'),
+        'short_answer_quizzes': sample('short_answer'),
+        'user_ids': user_ids or [row[0] for row in db.session.query(User.id).limit(sample_size)],
+        'tags': [row[0] for row in db.session.query(Tag.name).limit(sample_size)],
+        'auth': auth,
+        'dataset': {
+            'users': User.query.count(),
+            'quizzes': Quiz.query.count(),
+            'attempts': QuizAttempt.query.count(),
+            'tags': Tag.query.count()
+        }
+    }
+
+@bp.cli.command('benchmark')
+@click.option('--scenario', 'scenario_names', multiple=True,
+              help='Scenario to run (repeatable); defaults to all of them')
+@click.option('--requests', type=int, default=200, help='Requests per scenario')
+@click.option('--concurrency', type=int, default=8)
+@click.option('--seed', type=int, default=1)
+@click.option('--output', type=click.Path(dir_okay=False), help='Write the JSON report here')
+@click.option('--baseline', type=click.Path(exists=True, dir_okay=False),
+              help='Previous JSON report to compare against')
+@click.option('--threshold', type=float, default=0.2, help='Allowed relative regression vs the baseline')
+@click.option('--server', type=click.Choice(['wsgi', 'asgi']), default='wsgi',
+              help='Drive the Flask app directly or through the async endpoints in asgi.py')
+def benchmark_command(scenario_names, requests, concurrency, seed, output, baseline, threshold, server):
+    """Run the end-to-end benchmark scenarios against the configured database"""
+    import benchmark
+
+    names = list(scenario_names) or list(benchmark.SCENARIOS)
+    unknown = [name for name in names if name not in benchmark.SCENARIOS]
+    if unknown:
+        raise click.BadParameter(f"Unknown scenario(s): {', '.join(unknown)}")
+    if 'short_answer_submit' in names and current_app.config['LLM_BACKEND'] in ('openai', 'record'):
+        raise click.UsageError('short_answer_submit calls the LLM; run it with LLM_BACKEND=stub or replay')
+
+    fixtures = benchmark_fixtures()
+    if not fixtures['mcq_quizzes'] or not fixtures['user_ids']:
+        raise click.UsageError('No data to benchmark; run `flask seed-synthetic` first')
+    if not fixtures['short_answer_quizzes']:
+        names = [name for name in names if name != 'short_answer_submit']
+
+    report = benchmark.run_benchmark(current_app._get_current_object(), db.engine, fixtures, names,
+                                     requests, concurrency, seed, server)
+    report['grading'] = grading_stats.snapshot()
+    click.echo(benchmark.format_report(report))
+    if report['grading']['answers']:
+        click.echo(f"Short answers graded locally: {report['grading']['local_share'] * 100:.1f}%")
+    if output:
+        benchmark.write_report(report, output)
+        click.echo(f"Report written to {output}")
+    if baseline:
+        with open(baseline, encoding='utf-8') as baseline_file:
+            regressions = benchmark.compare_reports(json.load(baseline_file), report, threshold)
+        for regression in regressions:
+            click.echo(f"REGRESSION {regression}")
+        if regressions:
+            raise SystemExit(1)
+
+@bp.cli.command('benchmark-payloads')
+@click.option('--user-id', type=int, help='User whose data is fetched; defaults to the one with the most quizzes')
+@click.option('--repeat', type=int, default=10, help='Serializations / compressions timed per payload')
+@click.option('--output', type=click.Path(dir_okay=False), help='Write the JSON report here')
+def benchmark_payloads_command(user_id, repeat, output):
+    """Measure response sizes and JSON / compression CPU of the largest endpoints"""
+    import benchmark
+
+    if user_id is None:
+        user_id = db.session.query(Quiz.user_id).group_by(Quiz.user_id)\
+                    .order_by(func.count().desc()).limit(1).scalar()
+    if user_id is None:
+        raise click.UsageError('No data to benchmark; run `flask seed-synthetic` first')
+    headers = benchmark_fixtures()['auth'](user_id)
+    endpoints = [
+        ('user_data', '/get-user-data', headers),
+        ('quiz_history', '/api/user/quiz-history?limit=100', headers),
+        ('discover', '/api/quizzes?sort=newest', None)
+    ]
+    report = benchmark.run_payload_benchmark(current_app._get_current_object(), endpoints, repeat)
+    report['meta']['user_id'] = user_id
+    click.echo(benchmark.format_payload_report(report))
+    if output:
+        benchmark.write_report(report, output)
+        click.echo(f"Report written to {output}")
+
+@bp.cli.command('benchmark-live')
+@click.option('--participants', type=int, default=1000, help='Participants holding an SSE stream')
+@click.option('--guests', type=float, default=0.0, help='Share of participants joining without an account')
+@click.option('--quiz-id', help='Multiple-choice quiz to play; defaults to the one with the most plays')
+@click.option('--seed', type=int, default=1)
+@click.option('--output', type=click.Path(dir_okay=False), help='Write the JSON report here')
+def benchmark_live_command(participants, guests, quiz_id, seed, output):
+    """Play a live session through asgi.py: fan-out, answer ingestion and the final save (stores attempts)"""
+    import asgi
+    import benchmark
+
+    if quiz_id is None:
+        quiz_id = db.session.query(Quiz.id).filter(Quiz.quiz_type.in_(LIVE_QUIZ_TYPES))\
+                    .order_by(Quiz.plays.desc()).limit(1).scalar()
+    quiz = db.session.get(Quiz, quiz_id) if quiz_id else None
+    if quiz is None:
+        raise click.UsageError('No multiple-choice quiz to play; run `flask seed-synthetic` first')
+    signed_in = participants - round(participants * guests)
+    user_ids = [user_id for user_id, in db.session.query(User.id).filter(User.id != quiz.user_id)
+                                                  .order_by(User.id).limit(signed_in)]
+    auth = benchmark_fixtures()['auth']
+    db.session.remove()  # The session's database steps run on asgi.py's threads
+
+    report = benchmark.run_live_benchmark(asgi.application, quiz_id, auth(quiz.user_id),
+                                          [auth(user_id) for user_id in user_ids],
+                                          guests=participants - len(user_ids), seed=seed)
+    click.echo(benchmark.format_live_report(report))
+    if output:
+        benchmark.write_report(report, output)
+        click.echo(f"Report written to {output}")
+
+# ---------------------------------------------------------------------------
+# Application Factory
+# ---------------------------------------------------------------------------
+def create_app(test_config=None):
+    """Build the Flask app. Creating it touches neither the database nor the LLM provider."""
+    app = Flask(__name__)
+
+    # Configuration
+    app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key')
+    app.config['OPENAI_API_KEY'] = os.getenv('OPENAI_API_KEY')
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///quizzes.db'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['ATTEMPT_RETENTION_DAYS'] = int(os.getenv('ATTEMPT_RETENTION_DAYS', 90))
+    app.config['ATTEMPT_ARCHIVE_MODE'] = os.getenv('ATTEMPT_ARCHIVE_MODE', 'table')  # 'table' or 'ndjson'
+    app.config['ATTEMPT_ARCHIVE_DIR'] = os.getenv('ATTEMPT_ARCHIVE_DIR', 'archive')
+    app.config['LLM_MAX_CONCURRENCY'] = int(os.getenv('LLM_MAX_CONCURRENCY', 8))
+    app.config['LLM_REQUESTS_PER_MINUTE'] = int(os.getenv('LLM_REQUESTS_PER_MINUTE', 3500))
+    app.config['LLM_TOKENS_PER_MINUTE'] = int(os.getenv('LLM_TOKENS_PER_MINUTE', 90000))
+    app.config['LLM_RATE_LIMIT_DB'] = os.getenv('LLM_RATE_LIMIT_DB', DEFAULT_STORE_PATH)
+    app.config['LLM_BACKEND'] = os.getenv('LLM_BACKEND', 'openai')  # openai, record, replay or stub
+    app.config['LLM_RECORDINGS_DIR'] = os.getenv('LLM_RECORDINGS_DIR', 'llm_recordings')
+    app.config['LLM_STUB_LATENCY_MS'] = int(os.getenv('LLM_STUB_LATENCY_MS', 0))
+    app.config['LLM_STUB_JITTER_MS'] = int(os.getenv('LLM_STUB_JITTER_MS', 0))
+    app.config['BULK_GENERATION_MAX_ITEMS'] = int(os.getenv('BULK_GENERATION_MAX_ITEMS', 50))
+    app.config['BULK_GENERATION_PERSIST_BATCH'] = int(os.getenv('BULK_GENERATION_PERSIST_BATCH', 5))
+    app.config['REGRADE_BATCH_SIZE'] = int(os.getenv('REGRADE_BATCH_SIZE', 1000))
+    app.config['SIMILAR_INDEX_PATH'] = os.getenv('SIMILAR_INDEX_PATH', 'similar_index.npz')
+    app.config['SIMILAR_INDEX_K'] = int(os.getenv('SIMILAR_INDEX_K', 10))
+    app.config['TRENDING_HALF_LIFE_HOURS'] = float(os.getenv('TRENDING_HALF_LIFE_HOURS', 48))
+    app.config['TRENDING_TOP_N'] = int(os.getenv('TRENDING_TOP_N', 100))
+    app.config['TAG_FACETS_CACHE_SECONDS'] = int(os.getenv('TAG_FACETS_CACHE_SECONDS', 30))
+    app.config['GENERATION_PASSAGE_TOKENS'] = int(os.getenv('GENERATION_PASSAGE_TOKENS', 3000))
+    app.config['GENERATION_TOKENS_PER_QUESTION'] = int(os.getenv('GENERATION_TOKENS_PER_QUESTION', 160))
+    app.config['GENERATION_REPAIR_ROUNDS'] = int(os.getenv('GENERATION_REPAIR_ROUNDS', 1))  # Follow-up requests
+    app.config['QUESTION_BANK_MAX_QUESTIONS'] = int(os.getenv('QUESTION_BANK_MAX_QUESTIONS', 50))  # Per assembled quiz
+    app.config['JSON_PROVIDER'] = os.getenv('JSON_PROVIDER', 'orjson')  # or 'stdlib'
+    app.config['COMPRESS_MIN_BYTES'] = int(os.getenv('COMPRESS_MIN_BYTES', 1024))  # -1 disables compression
+    app.config['LIVE_QUESTION_SECONDS'] = int(os.getenv('LIVE_QUESTION_SECONDS', 20))
+    app.config['LIVE_MAX_PARTICIPANTS'] = int(os.getenv('LIVE_MAX_PARTICIPANTS', 2000))
+    app.config['OUTBOX_WORKER'] = os.getenv('OUTBOX_WORKER', 'thread')  # 'thread', 'inline' or 'off'
+    app.config['OUTBOX_BATCH_SIZE'] = int(os.getenv('OUTBOX_BATCH_SIZE', 100))
+    app.config['OUTBOX_POLL_SECONDS'] = float(os.getenv('OUTBOX_POLL_SECONDS', 5))
+    app.config['OUTBOX_MAX_ATTEMPTS'] = int(os.getenv('OUTBOX_MAX_ATTEMPTS', 10))
+    if test_config:
+        app.config.update(test_config)
+
+    if app.config['JSON_PROVIDER'] == 'orjson':
+        app.json = OrjsonProvider(app)
+
+    CORS(app, resources={r"/*": {"origins": CORS_ORIGINS}}, supports_credentials=True)
+
+    db.init_app(app)
+    migrate.init_app(app, db)
+    app.teardown_appcontext(shutdown_session)
+    app.register_blueprint(bp)
+    return app
+
+# Module-level app for `gunicorn app:app` / `flask --app app`
+app = create_app()
+
 if __name__ == '__main__':
     with app.app_context():
         port = int(os.environ.get('PORT', 5000))
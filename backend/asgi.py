@@ -0,0 +1,394 @@
+"""ASGI entry point with async versions of the LLM-bound endpoints.
+
+/generate-quiz and /submit-quiz spend nearly all of their wall time waiting on
+the LLM. Here they run as coroutines: provider calls go through the async client
+(and the shared rate-limit scheduler), while the short database reads and writes
+are offloaded to threads. A single process can therefore hold hundreds of
+in-flight generations and gradings instead of one per sync worker. Every other
+route is served by the regular Flask app through asgiref's WSGI adapter.
+
+Run with uvicorn directly:
+
+    uvicorn asgi:application --host 0.0.0.0 --port $PORT --workers 2
+
+or under gunicorn's process management:
+
+    gunicorn -k uvicorn.workers.UvicornWorker -w 2 --timeout 120 asgi:application
+
+DB_THREADS bounds the threads used for database work (default 32); the number
+of concurrent LLM waits is bounded only by the rate-limit scheduler.
+
+Live sessions (/live/...) are served only here: a host runs a quiz question by
+question and participants follow it over Server-Sent Events (see
+live_sessions.py). A session lives in the memory of the process that created
+it, so route /live/ to a single worker (or pin each join code to one):
+
+    POST /live/sessions            host: {quiz_id, time_limit?} -> {code}
+    GET  /live/<code>              state snapshot (?participant=<token> adds yours)
+    POST /live/<code>/join         {name}; signed-in users are stored at the end
+    GET  /live/<code>/events       SSE stream (?participant=<token>)
+    POST /live/<code>/answer       {participant_token, question, answer}
+    POST /live/<code>/next         host: close the open question, open the next
+    POST /live/<code>/close        host: close the open question early
+    POST /live/<code>/end          host: final leaderboard, attempts saved
+"""
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+from asgiref.sync import ThreadSensitiveContext
+from asgiref.wsgi import WsgiToAsgi
+
+import app as quizgenie
+from live_sessions import LiveSessionError, LiveSessionRegistry, sse_frame
+from llm_scheduler import PRIORITY_GENERATION
+
+SSE_HEARTBEAT_SECONDS = 15  # Comment line that keeps proxies from closing idle streams
+
+
+async def read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+
+class AsyncEndpoints:
+    """ASGI app: async generate/submit handlers in front of the WSGI Flask app"""
+
+    def __init__(self, flask_app, db_threads=32):
+        self.flask_app = flask_app
+        self.wsgi = WsgiToAsgi(flask_app)
+        self.db_executor = ThreadPoolExecutor(max_workers=db_threads, thread_name_prefix='asgi-db')
+        self.routes = {
+            ('POST', '/generate-quiz'): self.generate_quiz,
+            ('POST', '/submit-quiz'): self.submit_quiz,
+        }
+        self.live_sessions = LiveSessionRegistry()
+        self.live_routes = {
+            ('POST', 'sessions'): self.live_create,
+            ('GET', None): self.live_state,
+            ('POST', 'join'): self.live_join,
+            ('POST', 'answer'): self.live_answer,
+            ('POST', 'next'): self.live_next,
+            ('POST', 'close'): self.live_close,
+            ('POST', 'end'): self.live_end,
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] == 'http' and scope['path'].startswith('/live/'):
+            return await self.live(scope, receive, send)
+
+        handler = self.routes.get((scope.get('method'), scope.get('path'))) if scope['type'] == 'http' else None
+        if handler is None:
+            # Each WSGI request gets its own thread instead of asgiref's single shared one
+            async with ThreadSensitiveContext():
+                return await self.wsgi(scope, receive, send)
+
+        headers = {key.decode('latin-1').lower(): value.decode('latin-1') for key, value in scope['headers']}
+        try:
+            data = json.loads(await read_body(receive) or b'null')
+        except ValueError:
+            data = None
+        status, payload = await handler(headers, data if isinstance(data, dict) else {})
+        await self.respond(send, status, payload, headers.get('origin'))
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.db_executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def cors_headers(self, origin):
+        if origin not in quizgenie.CORS_ORIGINS:
+            return []
+        return [(b'access-control-allow-origin', origin.encode('latin-1')),
+                (b'access-control-allow-credentials', b'true'),
+                (b'vary', b'Origin')]
+
+    async def respond(self, send, status, payload, origin):
+        body = json.dumps(payload).encode('utf-8')
+        headers = [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())]
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers + self.cors_headers(origin)})
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def run_db(self, fn, *args):
+        """Run fn(*args) in an app context on the DB thread pool (fresh session per call)"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.db_executor, quizgenie.in_app_context, self.flask_app, fn, *args)
+
+    def authenticate(self, headers):
+        return quizgenie.decode_auth_header(headers.get('authorization'), self.flask_app.config['SECRET_KEY'])
+
+    async def generate_quiz(self, headers, data):
+        user_id, error = self.authenticate(headers)
+        if error:
+            return error[1], error[0]
+
+        text = data.get('text')
+        quiz_type = data.get('type', 'mcq')
+        num_questions = data.get('num_questions', 5)
+        is_public = data.get('is_public', True)
+        if not text:
+            return 400, {'error': 'Text input is required'}
+        if not await self.run_db(user_exists, user_id):
+            return 404, {'error': 'User not found'}
+        if data.get('offer_existing'):
+            existing = await self.run_db(quizgenie.existing_quiz_offer, text, user_id)
+            if existing:
+                return 409, {'error': 'A near-identical quiz already exists', 'duplicates': existing}
+
+        try:
+            package = await quizgenie.agenerate_quiz_package(self.flask_app, text, quiz_type, num_questions,
+                                                             PRIORITY_GENERATION)
+            return 200, await self.run_db(save_generated_quiz, user_id, text, quiz_type, is_public, package)
+        except Exception as e:
+            self.flask_app.logger.error(f"Quiz generation failed: {str(e)}")
+            return 500, {'error': f"Quiz generation failed: {str(e)}"}
+
+    async def submit_quiz(self, headers, data):
+        user_id, error = self.authenticate(headers)
+        if error:
+            return error[1], error[0]
+
+        quiz_id = data.get('quiz_id')
+        answers = data.get('answers')
+        time_spent = data.get('time_spent', '00:00')
+        if not quiz_id or not answers:
+            return 400, {'error': 'Missing quiz ID or answers'}
+
+        quiz = await self.run_db(load_quiz_for_grading, quiz_id)
+        if quiz is None:
+            return 404, {'error': 'Quiz not found'}
+        if not await self.run_db(user_exists, user_id):
+            return 404, {'error': 'User not found'}
+
+        # All short answers of the attempt are graded concurrently
+        grading = quizgenie.short_answer_grading_messages(quiz['quiz_type'], quiz['quiz_content'], answers)
+        usage = quizgenie.TokenUsage()
+        replies = await asyncio.gather(*(quizgenie.agrade_short_answer(self.flask_app, messages, usage)
+                                         for messages in grading.values()))
+        llm_replies = dict(zip(grading.keys(), replies))
+
+        return 200, await self.run_db(record_attempt, user_id, quiz_id, answers, time_spent, llm_replies, usage)
+
+    # Live sessions -----------------------------------------------------------
+    async def live(self, scope, receive, send):
+        headers = {key.decode('latin-1').lower(): value.decode('latin-1') for key, value in scope['headers']}
+        origin = headers.get('origin')
+        method = scope['method']
+        if method == 'OPTIONS':
+            return await self.preflight(send, origin)
+
+        parts = scope['path'].strip('/').split('/')[1:]
+        query = {key: values[0] for key, values in parse_qs(scope.get('query_string', b'').decode()).items()}
+        if parts == ['sessions']:
+            session, action = None, 'sessions'
+        else:
+            session = self.live_sessions.get(parts[0]) if parts and len(parts) <= 2 else None
+            action = parts[1] if len(parts) == 2 else None
+            if session is None:
+                return await self.respond(send, 404, {'error': 'Live session not found'}, origin)
+
+        if method == 'GET' and action == 'events':
+            participant = session.participant(query.get('participant'))
+            return await self.live_events(receive, send, session, participant, headers.get('last-event-id'), origin)
+        handler = self.live_routes.get((method, action))
+        if handler is None:
+            return await self.respond(send, 404, {'error': 'Not found'}, origin)
+
+        data = {}
+        if method == 'POST':
+            try:
+                data = json.loads(await read_body(receive) or b'null')
+            except ValueError:
+                data = None
+        try:
+            status, payload = await handler(session, headers, data if isinstance(data, dict) else {}, query)
+        except LiveSessionError as e:
+            status, payload = e.status, {'error': str(e)}
+        await self.respond(send, status, payload, origin)
+
+    async def preflight(self, send, origin):
+        headers = self.cors_headers(origin)
+        if headers:
+            headers += [(b'access-control-allow-methods', b'GET, POST, OPTIONS'),
+                        (b'access-control-allow-headers', b'Authorization, Content-Type, Last-Event-ID'),
+                        (b'access-control-max-age', b'600')]
+        await send({'type': 'http.response.start', 'status': 204, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': b''})
+
+    def host_error(self, session, headers):
+        """None when the request comes from the session's host, else (status, body)"""
+        user_id, error = self.authenticate(headers)
+        if error:
+            return error[1], error[0]
+        if user_id != session.host_id:
+            return 403, {'error': 'Only the host can do this'}
+        return None
+
+    async def live_create(self, session, headers, data, query):
+        user_id, error = self.authenticate(headers)
+        if error:
+            return error[1], error[0]
+        config = self.flask_app.config
+        try:
+            time_limit = min(max(int(data.get('time_limit', config['LIVE_QUESTION_SECONDS'])), 5), 300)
+        except (TypeError, ValueError):
+            return 400, {'error': 'time_limit must be a number of seconds'}
+
+        quiz = await self.run_db(quizgenie.load_live_quiz, data.get('quiz_id'), user_id)
+        if quiz is None:
+            return 404, {'error': 'Quiz not found'}
+        if quiz['quiz_type'] not in quizgenie.LIVE_QUIZ_TYPES or not quiz['questions']:
+            return 400, {'error': 'Live sessions support multiple-choice quizzes only'}
+
+        session = self.live_sessions.create(quiz_id=quiz['quiz_id'], title=quiz['title'], host_id=user_id,
+                                            questions=quiz['questions'], answer_key=quiz['answer_key'],
+                                            time_limit=time_limit, max_participants=config['LIVE_MAX_PARTICIPANTS'])
+        return 201, session.snapshot()
+
+    async def live_state(self, session, headers, data, query):
+        return 200, session.snapshot(session.participant(query.get('participant')))
+
+    async def live_join(self, session, headers, data, query):
+        user_id, name = None, data.get('name')
+        if headers.get('authorization'):
+            user_id, error = self.authenticate(headers)
+            if error:
+                return error[1], error[0]
+            name = name or await self.run_db(username, user_id)
+        participant = session.join(name, user_id)
+        return 200, {'participant_id': participant.id, 'participant_token': participant.token,
+                     'session': session.snapshot(participant)}
+
+    async def live_answer(self, session, headers, data, query):
+        participant = session.participant(data.get('participant_token'))
+        if participant is None:
+            return 403, {'error': 'Unknown participant'}
+        if not session.submit(participant, data.get('question'), data.get('answer', '')):
+            return 409, {'accepted': False, 'error': 'The question is closed or was already answered'}
+        return 202, {'accepted': True}
+
+    async def live_next(self, session, headers, data, query):
+        error = self.host_error(session, headers)
+        if error:
+            return error
+        session.next_question()
+        return 200, session.snapshot()
+
+    async def live_close(self, session, headers, data, query):
+        error = self.host_error(session, headers)
+        if error:
+            return error
+        session.close_question()
+        return 200, session.snapshot()
+
+    async def live_end(self, session, headers, data, query):
+        """Finish the session and store its attempts; repeat it to retry a failed save"""
+        error = self.host_error(session, headers)
+        if error:
+            return error
+        if session.state != 'ended':
+            session.finish()
+        if session.saved is None:
+            try:
+                session.saved = await self.run_db(quizgenie.record_live_results, session.quiz_id, session.results)
+            except Exception as e:
+                self.flask_app.logger.error(f"Saving live session {session.code} failed: {str(e)}")
+                return 500, {'error': 'The session ended but its attempts could not be saved; retry'}
+        return 200, {'saved_attempts': session.saved, 'participants': len(session.results),
+                     'leaderboard': session.leaderboard()}
+
+    async def live_events(self, receive, send, session, participant, last_event_id, origin):
+        """SSE stream of a session: a `state` snapshot (or the frames missed since Last-Event-ID), then every event.
+
+        A participant's stream follows each `results` / `ended` event with their own `standing`.
+        """
+        headers = [(b'content-type', b'text/event-stream'), (b'cache-control', b'no-cache'),
+                   (b'x-accel-buffering', b'no')]
+        await send({'type': 'http.response.start', 'status': 200, 'headers': headers + self.cors_headers(origin)})
+
+        # uvicorn drops writes to a closed connection silently, so watch for the disconnect
+        stream = asyncio.current_task()
+        disconnected = asyncio.Event()
+        watcher = asyncio.create_task(cancel_on_disconnect(receive, stream, disconnected))
+        events = session.events
+        try:
+            seq = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+            frames = events.since(seq) if seq is not None and seq <= events.seq else None
+            if frames is None:
+                seq = events.seq
+                chunk = b'retry: 2000\n' + sse_frame('state', session.snapshot(participant), seq)
+            else:
+                chunk = b''
+            while True:
+                for seq, event, frame in frames or ():
+                    chunk += frame
+                    if participant is not None and event in ('results', 'ended'):
+                        chunk += sse_frame('standing', participant.standing())
+                await send({'type': 'http.response.body', 'body': chunk or b': ping\n\n', 'more_body': True})
+                finished = session.state == 'ended' and seq == events.seq
+                if finished or self.live_sessions.get(session.code) is not session:
+                    break
+                await events.wait(seq, SSE_HEARTBEAT_SECONDS)
+                frames, chunk = events.since(seq), b''
+                if frames is None:
+                    # Fell further behind than the event history: start over from a snapshot
+                    seq = events.seq
+                    chunk = sse_frame('state', session.snapshot(participant), seq)
+            await send({'type': 'http.response.body', 'body': b''})
+        except asyncio.CancelledError:
+            if not disconnected.is_set():
+                raise
+        finally:
+            watcher.cancel()
+
+
+async def cancel_on_disconnect(receive, task, disconnected):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+    disconnected.set()
+    task.cancel()
+
+
+# Database steps, run on the DB thread pool; they return plain dicts only
+def user_exists(user_id):
+    return quizgenie.db.session.get(quizgenie.User, user_id) is not None
+
+
+def username(user_id):
+    user = quizgenie.db.session.get(quizgenie.User, user_id)
+    return user.username if user else None
+
+
+def load_quiz_for_grading(quiz_id):
+    quiz = quizgenie.db.session.get(quizgenie.Quiz, quiz_id)
+    if quiz is None:
+        return None
+    return {'quiz_type': quiz.quiz_type, 'quiz_content': json.loads(quiz.quiz_content)}
+
+
+def save_generated_quiz(user_id, text, quiz_type, is_public, package):
+    user = quizgenie.db.session.get(quizgenie.User, user_id)
+    return quizgenie.save_generated_quiz(user, text, quiz_type, is_public, package)
+
+
+def record_attempt(user_id, quiz_id, answers, time_spent, llm_replies, usage):
+    user = quizgenie.db.session.get(quizgenie.User, user_id)
+    quiz = quizgenie.db.session.get(quizgenie.Quiz, quiz_id)
+    return quizgenie.record_attempt(user, quiz, json.loads(quiz.quiz_content), answers, time_spent, llm_replies,
+                                    usage)
+
+
+application = AsyncEndpoints(quizgenie.app, db_threads=int(os.environ.get('DB_THREADS', 32)))
@@ -0,0 +1,498 @@
+"""End-to-end benchmark scenarios for the API.
+
+Scenarios drive the real Flask app in-process through test clients (one per
+worker thread), so numbers measure our own request handling and database work;
+run them with LLM_BACKEND=stub to take the provider out of the picture. Each run
+produces a JSON report (p50/p95/p99 latency, throughput, SQL queries per
+request) that can be diffed against a previous run with compare_reports().
+With server='asgi' the same scenarios go through asgi.application instead; SQL
+queries then run on its worker threads and are not counted.
+
+run_payload_benchmark() sizes the largest responses instead: body bytes and
+serialization CPU per JSON provider, and bytes / CPU per Content-Encoding.
+run_live_benchmark() plays a live session with every participant holding an
+SSE stream and answering each question, all on one event loop like one worker.
+
+Use through the CLI:  flask seed-synthetic ... && flask benchmark --output run.json
+                      flask benchmark-payloads
+                      flask benchmark-live --participants 1000
+"""
+import asyncio
+import json
+import platform
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from sqlalchemy import event
+
+SCENARIOS = {}
+
+
+def scenario(name):
+    """Register a scenario: fn(client, fixtures, rng) -> response"""
+    def register(fn):
+        SCENARIOS[name] = fn
+        return fn
+    return register
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+class QueryCounter:
+    """Counts SQL statements executed by the current thread"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self._local = threading.local()
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._on_execute)
+
+    def _on_execute(self, *args, **kwargs):
+        self._local.count = getattr(self._local, 'count', 0) + 1
+
+    def reset(self):
+        self._local.count = 0
+
+    @property
+    def count(self):
+        return getattr(self._local, 'count', 0)
+
+
+class ASGIClient:
+    """Test-client lookalike that sends requests to an ASGI app on one shared event loop.
+
+    Worker threads block on their own request while the loop keeps every
+    in-flight request of the run progressing together, like a single server process.
+    """
+
+    def __init__(self, asgi_app):
+        import httpx
+
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self._thread.start()
+        self.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=asgi_app),
+                                        base_url='http://benchmark', timeout=None)
+
+    def _send(self, method, path, **kwargs):
+        return asyncio.run_coroutine_threadsafe(self.client.request(method, path, **kwargs), self.loop).result()
+
+    def get(self, path, query_string=None, headers=None):
+        return self._send('GET', path, params=query_string, headers=headers)
+
+    def post(self, path, headers=None, json=None):
+        return self._send('POST', path, headers=headers, json=json)
+
+    def close(self):
+        asyncio.run_coroutine_threadsafe(self.client.aclose(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+
+
+# ---------------------------------------------------------------------------
+# Scenarios
+# ---------------------------------------------------------------------------
+def _answers(rng, question_count, options=('a', 'b', 'c', 'd')):
+    return {str(index): rng.choice(options) for index in range(question_count)}
+
+
+@scenario('discover')
+def discover(client, fixtures, rng):
+    params = {'sort': rng.choice(['trending', 'newest', 'top-rated'])}
+    if rng.random() < 0.3:
+        params['difficulty'] = rng.choice(['Easy', 'Medium', 'Hard'])
+    if fixtures['tags'] and rng.random() < 0.3:
+        params['tags'] = rng.choice(fixtures['tags'])
+    return client.get('/api/quizzes', query_string=params)
+
+
+@scenario('quiz_fetch')
+def quiz_fetch(client, fixtures, rng):
+    quiz = rng.choice(fixtures['mcq_quizzes'] + fixtures['short_answer_quizzes'])
+    return client.get(f"/quiz/{quiz['id']}")
+
+
+@scenario('mcq_submit')
+def mcq_submit(client, fixtures, rng):
+    quiz = rng.choice(fixtures['mcq_quizzes'])
+    return client.post('/submit-quiz', headers=fixtures['auth'](rng.choice(fixtures['user_ids'])), json={
+        'quiz_id': quiz['id'],
+        'answers': _answers(rng, quiz['question_count']),
+        'time_spent': f"{rng.randint(0, 14):02d}:{rng.randint(0, 59):02d}"
+    })
+
+
+@scenario('short_answer_submit')
+def short_answer_submit(client, fixtures, rng):
+    quiz = rng.choice(fixtures['short_answer_quizzes'])
+    return client.post('/submit-quiz', headers=fixtures['auth'](rng.choice(fixtures['user_ids'])), json={
+        'quiz_id': quiz['id'],
+        'answers': _answers(rng, quiz['question_count'], ('photosynthesis', 'energy', 'I am not sure', '')),
+        'time_spent': f"{rng.randint(0, 14):02d}:{rng.randint(0, 59):02d}"
+    })
+
+
+@scenario('user_data')
+def user_data(client, fixtures, rng):
+    return client.get('/get-user-data', headers=fixtures['auth'](rng.choice(fixtures['user_ids'])))
+
+
+@scenario('quiz_analytics')
+def quiz_analytics(client, fixtures, rng):
+    quiz = rng.choice(fixtures['mcq_quizzes'] + fixtures['short_answer_quizzes'])
+    return client.get(f"/api/quiz/{quiz['id']}/analytics", headers=fixtures['auth'](quiz['user_id']))
+
+
+@scenario('analytics_page')
+def analytics_page(client, fixtures, rng):
+    quiz = rng.choice(fixtures['mcq_quizzes'] + fixtures['short_answer_quizzes'])
+    return client.get(f"/api/quiz-analytics/{quiz['id']}", headers=fixtures['auth'](quiz['user_id']))
+
+
+# ---------------------------------------------------------------------------
+# Runner
+# ---------------------------------------------------------------------------
+def run_scenario(make_client, name, fixtures, requests, concurrency, counter, seed):
+    fn = SCENARIOS[name]
+    local = threading.local()
+    timings, queries, errors = [], [], []
+    lock = threading.Lock()
+
+    def one_request(index):
+        if not hasattr(local, 'client'):
+            local.client = make_client()
+        rng = random.Random(f"{seed}-{name}-{index}")
+        counter.reset()
+        started = time.perf_counter()
+        response = fn(local.client, fixtures, rng)
+        elapsed = time.perf_counter() - started
+        with lock:
+            timings.append(elapsed * 1000.0)
+            queries.append(counter.count)
+            if response.status_code >= 400:
+                errors.append(response.status_code)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one_request, range(requests)))
+    wall_time = time.perf_counter() - started
+
+    timings.sort()
+    return {
+        'requests': requests,
+        'errors': len(errors),
+        'error_statuses': sorted(set(errors)),
+        'throughput_rps': round(requests / wall_time, 2) if wall_time else 0.0,
+        'latency_ms': {
+            'p50': round(percentile(timings, 50), 3),
+            'p95': round(percentile(timings, 95), 3),
+            'p99': round(percentile(timings, 99), 3),
+            'mean': round(sum(timings) / len(timings), 3) if timings else 0.0,
+            'max': round(timings[-1], 3) if timings else 0.0
+        },
+        'queries_per_request': {
+            'mean': round(sum(queries) / len(queries), 2) if queries else 0.0,
+            'max': max(queries) if queries else 0
+        }
+    }
+
+
+def run_benchmark(app, engine, fixtures, scenario_names, requests=200, concurrency=8, seed=1, server='wsgi'):
+    """Run the named scenarios one after another and return the JSON-serializable report"""
+    if server == 'asgi':
+        import asgi
+
+        asgi_client = ASGIClient(asgi.AsyncEndpoints(app))
+        make_client = lambda: asgi_client
+    else:
+        asgi_client = None
+        make_client = app.test_client
+
+    report = {
+        'meta': {
+            'started_at': datetime.utcnow().isoformat(),
+            'python': platform.python_version(),
+            'database': engine.dialect.name,
+            'llm_backend': app.config.get('LLM_BACKEND'),
+            'llm_stub_latency_ms': app.config.get('LLM_STUB_LATENCY_MS'),
+            'server': server,
+            'requests_per_scenario': requests,
+            'concurrency': concurrency,
+            'seed': seed,
+            'dataset': fixtures.get('dataset', {})
+        },
+        'scenarios': {}
+    }
+    try:
+        with QueryCounter(engine) as counter:
+            for name in scenario_names:
+                report['scenarios'][name] = run_scenario(make_client, name, fixtures, requests, concurrency,
+                                                         counter, seed)
+    finally:
+        if asgi_client is not None:
+            asgi_client.close()
+    return report
+
+
+def compare_reports(baseline, current, threshold=0.2):
+    """Regressions of `current` vs `baseline`: p95 / p99 latency or queries per request up by > threshold"""
+    regressions = []
+    for name, result in current['scenarios'].items():
+        before = baseline.get('scenarios', {}).get(name)
+        if not before:
+            continue
+        checks = [
+            ('p95 latency', before['latency_ms']['p95'], result['latency_ms']['p95']),
+            ('p99 latency', before['latency_ms']['p99'], result['latency_ms']['p99']),
+            ('queries per request', before['queries_per_request']['mean'], result['queries_per_request']['mean'])
+        ]
+        for label, old, new in checks:
+            if old and new > old * (1 + threshold):
+                regressions.append(f"{name}: {label} {old} -> {new} (+{(new / old - 1) * 100:.0f}%)")
+    return regressions
+
+
+def format_report(report):
+    lines = [f"{'scenario':<22}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'queries':>10}{'errors':>8}"]
+    for name, result in report['scenarios'].items():
+        latency = result['latency_ms']
+        lines.append(
+            f"{name:<22}{result['throughput_rps']:>10}{latency['p50']:>10}{latency['p95']:>10}"
+            f"{latency['p99']:>10}{result['queries_per_request']['mean']:>10}{result['errors']:>8}"
+        )
+    return '\n'.join(lines)
+
+
+def write_report(report, path):
+    with open(path, 'w', encoding='utf-8') as output:
+        json.dump(report, output, indent=2, sort_keys=True)
+
+
+# ---------------------------------------------------------------------------
+# Payloads (bytes on the wire, serialization CPU)
+# ---------------------------------------------------------------------------
+def _cpu_ms(fn, repeat):
+    """Mean process CPU time of fn() in milliseconds"""
+    started = time.process_time()
+    for _ in range(repeat):
+        result = fn()
+    return (time.process_time() - started) * 1000.0 / repeat, result
+
+
+def measure_payload(app, client, path, headers=None, repeat=10):
+    """Body sizes and CPU cost of one endpoint's response under each JSON provider and encoding.
+
+    The endpoint is fetched once; its decoded body is then re-encoded by the
+    stdlib and orjson providers (with the app's settings) and compressed with
+    each available encoding, so only serialization and compression are timed.
+    """
+    import compression
+    from flask.json.provider import DefaultJSONProvider
+    from json_provider import OrjsonProvider
+
+    response = client.get(path, headers=headers)
+    payload = json.loads(response.get_data())
+    result = {'status': response.status_code, 'providers': {}, 'encodings': {}}
+    body = None
+    for name, provider_class in (('stdlib', DefaultJSONProvider), ('orjson', OrjsonProvider)):
+        provider = provider_class(app)
+        with app.app_context():
+            cpu_ms, encoded = _cpu_ms(lambda: provider.response(payload).get_data(), repeat)
+        result['providers'][name] = {'bytes': len(encoded), 'cpu_ms': round(cpu_ms, 3)}
+        body = encoded
+    for encoding in compression.available_encodings():
+        cpu_ms, compressed = _cpu_ms(lambda: compression.compress(body, encoding), repeat)
+        result['encodings'][encoding] = {'bytes': len(compressed), 'cpu_ms': round(cpu_ms, 3)}
+    return result
+
+
+def run_payload_benchmark(app, endpoints, repeat=10):
+    """measure_payload() for each (name, path, headers) and the JSON-serializable report"""
+    client = app.test_client()
+    return {
+        'meta': {
+            'started_at': datetime.utcnow().isoformat(),
+            'python': platform.python_version(),
+            'repeat': repeat
+        },
+        'payloads': {name: measure_payload(app, client, path, headers, repeat) for name, path, headers in endpoints}
+    }
+
+
+def format_payload_report(report):
+    encodings = sorted({encoding for result in report['payloads'].values() for encoding in result['encodings']})
+    header = f"{'endpoint':<16}{'stdlib KB':>11}{'stdlib ms':>11}{'orjson KB':>11}{'orjson ms':>11}"
+    lines = [header + ''.join(f"{encoding + ' KB':>10}{encoding + ' ms':>10}" for encoding in encodings)]
+    for name, result in report['payloads'].items():
+        stdlib, fast = result['providers']['stdlib'], result['providers']['orjson']
+        line = (f"{name:<16}{stdlib['bytes'] / 1024:>11.1f}{stdlib['cpu_ms']:>11.2f}"
+                f"{fast['bytes'] / 1024:>11.1f}{fast['cpu_ms']:>11.2f}")
+        for encoding in encodings:
+            encoded = result['encodings'].get(encoding)
+            line += f"{encoded['bytes'] / 1024:>10.1f}{encoded['cpu_ms']:>10.2f}" if encoded else f"{'-':>10}{'-':>10}"
+        lines.append(line)
+    return '\n'.join(lines)
+
+
+# ---------------------------------------------------------------------------
+# Live sessions (one process, many SSE streams)
+# ---------------------------------------------------------------------------
+class ASGIStream:
+    """An open streaming response: chunks are timestamped as they arrive"""
+
+    def __init__(self):
+        self.chunks = []  # (perf_counter, bytes)
+        self._requested = False
+        self._closed = asyncio.Event()
+
+    async def receive(self):
+        if not self._requested:
+            self._requested = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await self._closed.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(self, message):
+        if message['type'] == 'http.response.body' and message.get('body'):
+            self.chunks.append((time.perf_counter(), message['body']))
+
+    def first_arrival(self, marker, after=0.0):
+        """When the first chunk containing `marker` (e.g. b'event: results') arrived after `after`"""
+        for arrived, body in self.chunks:
+            if arrived >= after and marker in body:
+                return arrived
+        return None
+
+    def close(self):
+        self._closed.set()
+
+
+def _asgi_scope(method, path, headers, query_string=b''):
+    return {'type': 'http', 'method': method, 'path': path, 'query_string': query_string,
+            'headers': [(key.lower().encode(), value.encode()) for key, value in (headers or {}).items()]}
+
+
+async def asgi_call(asgi_app, method, path, payload=None, headers=None):
+    """(status, decoded JSON body) of one request handled by asgi_app in this event loop"""
+    body = json.dumps(payload).encode() if payload is not None else b''
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    await asgi_app(_asgi_scope(method, path, headers), receive, send)
+    data = b''.join(message.get('body', b'') for message in messages[1:])
+    return messages[0]['status'], json.loads(data) if data else None
+
+
+async def _live_session_run(asgi_app, quiz_id, host_headers, participant_headers, guests, rng):
+    timings = {'questions': []}
+    status, session = await asgi_call(asgi_app, 'POST', '/live/sessions', {'quiz_id': quiz_id}, host_headers)
+    if status != 201:
+        raise RuntimeError(f"Could not create a live session: {status} {session}")
+    code, total = session['code'], session['total']
+
+    started = time.perf_counter()
+    joins = [asgi_call(asgi_app, 'POST', f'/live/{code}/join', {}, headers) for headers in participant_headers]
+    joins += [asgi_call(asgi_app, 'POST', f'/live/{code}/join', {'name': f'guest {i}'}) for i in range(guests)]
+    tokens = [body['participant_token'] for status, body in await asyncio.gather(*joins)]
+    timings['join_ms'] = (time.perf_counter() - started) * 1000
+
+    streams = [ASGIStream() for _ in tokens]
+    tasks = [asyncio.create_task(asgi_app(_asgi_scope('GET', f'/live/{code}/events', None,
+                                                      f'participant={token}'.encode()), stream.receive, stream.send))
+             for token, stream in zip(tokens, streams)]
+    await asyncio.sleep(0.05)
+
+    async def fan_out(marker, since):
+        while True:
+            arrivals = [stream.first_arrival(marker, since) for stream in streams]
+            if all(arrivals):
+                return (max(arrivals) - since) * 1000, (percentile(sorted(arrivals), 50) - since) * 1000
+            await asyncio.sleep(0.001)
+
+    for index in range(total):
+        question = {'index': index}
+        sent = time.perf_counter()
+        await asgi_call(asgi_app, 'POST', f'/live/{code}/next', None, host_headers)
+        question['question_fanout_ms'], question['question_fanout_p50_ms'] = await fan_out(b'event: question', sent)
+
+        started = time.perf_counter()
+        answers = await asyncio.gather(*(asgi_call(asgi_app, 'POST', f'/live/{code}/answer', {
+            'participant_token': token, 'question': index, 'answer': rng.choice(('a', 'b', 'c', 'd'))
+        }) for token in tokens))
+        elapsed = time.perf_counter() - started
+        question['answers_accepted'] = sum(status == 202 for status, _ in answers)
+        question['answers_per_second'] = round(len(tokens) / elapsed) if elapsed else None
+
+        sent = time.perf_counter()
+        await asgi_call(asgi_app, 'POST', f'/live/{code}/close', None, host_headers)
+        question['close_ms'] = (time.perf_counter() - sent) * 1000
+        question['results_fanout_ms'], question['results_fanout_p50_ms'] = await fan_out(b'event: standing', sent)
+        timings['questions'].append({key: round(value, 2) if isinstance(value, float) else value
+                                     for key, value in question.items()})
+
+    sent = time.perf_counter()
+    status, ended = await asgi_call(asgi_app, 'POST', f'/live/{code}/end', None, host_headers)
+    timings['end_ms'] = (time.perf_counter() - sent) * 1000
+    timings['saved_attempts'] = ended.get('saved_attempts')
+    await asyncio.wait_for(asyncio.gather(*tasks), 10)
+    for stream in streams:
+        stream.close()
+    timings['bytes_per_stream'] = sum(len(body) for _, body in streams[0].chunks)
+    timings['join_ms'] = round(timings['join_ms'], 2)
+    timings['end_ms'] = round(timings['end_ms'], 2)
+    return timings
+
+
+def run_live_benchmark(asgi_app, quiz_id, host_headers, participant_headers, guests=0, seed=1):
+    """Run one live session through asgi_app with every participant streaming, answering each question.
+
+    participant_headers are auth headers of signed-in participants (their attempts
+    are stored at the end); guests join by name only. Fan-out times are from the
+    host's command to the moment the last stream received the event.
+    """
+    started = time.process_time()
+    timings = asyncio.run(_live_session_run(asgi_app, quiz_id, host_headers, participant_headers, guests,
+                                            random.Random(seed)))
+    timings['cpu_seconds'] = round(time.process_time() - started, 2)
+    return {
+        'meta': {
+            'started_at': datetime.utcnow().isoformat(),
+            'python': platform.python_version(),
+            'participants': len(participant_headers) + guests,
+            'quiz_id': quiz_id
+        },
+        'live': timings
+    }
+
+
+def format_live_report(report):
+    live = report['live']
+    lines = [f"participants {report['meta']['participants']}  join all {live['join_ms']:.0f} ms  "
+             f"end + save {live['end_ms']:.0f} ms ({live['saved_attempts']} attempts)  cpu {live['cpu_seconds']} s",
+             f"{'question':>8}{'fan-out ms':>12}{'p50 ms':>9}{'answers/s':>11}{'accepted':>10}"
+             f"{'close ms':>10}{'results ms':>12}{'p50 ms':>9}"]
+    for question in live['questions']:
+        lines.append(f"{question['index']:>8}{question['question_fanout_ms']:>12.1f}"
+                     f"{question['question_fanout_p50_ms']:>9.1f}{question['answers_per_second']:>11}"
+                     f"{question['answers_accepted']:>10}{question['close_ms']:>10.1f}"
+                     f"{question['results_fanout_ms']:>12.1f}{question['results_fanout_p50_ms']:>9.1f}")
+    return '\n'.join(lines)
@@ -12,3 +12,6 @@ source venv/bin/activate
 # Install requirements
 pip install --upgrade pip
 pip install -r requirements.txt
+
+# Create tables and seed the admin user (no longer done on import)
+flask --app app init-db
@@ -0,0 +1,12 @@
+# Gunicorn settings: `gunicorn -c gunicorn.conf.py`
+#
+# The app is imported once in the master and forked into the workers. Importing
+# app.py opens no database connections and builds no LLM client or thread pools
+# (they are created lazily per worker), so nothing unsafe is shared across fork.
+import os
+
+wsgi_app = 'app:app'
+preload_app = True
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))  # Generation requests wait on the LLM
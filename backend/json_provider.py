@@ -0,0 +1,57 @@
+"""Flask JSON provider backed by orjson.
+
+jsonify() and request.get_json() go through app.json; OrjsonProvider keeps
+DefaultJSONProvider's behaviour (sorted keys, compact output outside debug,
+HTTP-date datetimes, the same fallbacks for Decimal / UUID / dataclasses) and
+only swaps the encoder and decoder. orjson builds the response body as bytes
+in one pass, several times faster than the stdlib encoder on large payloads.
+
+Two visible differences: non-ASCII text is sent as UTF-8 instead of \\u
+escapes, and values orjson refuses (integers beyond 64 bits, NaN literals in
+request bodies) are handled by the stdlib path, so they behave as before.
+"""
+import orjson
+from flask.json.provider import DefaultJSONProvider
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """DefaultJSONProvider with orjson doing the encoding and decoding"""
+
+    def _option(self, indent=False):
+        # Datetimes are passed to self.default so they keep Flask's format
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def _encode(self, obj, indent=False):
+        try:
+            return orjson.dumps(obj, default=self.default, option=self._option(indent))
+        except orjson.JSONEncodeError:
+            return None
+
+    def dumps(self, obj, **kwargs):
+        # Arguments only the stdlib encoder understands (cls, ...) keep the stdlib path
+        if set(kwargs) - {'default', 'indent', 'separators'} or kwargs.get('default', self.default) != self.default:
+            return super().dumps(obj, **kwargs)
+        encoded = self._encode(obj, indent=bool(kwargs.get('indent')))
+        return encoded.decode('utf-8') if encoded is not None else super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        try:
+            return orjson.loads(s)
+        except orjson.JSONDecodeError:
+            # Let the stdlib decide, so lenient input (NaN) and error messages are unchanged
+            return super().loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = self.compact is False or (self.compact is None and self._app.debug)
+        body = self._encode(obj, indent)
+        if body is None:
+            return super().response(obj)
+        return self._app.response_class(body + b'\n', mimetype=self.mimetype)
@@ -0,0 +1,333 @@
+"""In-memory live quiz sessions: a host runs a quiz question by question while
+participants answer in real time (Kahoot-style).
+
+A session lives in the memory of one process and is only touched from the
+event loop of asgi.py, so it needs no locks. Its hot paths cost the same for
+ten participants or a thousand:
+
+- Fan-out: each event is encoded as an SSE frame once and appended to the
+  session's EventLog. One asyncio.Event wakes every stream, and every stream
+  writes the same bytes.
+- Ingestion: an answer is a dict insert into the open question's buffer (the
+  first answer per participant counts). Nothing is scored on the way in, and
+  joins and answers only publish a coalesced count every COALESCE_SECONDS.
+- Scoring: when the question closes, the buffer is scored in one pass against
+  the answer key and ranks are recomputed once. A single `results` event
+  carries the answer distribution and the top of the leaderboard; each
+  participant's stream adds their own score and rank from that pass.
+
+Nothing is written to the database while a session runs: finish() returns one
+result per participant and the caller stores them in a single transaction.
+"""
+import asyncio
+import json
+import secrets
+import time
+from collections import deque
+
+LEADERBOARD_SIZE = 10
+MAX_POINTS = 1000  # A correct answer is worth MAX_POINTS / 2 .. MAX_POINTS depending on speed
+ANSWER_GRACE_SECONDS = 1.0  # Network slack after the deadline
+COALESCE_SECONDS = 0.5  # Bursts of joins and answers become one `lobby` / `progress` event per interval
+EVENT_HISTORY = 64  # Frames kept for streams that fall behind
+ENDED_TTL_SECONDS = 300  # Ended sessions stay readable this long
+IDLE_TTL_SECONDS = 4 * 3600
+MAX_NAME_LENGTH = 40
+
+
+class LiveSessionError(Exception):
+    """A request the session can't accept in its current state; `status` is the HTTP status to answer with"""
+
+    def __init__(self, message, status=409):
+        super().__init__(message)
+        self.status = status
+
+
+class EventLog:
+    """Encoded SSE frames of a session with a wake-up for the streams following it"""
+
+    def __init__(self, history=EVENT_HISTORY):
+        self.frames = deque(maxlen=history)  # (seq, event, frame)
+        self.seq = 0
+        self._changed = asyncio.Event()
+
+    def publish(self, event, data):
+        self.seq += 1
+        self.frames.append((self.seq, event, sse_frame(event, data, self.seq)))
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def since(self, seq):
+        """Frames after seq, or None when some of them were already dropped"""
+        if self.seq == seq:
+            return []
+        if not self.frames or self.frames[0][0] > seq + 1:
+            return None
+        return [frame for frame in self.frames if frame[0] > seq]
+
+    async def wait(self, seq, timeout):
+        """Return once there are frames after seq or timeout seconds passed"""
+        if self.seq > seq:
+            return
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+
+def sse_frame(event, data, seq=None):
+    payload = json.dumps(data, separators=(',', ':'))
+    return (f"id: {seq}\n" if seq is not None else '').encode() + f"event: {event}\ndata: {payload}\n\n".encode()
+
+
+class Participant:
+    __slots__ = ('id', 'token', 'name', 'user_id', 'joined_at', 'answers', 'points', 'correct',
+                 'response_seconds', 'rank', 'last')
+
+    def __init__(self, participant_id, name, user_id, joined_at):
+        self.id = participant_id
+        self.token = secrets.token_urlsafe(16)
+        self.name = name
+        self.user_id = user_id
+        self.joined_at = joined_at
+        self.answers = {}  # str(question index) -> answer, as /submit-quiz receives them
+        self.points = 0
+        self.correct = 0
+        self.response_seconds = 0.0  # Tie-break: faster total wins
+        self.rank = None
+        self.last = None  # Outcome of the latest closed question
+
+    def standing(self):
+        return {'participant_id': self.id, 'name': self.name, 'points': self.points, 'correct': self.correct,
+                'rank': self.rank, 'last': self.last}
+
+
+class LiveSession:
+    """One running quiz. States: lobby -> question <-> closed -> ended"""
+
+    def __init__(self, code, quiz_id, title, host_id, questions, answer_key, time_limit, max_participants):
+        self.code = code
+        self.quiz_id = quiz_id
+        self.title = title
+        self.host_id = host_id
+        self.questions = questions  # [{'question', 'options'}] as shown to participants
+        self.answer_key = answer_key  # [{'correct_answer', 'expected', 'explanation'}] from compile_answer_key()
+        self.time_limit = time_limit
+        self.max_participants = max_participants
+        self.state = 'lobby'
+        self.index = -1
+        self.opened_at = None
+        self.started_at = None
+        self.pending = {}  # participant id -> (answer, seconds taken) for the open question
+        self.participants = {}
+        self.by_token = {}
+        self.by_user = {}
+        self.ranked = []  # Participants in rank order as of the last closed question
+        self.events = EventLog()
+        self.touched_at = time.monotonic()
+        self.results = None  # finish() output, kept until it is stored
+        self.saved = None  # Number of attempts stored
+        self._timer = None
+        self._joined = []  # Names since the last `lobby` event
+        self._due = set()  # Coalesced events waiting to be published
+
+    # Participants -----------------------------------------------------------
+    def join(self, name, user_id=None):
+        """The new participant; signed-in users rejoining (another tab, reconnect) get their seat back"""
+        if self.state == 'ended':
+            raise LiveSessionError('This session has ended')
+        if user_id is not None and user_id in self.by_user:
+            return self.by_user[user_id]
+        name = ' '.join(str(name or '').split())[:MAX_NAME_LENGTH]
+        if not name:
+            raise LiveSessionError('A name is required', 400)
+        if len(self.participants) >= self.max_participants:
+            raise LiveSessionError('This session is full')
+
+        participant = Participant(len(self.participants) + 1, name, user_id, time.monotonic())
+        self.participants[participant.id] = participant
+        self.by_token[participant.token] = participant
+        if user_id is not None:
+            self.by_user[user_id] = participant
+        self.touched_at = participant.joined_at
+        self._joined.append(name)
+        self._publish_soon('lobby')
+        return participant
+
+    def participant(self, token):
+        return self.by_token.get(token)
+
+    # Questions --------------------------------------------------------------
+    def question_event(self):
+        question = self.questions[self.index]
+        return {'index': self.index, 'total': len(self.questions), 'question': question['question'],
+                'options': question.get('options', []), 'time_limit': self.time_limit,
+                'remaining': max(0.0, round(self.time_limit - (time.monotonic() - self.opened_at), 1))}
+
+    def next_question(self):
+        """Close the open question (if any) and open the next one"""
+        if self.state == 'ended':
+            raise LiveSessionError('This session has ended')
+        if self.state == 'question':
+            self.close_question()
+        if self.index + 1 >= len(self.questions):
+            raise LiveSessionError('No questions left; end the session')
+
+        self.index += 1
+        self.state = 'question'
+        self.pending = {}
+        self.opened_at = self.touched_at = time.monotonic()
+        if self.started_at is None:
+            self.started_at = self.opened_at
+        self.events.publish('question', self.question_event())
+        self._schedule_close(self.index)
+
+    def _schedule_close(self, index):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # Driven synchronously; the host closes questions explicitly
+        self._timer = loop.call_later(self.time_limit + ANSWER_GRACE_SECONDS, self._expire, index)
+
+    def _expire(self, index):
+        if self.state == 'question' and self.index == index:
+            self.close_question()
+
+    def submit(self, participant, index, answer):
+        """Buffer an answer to the open question; False if it is late, repeated or for another question"""
+        if self.state != 'question' or index != self.index or participant.id in self.pending:
+            return False
+        elapsed = time.monotonic() - self.opened_at
+        if elapsed > self.time_limit + ANSWER_GRACE_SECONDS:
+            return False
+        self.pending[participant.id] = (str(answer).strip(), min(elapsed, self.time_limit))
+        self._publish_soon('progress')
+        return True
+
+    def close_question(self):
+        """Score the buffered answers in one pass, re-rank everyone and publish the results"""
+        if self.state != 'question':
+            raise LiveSessionError('No question is open')
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        entry = self.answer_key[self.index]
+        distribution = {}
+        for participant_id, (answer, elapsed) in self.pending.items():
+            participant = self.participants[participant_id]
+            participant.answers[str(self.index)] = answer
+            is_correct = answer.lower() == entry['expected']
+            points = round(MAX_POINTS * (1 - elapsed / self.time_limit / 2)) if is_correct else 0
+            participant.points += points
+            participant.correct += is_correct
+            participant.response_seconds += elapsed
+            participant.last = {'index': self.index, 'answer': answer, 'is_correct': is_correct, 'points': points}
+            distribution[answer] = distribution.get(answer, 0) + 1
+        for participant in self.participants.values():
+            if participant.id not in self.pending:
+                participant.last = {'index': self.index, 'answer': None, 'is_correct': False, 'points': 0}
+
+        self.rank()
+        self.state = 'closed'
+        self.touched_at = time.monotonic()
+        self.events.publish('results', {
+            'index': self.index,
+            'correct_answer': entry['correct_answer'],
+            'explanation': entry['explanation'],
+            'answered': len(self.pending),
+            'participants': len(self.participants),
+            'distribution': distribution,
+            'leaderboard': self.leaderboard()
+        })
+
+    def rank(self):
+        ranked = sorted(self.participants.values(), key=lambda p: (-p.points, p.response_seconds, p.id))
+        for position, participant in enumerate(ranked, 1):
+            participant.rank = position
+        self.ranked = ranked
+        return ranked
+
+    def leaderboard(self):
+        return [participant.standing() for participant in self.ranked[:LEADERBOARD_SIZE]]
+
+    # Coalesced events ---------------------------------------------------------
+    def _publish_soon(self, event):
+        if event in self._due:
+            return
+        self._due.add(event)
+        try:
+            asyncio.get_running_loop().call_later(COALESCE_SECONDS, self._flush, event)
+        except RuntimeError:
+            self._flush(event)
+
+    def _flush(self, event):
+        self._due.discard(event)
+        if event == 'lobby':
+            self.events.publish('lobby', {'participants': len(self.participants),
+                                          'joined': self._joined[-LEADERBOARD_SIZE:]})
+            self._joined = []
+        elif event == 'progress' and self.state == 'question':
+            self.events.publish('progress', {'index': self.index, 'answered': len(self.pending),
+                                             'participants': len(self.participants)})
+
+    # End --------------------------------------------------------------------
+    def finish(self):
+        """End the session; returns one result per participant for persistence"""
+        if self.state == 'ended':
+            raise LiveSessionError('This session has ended')
+        if self.state == 'question':
+            self.close_question()
+        ranked = self.rank()
+        self.state = 'ended'
+        self.touched_at = now = time.monotonic()
+        self.events.publish('ended', {
+            'participants': len(self.participants),
+            'leaderboard': self.leaderboard()
+        })
+        self.results = [{
+            'user_id': participant.user_id,
+            'name': participant.name,
+            'answers': participant.answers,
+            'points': participant.points,
+            'rank': participant.rank,
+            'seconds': int(now - max(participant.joined_at, self.started_at or participant.joined_at))
+        } for participant in ranked]
+        return self.results
+
+    def snapshot(self, participant=None):
+        """Current state for a stream that (re)connects or a client polling once"""
+        state = {'code': self.code, 'quiz_id': self.quiz_id, 'title': self.title, 'state': self.state,
+                 'index': self.index, 'total': len(self.questions), 'participants': len(self.participants)}
+        if self.state == 'question':
+            state['question'] = self.question_event()
+            state['answered'] = participant is not None and participant.id in self.pending
+        if participant is not None:
+            state['you'] = participant.standing()
+        return state
+
+
+class LiveSessionRegistry:
+    """Sessions of this process by join code"""
+
+    def __init__(self):
+        self.sessions = {}
+
+    def create(self, **kwargs):
+        self.expire()
+        code = None
+        while code is None or code in self.sessions:
+            code = f"{secrets.randbelow(10 ** 6):06d}"
+        session = self.sessions[code] = LiveSession(code, **kwargs)
+        return session
+
+    def get(self, code):
+        return self.sessions.get(code)
+
+    def expire(self):
+        """Drop ended sessions after ENDED_TTL_SECONDS and abandoned ones after IDLE_TTL_SECONDS"""
+        now = time.monotonic()
+        for code, session in list(self.sessions.items()):
+            ttl = ENDED_TTL_SECONDS if session.state == 'ended' else IDLE_TTL_SECONDS
+            if now - session.touched_at > ttl:
+                del self.sessions[code]
@@ -0,0 +1,223 @@
+"""LLM backends behind a single chat_completion() call.
+
+Every backend returns objects shaped like the OpenAI SDK response
+(`response.choices[0].message.content`, `response.usage.total_tokens`), so the
+routes don't care which one is configured. achat_completion() is the awaitable
+variant used by the async endpoints in asgi.py.
+
+- openai: the real provider
+- record: calls OpenAI and stores every response on disk
+- replay: answers only from previously recorded responses
+- stub:   deterministic, offline quiz / verdict JSON with configurable latency
+"""
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import time
+from types import SimpleNamespace
+
+LLM_BACKENDS = ('openai', 'record', 'replay', 'stub')
+
+
+def make_response(content, prompt_tokens=0, completion_tokens=0):
+    """A minimal stand-in for openai.types.chat.ChatCompletion"""
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(role='assistant', content=content),
+                                 finish_reason='stop')],
+        usage=SimpleNamespace(prompt_tokens=prompt_tokens,
+                              completion_tokens=completion_tokens,
+                              total_tokens=prompt_tokens + completion_tokens)
+    )
+
+
+class OpenAIBackend:
+    def __init__(self, client, async_client_factory=None):
+        self.client = client
+        self._async_client_factory = async_client_factory
+        self._async_client = None
+
+    @property
+    def async_client(self):
+        # Created on first async call so it binds to the serving event loop
+        if self._async_client is None:
+            if self._async_client_factory is None:
+                raise RuntimeError("OpenAIBackend was built without an async client factory")
+            self._async_client = self._async_client_factory()
+        return self._async_client
+
+    def chat_completion(self, **kwargs):
+        return self.client.chat.completions.create(**kwargs)
+
+    async def achat_completion(self, **kwargs):
+        return await self.async_client.chat.completions.create(**kwargs)
+
+
+class RecordReplayBackend:
+    """Stores real responses keyed by a hash of the request, then serves them back offline"""
+
+    def __init__(self, directory, inner=None, mode='replay'):
+        if mode not in ('record', 'replay'):
+            raise ValueError(f"Unknown record/replay mode: {mode}")
+        if mode == 'record' and inner is None:
+            raise ValueError("Recording needs a backend to record from")
+        self.directory = directory
+        self.inner = inner
+        self.mode = mode
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def request_key(kwargs):
+        canonical = json.dumps(kwargs, sort_keys=True, default=str)
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+    def _path(self, kwargs):
+        return os.path.join(self.directory, f"{self.request_key(kwargs)}.json")
+
+    def _replay(self, path):
+        if not os.path.exists(path):
+            raise LookupError(f"No recorded LLM response for request {os.path.basename(path)}")
+        with open(path, encoding='utf-8') as recording:
+            saved = json.load(recording)
+        return make_response(saved['content'], saved['prompt_tokens'], saved['completion_tokens'])
+
+    def chat_completion(self, **kwargs):
+        path = self._path(kwargs)
+        if self.mode == 'replay':
+            return self._replay(path)
+        response = self.inner.chat_completion(**kwargs)
+        self._record(path, kwargs, response)
+        return response
+
+    async def achat_completion(self, **kwargs):
+        path = self._path(kwargs)
+        if self.mode == 'replay':
+            return self._replay(path)
+        response = await self.inner.achat_completion(**kwargs)
+        self._record(path, kwargs, response)
+        return response
+
+    def _record(self, path, kwargs, response):
+        usage = getattr(response, 'usage', None)
+        saved = {
+            'request': kwargs,
+            'content': response.choices[0].message.content,
+            'prompt_tokens': getattr(usage, 'prompt_tokens', 0) or 0,
+            'completion_tokens': getattr(usage, 'completion_tokens', 0) or 0
+        }
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as recording:
+            json.dump(saved, recording, default=str)
+        os.replace(tmp_path, path)
+
+
+class StubBackend:
+    """Offline backend returning valid quiz and grading JSON derived from the prompt.
+
+    Output depends only on the request, so benchmark runs are repeatable.
+    latency_ms / jitter_ms add an artificial provider delay per call.
+    """
+
+    GENERATION_RE = re.compile(r'Create (\d+) (\w+) questions')
+    PASSAGE_RE = re.compile(r'Passage:\s*"""(.*?)"""', re.S)
+    REPEAT_RE = re.compile(r'Do not repeat these questions:\n((?:\s*- .*\n?)+)')
+    GRADING_RE = re.compile(r"Correct Answer: (.*)\nUser's Answer: (.*)")
+
+    def __init__(self, latency_ms=0, jitter_ms=0, sleep=time.sleep, async_sleep=asyncio.sleep):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.sleep = sleep
+        self.async_sleep = async_sleep
+
+    def delay_seconds(self, prompt):
+        jitter = random.Random(prompt).uniform(0, self.jitter_ms) if self.jitter_ms else 0
+        return (self.latency_ms + jitter) / 1000.0
+
+    def chat_completion(self, **kwargs):
+        prompt = kwargs['messages'][-1]['content']
+        self.sleep(self.delay_seconds(prompt))
+        content = self.completion_content(prompt)
+        return make_response(content, len(prompt) // 4, len(content) // 4)
+
+    async def achat_completion(self, **kwargs):
+        prompt = kwargs['messages'][-1]['content']
+        await self.async_sleep(self.delay_seconds(prompt))
+        content = self.completion_content(prompt)
+        return make_response(content, len(prompt) // 4, len(content) // 4)
+
+    def completion_content(self, prompt):
+        grading = self.GRADING_RE.search(prompt)
+        if grading and '"verdict"' in prompt:
+            return json.dumps(self.grade(grading.group(1), grading.group(2)))
+        return json.dumps(self.generate(prompt))
+
+    @staticmethod
+    def _words(text):
+        return re.findall(r'[a-z0-9]+', text.lower())
+
+    def grade(self, correct_answer, user_answer):
+        expected, given = set(self._words(correct_answer)), set(self._words(user_answer))
+        if expected and expected == given:
+            return {'verdict': 'correct', 'reason': 'Stub: the answer matches the expected answer.'}
+        if expected & given:
+            return {'verdict': 'partial', 'reason': 'Stub: the answer shares key terms with the expected answer.'}
+        return {'verdict': 'incorrect', 'reason': 'Stub: the answer does not match the expected answer.'}
+
+    def generate(self, prompt):
+        match = self.GENERATION_RE.search(prompt)
+        num_questions = int(match.group(1)) if match else 5
+        is_mcq = not match or match.group(2).lower() == 'mcq'
+        passage_match = self.PASSAGE_RE.search(prompt)
+        passage = passage_match.group(1).strip() if passage_match else prompt
+
+        # Follow-up requests list the questions already kept; number the new ones after them
+        repeat = self.REPEAT_RE.search(prompt)
+        first = max(map(int, re.findall(r'Stub question (\d+)', repeat.group(1))), default=0) if repeat else 0
+
+        rng = random.Random(hashlib.sha256(prompt.encode('utf-8')).hexdigest())
+        words = [word for word in self._words(passage) if len(word) > 3] or ['topic', 'concept', 'detail', 'passage']
+        levels = ['Easy', 'Medium', 'Hard']
+
+        quiz = []
+        for index in range(first, first + num_questions):
+            answer = rng.choice(words)
+            question = {
+                'question': f"Stub question {index + 1}: which term appears in the passage?",
+                'answer': answer,
+                'explanation': f"'{answer}' is taken from the passage.",
+                'difficulty': levels[index % len(levels)]
+            }
+            if is_mcq:
+                options = [answer] + [f"{answer}-{suffix}" for suffix in ('x', 'y', 'z')]
+                rng.shuffle(options)
+                question['options'] = options
+            quiz.append(question)
+
+        tags = sorted(set(rng.sample(words, min(3, len(words)))))
+        return {
+            'title': f"Stub Quiz on {words[0].title()}",
+            'description': 'Deterministic quiz produced by the stub LLM backend.',
+            'quiz': quiz,
+            'tags': tags,
+            'overall_difficulty': 'Medium'
+        }
+
+
+def create_llm_backend(config, openai_client_factory=None, async_openai_client_factory=None):
+    """Build the backend named by config['LLM_BACKEND']"""
+    name = config.get('LLM_BACKEND', 'openai')
+    if name not in LLM_BACKENDS:
+        raise ValueError(f"Unknown LLM backend: {name} (expected one of {', '.join(LLM_BACKENDS)})")
+
+    if name == 'stub':
+        return StubBackend(latency_ms=config.get('LLM_STUB_LATENCY_MS', 0),
+                           jitter_ms=config.get('LLM_STUB_JITTER_MS', 0))
+    if name == 'replay':
+        return RecordReplayBackend(config['LLM_RECORDINGS_DIR'], mode='replay')
+
+    backend = OpenAIBackend(openai_client_factory(), async_openai_client_factory)
+    if name == 'record':
+        return RecordReplayBackend(config['LLM_RECORDINGS_DIR'], inner=backend, mode='record')
+    return backend
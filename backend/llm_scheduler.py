@@ -0,0 +1,286 @@
+"""Rate-limit-aware scheduling for OpenAI calls.
+
+Every gunicorn worker on a host shares one pair of token buckets (requests per
+minute and tokens per minute) kept in a small SQLite file, so the workers
+together stay under the provider limits instead of each assuming it has the
+whole budget. Calls are tagged with a priority class: lower classes may not
+drain the buckets below a reserve, which keeps headroom for interactive
+grading when generation traffic spikes.
+"""
+import asyncio
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+# Priority classes (lower value wins)
+PRIORITY_INTERACTIVE = 0  # Grading inside submit-quiz, the user is waiting
+PRIORITY_GENERATION = 1   # Single generate-quiz requests
+PRIORITY_BULK = 2         # Bulk / background generation
+
+# Fraction of each bucket a priority class must leave untouched
+PRIORITY_RESERVES = {
+    PRIORITY_INTERACTIVE: 0.0,
+    PRIORITY_GENERATION: 0.1,
+    PRIORITY_BULK: 0.3,
+}
+
+DEFAULT_STORE_PATH = os.path.join(tempfile.gettempdir(), 'quizgenie-llm-ratelimit.sqlite3')
+
+
+class SchedulerTimeout(Exception):
+    """Raised when a call could not get rate-limit budget within max_wait seconds"""
+
+
+class RateLimitStore:
+    """Token buckets persisted in SQLite so every process on the host draws from the same budget"""
+
+    def __init__(self, path=DEFAULT_STORE_PATH, requests_per_minute=3500, tokens_per_minute=90000):
+        self.path = path
+        self.capacities = {'requests': float(requests_per_minute), 'tokens': float(tokens_per_minute)}
+        conn = self._connect()
+        try:
+            conn.execute('CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, level REAL, updated REAL)')
+            conn.execute('CREATE TABLE IF NOT EXISTS pauses (name TEXT PRIMARY KEY, until REAL)')
+        finally:
+            conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def _levels(self, conn, now):
+        """Current (refilled) bucket levels; must be called inside a write transaction"""
+        rows = dict((name, (level, updated)) for name, level, updated in
+                    conn.execute('SELECT name, level, updated FROM buckets'))
+        levels = {}
+        for name, capacity in self.capacities.items():
+            level, updated = rows.get(name, (capacity, now))
+            levels[name] = min(capacity, level + (now - updated) * capacity / 60.0)
+        return levels
+
+    def _save(self, conn, levels, now):
+        conn.executemany(
+            'INSERT OR REPLACE INTO buckets (name, level, updated) VALUES (?, ?, ?)',
+            [(name, level, now) for name, level in levels.items()]
+        )
+
+    def try_acquire(self, tokens, priority):
+        """Take one request and `tokens` tokens from the buckets.
+
+        Returns 0 when the budget was granted, otherwise the number of seconds
+        to wait before it is worth trying again.
+        """
+        reserve = PRIORITY_RESERVES.get(priority, 0.0)
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute("SELECT until FROM pauses WHERE name = 'provider'").fetchone()
+            if row and row[0] > now:
+                conn.execute('COMMIT')
+                return row[0] - now
+
+            levels = self._levels(conn, now)
+            needed = {'requests': 1.0, 'tokens': float(min(tokens, self.capacities['tokens']))}
+            wait = 0.0
+            for name, amount in needed.items():
+                capacity = self.capacities[name]
+                available = levels[name] - capacity * reserve
+                if available < amount:
+                    wait = max(wait, (amount - available) * 60.0 / capacity)
+
+            if wait == 0.0:
+                for name, amount in needed.items():
+                    levels[name] -= amount
+                self._save(conn, levels, now)
+            conn.execute('COMMIT')
+            return wait
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    def adjust_tokens(self, delta):
+        """Debit (positive) or refund (negative) tokens once the real usage is known"""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            levels = self._levels(conn, now)
+            levels['tokens'] = min(self.capacities['tokens'], levels['tokens'] - delta)
+            self._save(conn, levels, now)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    def pause(self, seconds):
+        """Stop every worker from calling the provider for `seconds` (after a 429)"""
+        until = time.time() + seconds
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT INTO pauses (name, until) VALUES ('provider', ?) "
+                "ON CONFLICT(name) DO UPDATE SET until = MAX(until, excluded.until)",
+                (until,)
+            )
+        finally:
+            conn.close()
+
+
+def retry_after_seconds(error):
+    """Seconds the provider asked us to wait, from Retry-After / retry-after-ms, or None"""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None)
+    if not headers:
+        return None
+
+    retry_after_ms = headers.get('retry-after-ms')
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000.0
+        except ValueError:
+            pass
+
+    retry_after = headers.get('retry-after')
+    if not retry_after:
+        return None
+    try:
+        return float(retry_after)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def is_retryable(error):
+    import openai  # Deferred: the SDK is slow to import and only needed once a call has failed
+
+    if isinstance(error, (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in (408, 409, 429) or error.status_code >= 500
+    return False
+
+
+class LLMScheduler:
+    """Gate for provider calls: waits for rate-limit budget by priority and retries transient failures"""
+
+    def __init__(self, store, max_retries=5, base_delay=1.0, max_delay=30.0, max_wait=120.0):
+        self.store = store
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self._waiting = {priority: 0 for priority in PRIORITY_RESERVES}
+
+    def _higher_priority_waiting(self, priority):
+        with self._lock:
+            return any(count for other, count in self._waiting.items() if other < priority)
+
+    def acquire(self, tokens, priority=PRIORITY_GENERATION):
+        """Block until the buckets grant a request of `tokens` tokens for this priority class"""
+        deadline = time.monotonic() + self.max_wait
+        with self._lock:
+            self._waiting[priority] = self._waiting.get(priority, 0) + 1
+        try:
+            while True:
+                # Within a process, lower classes step aside while a higher one is queued
+                wait = 0.05 if self._higher_priority_waiting(priority) else self.store.try_acquire(tokens, priority)
+                if wait == 0:
+                    return
+                if time.monotonic() + wait > deadline:
+                    raise SchedulerTimeout(f"No LLM rate-limit budget within {self.max_wait:.0f}s")
+                # Small jitter so workers woken by the same refill don't stampede the store
+                time.sleep(min(wait, 1.0) + random.uniform(0, 0.05) * (priority + 1))
+        finally:
+            with self._lock:
+                self._waiting[priority] -= 1
+
+    async def aacquire(self, tokens, priority=PRIORITY_GENERATION):
+        """acquire() for coroutines: the SQLite check runs in a thread, waits don't block one"""
+        deadline = time.monotonic() + self.max_wait
+        with self._lock:
+            self._waiting[priority] = self._waiting.get(priority, 0) + 1
+        try:
+            while True:
+                if self._higher_priority_waiting(priority):
+                    wait = 0.05
+                else:
+                    wait = await asyncio.to_thread(self.store.try_acquire, tokens, priority)
+                if wait == 0:
+                    return
+                if time.monotonic() + wait > deadline:
+                    raise SchedulerTimeout(f"No LLM rate-limit budget within {self.max_wait:.0f}s")
+                await asyncio.sleep(min(wait, 1.0) + random.uniform(0, 0.05) * (priority + 1))
+        finally:
+            with self._lock:
+                self._waiting[priority] -= 1
+
+    def backoff(self, attempt, error=None):
+        """Full-jitter exponential backoff, never shorter than the provider's Retry-After"""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        retry_after = retry_after_seconds(error) if error is not None else None
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    def call(self, fn, priority=PRIORITY_GENERATION, estimated_tokens=1000):
+        """Run `fn()` (an OpenAI request) under the rate limits, retrying transient errors"""
+        attempt = 0
+        while True:
+            self.acquire(estimated_tokens, priority)
+            try:
+                response = fn()
+            except Exception as e:
+                if not is_retryable(e) or attempt >= self.max_retries:
+                    raise
+                delay = self.backoff(attempt, e)
+                if getattr(e, 'status_code', None) == 429:
+                    self.store.pause(delay)
+                attempt += 1
+                time.sleep(delay)
+                continue
+
+            self._reconcile(response, estimated_tokens)
+            return response
+
+    async def acall(self, coro_fn, priority=PRIORITY_GENERATION, estimated_tokens=1000):
+        """call() for coroutines: `await coro_fn()` under the rate limits, retrying transient errors"""
+        attempt = 0
+        while True:
+            await self.aacquire(estimated_tokens, priority)
+            try:
+                response = await coro_fn()
+            except Exception as e:
+                if not is_retryable(e) or attempt >= self.max_retries:
+                    raise
+                delay = self.backoff(attempt, e)
+                if getattr(e, 'status_code', None) == 429:
+                    await asyncio.to_thread(self.store.pause, delay)
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+
+            await asyncio.to_thread(self._reconcile, response, estimated_tokens)
+            return response
+
+    def _reconcile(self, response, estimated_tokens):
+        """Correct the token bucket once the real usage is known"""
+        usage = getattr(response, 'usage', None)
+        total_tokens = getattr(usage, 'total_tokens', None)
+        if total_tokens is not None and total_tokens != estimated_tokens:
+            self.store.adjust_tokens(total_tokens - estimated_tokens)
@@ -0,0 +1,126 @@
+"""MinHash signatures and LSH band keys for spotting near-identical quizzes.
+
+A quiz gets one signature for its source passage and one for its question
+text (see similarity() for how the two are used). Each signature is cut into
+BANDS bands of ROWS values, and each band is hashed into a 64-bit key. Two
+quizzes share at least one key with high probability when their shingle sets
+are similar (about 97% at Jaccard 0.8, under 1% at 0.3), so candidates come
+from an indexed lookup on the keys instead of a scan. Candidates are then
+checked against DUPLICATE_THRESHOLD with the signatures themselves.
+"""
+import hashlib
+import re
+import zlib
+from itertools import combinations
+
+import numpy as np
+
+NUM_PERM = 72
+BANDS, ROWS = 12, 6
+DUPLICATE_THRESHOLD = 0.8
+PASSAGE_SHINGLE_SIZE = 5
+QUESTION_SHINGLE_SIZE = 3
+FIELDS = ('passage', 'questions')
+
+_MERSENNE_PRIME = (1 << 61) - 1
+# Fixed seed: signatures are stored, so the permutations must never change
+_permutations = np.random.RandomState(20240601)
+_A = _permutations.randint(1, _MERSENNE_PRIME, size=NUM_PERM, dtype=np.uint64)
+_B = _permutations.randint(0, _MERSENNE_PRIME, size=NUM_PERM, dtype=np.uint64)
+
+WORD_RE = re.compile(r'[a-z0-9]+')
+
+
+def shingle_hashes(text, size):
+    """32-bit hashes of the distinct `size`-word shingles of a text"""
+    words = WORD_RE.findall((text or '').lower())
+    if not words:
+        return np.array([], dtype=np.uint64)
+    if len(words) <= size:
+        shingles = {' '.join(words)}
+    else:
+        shingles = {' '.join(words[i:i + size]) for i in range(len(words) - size + 1)}
+    return np.fromiter((zlib.crc32(shingle.encode('utf-8')) for shingle in shingles),
+                       dtype=np.uint64, count=len(shingles))
+
+
+def minhash(hashes):
+    """NUM_PERM-value MinHash signature of a set of shingle hashes, or None for an empty set"""
+    if not len(hashes):
+        return None
+    permuted = ((np.outer(hashes, _A) + _B) % _MERSENNE_PRIME) & np.uint64(0xffffffff)
+    return permuted.min(axis=0).astype('<u4')
+
+
+def text_signatures(original_text, question_texts):
+    """{'passage': signature, 'questions': signature}; a field without text maps to None"""
+    return {
+        'passage': minhash(shingle_hashes(original_text, PASSAGE_SHINGLE_SIZE)),
+        'questions': minhash(shingle_hashes(' '.join(question_texts), QUESTION_SHINGLE_SIZE))
+    }
+
+
+def band_keys(namespace, signature):
+    """Signed 64-bit LSH keys of a signature, namespaced (by field, see index_keys())"""
+    if signature is None:
+        return []
+    keys = []
+    for band in range(BANDS):
+        chunk = signature[band * ROWS:(band + 1) * ROWS].tobytes()
+        digest = hashlib.blake2b(f"{namespace}:{band}:".encode('utf-8') + chunk, digest_size=8).digest()
+        keys.append(int.from_bytes(digest, 'little', signed=True))
+    return keys
+
+
+def _namespace(field, earlier_fields):
+    return '+'.join((field,) + tuple(earlier_fields))
+
+
+def index_keys(signatures):
+    """Band keys a quiz is stored under.
+
+    A field's keys are namespaced by the earlier fields the quiz also has, so a
+    probe can skip every quiz that field would not decide for (see similarity()).
+    """
+    keys = []
+    for position, field in enumerate(FIELDS):
+        present = [name for name in FIELDS[:position] if signatures[name] is not None]
+        keys.extend(band_keys(_namespace(field, present), signatures[field]))
+    return keys
+
+
+def probe_keys(signatures):
+    """Band keys to look up for quizzes similar to these signatures.
+
+    For each field, only the namespaces of quizzes sharing none of the earlier
+    fields the probe has: templated question text shared by thousands of quizzes
+    with passages is never read when the probe has a passage too.
+    """
+    keys = []
+    for position, field in enumerate(FIELDS):
+        absent = [name for name in FIELDS[:position] if signatures[name] is None]
+        for size in range(len(absent) + 1):
+            for earlier_fields in combinations(absent, size):
+                keys.extend(band_keys(_namespace(field, earlier_fields), signatures[field]))
+    return keys
+
+
+def similarity(signatures, other):
+    """Estimated Jaccard similarity of two quizzes, from the first field (in FIELDS order) both have.
+
+    Passages decide whenever both quizzes have one: questions generated twice
+    from the same passage differ, while templated questions look alike across
+    passages. Question text decides for quizzes saved without a passage.
+    """
+    for field in FIELDS:
+        if signatures.get(field) is not None and other.get(field) is not None:
+            return float(np.mean(signatures[field] == other[field]))
+    return 0.0
+
+
+def to_bytes(signature):
+    return None if signature is None else signature.astype('<u4').tobytes()
+
+
+def from_bytes(data):
+    return None if data is None else np.frombuffer(data, dtype='<u4')
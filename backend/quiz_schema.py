@@ -0,0 +1,248 @@
+"""Validation and repair of generated quiz packages.
+
+A generation reply is only useful if it parses and has the expected shape, but
+one bad question or a reply cut off at max_tokens shouldn't cost the whole
+package. parse_package() recovers what it can from the raw text: code fences
+and surrounding prose are stripped, trailing commas dropped, and a truncated
+document is cut back to its last complete value and closed. validate_package()
+then keeps every question and metadata field that passes the schema and
+reports what is missing, so the caller can ask the LLM for just those parts
+(see generation_pipeline() in app.py) and merge_package() them in.
+"""
+import json
+import re
+import threading
+from collections import Counter
+
+DIFFICULTIES = ('Easy', 'Medium', 'Hard')
+METADATA_FIELDS = ('title', 'description', 'tags', 'overall_difficulty')
+MAX_TITLE_LENGTH = 200
+MAX_TAGS = 10
+
+FENCE_RE = re.compile(r'^\s*```(?:json)?\s*|\s*```\s*$', re.I)
+TRAILING_COMMA_RE = re.compile(r',\s*([}\]])')
+OPTION_LETTER_RE = re.compile(r'^(?:option\s*)?\(?([a-z])[).:]?$', re.I)
+
+
+class InvalidPackageError(ValueError):
+    """Nothing usable could be recovered from a generation reply"""
+
+
+# ---------------------------------------------------------------------------
+# JSON repair
+# ---------------------------------------------------------------------------
+def close_truncated_json(text):
+    """text cut back to its last complete value with the open brackets closed, or None"""
+    stack, in_string, escaped = [], False, False
+    safe = None  # (end index, closers) of the longest prefix that is valid once closed
+    for index, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+            continue
+        if char == '"':
+            in_string = True
+        elif char in '{[':
+            stack.append('}' if char == '{' else ']')
+            safe = (index + 1, ''.join(reversed(stack)))
+        elif char in '}]':
+            if not stack or stack.pop() != char:
+                return None
+            if not stack:
+                return text[:index + 1]
+            safe = (index + 1, ''.join(reversed(stack)))
+        elif char == ',':
+            safe = (index, ''.join(reversed(stack)))
+    if safe is None:
+        return None
+    end, closers = safe
+    return text[:end] + closers
+
+
+def parse_package(content):
+    """(object, repairs) from a raw reply; repairs names each fix that was needed.
+
+    Raises InvalidPackageError when no JSON object can be recovered.
+    """
+    text = (content or '').strip()
+    repairs = []
+    if text.startswith('```'):
+        text = FENCE_RE.sub('', text)
+        repairs.append('fence')
+    start = text.find('{')
+    if start > 0:
+        text = text[start:]
+        repairs.append('prose')
+    elif start < 0:
+        raise InvalidPackageError('The reply contains no JSON object')
+
+    candidates = [('', text)]
+    without_commas = TRAILING_COMMA_RE.sub(r'\1', text)
+    if without_commas != text:
+        candidates.append(('trailing_comma', without_commas))
+    closed = close_truncated_json(without_commas)
+    if closed is not None and closed != without_commas:
+        candidates.append(('truncated', closed))
+
+    for repair, candidate in candidates:
+        try:
+            result = json.loads(candidate)
+        except ValueError:
+            # Text after a complete object ("... } Hope this helps!")
+            try:
+                result, _ = json.JSONDecoder().raw_decode(candidate)
+                repair = repair or 'trailing_text'
+            except ValueError:
+                continue
+        if isinstance(result, dict):
+            return result, repairs + ([repair] if repair else [])
+    raise InvalidPackageError('The reply is not valid JSON and could not be repaired')
+
+
+# ---------------------------------------------------------------------------
+# Schema
+# ---------------------------------------------------------------------------
+def _text(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        value = str(value)
+    return ' '.join(value.split()) if isinstance(value, str) else ''
+
+
+def clean_question(question, quiz_type):
+    """The question in canonical form, or None if it doesn't fit the schema.
+
+    MCQ answers given as an option letter ("B", "(b)", "Option B") are mapped to
+    the option's text; an answer matching no option makes the question invalid.
+    """
+    if not isinstance(question, dict):
+        return None
+    text, answer = _text(question.get('question')), _text(question.get('answer'))
+    if not text or not answer:
+        return None
+    cleaned = {'question': text, 'answer': answer, 'explanation': _text(question.get('explanation'))}
+    if quiz_type == 'mcq':
+        options = question.get('options')
+        options = [_text(option) for option in options] if isinstance(options, list) else []
+        options = [option for option in options if option]
+        if len(options) < 2 or len({option.lower() for option in options}) != len(options):
+            return None
+        matches = [option for option in options if option.lower() == answer.lower()]
+        letter = OPTION_LETTER_RE.match(answer)
+        if not matches and letter and ord(letter.group(1).lower()) - ord('a') < len(options):
+            matches = [options[ord(letter.group(1).lower()) - ord('a')]]
+        if not matches:
+            return None
+        cleaned['options'] = options
+        cleaned['answer'] = matches[0]
+    return cleaned
+
+
+def clean_metadata(result):
+    """{field: value} for the metadata fields of `result` that fit the schema"""
+    metadata = {}
+    title = _text(result.get('title'))
+    if title:
+        metadata['title'] = title[:MAX_TITLE_LENGTH]
+    description = _text(result.get('description'))
+    if description:
+        metadata['description'] = description
+    tags = result.get('tags')
+    if isinstance(tags, str):
+        tags = tags.split(',')
+    if isinstance(tags, list):
+        tags = list(dict.fromkeys(tag for tag in (_text(tag) for tag in tags) if tag))[:MAX_TAGS]
+        if tags:
+            metadata['tags'] = tags
+    difficulty = _text(result.get('overall_difficulty')).capitalize()
+    if difficulty in DIFFICULTIES:
+        metadata['overall_difficulty'] = difficulty
+    return metadata
+
+
+def validate_package(result, quiz_type, num_questions):
+    """(questions, metadata, problems) for a parsed reply.
+
+    questions holds the valid ones (at most num_questions, no repeats) and
+    problems counts what is missing: {'invalid_questions', 'missing_questions',
+    'missing_metadata': [field, ...]}.
+    """
+    raw_questions = result.get('quiz')
+    raw_questions = raw_questions if isinstance(raw_questions, list) else []
+    questions, seen, invalid = [], set(), 0
+    for raw in raw_questions:
+        question = clean_question(raw, quiz_type)
+        if question is None or question['question'].lower() in seen:
+            invalid += 1
+            continue
+        seen.add(question['question'].lower())
+        questions.append(question)
+    questions = questions[:num_questions]
+    metadata = clean_metadata(result)
+    return questions, metadata, {
+        'invalid_questions': invalid,
+        'missing_questions': num_questions - len(questions),
+        'missing_metadata': [field for field in METADATA_FIELDS if field not in metadata]
+    }
+
+
+def merge_package(questions, metadata, result, quiz_type, num_questions):
+    """Add the valid parts of a follow-up reply to what was kept; returns (questions, metadata, problems)"""
+    extra_questions, extra_metadata, _ = validate_package(result, quiz_type, num_questions)
+    seen = {question['question'].lower() for question in questions}
+    for question in extra_questions:
+        if len(questions) < num_questions and question['question'].lower() not in seen:
+            seen.add(question['question'].lower())
+            questions.append(question)
+    metadata = dict(extra_metadata, **metadata)
+    return questions, metadata, {
+        'invalid_questions': 0,
+        'missing_questions': num_questions - len(questions),
+        'missing_metadata': [field for field in METADATA_FIELDS if field not in metadata]
+    }
+
+
+# ---------------------------------------------------------------------------
+# Metrics
+# ---------------------------------------------------------------------------
+class GenerationStats:
+    """Per-process counters of how generation replies had to be repaired.
+
+    Every generation is counted once by outcome: 'valid' (used as returned),
+    'repaired' (complete after local repair and/or follow-up requests),
+    'partial' (saved with fewer questions or default metadata) or 'failed'.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = Counter()
+
+    def record(self, outcome, repairs=(), rerequested=False):
+        with self._lock:
+            self._counts[outcome] += 1
+            for repair in repairs:
+                self._counts[f"repair:{repair}"] += 1
+            if rerequested:
+                self._counts['rerequested'] += 1
+
+    def snapshot(self):
+        with self._lock:
+            counts = dict(self._counts)
+        total = sum(counts.get(outcome, 0) for outcome in ('valid', 'repaired', 'partial', 'failed'))
+        needed_repair = total - counts.get('valid', 0)
+        return {
+            'generations': total,
+            'valid': counts.get('valid', 0),
+            'repaired': counts.get('repaired', 0),
+            'partial': counts.get('partial', 0),
+            'failed': counts.get('failed', 0),
+            'rerequested': counts.get('rerequested', 0),
+            'repair_success_rate': round(counts.get('repaired', 0) / needed_repair, 4) if needed_repair else None,
+            'repairs': {key.split(':', 1)[1]: value for key, value in counts.items() if key.startswith('repair:')}
+        }
+
+
+generation_stats = GenerationStats()
@@ -0,0 +1,320 @@
+""""More like this" recommendations from a TF-IDF index over public quizzes.
+
+build_index() turns each quiz's title, description, tags and question text
+into a sparse TF-IDF vector and precomputes its top-k most similar quizzes by
+cosine similarity. The all-pairs product is done one block of rows at a time
+against a pruned copy of the posting lists, and only the surviving candidates
+are rescored exactly, so both time and memory stay bounded at hundreds of
+thousands of quizzes. Serving is then a lookup in memory.
+
+upsert() and remove() keep the neighbour lists current as quizzes are created,
+edited or unpublished. The vocabulary and IDF weights stay those of the last
+full build (new words are ignored until the next one).
+"""
+import json
+import os
+import re
+import threading
+from array import array
+from collections import Counter, namedtuple
+
+import numpy as np
+import scipy.sparse as sp
+
+QuizDocument = namedtuple('QuizDocument', ['quiz_id', 'title', 'description', 'tags', 'questions', 'difficulty'])
+
+TOKEN_RE = re.compile(r'[a-z0-9]{2,}')
+STOPWORDS = frozenset([
+    'about', 'after', 'all', 'also', 'an', 'and', 'any', 'are', 'as', 'at', 'be', 'been', 'but', 'by', 'can',
+    'could', 'did', 'do', 'does', 'each', 'for', 'from', 'had', 'has', 'have', 'how', 'if', 'in', 'into', 'is',
+    'it', 'its', 'may', 'more', 'most', 'not', 'of', 'on', 'one', 'or', 'other', 'over', 'quiz', 'question',
+    'should', 'so', 'some', 'such', 'than', 'that', 'the', 'their', 'them', 'then', 'there', 'these', 'they',
+    'this', 'to', 'was', 'were', 'what', 'when', 'where', 'which', 'while', 'who', 'why', 'will', 'with', 'would',
+    'you', 'your'
+])
+# Title and tag words say more about a quiz than words from its questions
+FIELD_WEIGHTS = (('title', 3), ('tags', 3), ('description', 1), ('questions', 1))
+
+
+def quiz_terms(document):
+    """Field-weighted term counts of a QuizDocument"""
+    fields = {
+        'title': document.title,
+        'tags': ' '.join(document.tags),
+        'description': document.description,
+        'questions': ' '.join(document.questions)
+    }
+    counts = Counter()
+    for field, weight in FIELD_WEIGHTS:
+        for token in TOKEN_RE.findall((fields[field] or '').lower()):
+            if token not in STOPWORDS:
+                counts[token] += weight
+    return counts
+
+
+def _keep_top_per_row(matrix, limit):
+    """Zero all but the `limit` largest entries of each CSR row (in place)"""
+    lengths = np.diff(matrix.indptr)
+    for row in np.nonzero(lengths > limit)[0]:
+        values = matrix.data[matrix.indptr[row]:matrix.indptr[row + 1]]
+        values[np.argsort(values)[:-limit]] = 0
+    matrix.eliminate_zeros()
+    return matrix
+
+
+def _normalize_rows(matrix):
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sp.csr_matrix(sp.diags(1.0 / norms).dot(matrix), dtype=np.float32)
+
+
+def _top_k(columns, values, k):
+    """(neighbours, scores) of the k highest values, padded with (-1, 0)"""
+    neighbors = np.full(k, -1, dtype=np.int32)
+    best = np.zeros(k, dtype=np.float32)
+    if len(values) > k:
+        top = np.argpartition(values, -k)[-k:]
+        columns, values = columns[top], values[top]
+    order = np.argsort(-values, kind='stable')
+    neighbors[:len(order)] = columns[order]
+    best[:len(order)] = values[order]
+    return neighbors, best
+
+
+def _block_neighbors(matrix, postings, start, stop, k, candidates):
+    """Exact top-k neighbours for rows [start, stop), from at most `candidates` pruned-product hits per row"""
+    product = matrix[start:stop].dot(postings).tocsr()
+    pair_rows, pair_cols = [], []
+    for local in range(stop - start):
+        lo, hi = product.indptr[local], product.indptr[local + 1]
+        cols, values = product.indices[lo:hi], product.data[lo:hi]
+        if hi - lo > candidates:
+            cols = cols[np.argpartition(values, -candidates)[-candidates:]]
+        cols = cols[cols != start + local]
+        pair_rows.append(np.full(len(cols), local, dtype=np.int32))
+        pair_cols.append(cols.astype(np.int32))
+
+    neighbors = np.full((stop - start, k), -1, dtype=np.int32)
+    scores = np.zeros((stop - start, k), dtype=np.float32)
+    rows, cols = np.concatenate(pair_rows), np.concatenate(pair_cols)
+    if not len(rows):
+        return neighbors, scores
+
+    exact = np.asarray(matrix[rows + start].multiply(matrix[cols]).sum(axis=1)).ravel().astype(np.float32)
+    order = np.lexsort((-exact, rows))
+    rows, cols, exact = rows[order], cols[order], exact[order]
+    rank = np.arange(len(rows)) - np.searchsorted(rows, rows)
+    keep = rank < k
+    neighbors[rows[keep], rank[keep]] = cols[keep]
+    scores[rows[keep], rank[keep]] = exact[keep]
+    return neighbors, scores
+
+
+def build_index(documents, k=10, min_df=2, max_df=0.5, max_terms=32, max_postings=1000, block_size=1024,
+                echo=None):
+    """Vectorize an iterable of QuizDocuments and precompute each one's top-k similar quizzes.
+
+    Each quiz keeps its max_terms heaviest terms. Candidates come from the
+    max_postings heaviest quizzes of every term and are rescored exactly, so
+    a term shared by most quizzes can't turn the build quadratic.
+    """
+    term_ids, quiz_ids, cards = {}, [], []
+    rows, cols, counts = array('i'), array('i'), array('f')
+    for document in documents:
+        row = len(quiz_ids)
+        quiz_ids.append(document.quiz_id)
+        cards.append([document.title, document.difficulty, list(document.tags)])
+        for term, count in quiz_terms(document).items():
+            rows.append(row)
+            cols.append(term_ids.setdefault(term, len(term_ids)))
+            counts.append(count)
+
+    size = len(quiz_ids)
+    rows = np.frombuffer(rows, dtype=np.int32)
+    cols = np.frombuffer(cols, dtype=np.int32)
+    counts = np.frombuffer(counts, dtype=np.float32)
+    document_frequency = np.bincount(cols, minlength=len(term_ids))
+    kept = (document_frequency >= min_df) & (document_frequency <= max(min_df, max_df * size))
+    column_of = np.cumsum(kept) - 1
+    vocabulary = [None] * int(kept.sum())
+    for term, term_id in term_ids.items():
+        if kept[term_id]:
+            vocabulary[column_of[term_id]] = term
+    idf = (np.log((1.0 + size) / (1.0 + document_frequency[kept])) + 1.0).astype(np.float32)
+
+    mask = kept[cols]
+    columns = column_of[cols[mask]]
+    weights = (1.0 + np.log(counts[mask])) * idf[columns]
+    matrix = sp.csr_matrix((weights, (rows[mask], columns)), shape=(size, len(vocabulary)), dtype=np.float32)
+    matrix = _normalize_rows(_keep_top_per_row(matrix, max_terms))
+    if echo:
+        echo(f"  vectorized {size} quizzes, {len(vocabulary)} terms, {matrix.nnz} weights")
+
+    postings = _keep_top_per_row(matrix.T.tocsr(), max_postings)
+    neighbors = np.full((size, k), -1, dtype=np.int32)
+    scores = np.zeros((size, k), dtype=np.float32)
+    for start in range(0, size, block_size):
+        stop = min(size, start + block_size)
+        neighbors[start:stop], scores[start:stop] = _block_neighbors(matrix, postings, start, stop, k, 4 * k)
+        if echo and (stop == size or (start // block_size) % 50 == 49):
+            echo(f"  neighbours: {stop}/{size}")
+
+    return SimilarityIndex(vocabulary, idf, matrix, quiz_ids, cards, neighbors, scores)
+
+
+class SimilarityIndex:
+    """Sparse TF-IDF rows plus the precomputed neighbour lists, safe to share between threads.
+
+    Edited quizzes get a new row and their old one is marked dead. New rows
+    collect in a small tail matrix that is merged into the main one from time to time.
+    """
+
+    TAIL_LIMIT = 2048
+
+    def __init__(self, vocabulary, idf, matrix, quiz_ids, cards, neighbors, scores, live=None):
+        self.vocabulary = {term: column for column, term in enumerate(vocabulary)}
+        self.idf = idf
+        self.matrix = matrix
+        self.tail = sp.csr_matrix((0, len(vocabulary)), dtype=np.float32)
+        self.quiz_ids = list(quiz_ids)
+        self.cards = list(cards)
+        self.k = neighbors.shape[1]
+        self.size = len(self.quiz_ids)
+        self.neighbors = neighbors
+        self.scores = scores
+        self.live = np.ones(self.size, dtype=bool) if live is None else live
+        self.rows = {quiz_id: row for row, quiz_id in enumerate(self.quiz_ids) if self.live[row]}
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.rows)
+
+    def vectorize(self, document):
+        """Unit-length 1 x V row for a document, using the index's vocabulary and IDF"""
+        counts = {self.vocabulary[term]: count for term, count in quiz_terms(document).items()
+                  if term in self.vocabulary}
+        columns = np.fromiter(counts.keys(), dtype=np.int32, count=len(counts))
+        values = (1.0 + np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))) * self.idf[columns]
+        vector = sp.csr_matrix((values, (np.zeros(len(columns), dtype=np.int32), columns)),
+                               shape=(1, len(self.vocabulary)), dtype=np.float32)
+        return _normalize_rows(vector)
+
+    def similar(self, quiz_id, limit=None):
+        """Neighbour cards for a quiz, best first, or None when the quiz isn't indexed"""
+        with self._lock:
+            row = self.rows.get(quiz_id)
+            if row is None:
+                return None
+            results = []
+            for neighbor, score in zip(self.neighbors[row], self.scores[row]):
+                if neighbor < 0 or (limit is not None and len(results) >= limit):
+                    break
+                title, difficulty, tags = self.cards[neighbor]
+                results.append({'id': self.quiz_ids[neighbor], 'title': title, 'difficulty': difficulty,
+                                'tags': tags, 'score': round(float(score), 4)})
+            return results
+
+    def upsert(self, document):
+        """Index a new or edited quiz and update every neighbour list it enters or leaves"""
+        vector = self.vectorize(document)
+        with self._lock:
+            old_row = self.rows.pop(document.quiz_id, None)
+            if old_row is not None:
+                self.live[old_row] = False
+            row = self._append(document, vector)
+            stale = self._rows_listing(old_row)
+            # One product covers the new row and every list that showed its old version
+            similarities = self._similarity_rows(np.concatenate([[row], stale]))
+            columns, values = self._row_similarities(similarities, 0, row)
+            self.neighbors[row], self.scores[row] = _top_k(columns, values, self.k)
+            for position, other in enumerate(stale, start=1):
+                self.neighbors[other], self.scores[other] = _top_k(
+                    *self._row_similarities(similarities, position, other), self.k)
+
+            entered = values > self.scores[columns, -1]
+            entered[np.isin(columns, stale)] = False
+            for other, score in zip(columns[entered], values[entered]):
+                self._insert(other, row, score)
+
+    def remove(self, quiz_id):
+        """Drop a deleted or unpublished quiz from the index and from every list that showed it"""
+        with self._lock:
+            row = self.rows.pop(quiz_id, None)
+            if row is None:
+                return
+            self.live[row] = False
+            stale = self._rows_listing(row)
+            if len(stale):
+                similarities = self._similarity_rows(stale)
+                for position, other in enumerate(stale):
+                    self.neighbors[other], self.scores[other] = _top_k(
+                        *self._row_similarities(similarities, position, other), self.k)
+
+    def _append(self, document, vector):
+        if self.size == len(self.neighbors):
+            grow = max(1024, self.size // 4)
+            self.neighbors = np.vstack([self.neighbors, np.full((grow, self.k), -1, dtype=np.int32)])
+            self.scores = np.vstack([self.scores, np.zeros((grow, self.k), dtype=np.float32)])
+            self.live = np.concatenate([self.live, np.zeros(grow, dtype=bool)])
+        row = self.size
+        self.tail = sp.vstack([self.tail, vector], format='csr')
+        if self.tail.shape[0] >= self.TAIL_LIMIT:
+            self.matrix = sp.vstack([self.matrix, self.tail], format='csr')
+            self.tail = sp.csr_matrix((0, len(self.vocabulary)), dtype=np.float32)
+        self.quiz_ids.append(document.quiz_id)
+        self.cards.append([document.title, document.difficulty, list(document.tags)])
+        self.live[row] = True
+        self.rows[document.quiz_id] = row
+        self.size += 1
+        return row
+
+    def _row_vectors(self, rows):
+        base = self.matrix.shape[0]
+        return sp.vstack([self.matrix[row] if row < base else self.tail[row - base] for row in rows], format='csr')
+
+    def _similarity_rows(self, rows):
+        """Sparse (len(rows) x size) cosine similarities of the given rows to every row"""
+        columns = self._row_vectors(rows).T.tocsc()
+        return sp.vstack([self.matrix.dot(columns), self.tail.dot(columns)], format='csr').T.tocsr()
+
+    def _row_similarities(self, similarities, position, row):
+        """(columns, values) of one row of _similarity_rows(), without itself and dead rows"""
+        lo, hi = similarities.indptr[position], similarities.indptr[position + 1]
+        columns, values = similarities.indices[lo:hi], similarities.data[lo:hi]
+        keep = self.live[columns] & (columns != row) & (values > 0)
+        return columns[keep], values[keep]
+
+    def _rows_listing(self, row):
+        if row is None:
+            return np.array([], dtype=np.int64)
+        listing = np.nonzero((self.neighbors[:self.size] == row).any(axis=1))[0]
+        return listing[self.live[listing]]
+
+    def _insert(self, row, neighbor, score):
+        neighbors = np.append(self.neighbors[row], neighbor)
+        scores = np.append(self.scores[row], score)
+        order = np.argsort(-scores, kind='stable')[:self.k]
+        self.neighbors[row], self.scores[row] = neighbors[order], scores[order]
+
+    def save(self, path):
+        """Write the index to `path` (an .npz file), replacing it atomically"""
+        with self._lock:
+            matrix = sp.vstack([self.matrix, self.tail], format='csr')
+            vocabulary = sorted(self.vocabulary, key=self.vocabulary.get)
+            meta = json.dumps({'vocabulary': vocabulary, 'quiz_ids': self.quiz_ids, 'cards': self.cards})
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as output:
+                np.savez(output, data=matrix.data, indices=matrix.indices, indptr=matrix.indptr,
+                         shape=np.array(matrix.shape), idf=self.idf, neighbors=self.neighbors[:self.size],
+                         scores=self.scores[:self.size], live=self.live[:self.size],
+                         meta=np.frombuffer(meta.encode('utf-8'), dtype=np.uint8))
+            os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as saved:
+            meta = json.loads(saved['meta'].tobytes().decode('utf-8'))
+            matrix = sp.csr_matrix((saved['data'], saved['indices'], saved['indptr']),
+                                   shape=tuple(saved['shape']))
+            return cls(meta['vocabulary'], saved['idf'], matrix, meta['quiz_ids'], meta['cards'],
+                       saved['neighbors'], saved['scores'], saved['live'])
@@ -0,0 +1,50 @@
+"""Spaced-repetition scheduling of questions a user has answered (SM-2).
+
+Every graded answer is a review of that question. Its outcome maps to a
+recall quality, which moves the question's ease factor and sets the interval
+before it is due again:
+
+- incorrect: the question is relearned and comes back after RELEARN_MINUTES;
+- partial / correct: the interval grows 1 day, 6 days, then by the ease factor.
+
+Retaking a quiz to study shouldn't make its questions look mastered, so a
+successful answer before the question is due keeps its interval; a miss always
+counts.
+"""
+from datetime import timedelta
+
+INITIAL_EASE = 2.5
+MIN_EASE = 1.3
+FIRST_INTERVAL_DAYS = 1.0
+SECOND_INTERVAL_DAYS = 6.0
+RELEARN_MINUTES = 10
+
+QUALITY = {'correct': 5, 'partial': 3, 'incorrect': 1}  # SM-2 recall quality, 0..5; below 3 is a lapse
+
+REVIEW_FIELDS = ('ease', 'interval_days', 'repetitions', 'lapses', 'due_at', 'last_reviewed_at', 'last_outcome')
+
+
+def next_review(state, outcome, reviewed_at):
+    """Scheduling fields after answering with `outcome` at `reviewed_at`; state is the current fields or None"""
+    if state is None:
+        state = {'ease': INITIAL_EASE, 'interval_days': 0.0, 'repetitions': 0, 'lapses': 0, 'due_at': None}
+    quality = QUALITY[outcome]
+    if quality >= 3 and state['due_at'] is not None and reviewed_at < state['due_at']:
+        return dict(state, last_reviewed_at=reviewed_at, last_outcome=outcome)
+
+    ease = max(MIN_EASE, state['ease'] + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+    repetitions, lapses = state['repetitions'], state['lapses']
+    if quality < 3:
+        repetitions, lapses, interval = 0, lapses + 1, 0.0
+        due_at = reviewed_at + timedelta(minutes=RELEARN_MINUTES)
+    else:
+        repetitions += 1
+        if repetitions == 1:
+            interval = FIRST_INTERVAL_DAYS
+        elif repetitions == 2:
+            interval = SECOND_INTERVAL_DAYS
+        else:
+            interval = round(state['interval_days'] * ease, 2)
+        due_at = reviewed_at + timedelta(days=interval)
+    return {'ease': round(ease, 3), 'interval_days': interval, 'repetitions': repetitions, 'lapses': lapses,
+            'due_at': due_at, 'last_reviewed_at': reviewed_at, 'last_outcome': outcome}
@@ -0,0 +1,107 @@
+import json
+import os
+import sys
+import uuid
+from datetime import datetime, timedelta
+
+import jwt
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import Quiz, User, create_app, db, initialize_database  # noqa: E402
+
+
+class RecordingExecutor:
+    """Stands in for the bulk job pool: keeps submitted jobs until the test runs them"""
+
+    def __init__(self):
+        self.jobs = []
+
+    def submit(self, fn, *args):
+        self.jobs.append((fn, args))
+
+    def run_all(self):
+        jobs, self.jobs = self.jobs, []
+        for fn, args in jobs:
+            fn(*args)
+
+
+def build_app(directory):
+    """A test app with its database and files under `directory`"""
+    app = create_app({
+        'TESTING': True,
+        'SECRET_KEY': 'quizgenie-test-secret-key-0123456789',
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{directory / 'quizzes.db'}",
+        'LLM_BACKEND': 'stub',
+        'LLM_RATE_LIMIT_DB': str(directory / 'rate_limits.sqlite3'),
+        'SIMILAR_INDEX_PATH': str(directory / 'similar_index.npz'),
+        'ATTEMPT_ARCHIVE_DIR': str(directory / 'archive'),
+        'OUTBOX_WORKER': 'inline',
+    })
+    app.extensions['quizgenie.bulk_job_executor'] = RecordingExecutor()
+    with app.app_context():
+        initialize_database()
+    return app
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = build_app(tmp_path)
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def jobs(app):
+    return app.extensions['quizgenie.bulk_job_executor']
+
+
+@pytest.fixture
+def make_user(app):
+    def make(username):
+        with app.app_context():
+            user = User(username=username, email=f'{username}@example.com', password='x')
+            db.session.add(user)
+            db.session.commit()
+            return user.id
+    return make
+
+
+@pytest.fixture
+def auth(app):
+    def headers(user_id):
+        token = jwt.encode({'id': user_id, 'exp': datetime.utcnow() + timedelta(hours=1)}, app.config['SECRET_KEY'])
+        return {'Authorization': f'Bearer {token}'}
+    return headers
+
+
+@pytest.fixture
+def make_quiz(app):
+    def make(user_id, num_questions=4, title='Quiz', is_public=True, created_at=None, original_text='text'):
+        content = [{'question': f'Q{i}', 'options': ['a', 'b', 'c', 'd'], 'answer': 'a',
+                    'explanation': '', 'difficulty': 'Easy'} for i in range(num_questions)]
+        with app.app_context():
+            quiz = Quiz(id=str(uuid.uuid4()), original_text=original_text, quiz_content=json.dumps(content),
+                        quiz_type='mcq', title=title, difficulty='Easy', is_public=is_public,
+                        user_id=user_id, created_at=created_at or datetime.utcnow())
+            db.session.add(quiz)
+            db.session.commit()
+            return quiz.id
+    return make
+
+
+@pytest.fixture
+def submit(client, auth):
+    def post(user_id, quiz_id, answers):
+        response = client.post('/submit-quiz', headers=auth(user_id), json={'quiz_id': quiz_id, 'answers': answers})
+        assert response.status_code == 200, response.get_json()
+        return response.get_json()
+    return post
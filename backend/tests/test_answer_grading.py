@@ -0,0 +1,85 @@
+import pytest
+
+from answer_grading import GradingStats, compile_expected, local_verdict, normalize_answer, parse_quantity
+
+
+def verdict(expected, given):
+    result = local_verdict(expected, given)
+    return result and (result.verdict, result.rule)
+
+
+def test_normalize_answer_ignores_case_accents_and_punctuation():
+    assert normalize_answer("  Café au Lait!  ") == 'cafe au lait'
+    assert normalize_answer("Newton's") == 'newtons'
+
+
+@pytest.mark.parametrize('given', ['Photosynthesis', ' photosynthesis. ', 'PHOTOSYNTHESIS!'])
+def test_exact_match(given):
+    assert verdict('photosynthesis', given) == ('correct', 'exact')
+
+
+@pytest.mark.parametrize('given', ['', '   ', 'idk', "I don't know", 'N/A', 'pass'])
+def test_no_answer(given):
+    assert verdict('photosynthesis', given) == ('incorrect', 'no_answer')
+
+
+@pytest.mark.parametrize('expected, given, result', [
+    ('1000', '1,000', 'correct'),
+    ('1000', '1001', 'incorrect'),
+    ('3.14', '3.1416', 'correct'),
+    ('0.75', '3/4', 'correct'),
+    ('50%', '0.5', 'correct'),
+    ('50%', '0.6', 'incorrect'),
+    ('50%', '50 %', 'correct'),
+    ('2.5 kg', '2.50 kg', 'correct'),
+    ('2.5 kg', '3 kg', 'incorrect'),
+])
+def test_numeric(expected, given, result):
+    assert verdict(expected, given) == (result, 'numeric')
+
+
+@pytest.mark.parametrize('expected, given', [
+    ('5 million', '5'),
+    ('2 pi', '2'),
+    ('1990s', '1990'),
+    ('5', '5 million'),
+    ('2.5 kg', '2.5 g'),
+])
+def test_numeric_with_different_units_escalates(expected, given):
+    assert local_verdict(expected, given) is None
+
+
+def test_parse_quantity():
+    assert parse_quantity('1,000') == (1000.0, 0.5, '')
+    assert parse_quantity('-2.5 kg') == (-2.5, 0.05, 'kg')
+    assert parse_quantity('1/0') is None
+    assert parse_quantity('abc') is None
+
+
+def test_token_overlap():
+    assert verdict('the mitochondria', 'mitochondria of the cell') is None
+    assert verdict('light energy chemical energy', 'chemical energy and light energy') == ('correct', 'token_overlap')
+    assert verdict('carbon dioxide water', 'water and carbon dioxide') == ('correct', 'token_overlap')
+    # Missing words are never decided locally
+    assert verdict('carbon dioxide water', 'carbon dioxide') is None
+
+
+def test_negation_escalates():
+    assert verdict('it is a mammal', 'it is not a mammal') is None
+    assert verdict('not a mammal', 'not a mammal at all') is None
+
+
+def test_compiled_expected_answer_gives_the_same_verdicts():
+    expected = compile_expected('5 million')
+    assert local_verdict(expected, '5 million') == local_verdict('5 million', '5 million')
+    assert local_verdict(expected, '5') is None
+
+
+def test_grading_stats_snapshot():
+    stats = GradingStats()
+    stats.record('local', 'exact')
+    stats.record('local', 'numeric')
+    stats.record('llm')
+    snapshot = stats.snapshot()
+    assert (snapshot['answers'], snapshot['local'], snapshot['llm']) == (3, 2, 1)
+    assert snapshot['rules'] == {'exact': 1, 'numeric': 1}
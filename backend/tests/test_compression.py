@@ -0,0 +1,67 @@
+import gzip
+
+import pytest
+
+from compression import compress, is_compressible, negotiate_encoding, parse_accept_encoding
+
+
+def test_parse_accept_encoding():
+    assert parse_accept_encoding('gzip, br;q=0.8, identity; q=0, x;q=bad') == \
+        {'gzip': 1.0, 'br': 0.8, 'identity': 0.0, 'x': 0.0}
+    assert parse_accept_encoding(None) == {}
+
+
+@pytest.mark.parametrize('header, encoding', [
+    ('gzip, deflate, br', 'br'),
+    ('gzip;q=1, br;q=0.5', 'gzip'),
+    ('br;q=0, gzip', 'gzip'),
+    ('*', 'br'),
+    ('*;q=0.5, br;q=0', 'gzip'),
+    ('deflate', None),
+    ('', None),
+])
+def test_negotiate_encoding(header, encoding):
+    assert negotiate_encoding(header, ('br', 'gzip')) == encoding
+
+
+def test_negotiate_encoding_without_brotli():
+    assert negotiate_encoding('br', ('gzip',)) is None
+    assert negotiate_encoding('br, gzip', ('gzip',)) == 'gzip'
+
+
+def test_is_compressible():
+    assert is_compressible('application/json') and is_compressible('text/html')
+    assert not is_compressible('image/png') and not is_compressible(None)
+
+
+def test_compress_round_trips():
+    data = b'{"quiz": []}' * 100
+    assert gzip.decompress(compress(data, 'gzip')) == data
+    with pytest.raises(ValueError):
+        compress(data, 'deflate')
+
+
+def test_compress_brotli():
+    brotli = pytest.importorskip('brotli')
+    data = b'{"quiz": []}' * 100
+    assert brotli.decompress(compress(data, 'br')) == data
+
+
+def test_large_json_responses_are_gzipped(app, client, make_user, make_quiz):
+    owner = make_user('owner')
+    for i in range(5):
+        make_quiz(owner, title=f'Quiz {i}')
+    plain = client.get('/api/quizzes')
+    assert 'Content-Encoding' not in plain.headers
+
+    app.config['COMPRESS_MIN_BYTES'] = 64
+    response = client.get('/api/quizzes', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert gzip.decompress(response.get_data()) == plain.get_data()
+
+    # Below the threshold, or with compression turned off, the body goes as is
+    app.config['COMPRESS_MIN_BYTES'] = 1 << 20
+    assert 'Content-Encoding' not in client.get('/api/quizzes', headers={'Accept-Encoding': 'gzip'}).headers
+    app.config['COMPRESS_MIN_BYTES'] = -1
+    assert 'Content-Encoding' not in client.get('/api/quizzes', headers={'Accept-Encoding': 'gzip'}).headers
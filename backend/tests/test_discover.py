@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta
+
+from app import Quiz, Tag, db
+
+
+def trending_titles(client, query=''):
+    response = client.get(f'/api/quizzes?collapse=false{query}')
+    assert response.status_code == 200
+    return [quiz['title'] for quiz in response.get_json()]
+
+
+def test_trending_backfills_unplayed_public_quizzes(app, client, make_user, make_quiz, submit):
+    owner = make_user('owner')
+    start = datetime.utcnow() - timedelta(hours=1)
+    first = make_quiz(owner, title='First', created_at=start)
+    make_quiz(owner, title='Second', created_at=start + timedelta(minutes=1))
+    make_quiz(owner, title='Private', is_public=False, created_at=start + timedelta(minutes=2))
+
+    # Nothing played yet: newest first
+    assert trending_titles(client) == ['Second', 'First']
+
+    # Played quizzes rank ahead of the backfill
+    submit(owner, first, {'0': 'a'})
+    assert trending_titles(client) == ['First', 'Second']
+
+    # The backfill fills the page past TRENDING_TOP_N ranked quizzes
+    app.config['TRENDING_TOP_N'] = 1
+    make_quiz(owner, title='Third', created_at=start + timedelta(minutes=3))
+    assert trending_titles(client) == ['First', 'Third']
+
+
+def test_trending_backfill_respects_tags(app, client, make_user, make_quiz):
+    owner = make_user('owner')
+    start = datetime.utcnow() - timedelta(hours=1)
+    make_quiz(owner, title='Untagged', created_at=start)
+    tagged = make_quiz(owner, title='Tagged', created_at=start + timedelta(minutes=1))
+    with app.app_context():
+        quiz = db.session.get(Quiz, tagged)
+        quiz.tags.append(Tag(name='biology'))
+        db.session.commit()
+
+    assert trending_titles(client, '&tags=biology') == ['Tagged']
+
+
+def test_filters_apply_to_every_sort(app, client, make_user, make_quiz, submit):
+    owner = make_user('owner')
+    start = datetime.utcnow() - timedelta(hours=1)
+    biology = make_quiz(owner, title='Cell biology', created_at=start)
+    make_quiz(owner, title='Cell division', created_at=start + timedelta(minutes=1))
+    make_quiz(owner, title='Algebra', created_at=start + timedelta(minutes=2))
+    make_quiz(owner, title='Cell secrets', is_public=False, created_at=start + timedelta(minutes=3))
+    with app.app_context():
+        quiz = db.session.get(Quiz, biology)
+        quiz.difficulty = 'Hard'
+        quiz.rating = 90.0
+        quiz.tags.append(Tag(name='biology'))
+        db.session.commit()
+    submit(owner, biology, {'0': 'a'})
+
+    for sort in ('trending', 'newest'):
+        assert trending_titles(client, f'&sort={sort}&search=cell') == \
+            (['Cell biology', 'Cell division'] if sort == 'trending' else ['Cell division', 'Cell biology'])
+        assert trending_titles(client, f'&sort={sort}&difficulty=hard') == ['Cell biology']
+        assert trending_titles(client, f'&sort={sort}&difficulty=') == trending_titles(client, f'&sort={sort}')
+        assert trending_titles(client, f'&sort={sort}&tags=biology') == ['Cell biology']
+    assert trending_titles(client, '&sort=newest') == ['Algebra', 'Cell division', 'Cell biology']
+    assert trending_titles(client, '&sort=top-rated')[0] == 'Cell biology'
@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta
+
+from app import QuizAttempt, db, rollup_attempts
+
+
+def page_through(client, headers, url, key, cursor_key=None):
+    pages, cursor = [], None
+    while True:
+        response = client.get(url + (f'&cursor={cursor}' if cursor else ''), headers=headers)
+        assert response.status_code == 200, response.get_json()
+        body = response.get_json()
+        pages.append(body[key])
+        cursor = body['next_cursor'][cursor_key] if cursor_key else body['next_cursor']
+        if not cursor:
+            return pages
+
+
+def test_history_pages_follow_cursors_and_keep_archived_quizzes(app, client, auth, make_user, make_quiz, submit):
+    owner, player = make_user('owner'), make_user('player')
+    start = datetime.utcnow() - timedelta(days=50)
+    first, second, third = (make_quiz(owner, title=title, created_at=start + timedelta(minutes=i))
+                            for i, title in enumerate(('First', 'Second', 'Third')))
+    for quiz_id in (first, second, third, first):
+        submit(player, quiz_id, {'0': 'a', '1': 'a', '2': 'b', '3': 'b'})
+
+    now = datetime.utcnow()
+    completed = [now - timedelta(hours=3), now - timedelta(days=40), now - timedelta(hours=2), now - timedelta(hours=1)]
+    with app.app_context():
+        for attempt, completed_at in zip(QuizAttempt.query.order_by(QuizAttempt.id), completed):
+            attempt.completed_at = completed_at
+        db.session.commit()
+    assert app.test_cli_runner().invoke(args=['rebuild-quiz-history']).exit_code == 0
+    with app.app_context():
+        # Second's only attempt moves into the rollups
+        assert rollup_attempts(older_than_days=30) == 1
+
+    headers = auth(player)
+    taken = page_through(client, headers, '/api/user/quiz-history?type=taken&limit=2', 'taken_quizzes', 'taken')
+    assert [[quiz['title'] for quiz in page] for page in taken] == [['First', 'Third'], ['Second']]
+    attempts = {quiz['title']: quiz['attempt_data']['total_attempts'] for page in taken for quiz in page}
+    assert attempts == {'First': 2, 'Third': 1, 'Second': 1}
+
+    summary = client.get('/api/user/quiz-history?type=taken&limit=1', headers=headers).get_json()['summary']
+    assert (summary['total_taken'], summary['total_attempts'], summary['average_score']) == (3, 4, 50.0)
+
+    created = page_through(client, auth(owner), '/api/user/quiz-history?type=created&limit=2',
+                           'created_quizzes', 'created')
+    assert [len(page) for page in created] == [2, 1]
+    statistics = {quiz['title']: quiz['statistics']['total_attempts'] for page in created for quiz in page}
+    assert statistics == {'First': 2, 'Second': 1, 'Third': 1}
+    participants = {quiz['title']: len(quiz['recent_participants']) for page in created for quiz in page}
+    assert participants == {'First': 2, 'Second': 0, 'Third': 1}
+
+    recent = page_through(client, headers, '/api/attempts/user/recent?limit=2', 'attempts')
+    assert [[attempt['quiz_title'] for attempt in page] for page in recent] == [['First', 'Third'], ['First']]
+
+
+def test_quiz_attempts_summary_covers_every_attempt(app, client, auth, make_user, make_quiz, submit):
+    owner, player = make_user('owner'), make_user('player')
+    quiz_id = make_quiz(owner)
+    for correct in range(5):
+        submit(player, quiz_id, {str(i): 'a' if i < correct else 'b' for i in range(4)})
+    with app.app_context():
+        # The perfect attempt is archived: it still counts, but its details are gone
+        QuizAttempt.query.filter_by(score=100.0).update({'completed_at': datetime.utcnow() - timedelta(days=100)})
+        db.session.commit()
+        assert rollup_attempts(older_than_days=30) == 1
+
+    body = client.get(f'/api/attempts/{quiz_id}?limit=2', headers=auth(player)).get_json()
+    assert len(body['attempts']) == 2 and body['next_cursor']
+    summary = body['summary']
+    assert (summary['total_attempts'], summary['best_score'], summary['average_score']) == (5, 100.0, 50.0)
+    assert summary['best_attempt']['score'] == 75.0
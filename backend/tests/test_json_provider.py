@@ -0,0 +1,36 @@
+import json
+from datetime import datetime
+from decimal import Decimal
+
+from flask import jsonify
+
+from app import create_app
+from json_provider import OrjsonProvider
+
+PAYLOAD = {'b': 1, 'a': [True, None, 1.5], 'when': datetime(2026, 1, 2, 3, 4, 5), 'price': Decimal('9.99'),
+           'name': 'Zoë', 'c': {'2': 'x', '10': 'y'}}
+
+
+def test_orjson_matches_the_default_provider(app, tmp_path):
+    stdlib_app = create_app({'TESTING': True, 'JSON_PROVIDER': 'stdlib',
+                             'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'stdlib.db'}"})
+    assert isinstance(app.json, OrjsonProvider) and not isinstance(stdlib_app.json, OrjsonProvider)
+
+    encoded = app.json.dumps(PAYLOAD)
+    assert json.loads(encoded) == json.loads(stdlib_app.json.dumps(PAYLOAD))
+    assert encoded.index('"a"') < encoded.index('"b"') < encoded.index('"c"')
+    assert '"Fri, 02 Jan 2026 03:04:05 GMT"' in encoded and 'Zoë' in encoded
+
+    with app.test_request_context():
+        response = jsonify(PAYLOAD)
+    assert response.mimetype == 'application/json' and response.get_data().endswith(b'\n')
+    assert json.loads(response.get_data()) == json.loads(encoded)
+
+
+def test_values_orjson_refuses_fall_back_to_the_stdlib(app):
+    provider = app.json
+    assert provider.dumps({3: 'int key'}) == '{"3":"int key"}'
+    assert provider.dumps({'big': 2 ** 70}) == '{"big": 1180591620717411303424}'
+    assert provider.loads('{"x": NaN}')['x'] != provider.loads('{"x": NaN}')['x']
+    assert provider.loads(b'{"a": [1, 2]}') == {'a': [1, 2]}
+    assert provider.dumps({'a': 1}, indent=2) == '{\n  "a": 1\n}'
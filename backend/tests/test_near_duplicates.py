@@ -0,0 +1,82 @@
+import random
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from app import Quiz, QuizSignature, db, register_quiz_signatures
+from near_duplicates import (BANDS, NUM_PERM, from_bytes, index_keys, minhash, probe_keys, shingle_hashes,
+                             similarity, text_signatures, to_bytes)
+
+WORDS = [f'word{i}' for i in range(500)]
+
+
+def passage(seed, length=200):
+    rng = random.Random(seed)
+    return ' '.join(rng.choice(WORDS) for _ in range(length))
+
+
+def edited(text, changes, seed=0):
+    rng = random.Random(seed)
+    words = text.split()
+    for _ in range(changes):
+        words[rng.randrange(len(words))] = rng.choice(WORDS)
+    return ' '.join(words)
+
+
+def test_shingles_and_signatures():
+    assert len(shingle_hashes('One two, three!', 5)) == 1
+    assert len(shingle_hashes('a b c d e f', 5)) == 2
+    assert minhash(shingle_hashes('', 5)) is None
+    signature = minhash(shingle_hashes(passage(1), 5))
+    assert signature.shape == (NUM_PERM,) and signature.dtype == np.dtype('<u4')
+    # Signatures are stored, so they must be stable across processes
+    assert np.array_equal(signature, minhash(shingle_hashes(passage(1), 5)))
+    assert np.array_equal(from_bytes(to_bytes(signature)), signature)
+    assert to_bytes(None) is None and from_bytes(None) is None
+
+
+def test_similarity_tracks_jaccard():
+    text = passage(1)
+    same = text_signatures(text, ['Q1'])
+    assert similarity(same, text_signatures(text.upper(), ['other'])) == 1.0
+    assert similarity(same, text_signatures(edited(text, 2), [])) >= 0.8
+    assert similarity(same, text_signatures(passage(2), [])) < 0.3
+
+
+def test_passage_decides_before_questions():
+    questions = ['What is the capital of France?', 'What is the capital of Italy?']
+    first = text_signatures(passage(1), questions)
+    second = text_signatures(passage(2), questions)
+    assert similarity(first, second) < 0.3
+    # Without passages, the question text decides
+    assert similarity(text_signatures('', questions), text_signatures(None, questions)) == 1.0
+    assert similarity(text_signatures('', []), text_signatures('', [])) == 0.0
+
+
+def test_similar_quizzes_share_band_keys():
+    text = passage(3)
+    signatures = text_signatures(text, ['Q'])
+    near = text_signatures(edited(text, 2), ['Q'])
+    far = text_signatures(passage(4), ['Q'])
+    assert len(index_keys(signatures)) == 2 * BANDS
+    assert set(probe_keys(near)) & set(index_keys(signatures))
+    # Same questions but different passages: never probed through the question namespace
+    assert not set(probe_keys(far)) & set(index_keys(signatures))
+
+
+def test_near_identical_quizzes_are_clustered_and_collapsed(app, client, make_user, make_quiz):
+    owner = make_user('owner')
+    start = datetime.utcnow() - timedelta(hours=1)
+    text = passage(5)
+    ids = [make_quiz(owner, title='Original', original_text=text, created_at=start),
+           make_quiz(owner, title='Copy', original_text=edited(text, 2), created_at=start + timedelta(minutes=1)),
+           make_quiz(owner, title='Other', original_text=passage(6), created_at=start + timedelta(minutes=2))]
+    with app.app_context():
+        found = register_quiz_signatures(Quiz.query.filter(Quiz.id.in_(ids)).order_by(Quiz.created_at).all())
+        assert [match[2]['id'] for match in found[ids[1]]] == [ids[0]]
+        clusters = dict(db.session.query(QuizSignature.quiz_id, QuizSignature.cluster_id))
+        assert clusters[ids[0]] == clusters[ids[1]] != clusters[ids[2]]
+
+    collapsed = [quiz['title'] for quiz in client.get('/api/quizzes?sort=newest').get_json()]
+    assert collapsed == ['Other', 'Original']
+    assert len(client.get('/api/quizzes?sort=newest&collapse=false').get_json()) == 3
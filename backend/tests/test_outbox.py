@@ -0,0 +1,94 @@
+from datetime import datetime, timedelta
+
+import app as quizgenie
+from app import ATTEMPT_RECORDED, OutboxEvent, QuizAttempt, User, UserQuizSummary, db
+
+
+def test_submit_delivers_inline(app, make_user, make_quiz, submit):
+    owner, player = make_user('owner'), make_user('player')
+    quiz_id = make_quiz(owner)
+    submit(player, quiz_id, {'0': 'a', '1': 'a', '2': 'b', '3': 'b'})
+
+    with app.app_context():
+        assert OutboxEvent.query.count() == 0
+        assert db.session.get(User, player).total_score == 50.0
+        assert db.session.get(quizgenie.Quiz, quiz_id).plays == 1
+        summary = db.session.get(UserQuizSummary, (player, quiz_id))
+        assert (summary.attempts, summary.best_score, summary.last_score) == (1, 50.0, 50.0)
+
+
+def test_stats_need_a_token_and_drain_delivers_the_backlog(app, client, auth, make_user, make_quiz, submit):
+    owner, player = make_user('owner'), make_user('player')
+    quiz_id = make_quiz(owner)
+    app.config['OUTBOX_WORKER'] = 'off'
+    submit(player, quiz_id, {'0': 'a', '1': 'a', '2': 'b', '3': 'b'})
+    submit(player, quiz_id, {'0': 'a', '1': 'a', '2': 'a', '3': 'b'})
+
+    assert client.get('/api/outbox/stats').status_code == 401
+    stats = client.get('/api/outbox/stats', headers=auth(player)).get_json()
+    assert (stats['pending'], stats['parked']) == (2, 0)
+    with app.app_context():
+        assert not db.session.get(User, player).total_score
+
+    assert app.test_cli_runner().invoke(args=['drain-outbox']).exit_code == 0
+
+    with app.app_context():
+        assert OutboxEvent.query.count() == 0
+        assert db.session.get(User, player).total_score == 50.0 + 75.0
+        assert db.session.get(UserQuizSummary, (player, quiz_id)).attempts == 2
+
+
+def test_failing_events_are_retried_then_parked(app, monkeypatch, make_user, make_quiz, submit):
+    owner, player = make_user('owner'), make_user('player')
+    quiz_id = make_quiz(owner)
+    app.config['OUTBOX_WORKER'] = 'off'
+    app.config['OUTBOX_MAX_ATTEMPTS'] = 2
+    submit(player, quiz_id, {'0': 'a'})
+
+    def fail(payloads):
+        raise RuntimeError('handler down')
+    handlers = quizgenie.OUTBOX_HANDLERS[ATTEMPT_RECORDED]
+    monkeypatch.setitem(quizgenie.OUTBOX_HANDLERS, ATTEMPT_RECORDED, [fail])
+
+    with app.app_context():
+        assert quizgenie.drain_outbox() == 0
+        event = OutboxEvent.query.one()
+        assert event.attempts == 1 and event.last_error == 'handler down'
+        assert event.available_at > datetime.utcnow()
+
+        event.available_at = datetime.utcnow()
+        db.session.commit()
+        assert quizgenie.drain_outbox() == 0
+        event = OutboxEvent.query.one()
+        assert event.attempts == 2 and event.available_at is None
+        assert quizgenie.outbox_status()['parked'] == 1
+        # Parked events are skipped until requeued
+        assert quizgenie.drain_outbox() == 0
+
+    monkeypatch.setitem(quizgenie.OUTBOX_HANDLERS, ATTEMPT_RECORDED, handlers)
+    assert 'Requeued 1 events' in app.test_cli_runner().invoke(args=['outbox', '--requeue']).output
+
+    with app.app_context():
+        assert quizgenie.drain_outbox() == 1
+        assert OutboxEvent.query.count() == 0
+        assert db.session.get(User, player).total_score == 25.0
+
+
+def test_rollup_keeps_attempts_until_their_event_is_delivered(app, make_user, make_quiz, submit):
+    owner, player = make_user('owner'), make_user('player')
+    quiz_id = make_quiz(owner)
+    app.config['OUTBOX_WORKER'] = 'off'
+    submit(player, quiz_id, {'0': 'a', '1': 'a', '2': 'b', '3': 'b'})
+
+    with app.app_context():
+        QuizAttempt.query.update({'completed_at': datetime.utcnow() - timedelta(days=100)})
+        db.session.commit()
+        assert quizgenie.rollup_attempts(older_than_days=30) == 0
+        assert QuizAttempt.query.count() == 1
+
+        assert quizgenie.drain_outbox() == 1
+        assert quizgenie.rollup_attempts(older_than_days=30) == 1
+        assert QuizAttempt.query.count() == 0
+        assert db.session.get(User, player).total_score == 50.0
+        assert db.session.get(quizgenie.Quiz, quiz_id).plays == 1
+        assert db.session.get(UserQuizSummary, (player, quiz_id)).attempts == 1
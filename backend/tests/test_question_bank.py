@@ -0,0 +1,67 @@
+from app import ALL_QUIZZES_FACET, BankQuestionKey, db
+
+
+def questions(*names):
+    return [{'question': f'What is {name}?', 'options': ['a', 'b', 'c', 'd'], 'answer': 'a', 'explanation': ''}
+            for name in names]
+
+
+def bank_quiz(client, auth, make_quiz, owner, content, tags, is_public=True, difficulty='Medium'):
+    quiz_id = make_quiz(owner, is_public=is_public)
+    response = client.put(f'/api/quizzes/{quiz_id}', headers=auth(owner),
+                          json={'quiz_content': content, 'tags': tags, 'difficulty': difficulty})
+    assert response.status_code == 200, response.get_json()
+    return quiz_id
+
+
+def assemble(client, headers, status=200, **body):
+    response = client.post('/api/quizzes/assemble', headers=headers, json={'tag': 'biology', **body})
+    assert response.status_code == status, response.get_json()
+    return response.get_json()
+
+
+def drawn_questions(body):
+    return sorted(question['question'] for question in body['content'])
+
+
+def test_assembled_quizzes_draw_distinct_visible_questions(app, client, auth, make_user, make_quiz, submit):
+    owner, other, player = make_user('owner'), make_user('other'), make_user('player')
+    cells = bank_quiz(client, auth, make_quiz, owner, questions('a cell', 'DNA', 'RNA', 'a ribosome'), ['Biology'])
+    # 'What is DNA?' is saved twice but drawn once
+    bank_quiz(client, auth, make_quiz, owner, questions('dna', 'an enzyme'), ['biology'])
+    bank_quiz(client, auth, make_quiz, other, questions('a secret'), ['biology'], is_public=False)
+    bank_quiz(client, auth, make_quiz, owner, questions('Rome'), ['history'])
+    headers = auth(player)
+
+    body = assemble(client, headers, num_questions=10, difficulty='Medium')
+    assert len(body['content']) == 5 and body['bank']['drawn'] == 5
+    assert 'What is a secret?' not in drawn_questions(body) and 'What is Rome?' not in drawn_questions(body)
+    assert body['metadata']['tags'] == ['biology'] and body['metadata']['difficulty'] == 'Medium'
+    assert client.get(f"/api/quizzes/{body['quiz_id']}", headers=headers).get_json()['quiz']['title'] == \
+        'Biology practice'
+    with app.app_context():
+        # The assembled quiz's questions are copies, not new bank entries
+        assert db.session.query(BankQuestionKey).filter_by(tag_id=ALL_QUIZZES_FACET).count() == 8
+
+    # Questions of attempted quizzes are skipped unless asked for
+    submit(player, cells, {'0': 'a'})
+    assert drawn_questions(assemble(client, headers, num_questions=10)) == ['What is an enzyme?']
+    assert len(assemble(client, headers, num_questions=10, exclude_answered=False)['content']) == 5
+    assert len(assemble(client, headers, num_questions=3, exclude_answered=False)['content']) == 3
+
+    # Private questions are drawn for their owner only
+    assert 'What is a secret?' in drawn_questions(assemble(client, auth(other), num_questions=10))
+    assert drawn_questions(assemble(client, headers, tag=None, num_questions=10)) == \
+        ['What is Rome?', 'What is an enzyme?']
+
+
+def test_assemble_validates_the_request(client, auth, make_user, make_quiz):
+    owner = make_user('owner')
+    bank_quiz(client, auth, make_quiz, owner, questions('a cell'), ['biology'])
+    headers = auth(owner)
+    assemble(client, headers, 400, type='essay')
+    assemble(client, headers, 400, difficulty='Extreme')
+    assemble(client, headers, 400, num_questions=0)
+    assemble(client, headers, 400, num_questions=True)
+    assemble(client, headers, 404, tag='chemistry')
+    assert assemble(client, headers, 404, difficulty='Hard')['error'] == 'No matching questions in the bank'
@@ -0,0 +1,115 @@
+import json
+
+import pytest
+
+from quiz_schema import (GenerationStats, InvalidPackageError, clean_metadata, clean_question, close_truncated_json,
+                         merge_package, parse_package, validate_package)
+
+
+def mcq(question, answer='Paris', options=('Paris', 'Rome', 'Madrid')):
+    return {'question': question, 'options': list(options), 'answer': answer, 'explanation': 'Because.'}
+
+
+PACKAGE = {'title': 'Capitals', 'description': 'European capitals', 'tags': ['geography'],
+           'overall_difficulty': 'easy', 'quiz': [mcq('Capital of France?'), mcq('Capital of Italy?', 'Rome')]}
+
+
+def test_parse_valid_json():
+    assert parse_package(json.dumps(PACKAGE)) == (PACKAGE, [])
+
+
+@pytest.mark.parametrize('reply, repairs', [
+    ('```json\n' + json.dumps(PACKAGE) + '\n```', ['fence']),
+    ('Here is your quiz: ' + json.dumps(PACKAGE), ['prose']),
+    (json.dumps(PACKAGE)[:-1] + ',}', ['trailing_comma']),
+    (json.dumps(PACKAGE) + ' Hope this helps!', ['trailing_text']),
+])
+def test_parse_repairs(reply, repairs):
+    assert parse_package(reply) == (PACKAGE, repairs)
+
+
+def test_parse_truncated_reply_keeps_complete_questions():
+    text = json.dumps(PACKAGE)
+    cut = text[:text.index('Capital of Italy') + 5]
+    result, repairs = parse_package(cut)
+    assert repairs == ['truncated']
+    assert result['title'] == 'Capitals'
+    assert result['quiz'][0]['question'] == 'Capital of France?'
+
+
+@pytest.mark.parametrize('reply', ['', 'Sorry, I cannot help with that.', '{"quiz": [}}'])
+def test_parse_unrecoverable(reply):
+    with pytest.raises(InvalidPackageError):
+        parse_package(reply)
+
+
+def test_close_truncated_json():
+    assert close_truncated_json('{"a": [1, 2') == '{"a": [1]}'
+    assert close_truncated_json('{"a": "x, y') == '{}'
+    assert close_truncated_json('{"a": 1} trailing') == '{"a": 1}'
+    assert close_truncated_json('no json') is None
+
+
+@pytest.mark.parametrize('answer', ['B', '(b)', 'Option B', 'b.', 'rome'])
+def test_clean_question_maps_option_letters(answer):
+    assert clean_question(mcq('Capital of Italy?', answer), 'mcq')['answer'] == 'Rome'
+
+
+@pytest.mark.parametrize('question', [
+    mcq('Capital of Italy?', 'Berlin'),
+    mcq('Capital of Italy?', 'E'),
+    mcq('Capital of Italy?', 'Rome', options=('Rome',)),
+    mcq('Capital of Italy?', 'Rome', options=('Rome', 'rome')),
+    mcq('', 'Rome'),
+    'not a question',
+])
+def test_clean_question_rejects(question):
+    assert clean_question(question, 'mcq') is None
+
+
+def test_clean_question_short_answer_ignores_options():
+    assert clean_question({'question': ' What  is 2+2? ', 'answer': 4}, 'short_answer') == \
+        {'question': 'What is 2+2?', 'answer': '4', 'explanation': ''}
+
+
+def test_clean_metadata():
+    metadata = clean_metadata({'title': 'T' * 300, 'tags': 'a, b, a,', 'overall_difficulty': 'HARD',
+                               'description': ''})
+    assert metadata == {'title': 'T' * 200, 'tags': ['a', 'b'], 'overall_difficulty': 'Hard'}
+
+
+def test_validate_package_reports_what_is_missing():
+    result = {'title': 'Capitals',
+              'quiz': [mcq('Capital of France?'), mcq('capital of france?'), mcq('Bad?', 'Oslo')]}
+    questions, metadata, problems = validate_package(result, 'mcq', 3)
+    assert [question['question'] for question in questions] == ['Capital of France?']
+    assert metadata == {'title': 'Capitals'}
+    assert problems == {'invalid_questions': 2, 'missing_questions': 2,
+                        'missing_metadata': ['description', 'tags', 'overall_difficulty']}
+
+
+def test_validate_package_caps_the_question_count():
+    questions, _, problems = validate_package(PACKAGE, 'mcq', 1)
+    assert len(questions) == 1 and problems['missing_questions'] == 0
+
+
+def test_merge_package_fills_the_gaps_without_overwriting():
+    questions, metadata, _ = validate_package({'title': 'Kept', 'quiz': [mcq('Capital of France?')]}, 'mcq', 3)
+    followup = {'title': 'Replaced?', 'description': 'Filled', 'overall_difficulty': 'Medium', 'tags': ['x'],
+                'quiz': [mcq('Capital of France?'), mcq('Capital of Italy?', 'Rome'),
+                         mcq('Capital of Spain?', 'Madrid'), mcq('Capital of Chad?', 'Paris')]}
+    questions, metadata, problems = merge_package(questions, metadata, followup, 'mcq', 3)
+    assert [question['question'] for question in questions] == \
+        ['Capital of France?', 'Capital of Italy?', 'Capital of Spain?']
+    assert metadata['title'] == 'Kept' and metadata['description'] == 'Filled'
+    assert problems == {'invalid_questions': 0, 'missing_questions': 0, 'missing_metadata': []}
+
+
+def test_generation_stats_snapshot():
+    stats = GenerationStats()
+    stats.record('valid')
+    stats.record('repaired', repairs=['fence', 'truncated'], rerequested=True)
+    stats.record('failed')
+    snapshot = stats.snapshot()
+    assert (snapshot['generations'], snapshot['rerequested'], snapshot['repair_success_rate']) == (3, 1, 0.5)
+    assert snapshot['repairs'] == {'fence': 1, 'truncated': 1}
@@ -0,0 +1,112 @@
+from datetime import date
+
+import app as quizgenie
+from app import OutboxEvent, QuestionStat, Quiz, QuizAttempt, QuizDailyRollup, User, db
+
+
+def change_answer_key(client, auth, owner_id, quiz_id, answer):
+    content = client.get(f'/api/quizzes/{quiz_id}', headers=auth(owner_id)).get_json()['quiz']['quiz_content']
+    for question in content:
+        question['answer'] = answer
+    response = client.put(f'/api/quizzes/{quiz_id}', headers=auth(owner_id),
+                          json={'title': 'Quiz', 'quiz_content': content})
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()['regrade_job_id']
+
+
+def test_regrade_applies_score_deltas(app, client, auth, jobs, make_user, make_quiz, submit):
+    owner, player = make_user('owner'), make_user('player')
+    quiz_id = make_quiz(owner)
+    submit(player, quiz_id, {'0': 'a', '1': 'b', '2': 'b', '3': 'b'})
+    submit(player, quiz_id, {'0': 'b', '1': 'b', '2': 'a', '3': 'a'})
+
+    job_id = change_answer_key(client, auth, owner, quiz_id, 'b')
+    jobs.run_all()
+
+    with app.app_context():
+        scores = [attempt.score for attempt in QuizAttempt.query.order_by(QuizAttempt.id)]
+        assert scores == [75.0, 50.0]
+        assert db.session.get(User, player).total_score == 125.0
+        stats = QuestionStat.query.filter_by(quiz_id=quiz_id).all()
+        assert [stat.attempts for stat in stats] == [2, 2, 2, 2]
+        assert sum(stat.correct for stat in stats) == 5
+        assert db.session.get(Quiz, quiz_id).rating == (75.0 + 50.0) / 2
+
+    job = client.get(f'/api/quizzes/{quiz_id}/regrade', headers=auth(owner)).get_json()
+    assert job['job_id'] == job_id
+    assert job['status'] == 'completed'
+    assert job['attempts_done'] == 2 and job['attempts_changed'] == 2
+
+
+def test_regrade_leaves_undelivered_attempts_to_the_outbox(app, client, auth, jobs, make_user, make_quiz, submit):
+    owner, player = make_user('owner'), make_user('player')
+    quiz_id = make_quiz(owner)
+    submit(player, quiz_id, {'0': 'a', '1': 'b', '2': 'b', '3': 'b'})
+    submit(player, quiz_id, {'0': 'b', '1': 'b', '2': 'a', '3': 'a'})
+    app.config['OUTBOX_WORKER'] = 'off'
+    submit(player, quiz_id, {'0': 'b', '1': 'b', '2': 'b', '3': 'a'})
+    with app.app_context():
+        # Archived attempts seed the rating replay
+        db.session.add(QuizDailyRollup(quiz_id=quiz_id, day=date(2024, 1, 1), attempts=2, score_sum=120.0))
+        db.session.commit()
+
+    change_answer_key(client, auth, owner, quiz_id, 'b')
+    jobs.run_all()
+
+    with app.app_context():
+        assert OutboxEvent.query.count() == 1
+        # Only the delivered attempts are counted so far, at their regraded scores
+        assert db.session.get(User, player).total_score == 75.0 + 50.0
+        assert sum(stat.attempts for stat in QuestionStat.query.filter_by(quiz_id=quiz_id)) == 2 * 4
+
+    assert app.test_cli_runner().invoke(args=['drain-outbox']).exit_code == 0
+
+    with app.app_context():
+        assert OutboxEvent.query.count() == 0
+        assert [attempt.score for attempt in QuizAttempt.query.order_by(QuizAttempt.id)] == [75.0, 50.0, 75.0]
+        assert db.session.get(User, player).total_score == 75.0 + 50.0 + 75.0
+        stats = QuestionStat.query.filter_by(quiz_id=quiz_id).all()
+        assert [stat.attempts for stat in stats] == [3, 3, 3, 3]
+        assert sum(stat.correct for stat in stats) == 3 + 2 + 3
+        assert db.session.get(Quiz, quiz_id).rating == ((((120.0 / 2 + 75.0) / 2) + 50.0) / 2 + 75.0) / 2
+
+
+def test_failed_regrade_start_still_reports_the_save(app, client, auth, jobs, monkeypatch, make_user, make_quiz, submit):
+    owner, player = make_user('owner'), make_user('player')
+    quiz_id = make_quiz(owner)
+    submit(player, quiz_id, {'0': 'a'})
+
+    def refuse(fn, *args):
+        raise RuntimeError('pool shut down')
+    monkeypatch.setattr(jobs, 'submit', refuse)
+    content = client.get(f'/api/quizzes/{quiz_id}', headers=auth(owner)).get_json()['quiz']['quiz_content']
+    for question in content:
+        question['answer'] = 'b'
+    response = client.put(f'/api/quizzes/{quiz_id}', headers=auth(owner), json={'title': 'Renamed', 'quiz_content': content})
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['success'] and body['quiz']['title'] == 'Renamed'
+    assert 'pool shut down' in body['regrade_error']
+    monkeypatch.undo()
+    # The queued job can be resumed
+    assert client.post(f'/api/quizzes/{quiz_id}/regrade', headers=auth(owner)).get_json()['job_id'] == \
+        body['regrade_job_id']
+    jobs.run_all()
+    with app.app_context():
+        assert QuizAttempt.query.one().score == 0.0
+
+
+def test_failed_save_is_rolled_back(app, client, auth, monkeypatch, make_user, make_quiz):
+    owner = make_user('owner')
+    quiz_id = make_quiz(owner)
+
+    def fail(quizzes):
+        raise RuntimeError('bank down')
+    monkeypatch.setattr(quizgenie, 'index_bank_questions', fail)
+    response = client.put(f'/api/quizzes/{quiz_id}', headers=auth(owner), json={'title': 'Renamed', 'quiz_content': []})
+
+    assert response.status_code == 500
+    assert response.get_json()['error'] == 'Save failed'
+    with app.app_context():
+        assert db.session.get(Quiz, quiz_id).title == 'Quiz'
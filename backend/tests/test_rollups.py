@@ -0,0 +1,73 @@
+import gzip
+import json
+import os
+from datetime import datetime, timedelta
+
+from app import ArchivedQuizAttempt, QuizAttempt, QuizDailyRollup, UserDailyRollup, db, rollup_attempts
+
+
+def played_quiz(app, make_user, make_quiz, submit):
+    owner, first, second = make_user('owner'), make_user('first'), make_user('second')
+    quiz_id = make_quiz(owner)
+    submit(first, quiz_id, {'0': 'a', '1': 'a', '2': 'b', '3': 'b'})
+    submit(first, quiz_id, {'0': 'a', '1': 'a', '2': 'a', '3': 'a'})
+    submit(second, quiz_id, {'0': 'a', '1': 'b', '2': 'b', '3': 'b'})
+    # The first user's attempts are old enough to be rolled up
+    with app.app_context():
+        QuizAttempt.query.filter_by(user_id=first)\
+            .update({'completed_at': datetime.utcnow() - timedelta(days=100)})
+        db.session.commit()
+    return owner, quiz_id
+
+
+def analytics_totals(client, auth, owner, quiz_id):
+    page = client.get(f'/api/quiz-analytics/{quiz_id}', headers=auth(owner)).get_json()
+    analytics = client.get(f'/api/quiz/{quiz_id}/analytics', headers=auth(owner)).get_json()['analytics']
+    details = client.get(f'/api/quiz/{quiz_id}/details').get_json()
+    stats = client.get('/api/stats').get_json()['stats']
+    return {
+        'page': (page['totalAttempts'], page['averageScore']),
+        'analytics': (analytics['total_attempts'], analytics['average_score'], analytics['score_distribution']),
+        'details': details['quiz']['statistics'],
+        'stats': stats
+    }
+
+
+def test_rollup_moves_old_attempts_into_daily_aggregates(app, make_user, make_quiz, submit):
+    _, quiz_id = played_quiz(app, make_user, make_quiz, submit)
+
+    with app.app_context():
+        assert rollup_attempts(older_than_days=30, archive_mode='table', batch_size=1) == 2
+        assert QuizAttempt.query.count() == 1
+        assert ArchivedQuizAttempt.query.count() == 2
+        rollup = QuizDailyRollup.query.filter_by(quiz_id=quiz_id).one()
+        assert (rollup.attempts, rollup.score_sum, rollup.score_max) == (2, 150.0, 100.0)
+        assert (rollup.bucket_41_60, rollup.bucket_81_100) == (1, 1)
+        user_rollup = UserDailyRollup.query.one()
+        assert (user_rollup.attempts, user_rollup.questions_sum, user_rollup.last_score) == (2, 8, 100.0)
+        # Nothing left to roll up
+        assert rollup_attempts(older_than_days=30, archive_mode='table') == 0
+
+
+def test_rollup_to_ndjson(app, make_user, make_quiz, submit):
+    played_quiz(app, make_user, make_quiz, submit)
+
+    with app.app_context():
+        assert rollup_attempts(older_than_days=30, archive_mode='ndjson') == 2
+        archive_dir = app.config['ATTEMPT_ARCHIVE_DIR']
+        [name] = os.listdir(archive_dir)
+        with gzip.open(os.path.join(archive_dir, name), 'rt', encoding='utf-8') as archive_file:
+            rows = [json.loads(line) for line in archive_file]
+        assert sorted(row['score'] for row in rows) == [50.0, 100.0]
+        assert ArchivedQuizAttempt.query.count() == 0
+
+
+def test_analytics_totals_survive_the_rollup(app, client, auth, make_user, make_quiz, submit):
+    owner, quiz_id = played_quiz(app, make_user, make_quiz, submit)
+    before = analytics_totals(client, auth, owner, quiz_id)
+    assert before['page'] == (3, round(175.0 / 3, 1))
+
+    with app.app_context():
+        assert rollup_attempts(older_than_days=30) == 2
+
+    assert analytics_totals(client, auth, owner, quiz_id) == before
@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta
+
+from app import ReviewItem, db
+from spaced_repetition import INITIAL_EASE, MIN_EASE, RELEARN_MINUTES, next_review
+
+START = datetime(2026, 1, 1, 9, 0)
+
+
+def test_correct_answers_grow_the_interval():
+    state = next_review(None, 'correct', START)
+    assert (state['repetitions'], state['interval_days'], state['due_at']) == (1, 1.0, START + timedelta(days=1))
+    assert state['ease'] == INITIAL_EASE + 0.1
+
+    state = next_review(state, 'correct', state['due_at'])
+    assert (state['repetitions'], state['interval_days']) == (2, 6.0)
+
+    previous = state
+    state = next_review(state, 'correct', state['due_at'])
+    assert state['repetitions'] == 3
+    assert state['interval_days'] == round(6.0 * state['ease'], 2)
+    assert state['due_at'] == previous['due_at'] + timedelta(days=state['interval_days'])
+
+
+def test_partial_answer_keeps_progress_but_lowers_the_ease():
+    state = next_review(None, 'partial', START)
+    assert state['repetitions'] == 1
+    assert state['ease'] == round(INITIAL_EASE - 0.14, 3)
+
+
+def test_miss_resets_and_relearns():
+    state = next_review(next_review(None, 'correct', START), 'incorrect', START + timedelta(days=1))
+    assert (state['repetitions'], state['lapses'], state['interval_days']) == (0, 1, 0.0)
+    assert state['due_at'] == START + timedelta(days=1, minutes=RELEARN_MINUTES)
+    assert state['last_outcome'] == 'incorrect'
+
+
+def test_ease_never_drops_below_the_minimum():
+    state = None
+    for _ in range(20):
+        state = next_review(state, 'incorrect', START)
+    assert state['ease'] == MIN_EASE and state['lapses'] == 20
+
+
+def test_early_success_keeps_the_schedule_but_early_miss_counts():
+    state = next_review(None, 'correct', START)
+    early = START + timedelta(hours=1)
+    retaken = next_review(state, 'correct', early)
+    assert {key: retaken[key] for key in ('ease', 'interval_days', 'repetitions', 'due_at')} == \
+           {key: state[key] for key in ('ease', 'interval_days', 'repetitions', 'due_at')}
+    assert retaken['last_reviewed_at'] == early
+
+    missed = next_review(state, 'incorrect', early)
+    assert missed['lapses'] == 1 and missed['due_at'] == early + timedelta(minutes=RELEARN_MINUTES)
+
+
+def test_submits_schedule_reviews(app, client, auth, make_user, make_quiz, submit):
+    owner, player = make_user('owner'), make_user('player')
+    quiz_id = make_quiz(owner, num_questions=2)
+    submit(player, quiz_id, {'0': 'a', '1': 'b'})
+
+    with app.app_context():
+        items = {item.question_index: item for item in ReviewItem.query.filter_by(user_id=player)}
+        assert (items[0].repetitions, items[0].last_outcome) == (1, 'correct')
+        assert (items[1].lapses, items[1].last_outcome) == (1, 'incorrect')
+        # Make the missed question due
+        items[1].due_at = datetime.utcnow() - timedelta(minutes=1)
+        db.session.commit()
+
+    body = client.get('/api/review/next', headers=auth(player)).get_json()
+    assert [(item['quiz_id'], item['question_index']) for item in body['items']] == [(quiz_id, 1)]
+    assert body['items'][0]['question']['question'] == 'Q1'
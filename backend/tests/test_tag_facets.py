@@ -0,0 +1,61 @@
+import json
+
+from app import Quiz, TagFacetCount, db, rebuild_tag_facets
+
+
+def edit(client, auth, app, owner, quiz_id, **changes):
+    with app.app_context():
+        content = json.loads(db.session.get(Quiz, quiz_id).quiz_content)
+    response = client.put(f'/api/quizzes/{quiz_id}', headers=auth(owner), json={'quiz_content': content, **changes})
+    assert response.status_code == 200, response.get_json()
+
+
+def facet_rows(app):
+    with app.app_context():
+        return sorted((row.tag_id, row.difficulty, row.quizzes) for row in TagFacetCount.query if row.quizzes)
+
+
+def test_edits_keep_the_facet_counts_current(app, client, auth, make_user, make_quiz):
+    app.config['TAG_FACETS_CACHE_SECONDS'] = 0
+    owner = make_user('owner')
+    first, second, third = (make_quiz(owner, title=title) for title in ('First', 'Second', 'Third'))
+    with app.app_context():
+        rebuild_tag_facets()
+    assert client.get('/api/tags').get_json() == {'tags': [], 'difficulties': {'Easy': 3}, 'total': 3}
+
+    edit(client, auth, app, owner, first, tags=['Biology', 'cells', 'biology'], difficulty='Hard')
+    edit(client, auth, app, owner, second, tags=['biology'])
+    edit(client, auth, app, owner, third, tags=['cells'], is_public=False)
+
+    assert client.get('/api/tags').get_json() == {
+        'tags': [{'name': 'biology', 'count': 2}, {'name': 'cells', 'count': 1}],
+        'difficulties': {'Easy': 1, 'Hard': 1},
+        'total': 2
+    }
+    hard = client.get('/api/tags?difficulty=Hard').get_json()
+    assert (hard['tags'], hard['total']) == ([{'name': 'biology', 'count': 1}, {'name': 'cells', 'count': 1}], 1)
+    assert client.get('/api/tags?difficulty=all').get_json()['total'] == 2
+
+    # The incremental counts match a full recount
+    counted = facet_rows(app)
+    with app.app_context():
+        rebuild_tag_facets()
+    assert facet_rows(app) == counted
+
+    edit(client, auth, app, owner, first, is_public=False)
+    assert client.get('/api/tags').get_json()['tags'] == [{'name': 'biology', 'count': 1}]
+
+
+def test_facets_are_cached(app, client, auth, make_user, make_quiz):
+    owner = make_user('owner')
+    quiz_id = make_quiz(owner)
+    with app.app_context():
+        rebuild_tag_facets()
+    response = client.get('/api/tags')
+    assert response.headers['Cache-Control'] == 'public, max-age=30'
+
+    edit(client, auth, app, owner, quiz_id, tags=['history'])
+    assert client.get('/api/tags').get_json()['tags'] == []
+    app.config['TAG_FACETS_CACHE_SECONDS'] = 0
+    app.extensions['quizgenie.tag_facets_cache'].clear()
+    assert client.get('/api/tags').get_json()['tags'] == [{'name': 'history', 'count': 1}]
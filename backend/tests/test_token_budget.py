@@ -0,0 +1,63 @@
+from types import SimpleNamespace
+
+import pytest
+
+from token_budget import (TokenUsage, compress_passage, estimate_messages_tokens, estimate_tokens, fit_passage)
+
+
+@pytest.mark.parametrize('text, tokens', [
+    ('', 0),
+    (None, 0),
+    ('The cat sat.', 4),
+    ('photosynthesis', 3),
+    ('1234567', 3),
+    ('a_b', 3),
+    ('日本語', 3),
+])
+def test_estimate_tokens(text, tokens):
+    assert estimate_tokens(text) == tokens
+
+
+def test_estimate_messages_tokens_adds_framing():
+    messages = [{'role': 'system', 'content': 'Be brief.'}, {'role': 'user', 'content': 'Hi'}]
+    assert estimate_messages_tokens(messages) == (3 + 4) + (1 + 4) + 3
+
+
+def test_compress_passage_drops_whitespace_and_repeated_lines():
+    text = 'Page 1 header\n\n  First   line.  \nPage 1 header\nSecond line.\n' + 'L' * 250 + '\n' + 'L' * 250
+    assert compress_passage(text) == 'Page 1 header\nFirst line.\nSecond line.\n' + 'L' * 250 + '\n' + 'L' * 250
+
+
+def test_fit_passage_unchanged_and_compressed():
+    assert fit_passage('Short text.', 100) == ('Short text.', {'original_tokens': 3, 'tokens': 3,
+                                                               'strategy': 'unchanged'})
+    text = 'Header line\nBody sentence here.\n' + 'Header line\n' * 20
+    passage, report = fit_passage(text, 10)
+    assert passage == 'Header line\nBody sentence here.'
+    assert report['strategy'] == 'compressed' and report['tokens'] <= 10 < report['original_tokens']
+
+
+def test_fit_passage_keeps_informative_sentences_in_order():
+    sentences = [
+        'Chloroplasts capture light energy for photosynthesis.',
+        'It was a sunny day.',
+        'Photosynthesis stores light energy in glucose made by chloroplasts.',
+        'Nobody knows why.',
+    ]
+    passage, report = fit_passage(' '.join(sentences), 30)
+    assert report['strategy'] == 'trimmed' and report['tokens'] <= 30
+    # The filler sentences go and the two on photosynthesis stay in their original order
+    assert passage == sentences[0] + ' ' + sentences[2]
+
+
+def test_fit_passage_cuts_a_single_long_sentence():
+    passage, report = fit_passage(' '.join(['word'] * 400), 40)
+    assert report['strategy'] == 'trimmed'
+    assert passage.split() == ['word'] * 30
+
+
+def test_token_usage_sums_reported_usage():
+    usage = TokenUsage()
+    usage.add(SimpleNamespace(usage=SimpleNamespace(prompt_tokens=10, completion_tokens=5)))
+    usage.add(SimpleNamespace(usage=None))
+    assert usage.as_dict() == {'requests': 2, 'prompt_tokens': 10, 'completion_tokens': 5}
@@ -0,0 +1,127 @@
+import gzip
+import json
+import os
+
+import pytest
+
+from app import Quiz, QuizAttempt, Tag, TransferCheckpoint, User, db, import_lines
+from conftest import build_app
+
+
+@pytest.fixture
+def exported(app, make_user, make_quiz, submit):
+    owner, player = make_user('owner'), make_user('player')
+    quiz_ids = sorted(make_quiz(owner, title=f'Quiz {i}') for i in range(3))
+    with app.app_context():
+        quiz = db.session.get(Quiz, quiz_ids[0])
+        quiz.tags.append(Tag(name='biology'))
+        db.session.commit()
+    submit(player, quiz_ids[0], {'0': 'a', '1': 'a', '2': 'b', '3': 'b'})
+    submit(player, quiz_ids[2], {'0': 'a'})
+    return owner, player, quiz_ids
+
+
+def read_lines(path):
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as lines:
+        return lines.read().splitlines(keepends=True)
+
+
+def export_file(app, path, *args):
+    result = app.test_cli_runner().invoke(args=['export-data', str(path), '--attempts', '--page-size', '1', *args])
+    assert result.exit_code == 0, result.output
+    return read_lines(str(path))
+
+
+def test_export_endpoint_streams_the_callers_quizzes(client, auth, exported):
+    owner, player, quiz_ids = exported
+    response = client.get('/api/export?attempts=1', headers=auth(owner))
+    assert response.mimetype == 'application/x-ndjson' and 'Content-Encoding' not in response.headers
+    records = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [record['type'] for record in records] == \
+        ['header', 'quiz', 'quiz', 'quiz', 'attempt', 'attempt', 'checkpoint', 'end']
+    assert [record['id'] for record in records if record['type'] == 'quiz'] == quiz_ids
+    assert records[1]['owner'] == 'owner' and records[1]['tags'] == ['biology']
+    assert {record['username'] for record in records if record['type'] == 'attempt'} == {'player'}
+    assert records[-1] == {'type': 'end', 'quizzes': 3, 'attempts': 2}
+
+    resumed = client.get(f'/api/export?after={quiz_ids[0]}', headers=auth(owner)).get_data(as_text=True)
+    assert [json.loads(line).get('id') for line in resumed.splitlines()][1:3] == quiz_ids[1:]
+    assert json.loads(client.get('/api/export', headers=auth(player)).get_data(as_text=True)
+                      .splitlines()[-1])['quizzes'] == 0
+
+
+@pytest.mark.parametrize('name', ['export.ndjson', 'export.ndjson.gz'])
+def test_export_command_resumes_from_its_checkpoint(app, tmp_path, exported, name):
+    output = tmp_path / name
+    full = export_file(app, output)
+    assert [json.loads(line)['type'] for line in full].count('checkpoint') == 3
+    assert not os.path.exists(f'{output}.partial') and not os.path.exists(f'{output}.checkpoint')
+
+    # Interrupted halfway through the second page: the partial file holds the first page and a torn write
+    first_page = ''.join(full[:4]).encode()
+    first_page = gzip.compress(first_page, mtime=0) if name.endswith('.gz') else first_page
+    with open(f'{output}.partial', 'wb') as partial_file:
+        partial_file.write(first_page + b'{"type": "quiz", "id": "torn')
+    checkpoint = json.loads(full[3])
+    with open(f'{output}.checkpoint', 'w', encoding='utf-8') as checkpoint_file:
+        json.dump({'after': checkpoint['after'], 'bytes': len(first_page), 'quizzes': 1, 'attempts': 1},
+                  checkpoint_file)
+    os.remove(output)
+
+    assert export_file(app, output) == full
+
+
+def test_import_resumes_and_runs_once(app, tmp_path, exported):
+    lines = export_file(app, tmp_path / 'export.ndjson')
+    (tmp_path / 'target').mkdir()
+    target = build_app(tmp_path / 'target')
+    messages = []
+    with target.app_context():
+        db.session.add_all([User(username='owner', email='owner@example.com', password='x'),
+                            User(username='player', email='player@example.com', password='x')])
+        db.session.commit()
+
+        # A truncated copy: the first two pages
+        assert import_lines(lines[:6], batch_size=2, echo=messages.append) == \
+            {'quizzes': 2, 'attempts': 1, 'existing_quizzes': 0, 'skipped': 0}
+        assert messages[-1].startswith('Warning')
+        assert TransferCheckpoint.query.one().completed_at is None
+
+        totals = import_lines(lines, batch_size=2, echo=messages.append)
+        assert 'Resuming at line 7' in messages
+        assert totals == {'quizzes': 1, 'attempts': 1, 'existing_quizzes': 0, 'skipped': 0}
+        assert TransferCheckpoint.query.one().completed_at is not None
+        assert import_lines(lines, echo=messages.append) == {} and messages[-1] == 'This export was already imported'
+
+        assert Quiz.query.count() == 3 and QuizAttempt.query.count() == 2
+        quiz = db.session.get(Quiz, json.loads(lines[1])['id'])
+        assert [tag.name for tag in quiz.tags] == ['biology']
+        assert User.query.filter_by(username='player').one().total_score == 50.0 + 25.0
+        db.session.remove()
+        db.engine.dispose()
+
+
+def test_import_command_maps_missing_users(app, tmp_path, exported):
+    path = tmp_path / 'export.ndjson.gz'
+    export_file(app, path)
+    (tmp_path / 'target').mkdir()
+    target = build_app(tmp_path / 'target')
+    with target.app_context():
+        db.session.add(User(username='curator', email='curator@example.com', password='x'))
+        db.session.commit()
+    runner = target.test_cli_runner()
+
+    result = runner.invoke(args=['import-data', str(path), '--default-user', 'nobody'])
+    assert result.exit_code != 0 and 'Unknown user nobody' in result.output
+    result = runner.invoke(args=['import-data', str(path), '--default-user', 'curator'])
+    assert result.exit_code == 0, result.output
+    assert 'Imported 3 quizzes and 2 attempts (0 quizzes already present, 0 records skipped)' in result.output
+    with target.app_context():
+        assert {quiz.user_id for quiz in Quiz.query} == {User.query.filter_by(username='curator').one().id}
+        db.session.remove()
+        db.engine.dispose()
+
+    with pytest.raises(ValueError):
+        with app.app_context():
+            import_lines(['{"type": "quiz"}\n'])
@@ -0,0 +1,122 @@
+"""Token estimates, passage budgets and usage accounting for LLM calls.
+
+estimate_tokens() approximates the provider's BPE tokenizer without loading
+it: common words are one token, long words and numbers split into several,
+and punctuation and other symbols count one each. It is used to size
+requests before they are sent; what a call really cost always comes from the
+response's `usage` field (see TokenUsage).
+
+fit_passage() keeps a generation prompt within its budget. Whitespace runs
+and repeated lines (page headers, footers) are dropped first; if the passage
+is still too long, the most informative sentences are kept in their original
+order.
+"""
+import math
+import re
+import threading
+from collections import Counter
+
+WORD_RE = re.compile(r"[^\W\d_]+|\d+|[^\w\s]|_")
+SENTENCE_RE = re.compile(r'[^.!?\n]+(?:[.!?]+|\n|$)')
+CONTENT_WORD_RE = re.compile(r'[a-z]{4,}')
+
+# Letters per token for words longer than one token; digits group by three
+LETTERS_PER_TOKEN = 6
+DIGITS_PER_TOKEN = 3
+
+
+def estimate_tokens(text):
+    """Approximate token count of `text` for OpenAI's chat models"""
+    tokens = 0
+    for piece in WORD_RE.findall(text or ''):
+        if piece.isdigit():
+            tokens += math.ceil(len(piece) / DIGITS_PER_TOKEN)
+        elif piece.isalpha() and piece.isascii():
+            tokens += math.ceil(len(piece) / LETTERS_PER_TOKEN)
+        elif piece.isalpha():
+            tokens += len(piece)  # Non-Latin scripts are roughly a token per character
+        else:
+            tokens += 1
+    return tokens
+
+
+def estimate_messages_tokens(messages):
+    # Each message carries a few tokens of role / separator framing
+    return sum(estimate_tokens(message['content']) + 4 for message in messages) + 3
+
+
+def compress_passage(text):
+    """Collapse whitespace and drop lines repeated verbatim (page headers, footers, navigation)"""
+    seen, lines = set(), []
+    for line in text.splitlines():
+        line = ' '.join(line.split())
+        key = line.lower()
+        if not line or (key in seen and len(line) < 200):
+            continue
+        seen.add(key)
+        lines.append(line)
+    return '\n'.join(lines)
+
+
+def _sentence_scores(sentences):
+    """Sum of passage-wide frequencies of a sentence's content words, per token it costs"""
+    words = [CONTENT_WORD_RE.findall(sentence.lower()) for sentence in sentences]
+    frequencies = Counter(word for sentence_words in words for word in set(sentence_words))
+    return [sum(frequencies[word] for word in set(sentence_words)) / max(1, estimate_tokens(sentence))
+            for sentence_words, sentence in zip(words, sentences)]
+
+
+def fit_passage(text, max_tokens):
+    """(passage, report) with the passage within max_tokens.
+
+    report holds original_tokens, tokens and strategy: 'unchanged', 'compressed'
+    or 'trimmed' (sentences dropped).
+    """
+    original_tokens = estimate_tokens(text)
+    if original_tokens <= max_tokens:
+        return text, {'original_tokens': original_tokens, 'tokens': original_tokens, 'strategy': 'unchanged'}
+
+    compressed = compress_passage(text)
+    tokens = estimate_tokens(compressed)
+    if tokens <= max_tokens:
+        return compressed, {'original_tokens': original_tokens, 'tokens': tokens, 'strategy': 'compressed'}
+
+    sentences = [sentence.strip() for sentence in SENTENCE_RE.findall(compressed) if sentence.strip()]
+    costs = [estimate_tokens(sentence) + 1 for sentence in sentences]
+    scores = _sentence_scores(sentences)
+    ranked = sorted(range(len(sentences)), key=lambda index: (-scores[index], index))
+
+    kept, used = set(), 0
+    for index in ranked:
+        if used + costs[index] <= max_tokens:
+            kept.add(index)
+            used += costs[index]
+    if not kept:
+        # A single sentence longer than the budget: keep its beginning
+        words = compressed.split()
+        passage = ' '.join(words[:max(1, max_tokens * 3 // 4)])
+    else:
+        passage = ' '.join(sentences[index] for index in sorted(kept))
+    return passage, {'original_tokens': original_tokens, 'tokens': estimate_tokens(passage), 'strategy': 'trimmed'}
+
+
+class TokenUsage:
+    """Running total of the `usage` reported by one or more chat completions (thread-safe)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def add(self, response):
+        usage = getattr(response, 'usage', None)
+        with self._lock:
+            self.requests += 1
+            self.prompt_tokens += getattr(usage, 'prompt_tokens', 0) or 0
+            self.completion_tokens += getattr(usage, 'completion_tokens', 0) or 0
+
+    def as_dict(self):
+        with self._lock:
+            return {'requests': self.requests, 'prompt_tokens': self.prompt_tokens,
+                    'completion_tokens': self.completion_tokens}
@@ -2,9 +2,20 @@ import { useState, useEffect } from 'react';
 import { Clock, Check, X, BarChart2, List } from 'lucide-react';
 import axios from 'axios';
 
+const fetchAttemptPage = (quizId, cursor) => {
+  const token = localStorage.getItem('token');
+  return axios.get(`/api/attempts/${quizId}`, {
+    headers: { 'Authorization': `Bearer ${token}` },
+    params: cursor ? { cursor } : {}
+  });
+};
+
 const QuizAttemptTracker = ({ quizId, userId }) => {
   const [attempts, setAttempts] = useState([]);
+  const [summary, setSummary] = useState(null);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [error, setError] = useState(null);
   const [activeTab, setActiveTab] = useState('stats');
 
@@ -12,11 +23,10 @@ const QuizAttemptTracker = ({ quizId, userId }) => {
     const fetchAttempts = async () => {
       try {
         setLoading(true);
-        const token = localStorage.getItem('token');
-        const response = await axios.get(`/api/attempts/${quizId}`, {
-          headers: { 'Authorization': `Bearer ${token}` }
-        });
-        setAttempts(response.data);
+        const response = await fetchAttemptPage(quizId, null);
+        setAttempts(response.data.attempts);
+        setSummary(response.data.summary);
+        setNextCursor(response.data.next_cursor);
       } catch (err) {
         setError(err.response?.data?.error || 'Failed to load attempts');
       } finally {
@@ -29,16 +39,27 @@ const QuizAttemptTracker = ({ quizId, userId }) => {
     }
   }, [quizId, userId]);
 
+  // The history tab pages through older attempts; the statistics come from the server's totals
+  const loadMore = async () => {
+    try {
+      setLoadingMore(true);
+      const response = await fetchAttemptPage(quizId, nextCursor);
+      setAttempts((previous) => [...previous, ...response.data.attempts]);
+      setNextCursor(response.data.next_cursor);
+    } catch (err) {
+      setError(err.response?.data?.error || 'Failed to load attempts');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   if (loading) return <div className="text-center py-4">Loading attempt history...</div>;
   if (error) return <div className="text-red-500 text-center py-4">{error}</div>;
 
-  const bestAttempt = attempts.length > 0 
-    ? attempts.reduce((best, current) => current.score > best.score ? current : best)
-    : null;
-
-  const averageScore = attempts.length > 0
-    ? attempts.reduce((sum, attempt) => sum + attempt.score, 0) / attempts.length
-    : 0;
+  const totalAttempts = summary?.total_attempts ?? attempts.length;
+  const bestScore = summary?.best_score ?? null;
+  const averageScore = summary?.average_score ?? null;
+  const bestAttempt = summary?.best_attempt ?? null;
 
   return (
     <div className="bg-white rounded-lg shadow-sm p-6 border border-gray-200">
@@ -65,19 +86,19 @@ const QuizAttemptTracker = ({ quizId, userId }) => {
           <div className="grid grid-cols-1 md:grid-cols-3 gap-4 mb-6">
             <div className="bg-blue-50 rounded-lg p-4">
               <div className="text-2xl font-bold text-blue-600">
-                {attempts.length}
+                {totalAttempts}
               </div>
               <div className="text-sm text-gray-600">Total Attempts</div>
             </div>
             <div className="bg-green-50 rounded-lg p-4">
               <div className="text-2xl font-bold text-green-600">
-                {bestAttempt ? `${bestAttempt.score.toFixed(1)}%` : 'N/A'}
+                {bestScore !== null ? `${bestScore.toFixed(1)}%` : 'N/A'}
               </div>
               <div className="text-sm text-gray-600">Best Score</div>
             </div>
             <div className="bg-purple-50 rounded-lg p-4">
               <div className="text-2xl font-bold text-purple-600">
-                {attempts.length > 0 ? `${averageScore.toFixed(1)}%` : 'N/A'}
+                {averageScore !== null ? `${averageScore.toFixed(1)}%` : 'N/A'}
               </div>
               <div className="text-sm text-gray-600">Average Score</div>
             </div>
@@ -138,6 +159,15 @@ const QuizAttemptTracker = ({ quizId, userId }) => {
                   </div>
                 </div>
               ))}
+              {nextCursor && (
+                <button
+                  className="w-full py-2 text-sm font-medium text-blue-600 hover:text-blue-800 disabled:text-gray-400"
+                  onClick={loadMore}
+                  disabled={loadingMore}
+                >
+                  {loadingMore ? 'Loading...' : 'Load more'}
+                </button>
+              )}
             </div>
           )}
         </div>
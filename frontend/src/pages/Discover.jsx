@@ -145,9 +145,8 @@ const DiscoverQuizzes = () => {
     return matchesSearch && matchesCategory && matchesDifficulty;
   });
 
-  // Sort based on active filter
+  // Sort based on active filter (trending keeps the server's time-decayed order)
   const sortedQuizzes = [...filteredQuizzes].sort((a, b) => {
-    if (activeFilter === 'trending') return b.plays - a.plays;
     if (activeFilter === 'newest') return new Date(b.createdAt) - new Date(a.createdAt);
     if (activeFilter === 'top-rated') return b.rating - a.rating;
     return 0;
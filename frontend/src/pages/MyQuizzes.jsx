@@ -36,6 +36,8 @@ const MyQuizzes = () => {
   });
   
   const [loading, setLoading] = useState(true);
+  const [listLoading, setListLoading] = useState(false);
+  const [loadedSections, setLoadedSections] = useState({ created: false, taken: false });
   const [error, setError] = useState(null);
   const [currentPage, setCurrentPage] = useState(1);
   const [showDeleteConfirm, setShowDeleteConfirm] = useState(null);
@@ -60,9 +62,18 @@ const MyQuizzes = () => {
 
   const itemsPerPage = 6;
 
-  // Fetch all user data from a single endpoint
+  const handleFetchError = (err, fallback) => {
+    if (err.response?.status === 401) {
+      localStorage.removeItem('token');
+      navigate('/login');
+    } else {
+      setError(err.response?.data?.error || fallback);
+    }
+  };
+
+  // The header (profile, stats, rank) is fetched on its own so it renders at once
   useEffect(() => {
-    const fetchData = async () => {
+    const fetchHeader = async () => {
       try {
         setLoading(true);
         const token = localStorage.getItem('token');
@@ -71,75 +82,87 @@ const MyQuizzes = () => {
           return;
         }
 
-        const response = await axios.get('/get-user-data', { 
-          headers: { 'Authorization': `Bearer ${token}` } 
+        const response = await axios.get('/get-user-data', {
+          headers: { 'Authorization': `Bearer ${token}` },
+          params: { include: 'stats,rank' }
         });
 
-        // Transform the data to match our frontend expectations
-        const createdQuizzes = response.data.user.createdQuizzes?.map(quiz => ({
-          ...quiz,
-          questionCount: quiz.questions ? quiz.questions.length : 0,
-          createdAt: quiz.created_at || quiz.createdAt,
-          participants: quiz.attempts ? quiz.attempts.map(attempt => ({
-            username: attempt.user?.username || 'Anonymous',
-            score: attempt.score,
-            completedAt: attempt.completed_at,
-            timeSpent: attempt.time_spent
-          })) : []
-        })) || [];
-
-        const takenQuizzes = response.data.user.takenQuizzes?.map(attempt => ({
-          // quiz_id represents the actual quiz identifier, used for navigation
-          id: attempt.quiz_id,
-          title: attempt.quiz?.title || 'Deleted Quiz',
-          creator: attempt.quiz?.user?.username || 'System',
-          // The API returns quiz details at the top level (title, creator, etc.)
-          // so we access them directly rather than through a nested quiz object
-          title: attempt.title || 'Deleted Quiz',
-          creator: attempt.creator || 'System',
-          score: attempt.score,
-          completedAt: attempt.completed_at,
-          timeSpent: attempt.time_spent,
-          rating: attempt.quiz?.rating || 0,
-          category: attempt.quiz?.category,
-          difficulty: attempt.quiz?.difficulty,
-          rating: attempt.rating || 0,
-          category: attempt.category,
-          difficulty: attempt.difficulty,
-          questions: attempt.questions
-        })) || [];
-        
-
-        setUserData({
+        setUserData(prev => ({
+          ...prev,
           user: {
             ...response.data.user,
             joinDate: response.data.user.created_at
           },
-          stats: response.data.user.stats || {
-            quizzesCreated: createdQuizzes.length,
-            quizzesTaken: takenQuizzes.length,
-            totalPlays: response.data.user.stats?.totalPlays || 0,
-            averageScore: response.data.user.stats?.averageScore || 0
-          },
-          rank: response.data.user.rank || 0,
-          createdQuizzes,
-          takenQuizzes
-        });
+          stats: response.data.user.stats || prev.stats,
+          rank: response.data.user.rank || 0
+        }));
 
       } catch (err) {
-        if (err.response?.status === 401) {
-          localStorage.removeItem('token');
-          navigate('/login');
+        handleFetchError(err, 'Failed to load user data');
+      } finally {
+        setLoading(false);
+      }
+    };
+
+    fetchHeader();
+  }, [navigate]);
+
+  // Each quiz list is fetched the first time its tab is shown
+  useEffect(() => {
+    if (loadedSections[activeFilter]) return;
+
+    const fetchSection = async () => {
+      try {
+        setListLoading(true);
+        const token = localStorage.getItem('token');
+        if (!token) return;
+
+        const response = await axios.get(`/get-user-data/${activeFilter}`, {
+          headers: { 'Authorization': `Bearer ${token}` }
+        });
+
+        if (activeFilter === 'created') {
+          // Transform the data to match our frontend expectations
+          const createdQuizzes = response.data.createdQuizzes?.map(quiz => ({
+            ...quiz,
+            questionCount: quiz.questions ? quiz.questions.length : 0,
+            createdAt: quiz.created_at || quiz.createdAt,
+            participants: quiz.attempts ? quiz.attempts.map(attempt => ({
+              username: attempt.user?.username || 'Anonymous',
+              score: attempt.score,
+              completedAt: attempt.completed_at,
+              timeSpent: attempt.time_spent
+            })) : []
+          })) || [];
+          setUserData(prev => ({ ...prev, createdQuizzes }));
         } else {
-          setError(err.response?.data?.error || 'Failed to load user data');
+          const takenQuizzes = response.data.takenQuizzes?.map(attempt => ({
+            // quiz_id represents the actual quiz identifier, used for navigation
+            id: attempt.quiz_id,
+            // The API returns quiz details at the top level (title, creator, etc.)
+            title: attempt.title || 'Deleted Quiz',
+            creator: attempt.creator || 'System',
+            score: attempt.score,
+            completedAt: attempt.completed_at,
+            timeSpent: attempt.time_spent,
+            rating: attempt.rating || 0,
+            category: attempt.category,
+            difficulty: attempt.difficulty,
+            questions: attempt.questions
+          })) || [];
+          setUserData(prev => ({ ...prev, takenQuizzes }));
         }
+        setLoadedSections(prev => ({ ...prev, [activeFilter]: true }));
+
+      } catch (err) {
+        handleFetchError(err, 'Failed to load quizzes');
       } finally {
-        setLoading(false);
+        setListLoading(false);
       }
     };
 
-    fetchData();
-  }, [searchQuery, activeFilter, categoryFilter, difficultyFilter, navigate]);
+    fetchSection();
+  }, [activeFilter, loadedSections, navigate]);
 
   const handleCreateQuiz = () => {
     setIsCreatingQuiz(true);
@@ -455,7 +478,11 @@ const filteredQuizzes = currentQuizzes
         )}
 
         {/* Quiz Grid */}
-        {currentPageQuizzes.length > 0 ? (
+        {listLoading && !loadedSections[activeFilter] ? (
+          <div className="flex justify-center py-12">
+            <Loader2 className="h-8 w-8 animate-spin text-blue-500" />
+          </div>
+        ) : currentPageQuizzes.length > 0 ? (
           <div className="grid grid-cols-1 sm:grid-cols-2 lg:grid-cols-3 gap-6">
             {currentPageQuizzes.map((quiz) => (
               <div 